@@ -0,0 +1,56 @@
+import argparse
+import os
+import sys
+from time import perf_counter
+
+
+def main(argv=None):
+    # `python -m apache_logs <path or URL>` parses and loads a log in this process, without the broker
+    # and without importing Celery; requests is only imported for http(s) URLs.
+    parser = argparse.ArgumentParser(prog="python -m apache_logs", description="Imports an Apache log directly.")
+    parser.add_argument("url", help="path, file:// or http(s) URL of the log")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "parsing_logs.settings")
+
+    import django
+
+    django.setup()
+
+    from apache_logs.daos import FileRequestDAO
+    from apache_logs.usecases import ParseLogsUseCase
+    from apache_logs.workers import get_apache_logs_dao, get_import_status_dao, get_source_request_dao, \
+        get_parse_logs_options, refresh_saved_searches
+
+    if args.url.startswith(("http://", "https://")):
+        request_dao = get_source_request_dao()
+    else:
+        request_dao = FileRequestDAO()
+
+    import_status_dao = get_import_status_dao()
+    # Created here so the import shows up on the dashboard like one started from it.
+    import_status = import_status_dao.create_import_status()
+    print(f"Import {import_status.pk} of '{args.url}' started")
+
+    parse_logs_usecase = ParseLogsUseCase(
+        logs_dao=get_apache_logs_dao(),
+        request_dao=request_dao,
+        import_status_dao=import_status_dao,
+        **get_parse_logs_options(),
+    )
+
+    started_at = perf_counter()
+    try:
+        parse_logs_usecase.execute(url=args.url, import_status_id=import_status.pk)
+    except OSError as error:
+        print(f"Import {import_status.pk} failed: {error}")
+        return 1
+
+    print(f"Import {import_status.pk} finished in {perf_counter() - started_at:.1f} s")
+    print(f"{refresh_saved_searches()} saved searches refreshed")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
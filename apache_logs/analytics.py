@@ -0,0 +1,189 @@
+import fcntl
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Tuple, Iterator, Iterable
+
+# Columns of the analytics copy, rows are appended in this order.
+ANALYTICS_COLUMNS = ["id", "ip_address", "date", "method", "uri", "status_code", "size"]
+
+SEGMENT_EXTENSION = ".parquet"
+
+
+class ColumnarLogStore:
+    # Columnar copy of the imported log rows on local disk, queried by DuckDB with all cores.
+    # Rows are kept in immutable Parquet segments named after their row count. Every import
+    # batch becomes a new segment, so worker processes never write the same file, and small
+    # segments are merged once `compact_segments` of them pile up. Queries hold a shared lock
+    # on the directory, merges and deletions an exclusive one.
+
+    def __init__(self, path: str, threads: int = 0, compact_segments: int = 16, segment_rows: int = 1_000_000):
+        self.path = path
+        self.threads = threads
+        self.compact_segments = compact_segments
+        self.segment_rows = segment_rows
+
+    def _get_schema(self):
+        import pyarrow
+
+        return pyarrow.schema([
+            ("id", pyarrow.int64()),
+            ("ip_address", pyarrow.string()),
+            ("date", pyarrow.timestamp("us", tz="UTC")),
+            ("method", pyarrow.string()),
+            ("uri", pyarrow.string()),
+            ("status_code", pyarrow.int32()),
+            ("size", pyarrow.int64()),
+        ])
+
+    def _get_segment_names(self) -> List[str]:
+        if not os.path.isdir(self.path):
+            return []
+
+        return sorted(name for name in os.listdir(self.path) if name.endswith(SEGMENT_EXTENSION))
+
+    def _get_segment_rows(self, name: str) -> int:
+        return int(name.split("-", 1)[0])
+
+    def _get_new_segment_name(self, rows: int) -> str:
+        return f"{rows:012d}-{uuid.uuid4().hex}{SEGMENT_EXTENSION}"
+
+    def _get_sql_paths(self, names: List[str]) -> str:
+        paths = (os.path.join(self.path, name).replace("'", "''") for name in names)
+        return "[" + ", ".join(f"'{path}'" for path in paths) + "]"
+
+    @contextmanager
+    def _lock(self, exclusive: bool, blocking: bool = True) -> Iterator[bool]:
+        os.makedirs(self.path, exist_ok=True)
+
+        with open(os.path.join(self.path, ".lock"), "w") as lock_file:
+            operation = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            try:
+                fcntl.flock(lock_file, operation if blocking else operation | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _connect(self):
+        import duckdb
+
+        connection = duckdb.connect()
+        # Dates are compared and truncated in UTC, like the Django ORM does with USE_TZ.
+        connection.execute("SET TimeZone = 'UTC'")
+        if self.threads:
+            connection.execute(f"SET threads = {int(self.threads)}")
+
+        return connection
+
+    def _write_segment(self, connection, select_sql: str, rows: int, params: Iterable = ()):
+        # Written next to the segments and renamed, queries never see a partial file.
+        name = self._get_new_segment_name(rows)
+        temporary_path = os.path.join(self.path, f".{name}.tmp")
+        sql_path = temporary_path.replace("'", "''")
+        connection.execute(f"COPY ({select_sql}) TO '{sql_path}' (FORMAT parquet)", list(params))
+        os.replace(temporary_path, os.path.join(self.path, name))
+
+    def has_segments(self) -> bool:
+        return bool(self._get_segment_names())
+
+    def append(self, rows: List[Tuple]):
+        # `rows` are tuples of ANALYTICS_COLUMNS.
+        if not rows:
+            return
+
+        import pyarrow
+
+        schema = self._get_schema()
+        segment = pyarrow.Table.from_arrays(
+            [pyarrow.array(column, type=field.type) for column, field in zip(zip(*rows), schema)],
+            schema=schema,
+        )
+
+        os.makedirs(self.path, exist_ok=True)
+        connection = self._connect()
+        try:
+            connection.register("segment", segment)
+            self._write_segment(connection, "SELECT * FROM segment ORDER BY date", rows=len(rows))
+        finally:
+            connection.close()
+
+        self.compact(blocking=False)
+
+    def compact(self, blocking: bool = True) -> int:
+        # Merges small segments into one, returns the number of merged segments.
+        with self._lock(exclusive=True, blocking=blocking) as locked:
+            if not locked:
+                return 0
+
+            names = [name for name in self._get_segment_names() if self._get_segment_rows(name) < self.segment_rows]
+            if len(names) < self.compact_segments:
+                return 0
+
+            connection = self._connect()
+            try:
+                self._write_segment(
+                    connection,
+                    f"SELECT * FROM read_parquet({self._get_sql_paths(names)}) ORDER BY date",
+                    rows=sum(self._get_segment_rows(name) for name in names),
+                )
+            finally:
+                connection.close()
+
+            for name in names:
+                os.remove(os.path.join(self.path, name))
+
+            return len(names)
+
+    def delete_before(self, date: datetime) -> int:
+        # Segments with only older rows are removed, segments with some are rewritten without them.
+        deleted = 0
+
+        with self._lock(exclusive=True):
+            connection = self._connect()
+            try:
+                for name in self._get_segment_names():
+                    path = os.path.join(self.path, name)
+                    sql_paths = self._get_sql_paths([name])
+                    old_rows, rows = connection.execute(
+                        f"SELECT COUNT(*) FILTER (WHERE date < ?), COUNT(*) FROM read_parquet({sql_paths})", [date],
+                    ).fetchone()
+
+                    if old_rows and old_rows < rows:
+                        self._write_segment(
+                            connection,
+                            f"SELECT * FROM read_parquet({sql_paths}) WHERE date >= ?",
+                            rows=rows - old_rows,
+                            params=[date],
+                        )
+                    if old_rows:
+                        os.remove(path)
+                        deleted += old_rows
+            finally:
+                connection.close()
+
+        return deleted
+
+    def clear(self):
+        with self._lock(exclusive=True):
+            for name in self._get_segment_names():
+                os.remove(os.path.join(self.path, name))
+
+    @contextmanager
+    def connect(self):
+        # DuckDB connection with the `logs` view over all segments, segments are not
+        # merged or deleted while it is open.
+        with self._lock(exclusive=False):
+            connection = self._connect()
+            try:
+                names = self._get_segment_names()
+                if names:
+                    connection.execute(f"CREATE VIEW logs AS SELECT * FROM read_parquet({self._get_sql_paths(names)})")
+                yield connection
+            finally:
+                connection.close()
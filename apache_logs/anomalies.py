@@ -0,0 +1,136 @@
+from collections import Counter
+from datetime import datetime, timezone, timedelta
+from typing import List, Dict, Tuple, Optional
+
+from apache_logs.constants import ANOMALY_KINDS
+from apache_logs.entities import ApacheLog, AnomalyEvent, AnomalyThresholds
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class BurstDetector:
+    # Streams the logs of one file in time order and counts requests and errors (status >= 400)
+    # per ip address and per uri in fixed windows of `window_seconds`. The rate of a key is a
+    # sliding window estimate: the count of the previous window, weighted by the part of it still
+    # inside the sliding window, plus the count of the current one. A key crossing a threshold is
+    # flagged once per window, its event is emitted with the final counts when the window ends.
+    #
+    # Only the current and the previous window are kept, at most `max_keys` keys each, when there
+    # are more the least requested half is dropped, so counts of rare keys may be too low. Keys
+    # flagged in the current window are always kept. Logs older than the current window are
+    # counted in it.
+
+    def __init__(self, thresholds: AnomalyThresholds):
+        self.thresholds = thresholds
+        self.window_seconds = thresholds.window_seconds
+        self.max_requests = {"ip": thresholds.max_ip_requests, "uri": thresholds.max_uri_requests}
+        self.window: Optional[int] = None
+        self.counts: Dict[str, Counter] = {kind: Counter() for kind in ANOMALY_KINDS}
+        self.errors: Dict[str, Counter] = {kind: Counter() for kind in ANOMALY_KINDS}
+        self.previous_counts: Dict[str, Counter] = {kind: Counter() for kind in ANOMALY_KINDS}
+        # (kind, key, reason) flagged in the current window.
+        self.flagged: Dict[Tuple[str, str, str], None] = {}
+
+    def _get_window(self, date: datetime) -> int:
+        return (date - EPOCH) // timedelta(seconds=self.window_seconds)
+
+    def _end_window(self) -> List[AnomalyEvent]:
+        window_start = EPOCH + timedelta(seconds=self.window * self.window_seconds)
+        events = [
+            AnomalyEvent(
+                kind=kind,
+                key=key,
+                reason=reason,
+                window_start=window_start,
+                window_seconds=self.window_seconds,
+                count=self.counts[kind][key],
+                error_count=self.errors[kind][key],
+            ) for kind, key, reason in self.flagged
+        ]
+        self.flagged = {}
+
+        return events
+
+    def _move_to_window(self, window: int) -> List[AnomalyEvent]:
+        events = self._end_window() if self.window is not None else []
+
+        for kind in ANOMALY_KINDS:
+            if self.window is not None and window == self.window + 1:
+                self.previous_counts[kind] = self.counts[kind]
+            else:
+                self.previous_counts[kind] = Counter()
+            self.counts[kind] = Counter()
+            self.errors[kind] = Counter()
+        self.window = window
+
+        return events
+
+    def _prune(self, kind: str):
+        counts = self.counts[kind]
+        if len(counts) <= self.thresholds.max_keys:
+            return
+
+        # A flagged key keeps its counts, its event is emitted with them when the window ends.
+        kept = dict(counts.most_common(self.thresholds.max_keys // 2))
+        kept.update((key, counts[key]) for flagged_kind, key, _ in self.flagged if flagged_kind == kind)
+        self.counts[kind] = Counter(kept)
+        self.errors[kind] = Counter({key: count for key, count in self.errors[kind].items() if key in kept})
+
+    def _count(self, apache_logs: List[ApacheLog], last_date: datetime):
+        # `last_date` is the latest date of the logs, the sliding window ends there.
+        elapsed = (last_date - EPOCH) / timedelta(seconds=self.window_seconds) - self.window
+        previous_weight = 1.0 - min(max(elapsed, 0.0), 1.0)
+        errors = [apache_log for apache_log in apache_logs if apache_log.status_code >= 400]
+
+        for kind, attribute in ANOMALY_KINDS.items():
+            # Counted with Counter.update, which runs in C, only keys seen in these logs are checked.
+            keys = Counter(getattr(apache_log, attribute) for apache_log in apache_logs)
+            counts, kind_errors, previous_counts = self.counts[kind], self.errors[kind], self.previous_counts[kind]
+            counts.update(keys)
+            kind_errors.update(getattr(apache_log, attribute) for apache_log in errors)
+
+            max_requests = self.max_requests[kind]
+            for key in keys:
+                count = counts[key]
+                if max_requests and count + previous_counts.get(key, 0) * previous_weight > max_requests:
+                    self.flagged.setdefault((kind, key, "rate"), None)
+                if (
+                    self.thresholds.max_error_ratio
+                    and count >= self.thresholds.min_requests
+                    and kind_errors[key] / count > self.thresholds.max_error_ratio
+                ):
+                    self.flagged.setdefault((kind, key, "error_ratio"), None)
+
+            self._prune(kind)
+
+    def observe(self, apache_logs: List[ApacheLog]) -> List[AnomalyEvent]:
+        # Events of the windows that ended with these logs.
+        if not apache_logs:
+            return []
+
+        window_by_date = {date: self._get_window(date) for date in {log.date for log in apache_logs}}
+        events = []
+        start = 0
+
+        # Logs come in time order, so they are split into runs of the same window.
+        while start < len(apache_logs):
+            window = window_by_date[apache_logs[start].date]
+            if self.window is None or window > self.window:
+                events += self._move_to_window(window)
+
+            stop = start + 1
+            while stop < len(apache_logs) and window_by_date[apache_logs[stop].date] <= self.window:
+                stop += 1
+
+            run = apache_logs[start:stop]
+            self._count(run, last_date=max(log.date for log in run))
+            start = stop
+
+        return events
+
+    def flush(self) -> List[AnomalyEvent]:
+        # Events of the current window, at the end of the file.
+        if self.window is None:
+            return []
+
+        return self._end_window()
@@ -0,0 +1,85 @@
+from typing import Iterator, Tuple, List, Union
+
+KB = 1024
+MB = 1024 * KB
+
+# Complete log lines separated by b"\n", usually a view into a fetched slice.
+Buffer = Union[bytes, memoryview]
+
+
+class AdaptiveRangeSizer:
+    # Picks the size of the next range request from the measured throughput, so every
+    # request takes about `target_seconds`. `max_size` is the memory budget for a single
+    # slice, `min_size` keeps tiny files from being fetched in hundreds of requests.
+
+    def __init__(
+        self,
+        min_size: int = 64 * KB,
+        max_size: int = 16 * MB,
+        target_seconds: float = 1.0,
+        initial_size: int = MB,
+    ):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_seconds = target_seconds
+        self.size = self._clamp(initial_size)
+
+    def _clamp(self, size: int) -> int:
+        return max(self.min_size, min(self.max_size, size))
+
+    def get_size(self) -> int:
+        return self.size
+
+    def record(self, size: int, seconds: float):
+        if seconds <= 0:
+            desired_size = self.size * 2
+        else:
+            desired_size = int(size / seconds * self.target_seconds)
+
+        # Never more than double or halve at once, a single slow response
+        # should not collapse the range size.
+        desired_size = max(self.size // 2, min(self.size * 2, desired_size))
+
+        self.size = self._clamp(desired_size)
+
+    def get_ranges(self, max_length: int, from_bytes: int = 0) -> Iterator[Tuple[int, int]]:
+        while from_bytes < max_length:
+            to_bytes = min(from_bytes + self.size, max_length) - 1
+
+            yield from_bytes, to_bytes
+
+            from_bytes = to_bytes + 1
+
+
+class LineSplitter:
+    # Cuts fetched slices into buffers of complete lines without copying or decoding them.
+    # The unfinished last line of a slice is kept as a small bytes tail and completes the
+    # first line of the next slice. With `skip_first_line` everything up to the first
+    # newline is dropped, it belongs to a line that started before the first slice.
+
+    def __init__(self, skip_first_line: bool = False):
+        self.skip_first_line = skip_first_line
+        self.tail = b""
+
+    def split(self, content: bytes) -> List[Buffer]:
+        first_newline = content.find(b"\n")
+        if first_newline < 0:
+            if not self.skip_first_line:
+                self.tail += content
+            return []
+
+        last_newline = content.rfind(b"\n")
+        view = memoryview(content)
+        buffers = [] if self.skip_first_line else [self.tail + view[:first_newline]]
+        if last_newline > first_newline:
+            buffers.append(view[first_newline + 1:last_newline])
+
+        self.skip_first_line = False
+        self.tail = bytes(view[last_newline + 1:])
+
+        return buffers
+
+    def flush(self) -> List[Buffer]:
+        tail, self.tail = self.tail, b""
+
+        return [tail] if tail and not self.skip_first_line else []
@@ -9,3 +9,63 @@ HTTP_METHODS = [
     "CONNECT",
     "TRACE",
 ]
+
+# Log lines are parsed as bytes, the method field is looked up without decoding it.
+HTTP_METHODS_BY_NAME = {method.encode(): method for method in HTTP_METHODS}
+
+LOG_FIELDS = [
+    "ip_address",
+    "date",
+    "method",
+    "uri",
+    "status_code",
+    "size",
+]
+
+# Stored only for log formats and imports that have them, selectable in the JSON API.
+OPTIONAL_LOG_FIELDS = [
+    "referrer",
+    "user_agent",
+    "response_time",
+    # Filled when GEOIP_PATH is set.
+    "country",
+    "asn",
+]
+
+# Used to size the per-import Bloom filter from the Content-Length of a log file.
+AVERAGE_LINE_SIZE = 100
+DEFAULT_BLOOM_CAPACITY = 1_000_000
+# Line hashes of earlier imports read per database round trip.
+LOG_HASHES_CHUNK_SIZE = 10_000
+
+# Lines of a file the log format is detected on.
+DETECT_FORMAT_LINES = 20
+
+TIME_SERIES_INTERVALS = [
+    "minute",
+    "hour",
+    "day",
+]
+
+# Subnets the addresses are rolled up by, coarser prefixes are aggregated from them.
+ROLLUP_IPV4_PREFIX = 24
+ROLLUP_IPV6_PREFIX = 48
+
+# group: rollup column
+NETWORK_GROUPS = {
+    "subnet": "network",
+    "country": "country",
+    "asn": "asn",
+}
+
+# kind: ApacheLog attribute counted per window by BurstDetector
+ANOMALY_KINDS = {
+    "ip": "ip_address",
+    "uri": "uri",
+}
+ANOMALY_REASONS = [
+    "rate",
+    "error_ratio",
+]
+# Longer keys are cut when events are stored, they are part of a unique index.
+ANOMALY_KEY_LENGTH = 512
@@ -1,31 +1,250 @@
-from typing import List, Optional, Tuple
+import dataclasses
+import os
+import shutil
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime
+from functools import lru_cache, partial
+from typing import List, Optional, Tuple, Set, Iterator, TYPE_CHECKING
 
-import requests
 from django.core.paginator import Paginator
-from django.db.models import Count, Sum, QuerySet, Q
+from django.db import connection, connections, router, transaction
+from django.db.models import Count, Sum, QuerySet, Q, Aggregate, Min, Max, Avg, F
+from django.db.models.functions import Trunc, Least, Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from psycopg2.extras import execute_values
 
-from apache_logs.entities import ApacheLog, CountIPAddress, CountMethod, Pagination, ImportStatus
-from apache_logs.interfaces import IRequestDAO, IImportStatusDAO, IApacheLogsDAO
-from apache_logs.models import ApacheLogORM, ImportStatusORM
+from apache_logs.analytics import ColumnarLogStore, ANALYTICS_COLUMNS
+from apache_logs.constants import HTTP_METHODS, ROLLUP_IPV4_PREFIX, ROLLUP_IPV6_PREFIX, NETWORK_GROUPS, \
+    ANOMALY_KEY_LENGTH
+from apache_logs.dedup import get_log_hash
+from apache_logs.geoip import IPRangeDatabase
+from apache_logs.entities import ApacheLog, CountIPAddress, CountMethod, Pagination, ImportStatus, TimeBucket, \
+    CountStatusCode, ImportJob, ImportPart, ImportSource, ImportSourceReport, LogSegment, LogStatistics, \
+    ImportStatistics, CountNetwork, AnomalyEvent, ImportProgress, SavedSearch
+from apache_logs.interfaces import IRequestDAO, IImportStatusDAO, IApacheLogsDAO, ILogSegmentsDAO, IGeoIPDAO, \
+    IAnomalyEventsDAO, ISavedSearchesDAO, IHostRateLimitsDAO
+from apache_logs.models import ApacheLogORM, ImportStatusORM, ApacheLogRollupORM, ApacheLogNetworkRollupORM, \
+    AnomalyEventORM, SavedSearchORM, DataVersionORM, HostRateLimitORM
+from apache_logs.segments import LogSegmentReader, write_segment, read_segment_header, unpack_ip_address, \
+    IP_ADDRESS_SIZE
+
+if TYPE_CHECKING:
+    import requests
+
+INSERT_APACHE_LOGS_SQL = f"""
+    INSERT INTO {ApacheLogORM._meta.db_table}
+        (ip_address, date, method, uri, status_code, size, referrer, user_agent, response_time, line_hash,
+         import_status_id, country, asn)
+    VALUES %s
+    ON CONFLICT DO NOTHING
+"""
+
+UPDATE_ROLLUPS_SQL = f"""
+    INSERT INTO {ApacheLogRollupORM._meta.db_table} AS rollup (minute, method, status_code, count, size)
+    SELECT date_trunc('minute', date AT TIME ZONE 'UTC') AT TIME ZONE 'UTC', method, status_code, COUNT(*), SUM(size)
+    FROM inserted
+    GROUP BY 1, 2, 3
+    ON CONFLICT (minute, method, status_code) DO UPDATE
+    SET count = rollup.count + EXCLUDED.count, size = rollup.size + EXCLUDED.size
+"""
+
+UPDATE_NETWORK_ROLLUPS_SQL = f"""
+    INSERT INTO {ApacheLogNetworkRollupORM._meta.db_table} AS rollup (day, network, country, asn, count, size)
+    SELECT date_trunc('day', date AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+           network(set_masklen(
+               ip_address, CASE WHEN family(ip_address) = 4 THEN {ROLLUP_IPV4_PREFIX} ELSE {ROLLUP_IPV6_PREFIX} END
+           )),
+           COALESCE(country, ''), COALESCE(asn, 0), COUNT(*), SUM(size)
+    FROM inserted
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (day, network, country, asn) DO UPDATE
+    SET count = rollup.count + EXCLUDED.count, size = rollup.size + EXCLUDED.size
+"""
+
+# Returns the line hashes of the inserted rows.
+CREATE_APACHE_LOGS_SQL = f"""
+    WITH inserted AS (
+        {INSERT_APACHE_LOGS_SQL}
+        RETURNING date, method, status_code, size, ip_address, country, asn, line_hash
+    ), rollups AS (
+        {UPDATE_ROLLUPS_SQL}
+    ), network_rollups AS (
+        {UPDATE_NETWORK_ROLLUPS_SQL}
+    )
+    SELECT line_hash FROM inserted
+"""
+
+# Same as CREATE_APACHE_LOGS_SQL, but returns the inserted rows as ANALYTICS_COLUMNS followed by the line hash.
+CREATE_RETURNING_APACHE_LOGS_SQL = f"""
+    WITH inserted AS (
+        {INSERT_APACHE_LOGS_SQL}
+        RETURNING {", ".join(ANALYTICS_COLUMNS)}, country, asn, line_hash
+    ), rollups AS (
+        {UPDATE_ROLLUPS_SQL}
+    ), network_rollups AS (
+        {UPDATE_NETWORK_ROLLUPS_SQL}
+    )
+    SELECT {", ".join(ANALYTICS_COLUMNS)}, line_hash FROM inserted
+"""
+
+CREATE_ANOMALY_EVENTS_SQL = f"""
+    INSERT INTO {AnomalyEventORM._meta.db_table} AS event
+        (kind, key, reason, window_start, window_seconds, count, error_count, import_status_id, created_at)
+    VALUES %s
+    ON CONFLICT (kind, key, reason, window_start) DO UPDATE
+    SET count = event.count + EXCLUDED.count, error_count = event.error_count + EXCLUDED.error_count
+"""
+
+BUMP_DATA_VERSION_SQL = f"""
+    INSERT INTO {DataVersionORM._meta.db_table} AS data_version (id, version) VALUES (1, 1)
+    ON CONFLICT (id) DO UPDATE SET version = data_version.version + 1
+"""
+
+# Books the first free slot of the host, at least `interval` seconds after the one booked before,
+# and returns the seconds until it. The row lock serializes the imports of a host.
+RESERVE_HOST_REQUEST_SQL = f"""
+    INSERT INTO {HostRateLimitORM._meta.db_table} AS rate_limit (host, next_request_at)
+    VALUES (%(host)s, EXTRACT(EPOCH FROM now()) + %(interval)s)
+    ON CONFLICT (host) DO UPDATE
+    SET next_request_at = GREATEST(rate_limit.next_request_at, EXTRACT(EPOCH FROM now())) + %(interval)s
+    RETURNING next_request_at - %(interval)s - EXTRACT(EPOCH FROM now())
+"""
+
+# Arbitrary application-wide key of the advisory lock held while import jobs are claimed.
+IMPORT_SCHEDULER_LOCK_ID = 0x6C6F6773
 
 
 class ApacheLogsDAO(IApacheLogsDAO):
 
-    def create_apache_logs(self, apache_logs: List[ApacheLog]):
-        db_logs = [
-            ApacheLogORM(
-                ip_address=log.ip_address,
-                date=log.date,
-                method=log.method,
-                uri=log.uri,
-                status_code=log.status_code,
-                size=log.size,
+    def __init__(self, batch_size: int = 1000):
+        self.batch_size = batch_size
+
+    def _insert_apache_logs(
+        self,
+        apache_logs: List[ApacheLog],
+        import_status_id: Optional[int],
+        sql: str,
+    ) -> List[Tuple]:
+        rows = [
+            (
+                log.ip_address,
+                log.date,
+                log.method,
+                log.uri,
+                log.status_code,
+                log.size,
+                log.referrer,
+                log.user_agent,
+                log.response_time,
+                get_log_hash(log),
+                import_status_id,
+                log.country,
+                log.asn,
             ) for log in apache_logs
         ]
+        inserted_rows = []
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                inserted_rows += execute_values(cursor.cursor, sql, batch, page_size=len(batch), fetch=True)
+            # Rows skipped by ON CONFLICT DO NOTHING change no data, a re-import keeps cached results valid.
+            if inserted_rows:
+                self._bump_data_version(cursor)
+
+        return inserted_rows
+
+    def _bump_data_version(self, cursor):
+        # Last statement before the commit, so concurrent imports wait on the version row only briefly.
+        cursor.execute(BUMP_DATA_VERSION_SQL)
+
+    def create_apache_logs(self, apache_logs: List[ApacheLog], import_status_id: Optional[int] = None) -> Set[int]:
+        # Example on SQL:
+        # WITH inserted AS (
+        #     INSERT INTO apache_logs_apachelogorm (...) VALUES (...) ON CONFLICT DO NOTHING RETURNING ...
+        # )
+        # INSERT INTO apache_logs_apachelogrolluporm (...) SELECT ... FROM inserted GROUP BY ...
+        # ON CONFLICT (minute, method, status_code) DO UPDATE SET count = count + EXCLUDED.count, ...;
+        # Rows already imported are skipped by the unique line_hash index, and only
+        # rows that were really inserted are added to the per-minute and per-network rollups.
+        # Returns the line hashes of the inserted rows.
+        inserted_rows = self._insert_apache_logs(apache_logs, import_status_id, CREATE_APACHE_LOGS_SQL)
+
+        return {log_hash for log_hash, in inserted_rows}
+
+    def create_returning_apache_logs(
+        self,
+        apache_logs: List[ApacheLog],
+        import_status_id: Optional[int] = None,
+    ) -> List[Tuple]:
+        # Rows that were really inserted, as ANALYTICS_COLUMNS tuples followed by the line hash.
+        return self._insert_apache_logs(apache_logs, import_status_id, CREATE_RETURNING_APACHE_LOGS_SQL)
+
+    def iterate_analytics_rows(self, *, chunk_size: int) -> Iterator[Tuple]:
+        return (ApacheLogORM.objects.order_by("id")
+                                    .values_list(*ANALYTICS_COLUMNS)
+                                    .iterator(chunk_size=chunk_size))
+
+    def get_existing_log_hashes(self, *, log_hashes: List[int]) -> Set[int]:
+        return set(ApacheLogORM.objects.filter(line_hash__in=log_hashes).values_list("line_hash", flat=True))
+
+    def iterate_log_hashes(self, *, source: str, chunk_size: int) -> Iterator[int]:
+        # Rows of earlier imports of the source, by a single import or by the parts of a bulk import.
+        queryset = ApacheLogORM.objects.filter(
+            Q(import_status__url=source) | Q(import_status__sources__contains=[{"url": source}]),
+            line_hash__isnull=False,
+        )
+
+        return queryset.values_list("line_hash", flat=True).iterator(chunk_size=chunk_size)
+
+    def _get_index_names(self) -> Set[str]:
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(cursor, ApacheLogORM._meta.db_table))
+
+    def drop_secondary_indexes(self):
+        # Only Meta.indexes are dropped, the unique line_hash index is needed by the import itself.
+        index_names = self._get_index_names()
+
+        with connection.schema_editor(atomic=False) as schema_editor:
+            for index in ApacheLogORM._meta.indexes:
+                if index.name in index_names:
+                    schema_editor.remove_index(ApacheLogORM, index, concurrently=True)
+
+    def create_secondary_indexes(self):
+        index_names = self._get_index_names()
 
-        ApacheLogORM.objects.bulk_create(db_logs)
+        with connection.schema_editor(atomic=False) as schema_editor:
+            for index in ApacheLogORM._meta.indexes:
+                if index.name not in index_names:
+                    schema_editor.add_index(ApacheLogORM, index, concurrently=True)
+
+    def delete_logs_before(self, *, date: datetime, batch_size: int) -> int:
+        # Example on SQL:
+        # DELETE FROM apache_logs_apachelogorm
+        # WHERE id IN (SELECT id FROM apache_logs_apachelogorm WHERE date < %s ORDER BY id LIMIT 10000);
+        # One short statement per batch, so row locks are held only for a single batch.
+        # Per-minute rollups were written on insert and are kept.
+        ids = ApacheLogORM.objects.filter(date__lt=date).order_by("id").values("id")[:batch_size]
+
+        with transaction.atomic():
+            deleted, _ = ApacheLogORM.objects.filter(id__in=ids).delete()
+            if deleted:
+                with connection.cursor() as cursor:
+                    self._bump_data_version(cursor)
+
+        return deleted
+
+    def delete_analytics_logs_before(self, *, date: datetime) -> int:
+        # Without an analytics copy there is nothing else to delete.
+        return 0
 
     def _get_queryset_with_search_string(self, *, query: str) -> QuerySet:
+        # An empty search matches every row, skipping the filter lets the planner use index-only scans.
+        if not query:
+            return ApacheLogORM.objects.all()
+
         return ApacheLogORM.objects.filter(
             Q(ip_address__icontains=query) |
             Q(date__icontains=query) |
@@ -114,11 +333,688 @@ class ApacheLogsDAO(IApacheLogsDAO):
         )
         return entity_logs, pagination
 
+    def get_log_rows(
+        self,
+        *,
+        page: int,
+        per_page: int,
+        query: Optional[str],
+        fields: List[str],
+    ) -> Tuple[List[Tuple], bool]:
+        # One row more than requested tells if there is a next page without a COUNT(*).
+        offset = (page - 1) * per_page
+        rows = list(self._get_queryset_with_search_string(query=query)
+                        .order_by("id")
+                        .values_list(*fields)[offset:offset + per_page + 1])
+
+        return rows[:per_page], len(rows) > per_page
+
+    def get_data_version(self) -> str:
+        # Batches commit out of id order and retention deletes by date, so the id range can stay the
+        # same while the rows change; the version row is bumped by every batch instead.
+        version = DataVersionORM.objects.filter(pk=1).values_list("version", flat=True).first()
+
+        return str(version or 0)
+
+    def iterate_logs(self, *, query: Optional[str], chunk_size: int) -> Iterator[Tuple]:
+        # Server-side cursor, only `chunk_size` rows are fetched from Postgres at a time.
+        # The iterator is consumed after the view returns, so the database is pinned now.
+        queryset = self._get_queryset_with_search_string(query=query)
+        return (queryset.using(queryset.db)
+                        .order_by("id")
+                        .values_list("ip_address", "date", "method", "uri", "status_code", "size")
+                        .iterator(chunk_size=chunk_size))
+
+    def _get_aggregates_queryset(
+        self,
+        *,
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        query: Optional[str],
+    ) -> Tuple[QuerySet, str]:
+        # Without a search string everything is served from the per-minute rollups,
+        # the search string can match any uri or ip, so it needs the raw rows.
+        if query:
+            queryset, date_field = self._get_queryset_with_search_string(query=query), "date"
+        else:
+            queryset, date_field = ApacheLogRollupORM.objects.all(), "minute"
+
+        if date_from:
+            queryset = queryset.filter(**{f"{date_field}__gte": date_from})
+        if date_to:
+            queryset = queryset.filter(**{f"{date_field}__lt": date_to})
+
+        return queryset, date_field
+
+    def _get_count(self, *, query: Optional[str], condition: Optional[Q] = None) -> Aggregate:
+        if query:
+            return Count("id", filter=condition)
+
+        return Sum("count", filter=condition)
+
+    def get_time_buckets(
+        self,
+        *,
+        interval: str,
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        query: Optional[str],
+    ) -> List[TimeBucket]:
+        # Example on SQL:
+        # SELECT date_trunc('hour', minute) AS start, SUM(count), SUM(size),
+        #        SUM(count) FILTER (WHERE status_code BETWEEN 400 AND 499), ...
+        # FROM apache_logs_apachelogrolluporm
+        # GROUP BY start
+        # ORDER BY start;
+        queryset, date_field = self._get_aggregates_queryset(date_from=date_from, date_to=date_to, query=query)
+
+        aggregates = {
+            "requests_count": self._get_count(query=query),
+            "requests_size": Sum("size"),
+            "client_errors": self._get_count(query=query, condition=Q(status_code__range=(400, 499))),
+            "server_errors": self._get_count(query=query, condition=Q(status_code__range=(500, 599))),
+        }
+        buckets = (queryset.annotate(start=Trunc(date_field, interval))
+                           .values("start")
+                           .annotate(**aggregates)
+                           .order_by("start"))
+
+        entity_buckets = []
+        for bucket in buckets:
+            requests_count = bucket["requests_count"] or 0
+            entity_buckets.append(TimeBucket(
+                start=bucket["start"],
+                count=requests_count,
+                size=bucket["requests_size"] or 0,
+                client_error_rate=(bucket["client_errors"] or 0) / requests_count if requests_count else 0.0,
+                server_error_rate=(bucket["server_errors"] or 0) / requests_count if requests_count else 0.0,
+            ))
+
+        return entity_buckets
+
+    def get_status_codes_count(
+        self,
+        *,
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        query: Optional[str],
+    ) -> List[CountStatusCode]:
+        queryset, _ = self._get_aggregates_queryset(date_from=date_from, date_to=date_to, query=query)
+
+        count_status_codes = (queryset.values("status_code")
+                                      .annotate(requests_count=self._get_count(query=query))
+                                      .order_by("status_code"))
+
+        return [
+            CountStatusCode(status_code=count_status_code["status_code"], count=count_status_code["requests_count"])
+            for count_status_code in count_status_codes
+        ]
+
+    def get_import_statistics(self, *, import_status_id: int, addresses_count: int = 10) -> ImportStatistics:
+        # Example on SQL:
+        # SELECT COUNT(id), COUNT(DISTINCT ip_address), SUM(size), ...
+        # FROM apache_logs_apachelogorm
+        # WHERE import_status_id IN (SELECT id FROM apache_logs_importstatusorm WHERE id = 1 OR parent_id = 1);
+        # Rows of a bulk import are tagged with its parts. Only the rows of the import are
+        # read through the import_status index, however big the table is.
+        import_status_ids = ImportStatusORM.objects.filter(Q(pk=import_status_id) | Q(parent=import_status_id))
+        queryset = ApacheLogORM.objects.filter(import_status__in=import_status_ids.values("pk"))
+
+        aggregates = queryset.aggregate(
+            requests_count=Count("id"),
+            unique_ip_count=Count("ip_address", distinct=True),
+            requests_size=Sum("size"),
+            client_errors=Count("id", filter=Q(status_code__range=(400, 499))),
+            server_errors=Count("id", filter=Q(status_code__range=(500, 599))),
+            min_date=Min("date"),
+            max_date=Max("date"),
+        )
+        count_ip_addresses = (queryset.values("ip_address")
+                                      .annotate(count=Count("id"))
+                                      .order_by("-count", "ip_address")[:addresses_count])
+        count_status_codes = queryset.values("status_code").annotate(count=Count("id")).order_by("status_code")
+        # Lines skipped by the Bloom filter or by ON CONFLICT DO NOTHING are parsed but have no row.
+        lines_count = import_status_ids.aggregate(lines_count=Sum("lines_count"))["lines_count"] or 0
+
+        requests_count = aggregates["requests_count"]
+        return ImportStatistics(
+            count=requests_count,
+            unique_ip_count=aggregates["unique_ip_count"],
+            sum_sizes=aggregates["requests_size"] or 0,
+            client_error_rate=aggregates["client_errors"] / requests_count if requests_count else 0.0,
+            server_error_rate=aggregates["server_errors"] / requests_count if requests_count else 0.0,
+            min_date=aggregates["min_date"],
+            max_date=aggregates["max_date"],
+            top_ip_addresses=[
+                CountIPAddress(ip_address=count_ip_address["ip_address"], count=count_ip_address["count"])
+                for count_ip_address in count_ip_addresses
+            ],
+            status_codes_count=[
+                CountStatusCode(status_code=count_status_code["status_code"], count=count_status_code["count"])
+                for count_status_code in count_status_codes
+            ],
+            skipped_count=max(lines_count - requests_count, 0),
+        )
+
+    def get_network_groups(
+        self,
+        *,
+        group_by: str,
+        ipv4_prefix: int,
+        ipv6_prefix: int,
+        subnet: Optional[str],
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        groups_count: int = 20,
+    ) -> List[CountNetwork]:
+        # Example on SQL:
+        # SELECT network(set_masklen(network, CASE WHEN family(network) = 4 THEN 16 ELSE 32 END)), SUM(count), SUM(size)
+        # FROM apache_logs_apachelognetworkrolluporm
+        # WHERE network <<= '10.0.0.0/8'
+        # GROUP BY 1
+        # ORDER BY 2 DESC
+        # LIMIT 20;
+        # Served from the per-day rollups, prefixes are at most ROLLUP_IPV4_PREFIX / ROLLUP_IPV6_PREFIX long
+        # and dates are rounded to whole days.
+        column = NETWORK_GROUPS[group_by]
+        if group_by == "subnet":
+            group, params = f"network(set_masklen({column}, CASE WHEN family({column}) = 4 THEN %s ELSE %s END))", [
+                ipv4_prefix, ipv6_prefix,
+            ]
+        else:
+            group, params = f"NULLIF({column}, %s)", ["" if group_by == "country" else 0]
+
+        conditions = []
+        if subnet:
+            conditions.append("network <<= %s::cidr")
+            params.append(subnet)
+        if date_from:
+            conditions.append("day > %s - interval '1 day'")
+            params.append(date_from)
+        if date_to:
+            conditions.append("day < %s")
+            params.append(date_to)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        database = connections[router.db_for_read(ApacheLogNetworkRollupORM)]
+        with database.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {group}, SUM(count), SUM(size) FROM {ApacheLogNetworkRollupORM._meta.db_table} {where} "
+                f"GROUP BY 1 ORDER BY 2 DESC, 1 LIMIT %s",
+                params + [groups_count],
+            )
+            rows = cursor.fetchall()
+
+        return [
+            CountNetwork(group=None if value is None else str(value), count=int(count), size=int(size))
+            for value, count, size in rows
+        ]
+
+
+class AnalyticsApacheLogsDAO(IApacheLogsDAO):
+    # Postgres stays the source of truth, every inserted row is also appended to a columnar
+    # copy that serves the scan-heavy statistics. Pages, rows, exports and the rollup based
+    # time series without a search string are still read from Postgres.
+
+    def __init__(self, logs_dao: ApacheLogsDAO, store: ColumnarLogStore):
+        self.logs_dao = logs_dao
+        self.store = store
+
+    def create_apache_logs(self, apache_logs: List[ApacheLog], import_status_id: Optional[int] = None) -> Set[int]:
+        # The copy is written after the rows are committed, rows skipped as duplicates are not returned.
+        rows = self.logs_dao.create_returning_apache_logs(apache_logs, import_status_id=import_status_id)
+        self.store.append([row[:-1] for row in rows])
+
+        return {row[-1] for row in rows}
+
+    def rebuild(self, chunk_size: int = 100000) -> int:
+        # Copies all rows from Postgres again, imports should not run meanwhile.
+        self.store.clear()
+        rows_count = 0
+
+        rows = []
+        for row in self.logs_dao.iterate_analytics_rows(chunk_size=chunk_size):
+            rows.append(row)
+            if len(rows) >= chunk_size:
+                self.store.append(rows)
+                rows_count += len(rows)
+                rows = []
+
+        self.store.append(rows)
+        self.store.compact()
+
+        return rows_count + len(rows)
+
+    def drop_secondary_indexes(self):
+        self.logs_dao.drop_secondary_indexes()
+
+    def create_secondary_indexes(self):
+        self.logs_dao.create_secondary_indexes()
+
+    def get_existing_log_hashes(self, *, log_hashes: List[int]) -> Set[int]:
+        return self.logs_dao.get_existing_log_hashes(log_hashes=log_hashes)
+
+    def iterate_log_hashes(self, *, source: str, chunk_size: int) -> Iterator[int]:
+        return self.logs_dao.iterate_log_hashes(source=source, chunk_size=chunk_size)
+
+    def delete_logs_before(self, *, date: datetime, batch_size: int) -> int:
+        return self.logs_dao.delete_logs_before(date=date, batch_size=batch_size)
+
+    def delete_analytics_logs_before(self, *, date: datetime) -> int:
+        # Rewrites every segment with old rows under the exclusive lock, so it runs once per retention run.
+        return self.store.delete_before(date)
+
+    def _get_where(
+        self,
+        *,
+        query: Optional[str],
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+    ) -> Tuple[str, List]:
+        # Same rows as ApacheLogsDAO._get_queryset_with_search_string, dates are cast to text in UTC.
+        conditions, params = [], []
+        if query:
+            conditions.append(
+                "(contains(lower(ip_address), ?) OR contains(lower(CAST(date AS VARCHAR)), ?) "
+                "OR contains(lower(method), ?) OR contains(lower(uri), ?))"
+            )
+            params += [query.lower()] * 4
+        if date_from:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("date < ?")
+            params.append(date_to)
+
+        return ("WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+    def _fetch(self, sql: str, params: List) -> List[Tuple]:
+        with self.store.connect() as analytics_connection:
+            return analytics_connection.execute(sql, params).fetchall()
+
+    def get_count_unique_ip_addresses(self, *, query: Optional[str]) -> int:
+        if not self.store.has_segments():
+            return self.logs_dao.get_count_unique_ip_addresses(query=query)
+
+        where, params = self._get_where(query=query)
+        return self._fetch(f"SELECT COUNT(DISTINCT ip_address) FROM logs {where}", params)[0][0]
+
+    def get_top_ip_addresses(self, *, addresses_count: int = 10, query: Optional[str]) -> List[CountIPAddress]:
+        if not self.store.has_segments():
+            return self.logs_dao.get_top_ip_addresses(addresses_count=addresses_count, query=query)
+
+        where, params = self._get_where(query=query)
+        rows = self._fetch(
+            f"SELECT ip_address, COUNT(*) AS count FROM logs {where} GROUP BY ip_address "
+            f"ORDER BY count DESC, ip_address LIMIT ?",
+            params + [addresses_count],
+        )
+
+        return [CountIPAddress(ip_address=ip_address, count=count) for ip_address, count in rows]
+
+    def get_http_methods_count(self, *, query: Optional[str]) -> List[CountMethod]:
+        if not self.store.has_segments():
+            return self.logs_dao.get_http_methods_count(query=query)
+
+        where, params = self._get_where(query=query)
+        rows = self._fetch(f"SELECT method, COUNT(*) FROM logs {where} GROUP BY method ORDER BY method", params)
+
+        return [CountMethod(method=method, count=count) for method, count in rows]
+
+    def get_sum_sizes(self, *, query: Optional[str]) -> int:
+        if not self.store.has_segments():
+            return self.logs_dao.get_sum_sizes(query=query)
+
+        where, params = self._get_where(query=query)
+        total_size = self._fetch(f"SELECT SUM(size) FROM logs {where}", params)[0][0]
+
+        return int(total_size or 0)
+
+    def get_logs(self, *, page: int, per_page: int, query: Optional[str]) -> Tuple[List[ApacheLog], Pagination]:
+        return self.logs_dao.get_logs(page=page, per_page=per_page, query=query)
+
+    def get_log_rows(
+        self,
+        *,
+        page: int,
+        per_page: int,
+        query: Optional[str],
+        fields: List[str],
+    ) -> Tuple[List[Tuple], bool]:
+        return self.logs_dao.get_log_rows(page=page, per_page=per_page, query=query, fields=fields)
+
+    def get_data_version(self) -> str:
+        return self.logs_dao.get_data_version()
+
+    def iterate_logs(self, *, query: Optional[str], chunk_size: int) -> Iterator[Tuple]:
+        return self.logs_dao.iterate_logs(query=query, chunk_size=chunk_size)
+
+    def get_time_buckets(
+        self,
+        *,
+        interval: str,
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        query: Optional[str],
+    ) -> List[TimeBucket]:
+        # Without a search string the per-minute rollups are smaller still, and they outlive the raw rows.
+        if not query or not self.store.has_segments():
+            return self.logs_dao.get_time_buckets(interval=interval, date_from=date_from, date_to=date_to, query=query)
+
+        where, params = self._get_where(query=query, date_from=date_from, date_to=date_to)
+        rows = self._fetch(
+            f"SELECT date_trunc(?, date) AS start, COUNT(*), SUM(size), "
+            f"COUNT(*) FILTER (WHERE status_code BETWEEN 400 AND 499), "
+            f"COUNT(*) FILTER (WHERE status_code BETWEEN 500 AND 599) "
+            f"FROM logs {where} GROUP BY start ORDER BY start",
+            [interval] + params,
+        )
+
+        return [
+            TimeBucket(
+                start=start,
+                count=count,
+                size=int(size or 0),
+                client_error_rate=client_errors / count,
+                server_error_rate=server_errors / count,
+            ) for start, count, size, client_errors, server_errors in rows
+        ]
+
+    def get_status_codes_count(
+        self,
+        *,
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        query: Optional[str],
+    ) -> List[CountStatusCode]:
+        if not query or not self.store.has_segments():
+            return self.logs_dao.get_status_codes_count(date_from=date_from, date_to=date_to, query=query)
+
+        where, params = self._get_where(query=query, date_from=date_from, date_to=date_to)
+        rows = self._fetch(
+            f"SELECT status_code, COUNT(*) FROM logs {where} GROUP BY status_code ORDER BY status_code", params,
+        )
+
+        return [CountStatusCode(status_code=status_code, count=count) for status_code, count in rows]
+
+    def get_import_statistics(self, *, import_status_id: int, addresses_count: int = 10) -> ImportStatistics:
+        # The copy has no import column, the rows of one import are read through its index in Postgres.
+        return self.logs_dao.get_import_statistics(import_status_id=import_status_id, addresses_count=addresses_count)
+
+    def get_network_groups(
+        self,
+        *,
+        group_by: str,
+        ipv4_prefix: int,
+        ipv6_prefix: int,
+        subnet: Optional[str],
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        groups_count: int = 20,
+    ) -> List[CountNetwork]:
+        return self.logs_dao.get_network_groups(
+            group_by=group_by,
+            ipv4_prefix=ipv4_prefix,
+            ipv6_prefix=ipv6_prefix,
+            subnet=subnet,
+            date_from=date_from,
+            date_to=date_to,
+            groups_count=groups_count,
+        )
+
+
+class LogSegmentsDAO(ILogSegmentsDAO):
+    # Parsed logs kept as memory-mapped column segments, one directory per segment under `path`.
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def create_segment(self, apache_logs: List[ApacheLog], source: str) -> Optional[LogSegment]:
+        if not apache_logs:
+            return None
+
+        # Written under a hidden name and renamed, readers never see a partial segment.
+        name = uuid.uuid4().hex
+        temporary_path = os.path.join(self.path, f".{name}.tmp")
+        os.makedirs(self.path, exist_ok=True)
+        write_segment(temporary_path, apache_logs=apache_logs, source=source)
+        os.rename(temporary_path, os.path.join(self.path, name))
+
+        return read_segment_header(os.path.join(self.path, name))
+
+    def get_segments(self, *, source: Optional[str] = None) -> List[LogSegment]:
+        # Only headers are read.
+        if not os.path.isdir(self.path):
+            return []
+
+        segments = [
+            read_segment_header(os.path.join(self.path, name))
+            for name in os.listdir(self.path) if not name.startswith(".")
+        ]
+
+        return sorted(
+            (segment for segment in segments if source is None or segment.source == source),
+            key=lambda segment: (segment.min_date, segment.path),
+        )
+
+    def iterate_segment_logs(self, segment: LogSegment, chunk_size: int) -> Iterator[List[ApacheLog]]:
+        with LogSegmentReader(segment.path) as reader:
+            yield from reader.iterate_logs(chunk_size=chunk_size)
+
+    def _matches(self, apache_log: ApacheLog, query: str) -> bool:
+        # Same rows as ApacheLogsDAO._get_queryset_with_search_string, Postgres casts dates to text in UTC.
+        return (
+            query in apache_log.ip_address.lower()
+            or query in apache_log.date.strftime("%Y-%m-%d %H:%M:%S+00")
+            or query in apache_log.method.lower()
+            or query in apache_log.uri.lower()
+        )
+
+    def iterate_logs(self, *, query: Optional[str], chunk_size: int) -> Iterator[Tuple]:
+        # Rows of LOG_FIELDS with UTC dates, like ApacheLogsDAO.iterate_logs.
+        query = (query or "").lower()
+
+        for segment in self.get_segments():
+            for apache_logs in self.iterate_segment_logs(segment, chunk_size=chunk_size):
+                for apache_log in apache_logs:
+                    apache_log.date = apache_log.date.astimezone(timezone.utc)
+                    if not query or self._matches(apache_log, query):
+                        yield (
+                            apache_log.ip_address,
+                            apache_log.date,
+                            apache_log.method,
+                            apache_log.uri,
+                            apache_log.status_code,
+                            apache_log.size,
+                        )
+
+    def get_statistics(self, *, source: Optional[str], addresses_count: int = 10) -> LogStatistics:
+        # Counted straight from the mapped columns, ip addresses are only unpacked for the top ones.
+        ip_addresses = Counter()
+        methods = Counter()
+        sum_sizes = 0
+
+        for segment in self.get_segments(source=source):
+            with LogSegmentReader(segment.path) as reader:
+                packed_ip_addresses = bytes(reader.columns["ip_address"])
+                ip_addresses.update(zip(
+                    reader.columns["ip_version"],
+                    (packed_ip_addresses[start:start + IP_ADDRESS_SIZE]
+                     for start in range(0, len(packed_ip_addresses), IP_ADDRESS_SIZE)),
+                ))
+                methods.update(reader.columns["method"])
+                sum_sizes += sum(reader.columns["size"])
+
+        return LogStatistics(
+            unique_ip_count=len(ip_addresses),
+            top_ip_addresses=[
+                CountIPAddress(ip_address=unpack_ip_address(*ip_address), count=count)
+                for ip_address, count in ip_addresses.most_common(addresses_count)
+            ],
+            http_methods_count=[
+                CountMethod(method=HTTP_METHODS[method], count=count) for method, count in sorted(methods.items())
+            ],
+            sum_sizes=sum_sizes,
+        )
+
+    def delete_segments_before(self, *, date: datetime) -> int:
+        # Whole segments only, a segment with a single newer row is kept.
+        deleted = 0
+
+        for segment in self.get_segments():
+            if segment.max_date < date:
+                shutil.rmtree(segment.path)
+                deleted += segment.rows
+
+        return deleted
+
+
+class GeoIPDAO(IGeoIPDAO):
+    # Offline lookups in an IPRangeDatabase. Addresses repeat a lot in logs, so results are kept in an LRU cache.
+
+    def __init__(self, path: str, cache_size: int = 65536):
+        self.database = IPRangeDatabase.load(path)
+        self._lookup = lru_cache(maxsize=cache_size)(self.database.lookup)
+
+    def get_ip_location(self, ip_address: str) -> Tuple[Optional[str], Optional[int]]:
+        return self._lookup(ip_address)
+
+
+class AnomalyEventsDAO(IAnomalyEventsDAO):
+
+    def create_anomaly_events(self, anomaly_events: List[AnomalyEvent], import_status_id: Optional[int] = None):
+        # Windows flagged again, by another part of the same bulk import, add their counts to the stored event.
+        if not anomaly_events:
+            return
+
+        now = timezone.now()
+        rows = [
+            (
+                event.kind,
+                event.key[:ANOMALY_KEY_LENGTH],
+                event.reason,
+                event.window_start,
+                event.window_seconds,
+                event.count,
+                event.error_count,
+                import_status_id,
+                now,
+            ) for event in anomaly_events
+        ]
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            execute_values(cursor.cursor, CREATE_ANOMALY_EVENTS_SQL, rows)
+
+    def get_anomaly_events(
+        self,
+        *,
+        kind: Optional[str],
+        reason: Optional[str],
+        key: Optional[str],
+        import_status_id: Optional[int],
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        events_count: int = 100,
+    ) -> List[AnomalyEvent]:
+        queryset = AnomalyEventORM.objects.all()
+        if kind:
+            queryset = queryset.filter(kind=kind)
+        if reason:
+            queryset = queryset.filter(reason=reason)
+        if key:
+            queryset = queryset.filter(key=key)
+        if import_status_id is not None:
+            queryset = queryset.filter(import_status_id=import_status_id)
+        if date_from:
+            queryset = queryset.filter(window_start__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(window_start__lt=date_to)
+
+        return [
+            AnomalyEvent(
+                kind=event.kind,
+                key=event.key,
+                reason=event.reason,
+                window_start=event.window_start,
+                window_seconds=event.window_seconds,
+                count=event.count,
+                error_count=event.error_count,
+                import_status_id=event.import_status_id,
+            ) for event in queryset.order_by("-window_start", "-count")[:events_count]
+        ]
+
+
+class SavedSearchesDAO(ISavedSearchesDAO):
+    def _to_entity(self, saved_search: SavedSearchORM) -> SavedSearch:
+        return SavedSearch(
+            query=saved_search.query,
+            data_version=saved_search.data_version or None,
+            refreshed_at=saved_search.refreshed_at,
+        )
+
+    def create_saved_search(self, query: str) -> SavedSearch:
+        saved_search, _ = SavedSearchORM.objects.get_or_create(query=query)
+        return self._to_entity(saved_search)
+
+    def delete_saved_search(self, query: str) -> bool:
+        deleted_count, _ = SavedSearchORM.objects.filter(query=query).delete()
+        return deleted_count > 0
+
+    def get_saved_searches(self) -> List[SavedSearch]:
+        return [self._to_entity(saved_search) for saved_search in SavedSearchORM.objects.order_by("query")]
+
+    def get_saved_statistics(self, query: str, data_version: str) -> Optional[LogStatistics]:
+        # None for searches that are not saved or were computed at another data version.
+        statistics = SavedSearchORM.objects.filter(
+            query=query,
+            data_version=data_version,
+        ).values_list("statistics", flat=True).first()
+        if statistics is None:
+            return None
+
+        return LogStatistics(
+            unique_ip_count=statistics["unique_ip_count"],
+            top_ip_addresses=[CountIPAddress(**count) for count in statistics["top_ip_addresses"]],
+            http_methods_count=[CountMethod(**count) for count in statistics["http_methods_count"]],
+            sum_sizes=statistics["sum_sizes"],
+        )
+
+    def save_statistics(self, query: str, data_version: str, statistics: LogStatistics):
+        # A single UPDATE, readers see either the old or the new statistics and are never blocked.
+        SavedSearchORM.objects.filter(query=query).update(
+            statistics=dataclasses.asdict(statistics),
+            data_version=data_version,
+            refreshed_at=timezone.now(),
+        )
+
+
+class HostRateLimitsDAO(IHostRateLimitsDAO):
+    def reserve_request(self, host: str, interval: float) -> float:
+        with connection.cursor() as cursor:
+            cursor.execute(RESERVE_HOST_REQUEST_SQL, {"host": host, "interval": interval})
+            seconds, = cursor.fetchone()
+
+        return max(seconds, 0.0)
+
 
 class RequestDAO(IRequestDAO):
 
+    def __init__(self, session: Optional["requests.Session"] = None):
+        # A shared Session keeps TCP/TLS connections to the log server alive between range requests.
+        self.session = session
+
+    @property
+    def http(self):
+        if self.session is not None:
+            return self.session
+
+        # requests and urllib3 are imported by the processes that fetch logs only, not by the dashboard.
+        import requests
+
+        return requests
+
     def check_partial_content(self, url: str) -> Tuple[bool, int]:
-        headers = requests.head(url)
+        headers = self.http.head(url)
         is_accept_ranges = False
         max_length = 0
         if "Accept-Ranges" in headers.headers:
@@ -127,45 +1023,313 @@ class RequestDAO(IRequestDAO):
 
         return is_accept_ranges, max_length
 
-    def get_partial_rows(self, url: str, from_bytes: int, to_bytes: int) -> List[str]:
-        result = requests.get(url, headers={"Range": f"bytes={from_bytes}-{to_bytes}"})
-        rows = result.content.decode("utf-8").split("\n")
+    def get_partial_content(self, url: str, from_bytes: int, to_bytes: int) -> bytes:
+        result = self.http.get(url, headers={"Range": f"bytes={from_bytes}-{to_bytes}"})
+
+        return result.content
+
+    def get_full_content(self, url: str) -> bytes:
+        result = self.http.get(url)
+
+        return result.content
+
+    def iter_full_content(self, url: str, chunk_size: int) -> Iterator[bytes]:
+        # Streamed, so a server without range support does not put the whole file in memory.
+        with self.http.get(url, stream=True) as result:
+            yield from result.iter_content(chunk_size=chunk_size)
+
+
+class FileRequestDAO(IRequestDAO):
+    # Reads local log files (paths or file:// URLs) with the same interface as RequestDAO.
+
+    def _get_path(self, url: str) -> str:
+        return url[len("file://"):] if url.startswith("file://") else url
 
-        return rows
+    def check_partial_content(self, url: str) -> Tuple[bool, int]:
+        return True, os.path.getsize(self._get_path(url))
+
+    def get_partial_content(self, url: str, from_bytes: int, to_bytes: int) -> bytes:
+        with open(self._get_path(url), "rb") as file:
+            file.seek(from_bytes)
+            return file.read(to_bytes - from_bytes + 1)
+
+    def get_full_content(self, url: str) -> bytes:
+        with open(self._get_path(url), "rb") as file:
+            return file.read()
+
+    def iter_full_content(self, url: str, chunk_size: int) -> Iterator[bytes]:
+        with open(self._get_path(url), "rb") as file:
+            yield from iter(partial(file.read, chunk_size), b"")
 
-    def get_full_rows(self, url: str) -> List[str]:
-        result = requests.get(url)
-        rows = result.content.decode("utf-8").split("\n")
 
-        return rows
+class SourceRequestDAO(IRequestDAO):
+    # Sends http(s) URLs to `http_dao` and everything else to `file_dao`.
+
+    def __init__(self, http_dao: IRequestDAO, file_dao: IRequestDAO):
+        self.http_dao = http_dao
+        self.file_dao = file_dao
+
+    def _get_dao(self, url: str) -> IRequestDAO:
+        return self.http_dao if url.startswith(("http://", "https://")) else self.file_dao
+
+    def check_partial_content(self, url: str) -> Tuple[bool, int]:
+        return self._get_dao(url).check_partial_content(url=url)
+
+    def get_partial_content(self, url: str, from_bytes: int, to_bytes: int) -> bytes:
+        return self._get_dao(url).get_partial_content(url=url, from_bytes=from_bytes, to_bytes=to_bytes)
+
+    def get_full_content(self, url: str) -> bytes:
+        return self._get_dao(url).get_full_content(url=url)
+
+    def iter_full_content(self, url: str, chunk_size: int) -> Iterator[bytes]:
+        return self._get_dao(url).iter_full_content(url=url, chunk_size=chunk_size)
 
 
 class ImportStatusDAO(IImportStatusDAO):
+    def _to_entity(self, import_status: ImportStatusORM) -> ImportStatus:
+        return ImportStatus(pk=import_status.pk, percent=import_status.percent, status=import_status.status)
+
     def create_import_status(self) -> ImportStatus:
-        import_status = ImportStatusORM()
+        import_status = ImportStatusORM(started_at=timezone.now())
         import_status.save()
-        return ImportStatus(pk=import_status.pk, percent=import_status.percent, status=import_status.status)
+        return self._to_entity(import_status)
+
+    def _to_import_job(self, import_status: ImportStatusORM) -> ImportJob:
+        return ImportJob(
+            pk=import_status.pk,
+            url=import_status.url,
+            host=import_status.host,
+            priority=import_status.priority,
+            sources=[ImportSource(**source) for source in import_status.sources],
+        )
+
+    def _get_jobs(self) -> QuerySet:
+        # Aggregate rows of bulk imports only sum up their parts, they are not jobs themselves.
+        return ImportStatusORM.objects.filter(parts__isnull=True)
+
+    def create_import_job(self, url: str, host: str, priority: int) -> ImportJob:
+        import_status = ImportStatusORM(status=ImportStatusORM.STATUS_QUEUED, url=url, host=host, priority=priority)
+        import_status.save()
+        return self._to_import_job(import_status)
+
+    def create_bulk_import(self, parts: List[ImportPart], priority: int, queued: bool = True) -> ImportStatus:
+        # Parts that are not queued are started at once by the caller, the scheduler never claims them.
+        part_sizes = [sum(source.to_bytes - source.from_bytes + 1 for source in part.sources) for part in parts]
+        started_at = timezone.now()
+
+        with transaction.atomic():
+            import_status = ImportStatusORM.objects.create(started_at=started_at, size=max(sum(part_sizes), 1))
+            ImportStatusORM.objects.bulk_create([
+                ImportStatusORM(
+                    status=ImportStatusORM.STATUS_QUEUED if queued else ImportStatusORM.STATUS_START,
+                    started_at=None if queued else started_at,
+                    host=part.host,
+                    priority=priority,
+                    parent=import_status,
+                    sources=[dataclasses.asdict(source) for source in part.sources],
+                    size=part_size,
+                ) for part, part_size in zip(parts, part_sizes)
+            ])
+
+        return self._to_entity(import_status)
+
+    def get_import_status(self, import_status_id: int) -> ImportStatus:
+        return self._to_entity(ImportStatusORM.objects.get(pk=import_status_id))
+
+    def get_import_parts(self, import_status_id: int) -> List[ImportJob]:
+        parts = ImportStatusORM.objects.filter(parent=import_status_id).order_by("pk")
+
+        return [self._to_import_job(part) for part in parts]
+
+    def get_import_progress(self, import_status_id: int) -> ImportProgress:
+        import_status = ImportStatusORM.objects.get(pk=import_status_id)
+
+        return ImportProgress(
+            status=import_status.status,
+            percent=import_status.percent,
+            size=import_status.size,
+            imported_size=import_status.imported_size,
+        )
+
+    def get_import_job(self, import_status_id: int) -> ImportJob:
+        return self._to_import_job(ImportStatusORM.objects.get(pk=import_status_id))
 
     def update_import_status(self, import_status_id: int, percent: int) -> ImportStatus:
         import_status = ImportStatusORM.objects.get(pk=import_status_id)
         import_status.percent = percent
         import_status.save()
-        return ImportStatus(pk=import_status.pk, percent=import_status.percent, status=import_status.status)
+        return self._to_entity(import_status)
 
     def finish_import_status(self, import_status_id: int) -> ImportStatus:
         import_status = ImportStatusORM.objects.get(pk=import_status_id)
         import_status.status = ImportStatusORM.STATUS_FINISH
         import_status.percent = 100
+        import_status.finished_at = timezone.now()
         import_status.save()
-        return ImportStatus(pk=import_status.pk, percent=import_status.percent, status=import_status.status)
+        return self._to_entity(import_status)
+
+    def fail_import_status(self, import_status_id: int) -> ImportStatus:
+        import_status = ImportStatusORM.objects.get(pk=import_status_id)
+        import_status.status = ImportStatusORM.STATUS_FAILED
+        import_status.finished_at = timezone.now()
+        import_status.save()
+        return self._to_entity(import_status)
+
+    def add_imported_size(self, import_status_id: int, size: int):
+        imported_size = F("imported_size") + size
+        ImportStatusORM.objects.filter(parts=import_status_id).update(
+            imported_size=imported_size,
+            percent=Least(99, Greatest(1, imported_size * 100 / F("size"))),
+        )
+
+    def finish_import_part(
+        self,
+        import_status_id: int,
+        report: List[ImportSourceReport],
+        failed: bool = False,
+    ) -> ImportStatus:
+        import_status = ImportStatusORM.objects.get(pk=import_status_id)
+
+        with transaction.atomic():
+            # Parts finishing at the same time queue up on the parent row,
+            # so the last one always sees all the others finished.
+            parent = ImportStatusORM.objects.select_for_update().get(pk=import_status.parent_id)
+
+            import_status.status = ImportStatusORM.STATUS_FAILED if failed else ImportStatusORM.STATUS_FINISH
+            import_status.percent = import_status.percent if failed else 100
+            import_status.report = [dataclasses.asdict(source_report) for source_report in report]
+            import_status.finished_at = timezone.now()
+            import_status.save()
+
+            finished_statuses = [ImportStatusORM.STATUS_FINISH, ImportStatusORM.STATUS_FAILED]
+            if not parent.parts.exclude(status__in=finished_statuses).exists():
+                if parent.parts.filter(status=ImportStatusORM.STATUS_FAILED).exists():
+                    parent.status = ImportStatusORM.STATUS_FAILED
+                else:
+                    parent.status = ImportStatusORM.STATUS_FINISH
+                    parent.percent = 100
+                parent.finished_at = timezone.now()
+                parent.save()
+
+        return self._to_entity(import_status)
+
+    def get_parent_import_status(self, import_status_id: int) -> Optional[ImportStatus]:
+        parent = ImportStatusORM.objects.filter(parts=import_status_id).first()
+
+        return self._to_entity(parent) if parent is not None else None
+
+    def save_lines_count(self, import_status_id: int, lines_count: int):
+        ImportStatusORM.objects.filter(pk=import_status_id).update(lines_count=lines_count)
+
+    def save_import_statistics(self, import_status_id: int, statistics: ImportStatistics):
+        statistics = dataclasses.asdict(statistics)
+        for field in ("min_date", "max_date"):
+            statistics[field] = statistics[field] and statistics[field].isoformat()
+
+        ImportStatusORM.objects.filter(pk=import_status_id).update(statistics=statistics)
+
+    def get_import_statistics(self, import_status_id: int) -> Optional[ImportStatistics]:
+        # None for imports that are unknown or not finished yet.
+        statistics = ImportStatusORM.objects.filter(pk=import_status_id).values_list("statistics", flat=True).first()
+        if statistics is None:
+            return None
+
+        return ImportStatistics(**{
+            **statistics,
+            "min_date": statistics["min_date"] and parse_datetime(statistics["min_date"]),
+            "max_date": statistics["max_date"] and parse_datetime(statistics["max_date"]),
+            "top_ip_addresses": [CountIPAddress(**count) for count in statistics["top_ip_addresses"]],
+            "status_codes_count": [CountStatusCode(**count) for count in statistics["status_codes_count"]],
+        })
+
+    def get_import_part_reports(self, import_status_id: int) -> List[ImportSourceReport]:
+        parts = ImportStatusORM.objects.filter(parent=import_status_id).order_by("pk")
+        reports = parts.values_list("report", flat=True)
+
+        return [ImportSourceReport(**source_report) for report in reports for source_report in report]
+
+    def get_imported_sources(self) -> Set[str]:
+        imported_sources = set(ImportStatusORM.objects.filter(
+            status=ImportStatusORM.STATUS_FINISH,
+            parent__isnull=True,
+        ).exclude(url="").values_list("url", flat=True))
+
+        # A split source counts once the finished parts cover all of it.
+        imported_sizes = defaultdict(int)
+        sizes = {}
+        parts = ImportStatusORM.objects.filter(status=ImportStatusORM.STATUS_FINISH, parent__isnull=False)
+        for sources in parts.values_list("sources", flat=True):
+            for source in sources:
+                imported_sizes[source["url"]] += source["to_bytes"] - source["from_bytes"] + 1
+                sizes[source["url"]] = source["size"]
+
+        imported_sources.update(url for url, size in sizes.items() if imported_sizes[url] >= size)
+
+        return imported_sources
 
     def get_import_statuses(self) -> List[ImportStatus]:
-        import_statuses = ImportStatusORM.objects.all()
+        import_statuses = ImportStatusORM.objects.filter(parent__isnull=True)
 
-        return [
-            ImportStatus(
-                pk=import_status.pk,
-                percent=import_status.percent,
-                status=import_status.status,
-            ) for import_status in import_statuses
-        ]
+        return [self._to_entity(import_status) for import_status in import_statuses]
+
+    def claim_import_jobs(self, max_concurrent: int, max_concurrent_per_host: int) -> List[ImportJob]:
+        with transaction.atomic():
+            # Schedulers run one at a time, otherwise two of them could count
+            # the same running imports and start more than the limits allow.
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [IMPORT_SCHEDULER_LOCK_ID])
+
+            # Imports started before the queue existed have no started_at and are not counted.
+            running_hosts = Counter(self._get_jobs().filter(
+                status=ImportStatusORM.STATUS_START,
+                started_at__isnull=False,
+            ).values_list("host", flat=True))
+
+            free_slots = max_concurrent - sum(running_hosts.values())
+            if free_slots <= 0:
+                return []
+
+            queued_import_statuses = ImportStatusORM.objects.filter(
+                status=ImportStatusORM.STATUS_QUEUED,
+            ).order_by("-priority", "created_at", "pk")
+
+            claimed_import_statuses = []
+            for import_status in queued_import_statuses:
+                if len(claimed_import_statuses) >= free_slots:
+                    break
+                if running_hosts[import_status.host] >= max_concurrent_per_host:
+                    continue
+
+                running_hosts[import_status.host] += 1
+                claimed_import_statuses.append(import_status)
+
+            claimed_ids = [import_status.pk for import_status in claimed_import_statuses]
+            ImportStatusORM.objects.filter(pk__in=claimed_ids).update(
+                status=ImportStatusORM.STATUS_START,
+                started_at=timezone.now(),
+            )
+
+        return [self._to_import_job(import_status) for import_status in claimed_import_statuses]
+
+    def count_import_statuses(self, status: str) -> int:
+        return self._get_jobs().filter(status=status).count()
+
+    def get_average_import_seconds(self, last: int = 20) -> Optional[float]:
+        last_import_statuses = self._get_jobs().filter(
+            status=ImportStatusORM.STATUS_FINISH,
+            started_at__isnull=False,
+        ).order_by("-finished_at")[:last]
+
+        average_duration = ImportStatusORM.objects.filter(pk__in=last_import_statuses).aggregate(
+            average_duration=Avg(F("finished_at") - F("started_at")),
+        )["average_duration"]
+
+        return average_duration.total_seconds() if average_duration is not None else None
+
+    def delete_finished_import_statuses_before(self, *, date: datetime) -> int:
+        deleted, _ = ImportStatusORM.objects.filter(
+            status__in=[ImportStatusORM.STATUS_FINISH, ImportStatusORM.STATUS_FAILED],
+            finished_at__lt=date,
+        ).delete()
+
+        return deleted
@@ -0,0 +1,104 @@
+import hashlib
+import math
+from typing import Dict, List, Tuple
+
+from apache_logs.entities import ApacheLog
+
+# Seconds a line may be logged out of order, Apache writes the start time of a request when it finishes.
+OCCURRENCE_WINDOW_SECONDS = 600
+
+
+def get_log_hash(apache_log: ApacheLog) -> int:
+    # Signed 64-bit hash of the natural key, fits into a BigIntegerField.
+    natural_key = "\t".join([
+        apache_log.ip_address,
+        apache_log.date.isoformat(),
+        apache_log.method,
+        apache_log.uri,
+        str(apache_log.status_code),
+        str(apache_log.size),
+    ])
+    # Fields of richer log formats only take part when present, so Common Log Format hashes stay the same.
+    for value in (apache_log.referrer, apache_log.user_agent, apache_log.response_time):
+        if value is not None:
+            natural_key += f"\t{value}"
+    # Repeated identical lines are kept, the first occurrence hashes like the line itself.
+    if apache_log.occurrence:
+        natural_key += f"\t#{apache_log.occurrence}"
+    digest = hashlib.blake2b(natural_key.encode("utf-8", "surrogateescape"), digest_size=8).digest()
+
+    return int.from_bytes(digest, "big", signed=True)
+
+
+class OccurrenceCounter:
+    # Numbers identical lines of an import, so importing the same lines again gives the same
+    # hashes wherever they are read from. Identical lines share their second, only the seconds
+    # of the last `window_seconds` are kept.
+
+    def __init__(self, window_seconds: int = OCCURRENCE_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self.seconds: Dict[int, Dict[Tuple, int]] = {}
+        self.last_second = None
+
+    def count(self, apache_logs: List[ApacheLog]):
+        for apache_log in apache_logs:
+            second = int(apache_log.date.timestamp())
+            lines = self.seconds.get(second)
+            if lines is None:
+                lines = self.seconds[second] = {}
+                if self.last_second is None or second > self.last_second:
+                    self.last_second = second
+
+            natural_key = (
+                apache_log.ip_address,
+                apache_log.date.utcoffset(),
+                apache_log.method,
+                apache_log.uri,
+                apache_log.status_code,
+                apache_log.size,
+                apache_log.referrer,
+                apache_log.user_agent,
+                apache_log.response_time,
+            )
+            apache_log.occurrence = lines.get(natural_key, 0)
+            lines[natural_key] = apache_log.occurrence + 1
+
+        self._prune()
+
+    def _prune(self):
+        if self.last_second is None:
+            return
+
+        for second in [second for second in self.seconds if second <= self.last_second - self.window_seconds]:
+            del self.seconds[second]
+
+
+class BloomFilter:
+    # Answers "definitely not seen" or "maybe seen" for 64-bit log hashes.
+    # Bit positions are derived from the hash itself (double hashing), so
+    # adding and checking costs no extra hashing of the line.
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(self.size // 8 + 1)
+
+    def _get_positions(self, log_hash: int):
+        # splitmix64 finalizer, spreads hashes that differ only in a few bits.
+        log_hash &= 0xFFFFFFFFFFFFFFFF
+        log_hash = ((log_hash ^ (log_hash >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        log_hash = ((log_hash ^ (log_hash >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+        log_hash ^= log_hash >> 31
+        first_hash = log_hash & 0xFFFFFFFF
+        second_hash = (log_hash >> 32) | 1
+
+        for i in range(self.hashes_count):
+            yield (first_hash + i * second_hash) % self.size
+
+    def add(self, log_hash: int):
+        for position in self._get_positions(log_hash):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, log_hash: int) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._get_positions(log_hash))
@@ -1,6 +1,6 @@
 import datetime
 from dataclasses import dataclass
-from typing import List
+from typing import List, Iterator, Tuple, Optional, Dict
 
 
 @dataclass
@@ -11,6 +11,14 @@ class ApacheLog:
     uri: str
     status_code: int
     size: int
+    referrer: Optional[str] = None
+    user_agent: Optional[str] = None
+    # Microseconds.
+    response_time: Optional[int] = None
+    country: Optional[str] = None
+    asn: Optional[int] = None
+    # Identical lines of an import, logged in the same second, are numbered from 0.
+    occurrence: int = 0
 
 
 @dataclass
@@ -25,6 +33,28 @@ class CountMethod:
     count: int
 
 
+@dataclass
+class CountStatusCode:
+    status_code: int
+    count: int
+
+
+@dataclass
+class TimeBucket:
+    start: datetime
+    count: int
+    size: int
+    client_error_rate: float
+    server_error_rate: float
+
+
+@dataclass
+class LogTimeSeries:
+    interval: str
+    buckets: List[TimeBucket]
+    status_codes_count: List[CountStatusCode]
+
+
 @dataclass
 class LogStatistics:
     unique_ip_count: int
@@ -52,8 +82,222 @@ class PaginatedLogWithStatistics:
     pagination: Pagination
 
 
+@dataclass
+class LogRows:
+    fields: List[str]
+    rows: List[Tuple]
+    page: int
+    has_next: bool
+
+
 @dataclass
 class ImportStatus:
     pk: int
     percent: int
     status: str
+
+
+@dataclass
+class ImportSource:
+    url: str
+    from_bytes: int
+    to_bytes: int
+    size: int
+    accept_ranges: bool
+
+
+@dataclass
+class ImportSourceReport:
+    url: str
+    size: int
+    seconds: float
+
+
+@dataclass
+class ImportPart:
+    host: str
+    sources: List[ImportSource]
+
+
+@dataclass
+class ImportJob:
+    pk: int
+    url: str
+    host: str
+    priority: int
+    sources: List[ImportSource]
+
+
+@dataclass
+class BulkImportPlan:
+    import_status_id: Optional[int]
+    parts_count: int
+    sources: List[str]
+    skipped: List[str]
+    unavailable: List[str]
+
+
+@dataclass
+class SourceThroughput:
+    url: str
+    size: int
+    seconds: float
+    bytes_per_second: float
+
+
+@dataclass
+class ImportProgress:
+    status: str
+    percent: int
+    size: int
+    imported_size: int
+
+
+@dataclass
+class LocalImportProgress:
+    import_status_id: int
+    status: str
+    percent: int
+    size: int
+    imported_size: int
+    seconds: float
+    # Since the start and over the last interval.
+    bytes_per_second: float
+    current_bytes_per_second: float
+
+
+@dataclass
+class BulkImportSummary:
+    status: str
+    percent: int
+    sources: List[SourceThroughput]
+
+
+@dataclass
+class ImportQueue:
+    depth: int
+    running: int
+    expected_wait_seconds: Optional[float]
+
+
+@dataclass
+class LogsExport:
+    filename: str
+    content_type: str
+    chunks: Iterator[bytes]
+
+
+@dataclass
+class RetentionReport:
+    logs_deleted: int
+    import_statuses_deleted: int
+    seconds: float
+    segment_logs_deleted: int = 0
+
+
+@dataclass
+class LogSegment:
+    path: str
+    # The URL the rows were parsed from.
+    source: str
+    rows: int
+    min_date: datetime
+    max_date: datetime
+
+
+@dataclass
+class ImportStatistics:
+    # Rows inserted by the import, lines already imported before are not counted.
+    count: int
+    unique_ip_count: int
+    sum_sizes: int
+    client_error_rate: float
+    server_error_rate: float
+    min_date: Optional[datetime]
+    max_date: Optional[datetime]
+    top_ip_addresses: List[CountIPAddress]
+    status_codes_count: List[CountStatusCode]
+    # Parsed lines that were not inserted, the same line of the same file was imported before.
+    skipped_count: int = 0
+
+
+@dataclass
+class ImportComparison:
+    # Changes are `other` minus `base`.
+    base: ImportStatistics
+    other: ImportStatistics
+    count_change: int
+    unique_ip_count_change: int
+    sum_sizes_change: int
+    client_error_rate_change: float
+    server_error_rate_change: float
+    status_codes_change: List[CountStatusCode]
+    # Top addresses of `other` that are not among the top addresses of `base`, and the other way round.
+    new_top_ip_addresses: List[CountIPAddress]
+    dropped_top_ip_addresses: List[CountIPAddress]
+
+
+@dataclass
+class CountNetwork:
+    # A subnet like 10.1.0.0/16, a country code or an AS number, None when unknown.
+    group: Optional[str]
+    count: int
+    size: int
+
+
+@dataclass
+class AnomalyThresholds:
+    window_seconds: int = 60
+    # Requests per sliding window, 0 turns the check off.
+    max_ip_requests: int = 600
+    max_uri_requests: int = 6000
+    # Share of responses with status >= 400, checked for keys with at least `min_requests` requests in a window.
+    max_error_ratio: float = 0.5
+    min_requests: int = 50
+    # Keys tracked per window and kind, see BurstDetector.
+    max_keys: int = 100000
+
+
+@dataclass
+class AnomalyEvent:
+    # kind: "ip" or "uri", reason: "rate" or "error_ratio".
+    kind: str
+    key: str
+    reason: str
+    window_start: datetime
+    window_seconds: int
+    count: int
+    error_count: int
+    import_status_id: Optional[int] = None
+
+
+@dataclass
+class SavedSearch:
+    query: str
+    # The data version the stored statistics were computed at, None before the first refresh.
+    data_version: Optional[str] = None
+    refreshed_at: Optional[datetime] = None
+
+
+@dataclass
+class EndpointLatency:
+    name: str
+    requests_count: int
+    errors_count: int
+    requests_per_second: float
+    p50_seconds: float
+    p95_seconds: float
+    p99_seconds: float
+    max_seconds: float
+
+
+@dataclass
+class LoadTestReport:
+    seconds: float
+    users: int
+    # All endpoints together first.
+    endpoints: List[EndpointLatency]
+    # Connections to the database sampled during the run, by state ("active", "idle", ...).
+    max_connections: int
+    average_connections: float
+    max_connections_by_state: Dict[str, int]
@@ -0,0 +1,146 @@
+import csv
+import io
+import json
+import zlib
+from typing import Iterator, Iterable, Tuple, List
+
+from apache_logs.constants import LOG_FIELDS
+
+
+class _Buffer:
+    # File-like object the writers write into, drained after every chunk.
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    @property
+    def closed(self) -> bool:
+        return False
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _get_batches(rows: Iterable[Tuple], batch_size: int) -> Iterator[List[Tuple]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def export_csv(rows: Iterable[Tuple], batch_size: int) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(LOG_FIELDS)
+
+    for batch in _get_batches(rows, batch_size):
+        writer.writerows((ip_address, date.isoformat(), *other) for ip_address, date, *other in batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def export_jsonl(rows: Iterable[Tuple], batch_size: int) -> Iterator[bytes]:
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    for batch in _get_batches(rows, batch_size):
+        yield "".join(
+            encoder.encode({
+                "ip_address": ip_address,
+                "date": date.isoformat(),
+                "method": method,
+                "uri": uri,
+                "status_code": status_code,
+                "size": size,
+            }) + "\n" for ip_address, date, method, uri, status_code, size in batch
+        ).encode("utf-8")
+
+
+def export_parquet(rows: Iterable[Tuple], batch_size: int) -> Iterator[bytes]:
+    # Every batch becomes one row group, so only a single batch is held in memory.
+    import pyarrow
+    import pyarrow.parquet
+
+    schema = pyarrow.schema([
+        ("ip_address", pyarrow.string()),
+        ("date", pyarrow.timestamp("us", tz="UTC")),
+        ("method", pyarrow.string()),
+        ("uri", pyarrow.string()),
+        ("status_code", pyarrow.int32()),
+        ("size", pyarrow.int64()),
+    ])
+    buffer = _Buffer()
+    writer = pyarrow.parquet.ParquetWriter(buffer, schema)
+
+    for batch in _get_batches(rows, batch_size):
+        columns = list(zip(*batch))
+        writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)],
+            schema=schema,
+        ))
+        yield buffer.drain()
+
+    writer.close()
+    yield buffer.drain()
+
+
+def gzip_encode(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+
+    yield compressor.flush()
+
+
+def zstd_encode(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    import zstandard
+
+    compressor = zstandard.ZstdCompressor().compressobj()
+
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+
+    yield compressor.flush()
+
+
+# format: (writer, content type, file extension, required module)
+EXPORT_FORMATS = {
+    "csv": (export_csv, "text/csv", "csv", None),
+    "jsonl": (export_jsonl, "application/x-ndjson", "jsonl", None),
+    "parquet": (export_parquet, "application/vnd.apache.parquet", "parquet", "pyarrow"),
+}
+
+# compression: (encoder, file extension, required module)
+EXPORT_COMPRESSIONS = {
+    "gzip": (gzip_encode, "gz", None),
+    "zstd": (zstd_encode, "zst", "zstandard"),
+}
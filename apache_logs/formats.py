@@ -0,0 +1,260 @@
+import re
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+# Raw fields every parser returns, in this order; fields the format does not have are None.
+LINE_FIELDS = [
+    "ip_address",
+    "date",
+    "gmt",
+    "method",
+    "uri",
+    "status_code",
+    "size",
+    "referrer",
+    "user_agent",
+    "response_time",
+]
+
+LineFields = Tuple[Optional[bytes], ...]
+
+# Apache LogFormat strings, tried by the auto-detection in this order, so the most specific come first.
+LOG_FORMATS = {
+    "combined_time": '%h %l %u %t "%r" %>s %b "%{Referer}i" "%{User-agent}i" %D',
+    "nginx_time": '$remote_addr - $remote_user [$time_local] "$request" $status $body_bytes_sent '
+                  '"$http_referer" "$http_user_agent" $request_time',
+    "combined": '%h %l %u %t "%r" %>s %b "%{Referer}i" "%{User-agent}i"',
+    "common": '%h %l %u %t "%r" %>s %b',
+}
+
+# nginx variables with an Apache directive of the same meaning.
+NGINX_VARIABLES = {
+    "[$time_local]": "%t",
+    "$remote_addr": "%h",
+    "$remote_user": "%u",
+    "$request": "%r",
+    "$status": "%>s",
+    "$body_bytes_sent": "%b",
+    "$bytes_sent": "%B",
+    "$http_referer": "%{Referer}i",
+    "$http_user_agent": "%{User-agent}i",
+    "$request_time": "%T",
+}
+
+QUOTED_TEXT = rb'(?:[^"\\]|\\.)*'
+
+# directive: (field, regex, tokens in a whitespace split line)
+DIRECTIVES = {
+    "%h": ("ip_address", rb"(?P<ip_address>\S+)", 1),
+    "%a": ("ip_address", rb"(?P<ip_address>\S+)", 1),
+    "%l": (None, rb"\S+", 1),
+    "%u": (None, rb"\S+", 1),
+    "%t": ("date", rb"\[(?P<date>[^\]\s]*) (?P<gmt>[^\]\s]*)\]", 2),
+    "%r": ("method", rb'(?P<method>[^\s"]*) (?P<uri>[^\s"]*)(?: [^"]*)?', 3),
+    "%>s": ("status_code", rb"(?P<status_code>\S+)", 1),
+    "%s": ("status_code", rb"(?P<status_code>\S+)", 1),
+    "%b": ("size", rb"(?P<size>\S+)", 1),
+    "%B": ("size", rb"(?P<size>\S+)", 1),
+    "%{Referer}i": ("referrer", b"(?P<referrer>" + QUOTED_TEXT + b")", None),
+    "%{User-agent}i": ("user_agent", b"(?P<user_agent>" + QUOTED_TEXT + b")", None),
+    "%D": ("response_time", rb"(?P<response_time>\d+)", 1),
+    "%T": ("response_time", rb"(?P<response_time>\d+(?:\.\d+)?)", 1),
+}
+
+DIRECTIVE_PATTERN = re.compile(r"%\{[^}]*\}[a-zA-Z]|%[<>]?[a-zA-Z%]")
+REQUIRED_FIELDS = {"ip_address", "date", "method", "status_code"}
+
+
+class LogFormatError(Exception):
+    pass
+
+
+class LogParser:
+    # Turns one log line into LINE_FIELDS. `response_time_scale` converts the response
+    # time of the format to microseconds.
+
+    def __init__(self, name: str, log_format: str, response_time_scale: int = 1):
+        self.name = name
+        self.log_format = log_format
+        self.response_time_scale = response_time_scale
+
+    def parse(self, line: bytes) -> Optional[LineFields]:
+        raise NotImplementedError
+
+
+class SplitLogParser(LogParser):
+    # Formats made of whitespace separated directives are parsed like the Common Log Format
+    # always was: one bytes.split() and fixed token positions. A trailing quoted directive
+    # takes the rest of the line.
+
+    def __init__(
+        self,
+        name: str,
+        log_format: str,
+        positions: Dict[str, int],
+        tokens_count: int,
+        takes_rest: bool,
+        **kwargs,
+    ):
+        super().__init__(name=name, log_format=log_format, **kwargs)
+        self.tokens_count = tokens_count
+        # Text after the last token is ignored, unless the last directive takes the rest of the line.
+        self.maxsplit = tokens_count - 1 if takes_rest else tokens_count
+        # Missing fields point to the None appended to every split line.
+        self.get_fields = itemgetter(*(positions.get(field, -1) for field in LINE_FIELDS))
+
+    def parse(self, line: bytes) -> Optional[LineFields]:
+        tokens = line.split(None, self.maxsplit)
+        if len(tokens) < self.tokens_count:
+            return None
+        tokens.append(None)
+
+        ip_address, date, gmt, method, uri, status_code, size, referrer, user_agent, response_time = \
+            self.get_fields(tokens)
+
+        return (
+            ip_address, date[1:], gmt[:-1], method[1:], uri, status_code, size,
+            referrer and _unquote(referrer), user_agent and _unquote(user_agent), response_time,
+        )
+
+
+class RegexLogParser(LogParser):
+
+    def __init__(self, name: str, log_format: str, pattern: bytes, **kwargs):
+        super().__init__(name=name, log_format=log_format, **kwargs)
+        self.pattern = re.compile(pattern)
+        # All groups are named, missing fields point to the None appended to the groups.
+        self.get_fields = itemgetter(*(self.pattern.groupindex.get(field, 0) - 1 for field in LINE_FIELDS))
+
+    def parse(self, line: bytes) -> Optional[LineFields]:
+        match = self.pattern.match(line)
+        if match is None:
+            return None
+
+        return self.get_fields(match.groups() + (None,))
+
+
+def _unquote(value: bytes) -> bytes:
+    value = value.rstrip()
+    if len(value) >= 2 and value[:1] == value[-1:] == b'"':
+        return value[1:-1]
+
+    return value
+
+
+def _to_apache_format(log_format: str) -> str:
+    for variable, directive in sorted(NGINX_VARIABLES.items(), key=lambda item: -len(item[0])):
+        log_format = log_format.replace(variable, directive)
+
+    # Other nginx variables are kept as unnamed fields.
+    return re.sub(r"\$[a-zA-Z_]+", "%{-}n", log_format)
+
+
+def _get_items(log_format: str) -> List[Tuple[bool, str]]:
+    # (is directive, text) pairs of the format string.
+    items = []
+    position = 0
+    for match in DIRECTIVE_PATTERN.finditer(log_format):
+        if match.start() > position:
+            items.append((False, log_format[position:match.start()]))
+        items.append((match.group() != "%%", "%" if match.group() == "%%" else match.group()))
+        position = match.end()
+    if position < len(log_format):
+        items.append((False, log_format[position:]))
+
+    return items
+
+
+def _get_split_positions(log_format: str) -> Optional[Tuple[Dict[str, int], int, bool]]:
+    # Token positions when every directive is a whitespace separated word, like '%h %t "%r"'.
+    words = log_format.split(" ")
+    positions = {}
+    position = 0
+    takes_rest = False
+
+    for index, word in enumerate(words):
+        is_quoted = len(word) > 2 and word[0] == word[-1] == '"'
+        directive = word[1:-1] if is_quoted else word
+        if directive not in DIRECTIVES:
+            return None
+
+        field, _, tokens = DIRECTIVES[directive]
+        if tokens is None:
+            # Quoted text may contain spaces, it can only take the rest of the line.
+            if index != len(words) - 1 or not is_quoted:
+                return None
+            tokens = 1
+            takes_rest = True
+        elif is_quoted != (directive == "%r"):
+            return None
+
+        if field is not None:
+            positions[field] = position
+        if field == "date":
+            positions["gmt"] = position + 1
+        if field == "method":
+            positions["uri"] = position + 1
+        position += tokens
+
+    return positions, position, takes_rest
+
+
+def _get_pattern(items: List[Tuple[bool, str]]) -> bytes:
+    pattern = b""
+    for is_directive, text in items:
+        if not is_directive:
+            pattern += re.escape(text.encode())
+        elif text in DIRECTIVES:
+            pattern += DIRECTIVES[text][1]
+        else:
+            pattern += QUOTED_TEXT if pattern.endswith(b'"') else rb"\S*"
+
+    return pattern + rb"\s*$"
+
+
+def compile_log_format(log_format: str, name: Optional[str] = None) -> LogParser:
+    name = name or log_format
+    apache_format = _to_apache_format(log_format)
+    items = _get_items(apache_format)
+
+    directives = [text for is_directive, text in items if is_directive]
+    fields = {DIRECTIVES[directive][0] for directive in directives if directive in DIRECTIVES}
+    missing_fields = REQUIRED_FIELDS - fields
+    if missing_fields:
+        raise LogFormatError(f"{log_format} log format has no {', '.join(sorted(missing_fields))} field.")
+
+    options = {"response_time_scale": 1_000_000 if "%T" in directives else 1}
+
+    split_positions = _get_split_positions(apache_format)
+    if split_positions is not None:
+        positions, tokens_count, takes_rest = split_positions
+        return SplitLogParser(
+            name, log_format, positions=positions, tokens_count=tokens_count, takes_rest=takes_rest, **options,
+        )
+
+    return RegexLogParser(name, log_format, pattern=_get_pattern(items), **options)
+
+
+def get_log_parser(log_format: str) -> LogParser:
+    # A name from LOG_FORMATS or a LogFormat string.
+    if log_format in LOG_FORMATS:
+        return LOG_PARSERS[log_format]
+
+    return compile_log_format(log_format)
+
+
+def detect_log_parser(lines: List[bytes]) -> Optional[LogParser]:
+    # The registered format matching most of the sample lines, the most specific on a tie.
+    lines = [line for line in lines if line.strip()]
+    best_parser = None
+    best_matches = 0
+
+    for parser in LOG_PARSERS.values():
+        matches = sum(parser.parse(line) is not None for line in lines)
+        if matches > best_matches:
+            best_parser, best_matches = parser, matches
+
+    return best_parser
+
+
+LOG_PARSERS = {name: compile_log_format(log_format, name=name) for name, log_format in LOG_FORMATS.items()}
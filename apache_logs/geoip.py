@@ -0,0 +1,76 @@
+import gzip
+import ipaddress
+from bisect import bisect_right
+from typing import Optional, Tuple, Dict, List
+
+# An offline database of ip ranges with their autonomous system and country, in the tab separated
+# format of https://iptoasn.com (ip2asn-combined.tsv, optionally gzipped):
+#   range_start  range_end  AS_number  country_code  AS_description
+# AS 0 and the "None" country mark ranges that are not routed.
+UNKNOWN_COUNTRIES = {"", "None", "none"}
+
+
+class GeoIPFormatError(Exception):
+    pass
+
+
+class IPRangeDatabase:
+    # Ranges are sorted by their start, an address is looked up with one bisect in the ranges of its family.
+
+    def __init__(self, ranges: List[Tuple[int, int, int, int, Optional[str]]]):
+        # (version, start, end, asn, country) tuples.
+        self._starts: Dict[int, List[int]] = {4: [], 6: []}
+        self._ranges: Dict[int, List[Tuple[int, int, Optional[str]]]] = {4: [], 6: []}
+
+        for version, start, end, asn, country in sorted(ranges):
+            self._starts[version].append(start)
+            self._ranges[version].append((end, asn, country))
+
+    @classmethod
+    def load(cls, path: str) -> "IPRangeDatabase":
+        opener = gzip.open if path.endswith(".gz") else open
+        ranges = []
+
+        with opener(path, "rt", encoding="utf-8") as database_file:
+            for line_number, line in enumerate(database_file, start=1):
+                if not line.strip() or line.startswith("#"):
+                    continue
+
+                fields = line.rstrip("\n").split("\t")
+                try:
+                    start, end = ipaddress.ip_address(fields[0]), ipaddress.ip_address(fields[1])
+                    asn = int(fields[2])
+                except (IndexError, ValueError):
+                    raise GeoIPFormatError(f"{path}:{line_number} is not a valid ip range.")
+
+                if start.version != end.version:
+                    raise GeoIPFormatError(f"{path}:{line_number} range mixes ip versions.")
+
+                country = fields[3] if len(fields) > 3 and fields[3] not in UNKNOWN_COUNTRIES else None
+                ranges.append((start.version, int(start), int(end), asn, country))
+
+        return cls(ranges)
+
+    def __len__(self) -> int:
+        return len(self._ranges[4]) + len(self._ranges[6])
+
+    def lookup(self, ip_address: str) -> Tuple[Optional[str], Optional[int]]:
+        # (country, asn) of the address, None for what is unknown.
+        try:
+            address = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return None, None
+
+        # IPv4-mapped IPv6 addresses are looked up in the IPv4 ranges.
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+
+        index = bisect_right(self._starts[address.version], int(address)) - 1
+        if index < 0:
+            return None, None
+
+        end, asn, country = self._ranges[address.version][index]
+        if int(address) > end:
+            return None, None
+
+        return country, asn or None
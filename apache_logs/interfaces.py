@@ -1,12 +1,39 @@
 from abc import ABC, abstractmethod
-from typing import List, Tuple, Optional
+from datetime import datetime
+from typing import List, Tuple, Optional, Set, Iterator
 
-from apache_logs.entities import ApacheLog, CountIPAddress, CountMethod, Pagination, ImportStatus
+from apache_logs.entities import ApacheLog, CountIPAddress, CountMethod, Pagination, ImportStatus, TimeBucket, \
+    CountStatusCode, ImportJob, ImportPart, ImportSourceReport, LogSegment, LogStatistics, ImportStatistics, \
+    CountNetwork, AnomalyEvent, ImportProgress, SavedSearch
 
 
 class IApacheLogsDAO(ABC):
     @abstractmethod
-    def create_apache_logs(self, apache_logs: List[ApacheLog]):
+    def create_apache_logs(self, apache_logs: List[ApacheLog], import_status_id: Optional[int] = None) -> Set[int]:
+        pass
+
+    @abstractmethod
+    def drop_secondary_indexes(self):
+        pass
+
+    @abstractmethod
+    def create_secondary_indexes(self):
+        pass
+
+    @abstractmethod
+    def get_existing_log_hashes(self, *, log_hashes: List[int]) -> Set[int]:
+        pass
+
+    @abstractmethod
+    def iterate_log_hashes(self, *, source: str, chunk_size: int) -> Iterator[int]:
+        pass
+
+    @abstractmethod
+    def delete_logs_before(self, *, date: datetime, batch_size: int) -> int:
+        pass
+
+    @abstractmethod
+    def delete_analytics_logs_before(self, *, date: datetime) -> int:
         pass
 
     @abstractmethod
@@ -29,6 +56,144 @@ class IApacheLogsDAO(ABC):
     def get_logs(self, *, page: int, per_page: int, query: Optional[str]) -> Tuple[List[ApacheLog], Pagination]:
         pass
 
+    @abstractmethod
+    def get_log_rows(
+        self,
+        *,
+        page: int,
+        per_page: int,
+        query: Optional[str],
+        fields: List[str],
+    ) -> Tuple[List[Tuple], bool]:
+        pass
+
+    @abstractmethod
+    def get_data_version(self) -> str:
+        pass
+
+    @abstractmethod
+    def iterate_logs(self, *, query: Optional[str], chunk_size: int) -> Iterator[Tuple]:
+        pass
+
+    @abstractmethod
+    def get_time_buckets(
+        self,
+        *,
+        interval: str,
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        query: Optional[str],
+    ) -> List[TimeBucket]:
+        pass
+
+    @abstractmethod
+    def get_status_codes_count(
+        self,
+        *,
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        query: Optional[str],
+    ) -> List[CountStatusCode]:
+        pass
+
+    @abstractmethod
+    def get_import_statistics(self, *, import_status_id: int, addresses_count: int = 10) -> ImportStatistics:
+        pass
+
+    @abstractmethod
+    def get_network_groups(
+        self,
+        *,
+        group_by: str,
+        ipv4_prefix: int,
+        ipv6_prefix: int,
+        subnet: Optional[str],
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        groups_count: int = 20,
+    ) -> List[CountNetwork]:
+        pass
+
+
+class ILogSegmentsDAO(ABC):
+    @abstractmethod
+    def create_segment(self, apache_logs: List[ApacheLog], source: str) -> Optional[LogSegment]:
+        pass
+
+    @abstractmethod
+    def get_segments(self, *, source: Optional[str] = None) -> List[LogSegment]:
+        pass
+
+    @abstractmethod
+    def iterate_segment_logs(self, segment: LogSegment, chunk_size: int) -> Iterator[List[ApacheLog]]:
+        pass
+
+    @abstractmethod
+    def iterate_logs(self, *, query: Optional[str], chunk_size: int) -> Iterator[Tuple]:
+        pass
+
+    @abstractmethod
+    def get_statistics(self, *, source: Optional[str], addresses_count: int = 10) -> LogStatistics:
+        pass
+
+    @abstractmethod
+    def delete_segments_before(self, *, date: datetime) -> int:
+        pass
+
+
+class IGeoIPDAO(ABC):
+    @abstractmethod
+    def get_ip_location(self, ip_address: str) -> Tuple[Optional[str], Optional[int]]:
+        pass
+
+
+class IAnomalyEventsDAO(ABC):
+    @abstractmethod
+    def create_anomaly_events(self, anomaly_events: List[AnomalyEvent], import_status_id: Optional[int] = None):
+        pass
+
+    @abstractmethod
+    def get_anomaly_events(
+        self,
+        *,
+        kind: Optional[str],
+        reason: Optional[str],
+        key: Optional[str],
+        import_status_id: Optional[int],
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        events_count: int = 100,
+    ) -> List[AnomalyEvent]:
+        pass
+
+
+class ISavedSearchesDAO(ABC):
+    @abstractmethod
+    def create_saved_search(self, query: str) -> SavedSearch:
+        pass
+
+    @abstractmethod
+    def delete_saved_search(self, query: str) -> bool:
+        pass
+
+    @abstractmethod
+    def get_saved_searches(self) -> List[SavedSearch]:
+        pass
+
+    @abstractmethod
+    def get_saved_statistics(self, query: str, data_version: str) -> Optional[LogStatistics]:
+        pass
+
+    @abstractmethod
+    def save_statistics(self, query: str, data_version: str, statistics: LogStatistics):
+        pass
+
+
+class IHostRateLimitsDAO(ABC):
+    @abstractmethod
+    def reserve_request(self, host: str, interval: float) -> float:
+        pass
+
 
 class IRequestDAO(ABC):
     @abstractmethod
@@ -36,11 +201,15 @@ class IRequestDAO(ABC):
         pass
 
     @abstractmethod
-    def get_partial_rows(self, url: str, from_bytes: int, to_bytes: int) -> List[str]:
+    def get_partial_content(self, url: str, from_bytes: int, to_bytes: int) -> bytes:
         pass
 
     @abstractmethod
-    def get_full_rows(self, url: str) -> List[str]:
+    def get_full_content(self, url: str) -> bytes:
+        pass
+
+    @abstractmethod
+    def iter_full_content(self, url: str, chunk_size: int) -> Iterator[bytes]:
         pass
 
 
@@ -49,6 +218,30 @@ class IImportStatusDAO(ABC):
     def create_import_status(self) -> ImportStatus:
         pass
 
+    @abstractmethod
+    def create_import_job(self, url: str, host: str, priority: int) -> ImportJob:
+        pass
+
+    @abstractmethod
+    def create_bulk_import(self, parts: List[ImportPart], priority: int, queued: bool = True) -> ImportStatus:
+        pass
+
+    @abstractmethod
+    def get_import_parts(self, import_status_id: int) -> List[ImportJob]:
+        pass
+
+    @abstractmethod
+    def get_import_progress(self, import_status_id: int) -> ImportProgress:
+        pass
+
+    @abstractmethod
+    def get_import_status(self, import_status_id: int) -> ImportStatus:
+        pass
+
+    @abstractmethod
+    def get_import_job(self, import_status_id: int) -> ImportJob:
+        pass
+
     @abstractmethod
     def update_import_status(self, import_status_id: int, percent: int) -> ImportStatus:
         pass
@@ -57,6 +250,63 @@ class IImportStatusDAO(ABC):
     def finish_import_status(self, import_status_id: int) -> ImportStatus:
         pass
 
+    @abstractmethod
+    def fail_import_status(self, import_status_id: int) -> ImportStatus:
+        pass
+
+    @abstractmethod
+    def add_imported_size(self, import_status_id: int, size: int):
+        pass
+
+    @abstractmethod
+    def finish_import_part(
+        self,
+        import_status_id: int,
+        report: List[ImportSourceReport],
+        failed: bool = False,
+    ) -> ImportStatus:
+        pass
+
+    @abstractmethod
+    def get_parent_import_status(self, import_status_id: int) -> Optional[ImportStatus]:
+        pass
+
+    @abstractmethod
+    def save_lines_count(self, import_status_id: int, lines_count: int):
+        pass
+
+    @abstractmethod
+    def save_import_statistics(self, import_status_id: int, statistics: ImportStatistics):
+        pass
+
+    @abstractmethod
+    def get_import_statistics(self, import_status_id: int) -> Optional[ImportStatistics]:
+        pass
+
+    @abstractmethod
+    def get_import_part_reports(self, import_status_id: int) -> List[ImportSourceReport]:
+        pass
+
+    @abstractmethod
+    def get_imported_sources(self) -> Set[str]:
+        pass
+
     @abstractmethod
     def get_import_statuses(self) -> List[ImportStatus]:
         pass
+
+    @abstractmethod
+    def claim_import_jobs(self, max_concurrent: int, max_concurrent_per_host: int) -> List[ImportJob]:
+        pass
+
+    @abstractmethod
+    def count_import_statuses(self, status: str) -> int:
+        pass
+
+    @abstractmethod
+    def get_average_import_seconds(self, last: int = 20) -> Optional[float]:
+        pass
+
+    @abstractmethod
+    def delete_finished_import_statuses_before(self, *, date: datetime) -> int:
+        pass
@@ -0,0 +1,244 @@
+import asyncio
+import random
+from collections import defaultdict
+from dataclasses import dataclass
+from time import monotonic
+from typing import List, Dict, Tuple, Optional, Callable
+
+from apache_logs.entities import EndpointLatency, LoadTestReport
+
+
+@dataclass
+class Endpoint:
+    name: str
+    path: str
+    # Share of the requests of a user that go to this endpoint.
+    weight: float
+
+
+# A dashboard user: polls the import status and browses and searches the logs.
+DASHBOARD_ENDPOINTS = [
+    Endpoint(name="import_status", path="/import_status", weight=0.5),
+    Endpoint(name="index", path="/", weight=0.2),
+    Endpoint(name="index page", path="/?page=5", weight=0.1),
+    Endpoint(name="index search", path="/?q=GET", weight=0.2),
+]
+
+
+def get_percentile(sorted_values: List[float], percent: float) -> float:
+    # Nearest rank, so the value is one that was measured.
+    if not sorted_values:
+        return 0.0
+
+    rank = max(int(len(sorted_values) * percent / 100 + 0.5), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class HTTPConnection:
+    # A minimal keep-alive HTTP/1.1 client on asyncio streams, like a browser tab it reuses its
+    # connection until the server closes it (gunicorn sync workers close after every response).
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader, self.writer = None, None
+
+    async def _read_body(self, headers: Dict[str, str]) -> bytes:
+        if "content-length" in headers:
+            return await self.reader.readexactly(int(headers["content-length"]))
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if not size:
+                    return b"".join(chunks)
+                chunks.append(chunk[:-2])
+
+        return await self.reader.read()
+
+    async def _request(self, path: str) -> Tuple[int, bytes, bool]:
+        self.writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nConnection: keep-alive\r\n\r\n".encode()
+        )
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by the server")
+
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        body = await self._read_body(headers)
+        keep_alive = headers.get("connection", "").lower() != "close" and b"HTTP/1.0" not in status_line
+
+        return int(status_line.split()[1]), body, keep_alive
+
+    async def get(self, path: str) -> Tuple[int, bytes]:
+        # A kept connection the server has closed meanwhile is reopened once.
+        for attempt in range(2):
+            reused = self.writer is not None
+            if not reused:
+                await self._connect()
+
+            try:
+                status, body, keep_alive = await asyncio.wait_for(self._request(path), timeout=self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if reused and not attempt:
+                    continue
+                raise
+            except asyncio.TimeoutError:
+                await self.close()
+                raise
+
+            if not keep_alive:
+                await self.close()
+
+            return status, body
+
+
+class LoadTest:
+    # `users` virtual users send requests to the endpoints, picked by weight, for `seconds`, each
+    # waiting up to `think_seconds` (uniformly, so users drift apart) after every response. Latency
+    # is measured from sending the request to reading the whole body; responses other than 2xx and
+    # failed requests are errors. `sample_connections`, called in a thread every `sample_seconds`,
+    # returns the database connections by state.
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        users: int,
+        seconds: float,
+        endpoints: List[Endpoint] = DASHBOARD_ENDPOINTS,
+        think_seconds: float = 1.0,
+        timeout: float = 30.0,
+        sample_connections: Optional[Callable[[], Dict[str, int]]] = None,
+        sample_seconds: float = 1.0,
+        seed: int = 0,
+    ):
+        self.host = host
+        self.port = port
+        self.users = users
+        self.seconds = seconds
+        self.endpoints = endpoints
+        self.think_seconds = think_seconds
+        self.timeout = timeout
+        self.sample_connections = sample_connections
+        self.sample_seconds = sample_seconds
+        self.random = random.Random(seed)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.connection_samples: List[Dict[str, int]] = []
+
+    async def _user(self, stop_at: float):
+        connection = HTTPConnection(host=self.host, port=self.port, timeout=self.timeout)
+        weights = [endpoint.weight for endpoint in self.endpoints]
+
+        # Users start spread over the first think time, not all at once.
+        await asyncio.sleep(self.random.uniform(0, self.think_seconds))
+
+        try:
+            while monotonic() < stop_at:
+                endpoint = self.random.choices(self.endpoints, weights=weights)[0]
+                started_at = monotonic()
+                try:
+                    status, _ = await connection.get(endpoint.path)
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                    status = None
+
+                self.latencies[endpoint.name].append(monotonic() - started_at)
+                if status is None or not 200 <= status < 300:
+                    self.errors[endpoint.name] += 1
+
+                await asyncio.sleep(self.random.uniform(0, self.think_seconds))
+        finally:
+            await connection.close()
+
+    async def _sample(self, stop_at: float):
+        loop = asyncio.get_running_loop()
+
+        while monotonic() < stop_at:
+            self.connection_samples.append(await loop.run_in_executor(None, self.sample_connections))
+            await asyncio.sleep(self.sample_seconds)
+
+    def _get_endpoint_latency(self, name: str, latencies: List[float], errors_count: int, seconds: float):
+        latencies = sorted(latencies)
+
+        return EndpointLatency(
+            name=name,
+            requests_count=len(latencies),
+            errors_count=errors_count,
+            requests_per_second=len(latencies) / seconds if seconds else 0.0,
+            p50_seconds=get_percentile(latencies, 50),
+            p95_seconds=get_percentile(latencies, 95),
+            p99_seconds=get_percentile(latencies, 99),
+            max_seconds=latencies[-1] if latencies else 0.0,
+        )
+
+    def _get_report(self, seconds: float) -> LoadTestReport:
+        endpoints = [self._get_endpoint_latency(
+            name="all",
+            latencies=[latency for latencies in self.latencies.values() for latency in latencies],
+            errors_count=sum(self.errors.values()),
+            seconds=seconds,
+        )]
+        endpoints.extend(
+            self._get_endpoint_latency(
+                name=endpoint.name,
+                latencies=self.latencies[endpoint.name],
+                errors_count=self.errors[endpoint.name],
+                seconds=seconds,
+            ) for endpoint in self.endpoints
+        )
+
+        totals = [sum(sample.values()) for sample in self.connection_samples]
+        max_connections_by_state = defaultdict(int)
+        for sample in self.connection_samples:
+            for state, count in sample.items():
+                max_connections_by_state[state] = max(max_connections_by_state[state], count)
+
+        return LoadTestReport(
+            seconds=seconds,
+            users=self.users,
+            endpoints=endpoints,
+            max_connections=max(totals, default=0),
+            average_connections=sum(totals) / len(totals) if totals else 0.0,
+            max_connections_by_state=dict(max_connections_by_state),
+        )
+
+    async def execute_async(self) -> LoadTestReport:
+        started_at = monotonic()
+        stop_at = started_at + self.seconds
+        tasks = [self._user(stop_at=stop_at) for _ in range(self.users)]
+        if self.sample_connections is not None:
+            tasks.append(self._sample(stop_at=stop_at))
+
+        await asyncio.gather(*tasks)
+
+        return self._get_report(seconds=monotonic() - started_at)
+
+    def execute(self) -> LoadTestReport:
+        return asyncio.run(self.execute_async())
@@ -0,0 +1,77 @@
+import random
+from time import perf_counter
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+
+from apache_logs.constants import HTTP_METHODS
+from apache_logs.usecases import ParseLogsUseCase
+
+
+class Command(BaseCommand):
+    help = "Compares the scalar and the vectorized (NumPy) log parsers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--file", action="store", type=str, default=None)
+        parser.add_argument("--lines", action="store", type=int, default=200000)
+        parser.add_argument("--repeat", action="store", type=int, default=3)
+        parser.add_argument("--format", action="store", type=str, default="common")
+
+    def _generate_rows(self, lines: int):
+        rows = []
+
+        for i in range(lines):
+            rows.append(
+                f"10.{i % 256}.{i // 256 % 256}.{random.randint(1, 254)} - - "
+                f"[{random.randint(1, 28):02d}/Dec/2020:{random.randint(0, 23):02d}:{i % 60:02d}:{i % 60:02d} +0100] "
+                f"\"{random.choice(HTTP_METHODS)} /page/{random.randint(1, 10000)}?q={i} HTTP/1.1\" "
+                f"{random.choice([200, 200, 200, 301, 404, 500])} {random.randint(0, 100000)} \"-\" \"Mozilla/5.0\""
+            )
+
+        return rows
+
+    def _measure(self, parse, data: bytes, repeat: int) -> float:
+        best = None
+        for _ in range(repeat):
+            started_at = perf_counter()
+            parse(data)
+            seconds = perf_counter() - started_at
+            best = seconds if best is None else min(best, seconds)
+
+        return best
+
+    def handle(self, file: str, lines: int, repeat: int, format: str, *args, **options):
+        from apache_logs.vectorized import parse_log_buffer
+
+        if file:
+            with open(file, "rb") as log_file:
+                data = log_file.read()
+        else:
+            data = "\n".join(self._generate_rows(lines=lines)).encode("utf-8")
+        lines = data.count(b"\n") + 1
+
+        scalar_usecase = ParseLogsUseCase(mock.Mock(), mock.Mock(), mock.Mock(), log_format=format)
+        results = [
+            ("scalar", self._measure(lambda data: scalar_usecase._parse_logs(buffers=[data]), data, repeat)),
+        ]
+
+        # The vectorized parser only knows the Common Log Format.
+        if format == "common":
+            vectorized_usecase = ParseLogsUseCase(mock.Mock(), mock.Mock(), mock.Mock(), vectorized=True)
+
+            if scalar_usecase._parse_logs(buffers=[data]) != vectorized_usecase._parse_logs(buffers=[data]):
+                print("The parsers returned different results!")
+                return
+
+            results += [
+                ("vectorized, columns", self._measure(
+                    lambda data: parse_log_buffer(data, parse_rows=scalar_usecase._parse_rows), data, repeat,
+                )),
+                ("vectorized, ApacheLog", self._measure(
+                    lambda data: vectorized_usecase._parse_logs(buffers=[data]), data, repeat,
+                )),
+            ]
+
+        print(f"{lines} lines, best of {repeat}:")
+        for name, seconds in results:
+            print(f"{name:<24}{seconds * 1000:>10.0f} ms{lines / seconds:>14,.0f} lines/s")
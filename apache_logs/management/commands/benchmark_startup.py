@@ -0,0 +1,82 @@
+import subprocess
+import sys
+from time import perf_counter
+from typing import Dict, Tuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# What every process imports before it does any work.
+ENTRY_POINTS = {
+    "dashboard": "import django; django.setup(); import parsing_logs.wsgi, parsing_logs.urls",
+    "worker": "import django; django.setup(); import apache_logs.tasks",
+    "parse_logs": "import django; django.setup(); import apache_logs.management.commands.parse_logs",
+    # What python -m apache_logs imports before it reads the file.
+    "local import": "import django; django.setup(); import apache_logs.usecases, apache_logs.workers",
+}
+# Heavy packages reported wherever they are imported from.
+TRACKED_MODULES = ["requests", "parsing_logs.celery", "psycopg2", "numpy"]
+
+
+def parse_importtime(output: str) -> Dict[str, Tuple[int, int]]:
+    # `python -X importtime` writes "import time: self [us] | cumulative | module" lines to stderr,
+    # nested imports are indented by two spaces a level. Returns the cumulative microseconds and
+    # the nesting level of every module.
+    modules = {}
+
+    for line in output.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+
+        _, cumulative_time, name = line[len("import time:"):].split("|")
+        if not cumulative_time.strip().isdigit():
+            continue
+
+        module = name.strip()
+        modules[module] = (int(cumulative_time), (len(name) - len(name.lstrip()) - 1) // 2)
+
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Measures the import time of the dashboard, the Celery worker and the CLI with python -X importtime."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", action="store", type=int, default=5)
+        parser.add_argument("--top", action="store", type=int, default=8)
+
+    def _measure(self, code: str) -> Tuple[float, int, Dict[str, Tuple[int, int]]]:
+        started_at = perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        modules = parse_importtime(result.stderr)
+        imports_time = sum(cumulative for cumulative, level in modules.values() if level == 0)
+
+        return perf_counter() - started_at, imports_time, modules
+
+    def handle(self, repeat: int, top: int, *args, **options):
+        for name, code in ENTRY_POINTS.items():
+            # The fastest run has the least noise.
+            seconds, imports_time, modules = min(
+                (self._measure(code) for _ in range(repeat)),
+                key=lambda run: run[1],
+            )
+            top_modules = sorted(
+                ((module, cumulative) for module, (cumulative, level) in modules.items() if level == 0),
+                key=lambda item: -item[1],
+            )
+
+            tracked_modules = [
+                f"{module} ({modules[module][0] / 1000:.1f} ms)" for module in TRACKED_MODULES if module in modules
+            ]
+
+            print(f"{name}: {imports_time / 1000:.0f} ms of imports, {seconds * 1000:.0f} ms in total")
+            print(f"    loads {', '.join(tracked_modules) or 'none of ' + ', '.join(TRACKED_MODULES)}")
+            for module, cumulative in top_modules[:top]:
+                print(f"    {module}: {cumulative / 1000:.1f} ms")
@@ -0,0 +1,24 @@
+import dataclasses
+import json
+
+from django.core.management.base import BaseCommand
+
+from apache_logs.daos import ImportStatusDAO
+from apache_logs.usecases import CompareImportsUseCase, GetImportStatisticsUseCase
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument("base", type=int)
+        parser.add_argument("other", type=int)
+
+    def handle(self, base: int, other: int, *args, **options):
+        usecase = CompareImportsUseCase(import_status_dao=ImportStatusDAO())
+
+        try:
+            import_comparison = usecase.execute(base_import_status_id=base, other_import_status_id=other)
+        except GetImportStatisticsUseCase.GetImportStatisticsValidationError as e:
+            print(e)
+            return
+
+        print(json.dumps(dataclasses.asdict(import_comparison), indent=2, default=str))
@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from apache_logs.daos import ApacheLogsDAO
+from apache_logs.workers import get_segments_dao
+from apache_logs.usecases import ExportLogsUseCase
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument("--format", action="store", type=str, default="csv", dest="export_format")
+        parser.add_argument("--compression", action="store", type=str, default=None)
+        parser.add_argument("--query", "-q", action="store", type=str, default="")
+        parser.add_argument("--output", "-o", action="store", type=str, default=None)
+        parser.add_argument("--chunk-size", action="store", type=int, default=2000)
+        parser.add_argument("--from-segments", action="store_true", default=False)
+
+    def handle(self, export_format: str, compression: str, query: str, output: str, chunk_size: int, *args, **options):
+        export_logs_usecase = ExportLogsUseCase(
+            logs_dao=ApacheLogsDAO(),
+            chunk_size=chunk_size,
+            segments_dao=get_segments_dao(),
+        )
+
+        try:
+            logs_export = export_logs_usecase.execute(
+                query=query,
+                export_format=export_format,
+                compression=compression,
+                from_segments=options["from_segments"],
+            )
+        except export_logs_usecase.ExportLogsValidationError as e:
+            print(e)
+            return
+
+        if output:
+            with open(output, "wb") as file:
+                for chunk in logs_export.chunks:
+                    file.write(chunk)
+        else:
+            for chunk in logs_export.chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+
+        return
@@ -0,0 +1,50 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from apache_logs.chunking import MB
+from apache_logs.daos import ImportStatusDAO
+from apache_logs.services import BulkImportCeleryService
+from apache_logs.usecases import BulkImportSummaryUseCase
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument("manifest", action="store", type=str, nargs="?", default="-")
+        parser.add_argument("--priority", action="store", type=int, default=0)
+        parser.add_argument("--summary", action="store", type=int, default=None)
+
+    def _print_summary(self, import_status_id: int):
+        bulk_import_summary = BulkImportSummaryUseCase(import_status_dao=ImportStatusDAO()).execute(
+            import_status_id=import_status_id,
+        )
+
+        print(f"Import #{import_status_id}: {bulk_import_summary.status}, {bulk_import_summary.percent}%")
+        for source in bulk_import_summary.sources:
+            print(
+                f"{source.url}: {source.size / MB:.1f} MB in {source.seconds:.1f} s, "
+                f"{source.bytes_per_second / MB:.2f} MB/s"
+            )
+
+    def handle(self, manifest: str, priority: int, summary: int, *args, **options):
+        if summary is not None:
+            self._print_summary(import_status_id=summary)
+            return
+
+        bulk_import_service = BulkImportCeleryService()
+
+        if manifest == "-":
+            bulk_import_plan = bulk_import_service.execute(sources=sys.stdin, priority=priority)
+        else:
+            with open(manifest) as file:
+                bulk_import_plan = bulk_import_service.execute(sources=file, priority=priority)
+
+        print(
+            f"{len(bulk_import_plan.sources)} sources in {bulk_import_plan.parts_count} parts, "
+            f"{len(bulk_import_plan.skipped)} already imported, {len(bulk_import_plan.unavailable)} unavailable"
+        )
+        if bulk_import_plan.import_status_id is not None:
+            print(f"Import #{bulk_import_plan.import_status_id}, "
+                  f"see the summary with --summary {bulk_import_plan.import_status_id}")
+
+        return
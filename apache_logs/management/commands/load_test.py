@@ -0,0 +1,159 @@
+import importlib.util
+import socket
+import subprocess
+import sys
+from time import monotonic, sleep
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apache_logs.entities import LoadTestReport
+from apache_logs.loadtest import LoadTest
+
+# gunicorn 20 has no __main__ module.
+GUNICORN = [sys.executable, "-c", "from gunicorn.app.wsgiapp import run; run()"]
+SERVERS = {
+    "sync": ["parsing_logs.wsgi:application", "--worker-class", "sync"],
+    "gthread": ["parsing_logs.wsgi:application", "--worker-class", "gthread"],
+    "asgi": ["parsing_logs.asgi:application", "--worker-class", "uvicorn.workers.UvicornWorker"],
+}
+# Not in requirements.txt, the server is skipped without it.
+SERVER_REQUIREMENTS = {"asgi": "uvicorn"}
+
+
+def _get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _sample_connections() -> Dict[str, int]:
+    # Every connection to the database but this one: the web workers, Celery and the running import.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COALESCE(state, 'unknown'), COUNT(*) FROM pg_stat_activity "
+            "WHERE datname = current_database() AND pid <> pg_backend_pid() GROUP BY 1"
+        )
+        return dict(cursor.fetchall())
+
+
+class Command(BaseCommand):
+    help = "Load tests the dashboard under gunicorn with sync and gthread workers and under the ASGI entry point."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--servers", action="store", nargs="+", choices=list(SERVERS), default=list(SERVERS))
+        parser.add_argument("--users", action="store", type=int, default=50)
+        parser.add_argument("--seconds", action="store", type=float, default=30.0)
+        parser.add_argument("--think-seconds", action="store", type=float, default=1.0)
+        parser.add_argument("--workers", action="store", type=int, default=4)
+        parser.add_argument("--threads", action="store", type=int, default=8)
+        parser.add_argument("--timeout", action="store", type=float, default=30.0)
+        # A log imported with `python -m apache_logs` while every server is tested.
+        parser.add_argument("--import", action="store", type=str, default=None, dest="import_url")
+
+    def _start_server(self, server: str, port: int, workers: int, threads: int) -> subprocess.Popen:
+        # gunicorn turns sync workers with more than one thread into gthread workers.
+        threads_options = ["--threads", str(threads)] if server == "gthread" else []
+
+        return subprocess.Popen(
+            [
+                *GUNICORN,
+                *SERVERS[server],
+                "--bind", f"127.0.0.1:{port}",
+                "--workers", str(workers),
+                *threads_options,
+                "--log-level", "warning",
+            ],
+            cwd=settings.BASE_DIR,
+        )
+
+    def _wait_for_server(self, process: subprocess.Popen, port: int, timeout: float = 30.0):
+        stop_at = monotonic() + timeout
+
+        while monotonic() < stop_at:
+            if process.poll() is not None:
+                raise RuntimeError(f"The server exited with {process.returncode}.")
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=1):
+                    return
+            except OSError:
+                sleep(0.2)
+
+        raise RuntimeError(f"The server did not listen on {port} within {timeout} s.")
+
+    def _stop(self, process: Optional[subprocess.Popen]):
+        if process is None or process.poll() is not None:
+            return
+
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def _print_report(self, server: str, report: LoadTestReport):
+        connections_by_state = ", ".join(
+            f"{state} {count}" for state, count in sorted(report.max_connections_by_state.items())
+        )
+        print(
+            f"{server}: {report.users} users for {report.seconds:.0f} s, database connections "
+            f"{report.average_connections:.1f} on average, {report.max_connections} at most ({connections_by_state})"
+        )
+        for endpoint in report.endpoints:
+            print(
+                f"    {endpoint.name}: {endpoint.requests_per_second:.1f} requests/s, "
+                f"{endpoint.errors_count} errors of {endpoint.requests_count}, "
+                f"p50 {endpoint.p50_seconds * 1000:.0f} ms, p95 {endpoint.p95_seconds * 1000:.0f} ms, "
+                f"p99 {endpoint.p99_seconds * 1000:.0f} ms, max {endpoint.max_seconds * 1000:.0f} ms"
+            )
+
+    def handle(
+        self,
+        servers: List[str],
+        users: int,
+        seconds: float,
+        think_seconds: float,
+        workers: int,
+        threads: int,
+        timeout: float,
+        import_url: Optional[str],
+        *args,
+        **options,
+    ):
+        for server in servers:
+            module_name = SERVER_REQUIREMENTS.get(server)
+            if module_name and importlib.util.find_spec(module_name) is None:
+                print(f"{server}: skipped, {module_name} is not installed")
+                continue
+
+            port = _get_free_port()
+            server_process = self._start_server(server=server, port=port, workers=workers, threads=threads)
+            import_process = None
+
+            try:
+                self._wait_for_server(process=server_process, port=port)
+                if import_url:
+                    import_process = subprocess.Popen(
+                        [sys.executable, "-m", "apache_logs", import_url],
+                        cwd=settings.BASE_DIR,
+                        stdout=subprocess.DEVNULL,
+                    )
+
+                load_test = LoadTest(
+                    host="127.0.0.1",
+                    port=port,
+                    users=users,
+                    seconds=seconds,
+                    think_seconds=think_seconds,
+                    timeout=timeout,
+                    sample_connections=_sample_connections,
+                )
+                report = load_test.execute()
+            finally:
+                self._stop(import_process)
+                self._stop(server_process)
+
+            self._print_report(server=server, report=report)
@@ -1,17 +1,46 @@
+import os
+
 from django.core.management.base import BaseCommand
 
-from apache_logs.services import ParseLogsCeleryService
+from apache_logs.chunking import MB
+from apache_logs.entities import LocalImportProgress
+from apache_logs.services import ParseLogsCeleryService, ParseLogsLocalService
 
 
 class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("url", action="store", type=str)
+        parser.add_argument("--priority", action="store", type=int, default=0)
+        # Imports in this process tree, without Redis and the workers; the url may be a local path.
+        parser.add_argument("--local", action="store_true")
+        parser.add_argument("--processes", action="store", type=int, default=os.cpu_count())
+
+    def _print_progress(self, local_import_progress: LocalImportProgress):
+        print(
+            f"Import #{local_import_progress.import_status_id}: {local_import_progress.status}, "
+            f"{local_import_progress.percent}%, {local_import_progress.imported_size / MB:.1f} of "
+            f"{local_import_progress.size / MB:.1f} MB in {local_import_progress.seconds:.1f} s, "
+            f"{local_import_progress.current_bytes_per_second / MB:.2f} MB/s "
+            f"({local_import_progress.bytes_per_second / MB:.2f} MB/s on average)"
+        )
+
+    def _handle_local(self, url: str, processes: int):
+        parse_logs_local_service = ParseLogsLocalService()
+
+        try:
+            parse_logs_local_service.execute(url=url, processes=processes, on_progress=self._print_progress)
+        except parse_logs_local_service.ParseLogsLocalValidationError:
+            print(f"'{url}' is not a valid URL or file!")
 
     def handle(self, url: str, *args, **options):
+        if options["local"]:
+            self._handle_local(url=url, processes=options["processes"])
+            return
+
         parse_logs_celery_service = ParseLogsCeleryService()
 
         try:
-            parse_logs_celery_service.execute(url=url)
+            parse_logs_celery_service.execute(url=url, priority=options["priority"])
         except parse_logs_celery_service.ParseLogsCeleryValidationError:
             print(f"'{url}' is not a valid URL!")
 
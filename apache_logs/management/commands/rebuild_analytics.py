@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apache_logs.workers import get_apache_logs_dao
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", action="store", type=int, default=100000)
+
+    def handle(self, chunk_size: int, *args, **options):
+        if not settings.ANALYTICS_PATH:
+            print("ANALYTICS_PATH is not set.")
+            return
+
+        rows_count = get_apache_logs_dao().rebuild(chunk_size=chunk_size)
+
+        print(f"{rows_count} logs copied to {settings.ANALYTICS_PATH}")
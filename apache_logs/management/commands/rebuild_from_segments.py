@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from apache_logs.usecases import RebuildFromSegmentsUseCase
+from apache_logs.workers import get_apache_logs_dao, get_segments_dao, get_geoip_dao
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument("--source", action="store", type=str, default=None)
+        parser.add_argument("--chunk-size", action="store", type=int, default=10000)
+
+    def handle(self, source: str, chunk_size: int, *args, **options):
+        segments_dao = get_segments_dao()
+        if segments_dao is None:
+            print("SEGMENTS_PATH is not set.")
+            return
+
+        rebuild_usecase = RebuildFromSegmentsUseCase(
+            logs_dao=get_apache_logs_dao(),
+            segments_dao=segments_dao,
+            chunk_size=chunk_size,
+            geoip_dao=get_geoip_dao(),
+        )
+
+        logs_count = rebuild_usecase.execute(source=source)
+
+        print(f"{logs_count} logs imported from segments")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from apache_logs.workers import get_saved_searches_dao, refresh_saved_searches
+
+
+class Command(BaseCommand):
+    help = "Saves search strings whose dashboard statistics are kept in a summary table, refreshed after imports."
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", action="store", type=str, choices=["add", "remove", "list", "refresh"])
+        parser.add_argument("query", action="store", type=str, nargs="?", default="")
+
+    def handle(self, action: str, query: str, *args, **options):
+        saved_searches_dao = get_saved_searches_dao()
+
+        if action in ("add", "remove") and not query:
+            print(f"A search string is needed to {action} a saved search.")
+            return
+
+        if action == "add":
+            saved_searches_dao.create_saved_search(query=query)
+            print(f"'{query}' saved, {refresh_saved_searches()} saved searches refreshed")
+        elif action == "remove":
+            if not saved_searches_dao.delete_saved_search(query=query):
+                print(f"'{query}' is not a saved search!")
+        elif action == "list":
+            for saved_search in saved_searches_dao.get_saved_searches():
+                refreshed_at = saved_search.refreshed_at.isoformat() if saved_search.refreshed_at else "never"
+                print(f"'{saved_search.query}': refreshed {refreshed_at}, data version {saved_search.data_version}")
+        else:
+            print(f"{refresh_saved_searches()} saved searches refreshed")
+
+        return
@@ -0,0 +1,22 @@
+import dataclasses
+import json
+
+from django.core.management.base import BaseCommand
+
+from apache_logs.usecases import GetSegmentStatisticsUseCase
+from apache_logs.workers import get_segments_dao
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument("--source", action="store", type=str, default=None)
+
+    def handle(self, source: str, *args, **options):
+        segments_dao = get_segments_dao()
+        if segments_dao is None:
+            print("SEGMENTS_PATH is not set.")
+            return
+
+        statistics = GetSegmentStatisticsUseCase(segments_dao=segments_dao).execute(source=source)
+
+        print(json.dumps(dataclasses.asdict(statistics), indent=2))
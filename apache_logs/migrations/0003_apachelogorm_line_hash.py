@@ -0,0 +1,52 @@
+# Generated by Django 3.1.5 on 2026-10-19 16:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # The unique index is built concurrently, so imports keep writing to the table meanwhile.
+    atomic = False
+
+    dependencies = [
+        ('apache_logs', '0002_importstatusorm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apachelogorm',
+            name='line_hash',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='apachelogorm',
+                    name='line_hash',
+                    field=models.BigIntegerField(null=True, unique=True),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    sql="""
+                        CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS apache_logs_apachelogorm_line_hash_key
+                        ON apache_logs_apachelogorm (line_hash);
+                    """,
+                    reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS apache_logs_apachelogorm_line_hash_key;",
+                ),
+                # Takes the index over without scanning the table, the name is the one Postgres
+                # gives an inline UNIQUE column.
+                migrations.RunSQL(
+                    sql="""
+                        ALTER TABLE apache_logs_apachelogorm
+                        ADD CONSTRAINT apache_logs_apachelogorm_line_hash_key
+                        UNIQUE USING INDEX apache_logs_apachelogorm_line_hash_key;
+                    """,
+                    reverse_sql="""
+                        ALTER TABLE apache_logs_apachelogorm
+                        DROP CONSTRAINT apache_logs_apachelogorm_line_hash_key;
+                    """,
+                ),
+            ],
+        ),
+    ]
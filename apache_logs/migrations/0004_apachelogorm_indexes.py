@@ -0,0 +1,33 @@
+# Generated by Django 3.1.5 on 2026-10-19 16:06
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('apache_logs', '0003_apachelogorm_line_hash'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='apachelogorm',
+            index=models.Index(fields=['ip_address'], name='apache_log_ip_address_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='apachelogorm',
+            index=models.Index(fields=['status_code'], name='apache_log_status_code_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='apachelogorm',
+            index=models.Index(fields=['method', 'ip_address', 'size'], name='apache_log_method_cover_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='apachelogorm',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['date'], name='apache_log_date_brin_idx'),
+        ),
+    ]
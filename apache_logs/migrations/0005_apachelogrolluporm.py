@@ -0,0 +1,58 @@
+# Generated by Django 3.1.5 on 2026-10-19 16:12
+
+from django.db import migrations, models, transaction
+
+BACKFILL_BATCH_SIZE = 100_000
+
+BACKFILL_ROLLUPS_SQL = """
+    INSERT INTO apache_logs_apachelogrolluporm AS rollup (minute, method, status_code, count, size)
+    SELECT date_trunc('minute', date AT TIME ZONE 'UTC') AT TIME ZONE 'UTC', method, status_code,
+           COUNT(*), COALESCE(SUM(size), 0)
+    FROM apache_logs_apachelogorm
+    WHERE id > %s AND id <= %s
+    GROUP BY 1, 2, 3
+    ON CONFLICT (minute, method, status_code) DO UPDATE
+    SET count = rollup.count + EXCLUDED.count, size = rollup.size + EXCLUDED.size
+"""
+
+
+def backfill_rollups(apps, schema_editor):
+    # Every batch of ids is committed on its own, so no transaction spans the whole table.
+    # Run with the import workers stopped, the rows they insert meanwhile would be missed or
+    # counted twice.
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM apache_logs_apachelogorm")
+        max_id, = cursor.fetchone()
+
+    for start in range(0, max_id, BACKFILL_BATCH_SIZE):
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(BACKFILL_ROLLUPS_SQL, [start, start + BACKFILL_BATCH_SIZE])
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('apache_logs', '0004_apachelogorm_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApacheLogRollupORM',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minute', models.DateTimeField()),
+                ('method', models.CharField(max_length=10)),
+                ('status_code', models.IntegerField()),
+                ('count', models.BigIntegerField(default=0)),
+                ('size', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='apachelogrolluporm',
+            constraint=models.UniqueConstraint(fields=('minute', 'method', 'status_code'), name='apache_log_rollup_unique'),
+        ),
+        migrations.RunPython(backfill_rollups, reverse_code=migrations.RunPython.noop),
+    ]
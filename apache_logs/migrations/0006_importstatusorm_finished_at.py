@@ -0,0 +1,18 @@
+# Generated by Django 3.1.5 on 2026-10-19 16:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apache_logs', '0005_apachelogrolluporm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importstatusorm',
+            name='finished_at',
+            field=models.DateTimeField(db_index=True, null=True),
+        ),
+    ]
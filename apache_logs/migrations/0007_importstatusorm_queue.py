@@ -0,0 +1,48 @@
+# Generated by Django 3.1.5 on 2026-10-19 16:23
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apache_logs', '0006_importstatusorm_finished_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importstatusorm',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='importstatusorm',
+            name='host',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='importstatusorm',
+            name='priority',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importstatusorm',
+            name='started_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='importstatusorm',
+            name='url',
+            field=models.TextField(default=''),
+        ),
+        migrations.AlterField(
+            model_name='importstatusorm',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('start', 'Start'), ('finish', 'Finish'), ('failed', 'Failed')], default='start', max_length=8),
+        ),
+        migrations.AddIndex(
+            model_name='importstatusorm',
+            index=models.Index(fields=['status', 'host'], name='import_status_status_host_idx'),
+        ),
+    ]
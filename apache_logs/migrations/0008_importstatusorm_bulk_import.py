@@ -0,0 +1,39 @@
+# Generated by Django 3.1.5 on 2026-10-19 16:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apache_logs', '0007_importstatusorm_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importstatusorm',
+            name='imported_size',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importstatusorm',
+            name='parent',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='parts', to='apache_logs.importstatusorm'),
+        ),
+        migrations.AddField(
+            model_name='importstatusorm',
+            name='report',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='importstatusorm',
+            name='size',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importstatusorm',
+            name='sources',
+            field=models.JSONField(default=list),
+        ),
+    ]
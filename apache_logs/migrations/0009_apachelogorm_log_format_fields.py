@@ -0,0 +1,28 @@
+# Generated by Django 3.1.5 on 2026-10-19 16:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apache_logs', '0008_importstatusorm_bulk_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apachelogorm',
+            name='referrer',
+            field=models.TextField(null=True),
+        ),
+        migrations.AddField(
+            model_name='apachelogorm',
+            name='response_time',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='apachelogorm',
+            name='user_agent',
+            field=models.TextField(null=True),
+        ),
+    ]
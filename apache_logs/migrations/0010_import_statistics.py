@@ -0,0 +1,31 @@
+# Generated by Django 3.1.5 on 2026-10-19 17:16
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('apache_logs', '0009_apachelogorm_log_format_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apachelogorm',
+            name='import_status',
+            field=models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='apache_logs.importstatusorm'),
+        ),
+        migrations.AddField(
+            model_name='importstatusorm',
+            name='statistics',
+            field=models.JSONField(null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='apachelogorm',
+            index=models.Index(fields=['import_status'], name='apache_log_import_status_idx'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 3.1.5 on 2026-10-19 17:20
+
+import apache_logs.models
+import django.contrib.postgres.indexes
+from django.db import migrations, models, transaction
+
+BACKFILL_BATCH_SIZE = 100_000
+
+BACKFILL_NETWORK_ROLLUPS_SQL = """
+    INSERT INTO apache_logs_apachelognetworkrolluporm AS rollup (day, network, country, asn, count, size)
+    SELECT date_trunc('day', date AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+           network(set_masklen(ip_address, CASE WHEN family(ip_address) = 4 THEN 24 ELSE 48 END)),
+           '', 0, COUNT(*), COALESCE(SUM(size), 0)
+    FROM apache_logs_apachelogorm
+    WHERE id > %s AND id <= %s
+    GROUP BY 1, 2
+    ON CONFLICT (day, network, country, asn) DO UPDATE
+    SET count = rollup.count + EXCLUDED.count, size = rollup.size + EXCLUDED.size
+"""
+
+
+def backfill_network_rollups(apps, schema_editor):
+    # Every batch of ids is committed on its own, so no transaction spans the whole table.
+    # Run with the import workers stopped, the rows they insert meanwhile would be missed or
+    # counted twice.
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM apache_logs_apachelogorm")
+        max_id, = cursor.fetchone()
+
+    for start in range(0, max_id, BACKFILL_BATCH_SIZE):
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(BACKFILL_NETWORK_ROLLUPS_SQL, [start, start + BACKFILL_BATCH_SIZE])
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('apache_logs', '0010_import_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApacheLogNetworkRollupORM',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateTimeField()),
+                ('network', apache_logs.models.CidrField()),
+                ('country', models.CharField(default='', max_length=2)),
+                ('asn', models.BigIntegerField(default=0)),
+                ('count', models.BigIntegerField(default=0)),
+                ('size', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='apachelogorm',
+            name='asn',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='apachelogorm',
+            name='country',
+            field=models.CharField(max_length=2, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='apachelognetworkrolluporm',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['network'], name='apache_log_network_gist_idx', opclasses=['inet_ops']),
+        ),
+        migrations.AddConstraint(
+            model_name='apachelognetworkrolluporm',
+            constraint=models.UniqueConstraint(fields=('day', 'network', 'country', 'asn'), name='apache_log_network_rollup_unique'),
+        ),
+        migrations.RunPython(backfill_network_rollups, reverse_code=migrations.RunPython.noop),
+        # Rollup rows are updated by every import batch, free space in their pages keeps updates HOT.
+        migrations.RunSQL(
+            sql="ALTER TABLE apache_logs_apachelognetworkrolluporm SET (fillfactor = 50);",
+            reverse_sql="ALTER TABLE apache_logs_apachelognetworkrolluporm RESET (fillfactor);",
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.1.5 on 2026-10-19 17:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apache_logs', '0011_network_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnomalyEventORM',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=8)),
+                ('key', models.CharField(max_length=512)),
+                ('reason', models.CharField(max_length=16)),
+                ('window_start', models.DateTimeField()),
+                ('window_seconds', models.IntegerField()),
+                ('count', models.BigIntegerField(default=0)),
+                ('error_count', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('import_status', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='apache_logs.importstatusorm')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='anomalyeventorm',
+            index=models.Index(fields=['window_start'], name='anomaly_event_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='anomalyeventorm',
+            index=models.Index(fields=['import_status'], name='anomaly_event_import_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='anomalyeventorm',
+            constraint=models.UniqueConstraint(fields=('kind', 'key', 'reason', 'window_start'), name='anomaly_event_unique'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.1.5 on 2026-10-19 19:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apache_logs', '0012_anomaly_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSearchORM',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.TextField(unique=True)),
+                ('statistics', models.JSONField(null=True)),
+                ('data_version', models.CharField(default='', max_length=64)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('refreshed_at', models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.1.5 on 2026-10-19 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apache_logs', '0013_saved_searches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersionORM',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
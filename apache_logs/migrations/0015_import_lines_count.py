@@ -0,0 +1,18 @@
+# Generated by Django 3.1.5 on 2026-10-19 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apache_logs', '0014_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importstatusorm',
+            name='lines_count',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.1.5 on 2026-10-19 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apache_logs', '0015_import_lines_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HostRateLimitORM',
+            fields=[
+                ('host', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('next_request_at', models.FloatField(default=0)),
+            ],
+        ),
+    ]
@@ -1,5 +1,16 @@
+from django.contrib.postgres.indexes import BrinIndex, GistIndex
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
+
+from apache_logs.constants import ANOMALY_KEY_LENGTH
+
+
+class CidrField(models.Field):
+    # Postgres cidr, a network address with its prefix length like 10.1.2.0/24.
+
+    def db_type(self, connection):
+        return "cidr"
 
 
 class ApacheLogORM(models.Model):
@@ -9,15 +20,146 @@ class ApacheLogORM(models.Model):
     uri = models.TextField()
     status_code = models.IntegerField()
     size = models.IntegerField()
+    referrer = models.TextField(null=True)
+    user_agent = models.TextField(null=True)
+    # Microseconds.
+    response_time = models.BigIntegerField(null=True)
+    line_hash = models.BigIntegerField(unique=True, null=True)
+    # Looked up in the offline GeoIP database during the import, None without one.
+    country = models.CharField(max_length=2, null=True)
+    asn = models.BigIntegerField(null=True)
+    # The import that inserted the row. Rows outlive their import statuses, which are deleted
+    # after IMPORT_STATUS_RETENTION_DAYS, so the id is not a database constraint and is kept as is.
+    import_status = models.ForeignKey(
+        "ImportStatusORM",
+        null=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name="+",
+    )
+
+    class Meta:
+        # Secondary indexes for the dashboard statistics, they can be dropped
+        # and rebuilt around big imports, see ApacheLogsDAO.drop_secondary_indexes.
+        indexes = [
+            models.Index(fields=["ip_address"], name="apache_log_ip_address_idx"),
+            models.Index(fields=["status_code"], name="apache_log_status_code_idx"),
+            # Covers GROUP BY method and the unique ip / size aggregates with an index-only scan.
+            models.Index(fields=["method", "ip_address", "size"], name="apache_log_method_cover_idx"),
+            # Rows are appended roughly in date order, a BRIN index is tiny and enough for range scans.
+            BrinIndex(fields=["date"], name="apache_log_date_brin_idx"),
+            # Statistics of a single import only read its rows.
+            models.Index(fields=["import_status"], name="apache_log_import_status_idx"),
+        ]
+
+
+class ApacheLogRollupORM(models.Model):
+    # Per-minute aggregates, maintained together with every insert into ApacheLogORM.
+    minute = models.DateTimeField()
+    method = models.CharField(max_length=10)
+    status_code = models.IntegerField()
+    count = models.BigIntegerField(default=0)
+    size = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["minute", "method", "status_code"], name="apache_log_rollup_unique"),
+        ]
+
+
+class ApacheLogNetworkRollupORM(models.Model):
+    # Per-day aggregates by /24 IPv4 and /48 IPv6 subnet, maintained together with every insert
+    # into ApacheLogORM. Unknown countries and autonomous systems are "" and 0. The table is created
+    # with fillfactor 50, so the counters are updated in place (HOT) instead of growing the indexes.
+    day = models.DateTimeField()
+    network = CidrField()
+    country = models.CharField(max_length=2, default="")
+    asn = models.BigIntegerField(default=0)
+    count = models.BigIntegerField(default=0)
+    size = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "network", "country", "asn"],
+                name="apache_log_network_rollup_unique",
+            ),
+        ]
+        indexes = [
+            # Answers "inside this subnet" (network <<= '10.0.0.0/8') without a scan.
+            GistIndex(fields=["network"], opclasses=["inet_ops"], name="apache_log_network_gist_idx"),
+        ]
+
+
+class AnomalyEventORM(models.Model):
+    # A window in which an ip address or uri went over a threshold, flagged by BurstDetector during an
+    # import. Parts of a bulk import add their counts to the same event.
+    kind = models.CharField(max_length=8)
+    key = models.CharField(max_length=ANOMALY_KEY_LENGTH)
+    reason = models.CharField(max_length=16)
+    window_start = models.DateTimeField()
+    window_seconds = models.IntegerField()
+    count = models.BigIntegerField(default=0)
+    error_count = models.BigIntegerField(default=0)
+    # The import that flagged the window first, see ApacheLogORM.import_status.
+    import_status = models.ForeignKey(
+        "ImportStatusORM",
+        null=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name="+",
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "key", "reason", "window_start"],
+                name="anomaly_event_unique",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["window_start"], name="anomaly_event_window_idx"),
+            models.Index(fields=["import_status"], name="anomaly_event_import_idx"),
+        ]
+
+
+class DataVersionORM(models.Model):
+    # A single row, bumped in the same transaction as every batch of logs inserted or deleted
+    # by ApacheLogsDAO, so readers that see the new rows also see the new version.
+    version = models.BigIntegerField(default=0)
+
+
+class HostRateLimitORM(models.Model):
+    # The next free request slot of a source host, as seconds since the epoch on the database clock.
+    # Shared by every import of the host, see HostRateLimitsDAO.reserve_request.
+    host = models.CharField(max_length=255, primary_key=True)
+    next_request_at = models.FloatField(default=0)
+
+
+class SavedSearchORM(models.Model):
+    # Summary table of the dashboard statistics of a registered search string, refreshed after imports.
+    # The statistics are only served while `data_version` is the current one, see ApacheLogsDAO.get_data_version.
+    query = models.TextField(unique=True)
+    statistics = models.JSONField(null=True)
+    data_version = models.CharField(max_length=64, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+    refreshed_at = models.DateTimeField(null=True)
 
 
 class ImportStatusORM(models.Model):
+    STATUS_QUEUED = "queued"
     STATUS_START = "start"
     STATUS_FINISH = "finish"
+    STATUS_FAILED = "failed"
 
     STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
         (STATUS_START, "Start"),
         (STATUS_FINISH, "Finish"),
+        (STATUS_FAILED, "Failed"),
     ]
 
     percent = models.IntegerField(default=1, validators=[
@@ -25,3 +167,25 @@ class ImportStatusORM(models.Model):
         MinValueValidator(1),
     ])
     status = models.CharField(choices=STATUS_CHOICES, max_length=8, default=STATUS_START)
+    url = models.TextField(default="")
+    host = models.CharField(max_length=255, default="")
+    priority = models.IntegerField(default=0)
+    # Bulk imports: one aggregate row, its parts are queued as separate jobs. A part imports
+    # `sources` (byte windows of files) and stores the time spent on every one in `report`.
+    parent = models.ForeignKey("self", null=True, on_delete=models.CASCADE, related_name="parts")
+    sources = models.JSONField(default=list)
+    report = models.JSONField(default=list)
+    size = models.BigIntegerField(default=0)
+    imported_size = models.BigIntegerField(default=0)
+    # Lines parsed by the import, also the ones that were skipped as already imported.
+    lines_count = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True, db_index=True)
+    # ImportStatistics of the rows inserted by the import, stored when it finishes.
+    statistics = models.JSONField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "host"], name="import_status_status_host_idx"),
+        ]
@@ -0,0 +1,56 @@
+import random
+from contextvars import ContextVar
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.utils import timezone
+
+from apache_logs.models import ImportStatusORM
+
+_read_database = ContextVar("read_database", default=None)
+
+
+class ReplicaRouter:
+    # Reads go to a replica only inside views wrapped with `read_from_replica`,
+    # everything else, including the importer, reads and writes the primary.
+
+    def db_for_read(self, model, **hints):
+        return _read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+def get_read_database() -> str:
+    if not settings.DATABASE_REPLICAS:
+        return "default"
+
+    # Replicas may lag behind an import that has just finished, read the primary for a while after it.
+    primary_reads_seconds = settings.DATABASE_PRIMARY_READS_AFTER_IMPORT_SECONDS
+    if primary_reads_seconds:
+        recently_finished = ImportStatusORM.objects.using("default").filter(
+            finished_at__gte=timezone.now() - timedelta(seconds=primary_reads_seconds),
+        )
+        if recently_finished.exists():
+            return "default"
+
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def read_from_replica(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _read_database.set(get_read_database())
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _read_database.reset(token)
+
+    return wrapper
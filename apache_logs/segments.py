@@ -0,0 +1,308 @@
+import ipaddress
+import mmap
+import os
+import struct
+from array import array
+from itertools import accumulate
+from datetime import datetime, timezone, timedelta
+from typing import List, Optional, Iterator, Dict, Tuple
+
+from apache_logs.constants import HTTP_METHODS
+from apache_logs.entities import ApacheLog, LogSegment
+
+# A segment is a directory of column files written once. Fixed-width columns are arrays in
+# native byte order, strings are kept in a heap file with rows + 1 offsets into it, and the
+# header holds the row count, the date range and the source the rows were parsed from, so
+# segments can be picked without opening their columns.
+SEGMENT_MAGIC = b"LOGSEG01"
+SEGMENT_HEADER = struct.Struct("<8sQqq")
+
+# column: array type code
+FIXED_COLUMNS = {
+    # Microseconds since the epoch, UTC.
+    "date": "q",
+    # Seconds, the offset the date was logged with takes part in the log hash.
+    "utc_offset": "i",
+    # Index in HTTP_METHODS.
+    "method": "B",
+    "status_code": "H",
+    "size": "q",
+    # Microseconds, -1 when the log format has none.
+    "response_time": "q",
+    # 4 or 6, IPv4 addresses are stored IPv4-mapped in the ip_address column.
+    "ip_version": "B",
+    # Number of the line among identical lines of the same second, it takes part in the log hash.
+    "occurrence": "I",
+}
+# Columns added later, segments written before have no file for them.
+OPTIONAL_COLUMNS = {"occurrence": 0}
+# 16 bytes per row.
+IP_ADDRESS_SIZE = 16
+# column: nullable
+HEAP_COLUMNS = {
+    "uri": False,
+    "referrer": True,
+    "user_agent": True,
+}
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+METHOD_INDEXES = {method: index for index, method in enumerate(HTTP_METHODS)}
+
+
+class SegmentFormatError(Exception):
+    pass
+
+
+def _to_microseconds(date: datetime) -> int:
+    return (date - EPOCH) // timedelta(microseconds=1)
+
+
+def _to_date(microseconds: int, utc_offset: int) -> datetime:
+    return (EPOCH + timedelta(microseconds=microseconds)).astimezone(timezone(timedelta(seconds=utc_offset)))
+
+
+def _pack_ip_address(ip_address: str) -> Tuple[int, bytes]:
+    address = ipaddress.ip_address(ip_address)
+    if address.version == 4:
+        return 4, b"\0" * 10 + b"\xff\xff" + address.packed
+
+    return 6, address.packed
+
+
+def unpack_ip_address(version: int, packed: bytes) -> str:
+    if version == 4:
+        return str(ipaddress.IPv4Address(packed[12:]))
+
+    return str(ipaddress.IPv6Address(packed))
+
+
+def read_segment_header(path: str) -> LogSegment:
+    with open(os.path.join(path, "header"), "rb") as header_file:
+        header = header_file.read()
+
+    if len(header) < SEGMENT_HEADER.size:
+        raise SegmentFormatError(f"{path} segment header is truncated.")
+
+    magic, rows, min_date, max_date = SEGMENT_HEADER.unpack_from(header)
+    if magic != SEGMENT_MAGIC:
+        raise SegmentFormatError(f"{path} is not a log segment.")
+
+    return LogSegment(
+        path=path,
+        source=header[SEGMENT_HEADER.size:].decode("utf-8"),
+        rows=rows,
+        min_date=EPOCH + timedelta(microseconds=min_date),
+        max_date=EPOCH + timedelta(microseconds=max_date),
+    )
+
+
+def _get_heap(values: List[Optional[str]]) -> Tuple[bytes, array]:
+    values = [value or "" for value in values]
+    text = "".join(values)
+
+    # Characters are bytes in ASCII text, the usual case for log fields.
+    if text.isascii():
+        heap, lengths = text.encode("ascii"), map(len, values)
+    else:
+        encoded_values = [value.encode("utf-8") for value in values]
+        heap, lengths = b"".join(encoded_values), map(len, encoded_values)
+
+    offsets = array("Q", [0])
+    offsets.extend(accumulate(lengths))
+
+    return heap, offsets
+
+
+def write_segment(path: str, apache_logs: List[ApacheLog], source: str = "") -> LogSegment:
+    # `path` must not exist yet. Empty segments are not written.
+    if not apache_logs:
+        raise SegmentFormatError("A segment needs at least one log.")
+
+    # Parsed logs share date and ip address values, each distinct one is converted once.
+    dates = [log.date for log in apache_logs]
+    converted_dates = {date: (_to_microseconds(date), int(date.utcoffset().total_seconds())) for date in set(dates)}
+    ip_addresses = [log.ip_address for log in apache_logs]
+    packed_ip_addresses = {ip_address: _pack_ip_address(ip_address) for ip_address in set(ip_addresses)}
+
+    columns = {
+        "date": [converted_dates[date][0] for date in dates],
+        "utc_offset": [converted_dates[date][1] for date in dates],
+        "method": [METHOD_INDEXES[log.method] for log in apache_logs],
+        "status_code": [log.status_code for log in apache_logs],
+        "size": [log.size for log in apache_logs],
+        "response_time": [-1 if log.response_time is None else log.response_time for log in apache_logs],
+        "ip_version": [packed_ip_addresses[ip_address][0] for ip_address in ip_addresses],
+        "occurrence": [log.occurrence for log in apache_logs],
+    }
+    heaps = {
+        "uri": [log.uri for log in apache_logs],
+        "referrer": [log.referrer for log in apache_logs],
+        "user_agent": [log.user_agent for log in apache_logs],
+    }
+
+    os.makedirs(path)
+
+    for name, type_code in FIXED_COLUMNS.items():
+        with open(os.path.join(path, name), "wb") as column_file:
+            array(type_code, columns[name]).tofile(column_file)
+
+    with open(os.path.join(path, "ip_address"), "wb") as column_file:
+        column_file.write(b"".join(packed_ip_addresses[ip_address][1] for ip_address in ip_addresses))
+
+    for name, nullable in HEAP_COLUMNS.items():
+        heap, offsets = _get_heap(heaps[name])
+        with open(os.path.join(path, f"{name}.heap"), "wb") as heap_file:
+            heap_file.write(heap)
+        with open(os.path.join(path, f"{name}.offsets"), "wb") as offsets_file:
+            offsets.tofile(offsets_file)
+
+        if nullable:
+            with open(os.path.join(path, f"{name}.nulls"), "wb") as nulls_file:
+                nulls_file.write(bytes(value is None for value in heaps[name]))
+
+    # The header goes last, a directory without it is an unfinished segment.
+    with open(os.path.join(path, "header"), "wb") as header_file:
+        header_file.write(SEGMENT_HEADER.pack(
+            SEGMENT_MAGIC, len(apache_logs), min(columns["date"]), max(columns["date"]),
+        ))
+        header_file.write(source.encode("utf-8"))
+
+    return read_segment_header(path)
+
+
+class LogSegmentReader:
+    # Maps the column files of a segment read-only. Columns are memoryviews into the page
+    # cache, nothing is copied or parsed until a value is read. Use as a context manager,
+    # views handed out must not be used after it is closed.
+
+    def __init__(self, path: str):
+        self.segment = read_segment_header(path)
+        self.path = path
+        self._maps = []
+        self._views = []
+        self.columns: Dict[str, memoryview] = {}
+
+        for name, type_code in FIXED_COLUMNS.items():
+            if name in OPTIONAL_COLUMNS and not os.path.exists(os.path.join(path, name)):
+                self.columns[name] = memoryview(array(type_code, [OPTIONAL_COLUMNS[name]]) * self.segment.rows)
+            else:
+                self.columns[name] = self._map(name, type_code)
+        self.columns["ip_address"] = self._map("ip_address")
+        for name, nullable in HEAP_COLUMNS.items():
+            self.columns[f"{name}.offsets"] = self._map(f"{name}.offsets", "Q")
+            self.columns[f"{name}.heap"] = self._map(f"{name}.heap")
+            if nullable:
+                self.columns[f"{name}.nulls"] = self._map(f"{name}.nulls")
+
+        if any(len(self.columns[name]) != self.segment.rows for name in FIXED_COLUMNS):
+            self.close()
+            raise SegmentFormatError(f"{path} segment columns do not match its header.")
+
+    def _map(self, name: str, type_code: Optional[str] = None) -> memoryview:
+        with open(os.path.join(self.path, name), "rb") as column_file:
+            if os.fstat(column_file.fileno()).st_size == 0:
+                view = memoryview(b"")
+            else:
+                mapped = mmap.mmap(column_file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps.append(mapped)
+                view = memoryview(mapped)
+
+        self._views.append(view)
+        if type_code is not None:
+            view = view.cast(type_code)
+            self._views.append(view)
+
+        return view
+
+    def __len__(self) -> int:
+        return self.segment.rows
+
+    def __enter__(self) -> "LogSegmentReader":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        for mapped in self._maps:
+            mapped.close()
+        self._views = []
+        self._maps = []
+        self.columns = {}
+
+    def get_strings(self, name: str, start: int, stop: int) -> List[Optional[str]]:
+        offsets = self.columns[f"{name}.offsets"][start:stop + 1]
+        if HEAP_COLUMNS[name]:
+            nulls = bytes(self.columns[f"{name}.nulls"][start:stop])
+            if 0 not in nulls:
+                return [None] * (stop - start)
+        else:
+            nulls = None
+
+        heap = bytes(self.columns[f"{name}.heap"][offsets[0]:offsets[-1]])
+        first_offset = offsets[0]
+        # Byte offsets are character offsets in ASCII text, the usual case for log fields.
+        text = heap.decode("ascii") if heap.isascii() else None
+        strings = []
+        for index in range(stop - start):
+            if nulls is not None and nulls[index]:
+                strings.append(None)
+            elif text is not None:
+                strings.append(text[offsets[index] - first_offset:offsets[index + 1] - first_offset])
+            else:
+                strings.append(str(heap[offsets[index] - first_offset:offsets[index + 1] - first_offset], "utf-8"))
+
+        return strings
+
+    def iterate_logs(self, chunk_size: int) -> Iterator[List[ApacheLog]]:
+        # Column by column for every chunk, dates and ip addresses repeat a lot, each
+        # distinct value is converted once.
+        dates = {}
+        ip_addresses = {}
+        columns = self.columns
+
+        for start in range(0, self.segment.rows, chunk_size):
+            stop = min(start + chunk_size, self.segment.rows)
+
+            chunk_dates = list(zip(columns["date"][start:stop], columns["utc_offset"][start:stop]))
+            for date in set(chunk_dates).difference(dates):
+                dates[date] = _to_date(*date)
+
+            packed_ip_addresses = bytes(columns["ip_address"][start * IP_ADDRESS_SIZE:stop * IP_ADDRESS_SIZE])
+            chunk_ip_addresses = list(zip(
+                columns["ip_version"][start:stop],
+                (packed_ip_addresses[offset:offset + IP_ADDRESS_SIZE]
+                 for offset in range(0, len(packed_ip_addresses), IP_ADDRESS_SIZE)),
+            ))
+            for ip_address in set(chunk_ip_addresses).difference(ip_addresses):
+                ip_addresses[ip_address] = unpack_ip_address(*ip_address)
+
+            yield [
+                ApacheLog(
+                    ip_address=ip_address,
+                    date=date,
+                    method=method,
+                    uri=uri,
+                    status_code=status_code,
+                    size=size,
+                    referrer=referrer,
+                    user_agent=user_agent,
+                    response_time=None if response_time < 0 else response_time,
+                    occurrence=occurrence,
+                ) for (
+                    ip_address, date, method, uri, status_code, size, referrer, user_agent, response_time, occurrence,
+                ) in zip(
+                    map(ip_addresses.__getitem__, chunk_ip_addresses),
+                    map(dates.__getitem__, chunk_dates),
+                    map(HTTP_METHODS.__getitem__, columns["method"][start:stop]),
+                    self.get_strings("uri", start, stop),
+                    columns["status_code"][start:stop],
+                    columns["size"][start:stop],
+                    self.get_strings("referrer", start, stop),
+                    self.get_strings("user_agent", start, stop),
+                    columns["response_time"][start:stop],
+                    columns["occurrence"][start:stop],
+                )
+            ]
@@ -1,14 +1,32 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Callable, Any, Optional
+from urllib.parse import urlparse
+
+import django
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import URLValidator
 
-from apache_logs.tasks import parse_logs_task
+from apache_logs.daos import ImportStatusDAO, RequestDAO, SourceRequestDAO, FileRequestDAO
+from apache_logs.entities import ImportJob, BulkImportPlan, LocalImportProgress
+from apache_logs.usecases import BulkImportUseCase, LocalImportUseCase
+from apache_logs.workers import import_part, refresh_saved_searches
+
+
+def _schedule_imports():
+    # Sent by name, so queueing an import loads only the Celery client, not apache_logs.tasks with the workers.
+    from parsing_logs.celery import celery_app
+
+    celery_app.send_task("apache_logs.tasks.schedule_imports_task")
 
 
 class ParseLogsCeleryService:
     class ParseLogsCeleryValidationError(Exception):
         pass
 
-    def execute(self, url):
+    def execute(self, url, priority: int = 0) -> ImportJob:
         url_validator = URLValidator()
 
         try:
@@ -16,4 +34,81 @@ class ParseLogsCeleryService:
         except ValidationError:
             raise self.ParseLogsCeleryValidationError
 
-        parse_logs_task.delay(url)
+        import_job = ImportStatusDAO().create_import_job(url=url, host=urlparse(url).hostname, priority=priority)
+        _schedule_imports()
+
+        return import_job
+
+
+class BulkImportCeleryService:
+    def _get_source(self, source: str) -> str:
+        # Local paths are resolved here, workers may run in another directory.
+        source = source.strip()
+        if not source or source.startswith("#") or "://" in source:
+            return source
+
+        return os.path.abspath(source)
+
+    def execute(self, sources: Iterable[str], priority: int = 0) -> BulkImportPlan:
+        bulk_import_usecase = BulkImportUseCase(
+            import_status_dao=ImportStatusDAO(),
+            request_dao=SourceRequestDAO(http_dao=RequestDAO(), file_dao=FileRequestDAO()),
+            pack_size=settings.IMPORT_PACK_SIZE,
+            split_size=settings.IMPORT_SPLIT_SIZE,
+        )
+
+        bulk_import_plan = bulk_import_usecase.execute(
+            sources=(self._get_source(source) for source in sources),
+            priority=priority,
+        )
+        if bulk_import_plan.import_status_id is not None:
+            _schedule_imports()
+
+        return bulk_import_plan
+
+
+class ParseLogsLocalService:
+    # Runs the import in this process tree instead of sending it to the workers, for backfills on the DB host.
+
+    class ParseLogsLocalValidationError(Exception):
+        pass
+
+    def _validate(self, url: str):
+        if url.startswith(("http://", "https://")):
+            try:
+                URLValidator()(url)
+            except ValidationError:
+                raise self.ParseLogsLocalValidationError
+        elif not os.path.isfile(url[len("file://"):] if url.startswith("file://") else url):
+            raise self.ParseLogsLocalValidationError
+
+    def execute(
+        self,
+        url: str,
+        processes: int,
+        on_progress: Optional[Callable[[LocalImportProgress], Any]] = None,
+    ) -> LocalImportProgress:
+        self._validate(url=url)
+
+        # Spawned rather than forked, a forked process would share the open database connection of this one.
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        ) as executor:
+            local_import_usecase = LocalImportUseCase(
+                import_status_dao=ImportStatusDAO(),
+                request_dao=SourceRequestDAO(http_dao=RequestDAO(), file_dao=FileRequestDAO()),
+                executor=executor,
+                import_part=import_part,
+                parts_count=processes,
+                min_part_size=settings.IMPORT_PACK_SIZE,
+                progress_seconds=settings.PARSE_LOGS_LOCAL_PROGRESS_SECONDS,
+                on_progress=on_progress,
+            )
+
+            local_import_progress = local_import_usecase.execute(url=url)
+
+        refresh_saved_searches()
+
+        return local_import_progress
@@ -1,17 +1,123 @@
-from apache_logs.daos import ApacheLogsDAO, RequestDAO, ImportStatusDAO
-from apache_logs.usecases import ParseLogsUseCase
+from typing import Optional
+
+from celery.signals import worker_process_init, task_prerun, task_postrun
+from django.conf import settings
+from django.utils import timezone
+
+from apache_logs.entities import ImportJob
+from apache_logs.usecases import ParseLogsUseCase, AsyncParseLogsUseCase, RetentionUseCase, ScheduleImportsUseCase
+from apache_logs.workers import get_apache_logs_dao, get_request_dao, get_import_status_dao, get_segments_dao, \
+    get_parse_logs_options, import_part, refresh_saved_searches, reset_worker_state, check_connections, \
+    release_connections, close_connections
 from parsing_logs.celery import celery_app
 
+# Worker processes rebuild the singletons of apache_logs.workers after the fork and check
+# their database connections around every task.
+worker_process_init.connect(reset_worker_state)
+task_prerun.connect(check_connections)
+task_postrun.connect(release_connections)
+
+
+@celery_app.task
+def parse_logs_task(url: str, import_status_id: Optional[int] = None):
+    parse_logs_dao = get_apache_logs_dao()
+    request_dao = get_request_dao()
+    import_status_dao = get_import_status_dao()
+
+    if settings.PARSE_LOGS_ASYNC:
+        parse_logs_service = AsyncParseLogsUseCase(
+            logs_dao=parse_logs_dao,
+            request_dao=request_dao,
+            import_status_dao=import_status_dao,
+            queue_size=settings.PARSE_LOGS_QUEUE_SIZE,
+            close_connection=close_connections,
+            **get_parse_logs_options(),
+        )
+    else:
+        parse_logs_service = ParseLogsUseCase(
+            logs_dao=parse_logs_dao,
+            request_dao=request_dao,
+            import_status_dao=import_status_dao,
+            **get_parse_logs_options(),
+        )
+
+    try:
+        parse_logs_service.execute(url=url, import_status_id=import_status_id)
+    finally:
+        # A slot is free again, start the next queued import.
+        schedule_imports_task.delay()
+
+    refresh_saved_searches_task.delay()
+
+
+@celery_app.task
+def import_part_task(import_status_id: int):
+    try:
+        import_part(import_status_id=import_status_id)
+    finally:
+        schedule_imports_task.delay()
+
+    # Saved searches are refreshed once, when the last part has finished the bulk import.
+    parent = get_import_status_dao().get_parent_import_status(import_status_id=import_status_id)
+    if parent is not None and parent.status == "finish":
+        refresh_saved_searches_task.delay()
+
+
+def _start_import(import_job: ImportJob):
+    if import_job.sources:
+        import_part_task.delay(import_job.pk)
+    else:
+        parse_logs_task.delay(import_job.url, import_job.pk)
+
 
 @celery_app.task
-def parse_logs_task(url: str):
-    parse_logs_dao = ApacheLogsDAO()
-    request_dao = RequestDAO()
-    import_status_dao = ImportStatusDAO()
-    parse_logs_service = ParseLogsUseCase(
-        logs_dao=parse_logs_dao,
-        request_dao=request_dao,
-        import_status_dao=import_status_dao,
+def schedule_imports_task():
+    schedule_imports_usecase = ScheduleImportsUseCase(
+        import_status_dao=get_import_status_dao(),
+        start_import=_start_import,
+        max_concurrent=settings.IMPORT_MAX_CONCURRENT,
+        max_concurrent_per_host=settings.IMPORT_MAX_CONCURRENT_PER_HOST,
     )
 
-    parse_logs_service.execute(url=url)
+    import_jobs = schedule_imports_usecase.execute()
+
+    return [import_job.pk for import_job in import_jobs]
+
+
+@celery_app.task
+def retention_task():
+    retention_usecase = RetentionUseCase(
+        logs_dao=get_apache_logs_dao(),
+        import_status_dao=get_import_status_dao(),
+        log_days=settings.RETENTION_LOG_DAYS,
+        import_status_days=settings.RETENTION_IMPORT_STATUS_DAYS,
+        batch_size=settings.RETENTION_BATCH_SIZE,
+        pause_seconds=settings.RETENTION_PAUSE_SECONDS,
+        segments_dao=get_segments_dao(),
+    )
+
+    retention_report = retention_usecase.execute(now=timezone.now())
+    refresh_saved_searches_task.delay()
+
+    print(
+        f"Retention: {retention_report.logs_deleted} logs, "
+        f"{retention_report.segment_logs_deleted} segment logs and "
+        f"{retention_report.import_statuses_deleted} import statuses deleted "
+        f"in {retention_report.seconds:.2f} seconds"
+    )
+
+    return {
+        "logs_deleted": retention_report.logs_deleted,
+        "import_statuses_deleted": retention_report.import_statuses_deleted,
+        "segment_logs_deleted": retention_report.segment_logs_deleted,
+        "seconds": retention_report.seconds,
+    }
+
+
+@celery_app.task
+def refresh_saved_searches_task():
+    refreshed_count = refresh_saved_searches()
+
+    print(f"Saved searches: {refreshed_count} refreshed")
+
+    return refreshed_count
@@ -0,0 +1,207 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone, timedelta
+from unittest import TestCase, skipUnless
+
+from django.test import TransactionTestCase
+
+from apache_logs.analytics import ColumnarLogStore
+from apache_logs.daos import ApacheLogsDAO, AnalyticsApacheLogsDAO
+from apache_logs.entities import ApacheLog
+
+ANALYTICS_INSTALLED = importlib.util.find_spec("duckdb") and importlib.util.find_spec("pyarrow")
+
+
+def _get_row(log_id: int, minutes: int = 0, ip_address: str = "127.0.0.1", status_code: int = 200):
+    date = datetime(2020, 12, 19, 10, tzinfo=timezone.utc) + timedelta(minutes=minutes)
+    return log_id, ip_address, date, "GET", f"/{log_id}", status_code, 10
+
+
+@skipUnless(ANALYTICS_INSTALLED, "duckdb or pyarrow is not installed")
+class ColumnarLogStoreTestCase(TestCase):
+    def setUp(self) -> None:
+        self.path = tempfile.mkdtemp()
+        self.store = ColumnarLogStore(path=self.path, threads=2, compact_segments=3, segment_rows=100)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.path)
+
+    def _get_ids(self):
+        with self.store.connect() as connection:
+            return [log_id for log_id, in connection.execute("SELECT id FROM logs ORDER BY id").fetchall()]
+
+    def _get_segments(self):
+        return [name for name in os.listdir(self.path) if name.endswith(".parquet")]
+
+    def test_append(self):
+        self.assertFalse(self.store.has_segments())
+
+        self.store.append([_get_row(1), _get_row(2)])
+        self.store.append([])
+        self.store.append([_get_row(3)])
+
+        self.assertTrue(self.store.has_segments())
+        self.assertEqual(self._get_ids(), [1, 2, 3])
+        self.assertEqual(len(self._get_segments()), 2)
+        with self.store.connect() as connection:
+            self.assertEqual(
+                connection.execute("SELECT * FROM logs WHERE id = 2").fetchone(),
+                _get_row(2),
+            )
+
+    def test_compact(self):
+        for log_id in range(1, 4):
+            self.store.append([_get_row(log_id)])
+
+        segments = self._get_segments()
+        self.assertEqual(len(segments), 1)
+        self.assertTrue(segments[0].startswith("000000000003-"))
+        self.assertEqual(self._get_ids(), [1, 2, 3])
+
+    def test_compact_skips_big_segments(self):
+        self.store.append([_get_row(log_id) for log_id in range(100)])
+        self.store.append([_get_row(100)])
+        self.store.append([_get_row(101)])
+
+        self.assertEqual(self.store.compact(), 0)
+        self.assertEqual(len(self._get_segments()), 3)
+
+    def test_compact_while_locked(self):
+        self.store.append([_get_row(1)])
+        self.store.append([_get_row(2)])
+
+        with self.store.connect():
+            self.store.append([_get_row(3)])
+
+        self.assertEqual(len(self._get_segments()), 3)
+        self.assertEqual(self.store.compact(), 3)
+        self.assertEqual(self._get_ids(), [1, 2, 3])
+
+    def test_delete_before(self):
+        self.store.compact_segments = 10
+        self.store.append([_get_row(1, minutes=0), _get_row(2, minutes=10)])
+        self.store.append([_get_row(3, minutes=0)])
+        self.store.append([_get_row(4, minutes=20)])
+
+        deleted = self.store.delete_before(datetime(2020, 12, 19, 10, 5, tzinfo=timezone.utc))
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(self._get_ids(), [2, 4])
+        self.assertEqual(len(self._get_segments()), 2)
+
+    def test_clear(self):
+        self.store.append([_get_row(1)])
+
+        self.store.clear()
+
+        self.assertFalse(self.store.has_segments())
+
+
+@skipUnless(ANALYTICS_INSTALLED, "duckdb or pyarrow is not installed")
+class AnalyticsApacheLogsDAOTestCase(TransactionTestCase):
+    def setUp(self) -> None:
+        self.path = tempfile.mkdtemp()
+        self.logs_dao = ApacheLogsDAO()
+        self.dao = AnalyticsApacheLogsDAO(logs_dao=self.logs_dao, store=ColumnarLogStore(path=self.path))
+        self.apache_logs = [
+            ApacheLog(
+                ip_address=ip_address,
+                date=datetime(2020, 12, 19, 10, minute, tzinfo=timezone.utc),
+                method=method,
+                uri=uri,
+                status_code=status_code,
+                size=size,
+            ) for ip_address, minute, method, uri, status_code, size in [
+                ("127.0.0.1", 0, "GET", "/index.html", 200, 100),
+                ("127.0.0.1", 1, "POST", "/login", 302, 0),
+                ("127.0.0.1", 59, "GET", "/missing", 404, 20),
+                ("10.0.0.1", 2, "GET", "/index.html", 200, 100),
+                ("10.0.0.1", 30, "GET", "/api", 500, 5),
+                ("192.168.0.1", 3, "DELETE", "/api", 204, 0),
+            ]
+        ]
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.path)
+
+    def _assert_same_statistics(self, query: str):
+        self.assertEqual(self.dao.get_count_unique_ip_addresses(query=query),
+                         self.logs_dao.get_count_unique_ip_addresses(query=query))
+        # Addresses with the same count come in any order.
+        self.assertEqual(sorted(self.dao.get_top_ip_addresses(addresses_count=10, query=query), key=str),
+                         sorted(self.logs_dao.get_top_ip_addresses(addresses_count=10, query=query), key=str))
+        self.assertEqual(sorted(self.dao.get_http_methods_count(query=query), key=str),
+                         sorted(self.logs_dao.get_http_methods_count(query=query), key=str))
+        self.assertEqual(self.dao.get_sum_sizes(query=query), self.logs_dao.get_sum_sizes(query=query))
+
+        for interval in ("minute", "hour"):
+            self.assertEqual(
+                self.dao.get_time_buckets(interval=interval, date_from=None, date_to=None, query=query),
+                self.logs_dao.get_time_buckets(interval=interval, date_from=None, date_to=None, query=query),
+            )
+        self.assertEqual(
+            self.dao.get_status_codes_count(date_from=None, date_to=None, query=query),
+            self.logs_dao.get_status_codes_count(date_from=None, date_to=None, query=query),
+        )
+
+    def test_statistics(self):
+        self.dao.create_apache_logs(apache_logs=self.apache_logs)
+
+        self.assertTrue(self.dao.store.has_segments())
+        for query in ("", "127.0.0.1", "api", "get", "10:30", "nothing"):
+            self._assert_same_statistics(query=query)
+
+    def test_statistics_date_range(self):
+        self.dao.create_apache_logs(apache_logs=self.apache_logs)
+        date_from = datetime(2020, 12, 19, 10, 2, tzinfo=timezone.utc)
+        date_to = datetime(2020, 12, 19, 10, 31, tzinfo=timezone.utc)
+
+        self.assertEqual(
+            self.dao.get_time_buckets(interval="minute", date_from=date_from, date_to=date_to, query="0"),
+            self.logs_dao.get_time_buckets(interval="minute", date_from=date_from, date_to=date_to, query="0"),
+        )
+        self.assertEqual(
+            self.dao.get_status_codes_count(date_from=date_from, date_to=date_to, query="0"),
+            self.logs_dao.get_status_codes_count(date_from=date_from, date_to=date_to, query="0"),
+        )
+
+    def test_duplicates_are_not_appended(self):
+        self.dao.create_apache_logs(apache_logs=self.apache_logs)
+        self.dao.create_apache_logs(apache_logs=self.apache_logs)
+
+        self.assertEqual(self.dao.get_sum_sizes(query=""), 225)
+        self.assertEqual(self.dao.get_top_ip_addresses(addresses_count=1, query="")[0].count, 3)
+
+    def test_without_segments(self):
+        self.logs_dao.create_apache_logs(apache_logs=self.apache_logs)
+
+        self.assertFalse(self.dao.store.has_segments())
+        self.assertEqual(self.dao.get_sum_sizes(query=""), 225)
+        self.assertEqual(self.dao.get_count_unique_ip_addresses(query=""), 3)
+
+    def test_rebuild(self):
+        self.logs_dao.create_apache_logs(apache_logs=self.apache_logs)
+        self.dao.store.append([_get_row(1000)])
+
+        rows_count = self.dao.rebuild(chunk_size=4)
+
+        self.assertEqual(rows_count, 6)
+        self._assert_same_statistics(query="")
+
+    def test_delete_logs_before(self):
+        self.dao.create_apache_logs(apache_logs=self.apache_logs)
+
+        deleted = self.dao.delete_logs_before(
+            date=datetime(2020, 12, 19, 10, 3, tzinfo=timezone.utc),
+            batch_size=100,
+        )
+        analytics_deleted = self.dao.delete_analytics_logs_before(
+            date=datetime(2020, 12, 19, 10, 3, tzinfo=timezone.utc),
+        )
+
+        self.assertEqual((deleted, analytics_deleted), (3, 3))
+        self._assert_same_statistics(query="")
+        self.assertEqual(self.dao.get_count_unique_ip_addresses(query=""), 3)
+        self.assertEqual(self.dao.get_sum_sizes(query=""), 25)
@@ -0,0 +1,139 @@
+from datetime import datetime, timezone, timedelta
+from unittest import TestCase
+
+from apache_logs.anomalies import BurstDetector
+from apache_logs.entities import ApacheLog, AnomalyEvent, AnomalyThresholds
+
+START = datetime(2021, 1, 1, 10, tzinfo=timezone.utc)
+
+
+def _get_logs(seconds: float, count: int = 1, ip_address: str = "10.0.0.1", uri: str = "/", status_code: int = 200):
+    return [
+        ApacheLog(
+            ip_address=ip_address,
+            date=START + timedelta(seconds=seconds),
+            method="GET",
+            uri=uri,
+            status_code=status_code,
+            size=10,
+        ) for _ in range(count)
+    ]
+
+
+class BurstDetectorTestCase(TestCase):
+    def setUp(self) -> None:
+        self.detector = BurstDetector(AnomalyThresholds(
+            window_seconds=60,
+            max_ip_requests=10,
+            max_uri_requests=0,
+            max_error_ratio=0.5,
+            min_requests=4,
+        ))
+
+    def test_rate(self):
+        events = self.detector.observe(_get_logs(0, count=8) + _get_logs(30, count=4) + _get_logs(30, ip_address="a"))
+
+        self.assertEqual(events, [])
+        self.assertEqual(self.detector.observe(_get_logs(119)), [AnomalyEvent(
+            kind="ip",
+            key="10.0.0.1",
+            reason="rate",
+            window_start=START,
+            window_seconds=60,
+            count=12,
+            error_count=0,
+        )])
+        self.assertEqual(self.detector.flush(), [])
+
+    def test_rate_below_threshold(self):
+        self.detector.observe(_get_logs(0, count=10))
+
+        self.assertEqual(self.detector.flush(), [])
+
+    def test_sliding_window(self):
+        # 8 requests at the end of a window and 8 at the start of the next one are 16 in the sliding window.
+        self.detector.observe(_get_logs(50, count=8))
+        self.detector.observe(_get_logs(65, count=8))
+
+        events = self.detector.flush()
+
+        self.assertEqual([(event.window_start, event.count) for event in events], [
+            (START + timedelta(seconds=60), 8),
+        ])
+
+    def test_sliding_window_previous_window_expires(self):
+        self.detector.observe(_get_logs(0, count=8))
+        self.detector.observe(_get_logs(119, count=8))
+
+        self.assertEqual(self.detector.flush(), [])
+
+    def test_gap_resets_previous_window(self):
+        self.detector.observe(_get_logs(50, count=8))
+        self.detector.observe(_get_logs(180, count=8))
+
+        self.assertEqual(self.detector.flush(), [])
+
+    def test_error_ratio(self):
+        self.detector.observe(
+            _get_logs(0, count=2, uri="/a", status_code=404)
+            + _get_logs(1, count=2, uri="/b", status_code=500)
+            + _get_logs(2, count=1, ip_address="10.0.0.2", status_code=404)
+        )
+
+        events = self.detector.flush()
+
+        self.assertEqual(events, [AnomalyEvent(
+            kind="ip",
+            key="10.0.0.1",
+            reason="error_ratio",
+            window_start=START,
+            window_seconds=60,
+            count=4,
+            error_count=4,
+        )])
+
+    def test_flagged_once_per_window(self):
+        for second in range(0, 40, 2):
+            self.detector.observe(_get_logs(second, count=2))
+
+        events = self.detector.flush()
+
+        self.assertEqual([(event.reason, event.count) for event in events], [("rate", 40)])
+
+    def test_late_logs_are_counted_in_current_window(self):
+        self.detector.observe(_get_logs(65, count=6))
+        self.detector.observe(_get_logs(30, count=6))
+
+        events = self.detector.flush()
+
+        self.assertEqual([(event.window_start, event.count) for event in events], [
+            (START + timedelta(seconds=60), 12),
+        ])
+
+    def test_max_keys(self):
+        self.detector.thresholds.max_keys = 4
+        self.detector.observe(_get_logs(0, count=3) + [
+            log for index in range(10) for log in _get_logs(1, ip_address=f"10.1.0.{index}")
+        ])
+
+        self.assertLessEqual(len(self.detector.counts["ip"]), 4)
+        self.assertEqual(self.detector.counts["ip"]["10.0.0.1"], 3)
+
+    def test_max_keys_keeps_flagged(self):
+        self.detector.thresholds.max_keys = 4
+        self.detector.observe(_get_logs(0, count=4, status_code=500))
+        self.detector.observe([
+            log for index in range(10) for log in _get_logs(1, count=5, ip_address=f"10.1.0.{index}")
+        ])
+
+        events = self.detector.flush()
+
+        self.assertEqual([
+            (event.key, event.reason, event.count, event.error_count) for event in events if event.kind == "ip"
+        ], [
+            ("10.0.0.1", "error_ratio", 4, 4),
+        ])
+
+    def test_empty(self):
+        self.assertEqual(self.detector.observe([]), [])
+        self.assertEqual(self.detector.flush(), [])
@@ -0,0 +1,84 @@
+from unittest import TestCase
+
+from apache_logs.chunking import AdaptiveRangeSizer, LineSplitter
+
+
+class AdaptiveRangeSizerTestCase(TestCase):
+    def test_initial_size_is_clamped(self):
+        range_sizer = AdaptiveRangeSizer(min_size=10, max_size=100, initial_size=1)
+
+        self.assertEqual(range_sizer.get_size(), 10)
+
+    def test_record_fast_response_grows_at_most_twice(self):
+        range_sizer = AdaptiveRangeSizer(min_size=10, max_size=1000, target_seconds=1, initial_size=50)
+
+        range_sizer.record(size=50, seconds=0.001)
+
+        self.assertEqual(range_sizer.get_size(), 100)
+
+    def test_record_slow_response_shrinks(self):
+        range_sizer = AdaptiveRangeSizer(min_size=10, max_size=1000, target_seconds=1, initial_size=100)
+
+        range_sizer.record(size=100, seconds=1.25)
+
+        self.assertEqual(range_sizer.get_size(), 80)
+
+    def test_record_respects_max_size(self):
+        range_sizer = AdaptiveRangeSizer(min_size=10, max_size=120, target_seconds=1, initial_size=100)
+
+        range_sizer.record(size=100, seconds=0)
+
+        self.assertEqual(range_sizer.get_size(), 120)
+
+    def test_get_ranges(self):
+        range_sizer = AdaptiveRangeSizer(min_size=4, max_size=4, initial_size=4)
+
+        ranges = list(range_sizer.get_ranges(max_length=10))
+
+        self.assertEqual(ranges, [(0, 3), (4, 7), (8, 9)])
+
+    def test_get_ranges_from_bytes(self):
+        range_sizer = AdaptiveRangeSizer(min_size=4, max_size=4, initial_size=4)
+
+        ranges = list(range_sizer.get_ranges(max_length=10, from_bytes=5))
+
+        self.assertEqual(ranges, [(5, 8), (9, 9)])
+
+    def test_get_ranges_empty(self):
+        range_sizer = AdaptiveRangeSizer()
+
+        self.assertEqual(list(range_sizer.get_ranges(max_length=0)), [])
+
+
+class LineSplitterTestCase(TestCase):
+    def test_split(self):
+        line_splitter = LineSplitter()
+
+        self.assertEqual(line_splitter.split(b"first\nsec"), [b"first"])
+        self.assertEqual(line_splitter.split(b"on"), [])
+        self.assertEqual(line_splitter.split(b"d\nthird\nfourth\nfif"), [b"second", b"third\nfourth"])
+        self.assertEqual(line_splitter.flush(), [b"fif"])
+        self.assertEqual(line_splitter.flush(), [])
+
+    def test_split_returns_views(self):
+        content = b"first\nsecond\nthird\n"
+
+        buffers = LineSplitter().split(content)
+
+        self.assertEqual(buffers, [b"first", b"second\nthird"])
+        self.assertIs(buffers[1].obj, content)
+
+    def test_skip_first_line(self):
+        line_splitter = LineSplitter(skip_first_line=True)
+
+        self.assertEqual(line_splitter.split(b"tail of"), [])
+        self.assertEqual(line_splitter.split(b" a line\nfirst\nsecond"), [b"first"])
+        self.assertEqual(line_splitter.flush(), [b"second"])
+
+    def test_skip_first_line_without_newline(self):
+        line_splitter = LineSplitter(skip_first_line=True)
+
+        line_splitter.split(b"inside a single line")
+
+        self.assertTrue(line_splitter.skip_first_line)
+        self.assertEqual(line_splitter.flush(), [])
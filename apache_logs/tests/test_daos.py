@@ -1,11 +1,19 @@
-from datetime import datetime
+import os
+import tempfile
+from dataclasses import replace
+from datetime import datetime, timezone, timedelta
 from unittest import TestCase, mock
 
 from django.test import TransactionTestCase
 
-from apache_logs.daos import ApacheLogsDAO, RequestDAO, ImportStatusDAO
-from apache_logs.entities import ApacheLog, CountIPAddress, CountMethod, Pagination, ImportStatus
-from apache_logs.models import ApacheLogORM, ImportStatusORM
+from apache_logs.daos import ApacheLogsDAO, RequestDAO, ImportStatusDAO, FileRequestDAO, SourceRequestDAO, \
+    AnomalyEventsDAO, SavedSearchesDAO, HostRateLimitsDAO
+from apache_logs.dedup import get_log_hash
+from apache_logs.entities import ApacheLog, CountIPAddress, CountMethod, Pagination, ImportStatus, TimeBucket, \
+    CountStatusCode, ImportJob, ImportPart, ImportSource, ImportSourceReport, ImportStatistics, CountNetwork, \
+    AnomalyEvent, ImportProgress, LogStatistics, SavedSearch
+from apache_logs.models import ApacheLogORM, ImportStatusORM, ApacheLogRollupORM, ApacheLogNetworkRollupORM, \
+    AnomalyEventORM
 
 
 class CreateApacheLogsDAOTestCase(TransactionTestCase):
@@ -46,6 +54,130 @@ class CreateApacheLogsDAOTestCase(TransactionTestCase):
 
         self.assertEqual(len(created_apache_logs), len(apache_logs))
 
+    def test_create_apache_logs_optional_fields(self):
+        self.dao.create_apache_logs(apache_logs=[ApacheLog(
+            ip_address="127.0.0.1",
+            date=datetime.now(timezone.utc),
+            method="GET",
+            uri="/",
+            status_code=200,
+            size=10,
+            referrer="https://example.com/",
+            user_agent="curl/7.68.0",
+            response_time=1500,
+        )])
+
+        self.assertEqual(
+            list(ApacheLogORM.objects.values_list("referrer", "user_agent", "response_time")),
+            [("https://example.com/", "curl/7.68.0", 1500)],
+        )
+
+    def test_create_apache_logs_twice(self):
+        apache_logs = [
+            ApacheLog(
+                ip_address="127.0.0.1",
+                date=datetime.now(),
+                method="GET",
+                uri="/?q=123",
+                status_code=200,
+                size=1024,
+            ),
+        ]
+
+        inserted_log_hashes = self.dao.create_apache_logs(apache_logs=apache_logs)
+        skipped_log_hashes = self.dao.create_apache_logs(apache_logs=apache_logs)
+
+        self.assertEqual(ApacheLogORM.objects.count(), 1)
+        self.assertEqual(inserted_log_hashes, {get_log_hash(apache_logs[0])})
+        self.assertEqual(skipped_log_hashes, set())
+
+    def test_get_existing_log_hashes(self):
+        apache_log = ApacheLog(
+            ip_address="127.0.0.1",
+            date=datetime.now(),
+            method="GET",
+            uri="/?q=123",
+            status_code=200,
+            size=1024,
+        )
+        self.dao.create_apache_logs(apache_logs=[apache_log])
+
+        existing_log_hashes = self.dao.get_existing_log_hashes(log_hashes=[get_log_hash(apache_log), 1])
+
+        self.assertEqual(existing_log_hashes, {get_log_hash(apache_log)})
+
+    def test_iterate_log_hashes(self):
+        apache_log = ApacheLog(
+            ip_address="127.0.0.1",
+            date=datetime.now(timezone.utc),
+            method="GET",
+            uri="/",
+            status_code=200,
+            size=10,
+        )
+        import_status = ImportStatusORM.objects.create(url="https://url.com/a.log")
+        part = ImportStatusORM.objects.create(sources=[{"url": "https://url.com/b.log"}])
+        self.dao.create_apache_logs(apache_logs=[apache_log], import_status_id=import_status.pk)
+        self.dao.create_apache_logs(apache_logs=[replace(apache_log, uri="/b")], import_status_id=part.pk)
+        self.dao.create_apache_logs(apache_logs=[replace(apache_log, uri="/c")])
+
+        self.assertEqual(
+            list(self.dao.iterate_log_hashes(source="https://url.com/a.log", chunk_size=10)),
+            [get_log_hash(apache_log)],
+        )
+        self.assertEqual(
+            list(self.dao.iterate_log_hashes(source="https://url.com/b.log", chunk_size=10)),
+            [get_log_hash(replace(apache_log, uri="/b"))],
+        )
+
+
+class DeleteLogsDAOTestCase(TransactionTestCase):
+    def setUp(self) -> None:
+        self.dao = ApacheLogsDAO()
+        self.dao.create_apache_logs(apache_logs=[
+            ApacheLog(
+                ip_address="127.0.0.1",
+                date=datetime(2021, 1, day, tzinfo=timezone.utc),
+                method="GET",
+                uri="/index",
+                status_code=200,
+                size=day,
+            ) for day in range(1, 6)
+        ])
+
+    def test_delete_logs_before(self):
+        deleted = self.dao.delete_logs_before(date=datetime(2021, 1, 4, tzinfo=timezone.utc), batch_size=2)
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(list(ApacheLogORM.objects.order_by("size").values_list("size", flat=True)), [3, 4, 5])
+
+    def test_delete_logs_before_keeps_rollups(self):
+        self.dao.delete_logs_before(date=datetime(2021, 1, 4, tzinfo=timezone.utc), batch_size=10)
+
+        self.assertEqual(ApacheLogORM.objects.count(), 2)
+        self.assertEqual(ApacheLogRollupORM.objects.count(), 5)
+
+
+class SecondaryIndexesDAOTestCase(TransactionTestCase):
+    def setUp(self) -> None:
+        self.dao = ApacheLogsDAO()
+        self.index_names = {index.name for index in ApacheLogORM._meta.indexes}
+
+    def test_drop_secondary_indexes(self):
+        self.dao.drop_secondary_indexes()
+
+        self.assertFalse(self.index_names & self.dao._get_index_names())
+
+        self.dao.create_secondary_indexes()
+
+    def test_create_secondary_indexes(self):
+        self.dao.drop_secondary_indexes()
+
+        self.dao.create_secondary_indexes()
+        self.dao.create_secondary_indexes()
+
+        self.assertTrue(self.index_names <= self.dao._get_index_names())
+
 
 class ApacheLogsDAOTestCase(TransactionTestCase):
     def setUp(self) -> None:
@@ -125,6 +257,83 @@ class ApacheLogsDAOTestCase(TransactionTestCase):
 
         self.assertEqual(sum_sizes, 202)
 
+    def test_get_log_rows(self):
+        rows, has_next = self.dao.get_log_rows(page=1, per_page=2, query="", fields=["ip_address", "size"])
+
+        self.assertEqual(rows, [("127.0.0.1", 201), ("127.0.0.1", 202)])
+        self.assertTrue(has_next)
+
+    def test_get_log_rows_last_page(self):
+        rows, has_next = self.dao.get_log_rows(page=2, per_page=2, query="", fields=["size"])
+
+        self.assertEqual(rows, [(203,)])
+        self.assertFalse(has_next)
+
+    def _create_log(self, **kwargs) -> ApacheLog:
+        options = {
+            "ip_address": "10.0.0.1",
+            "date": datetime(2021, 1, 1, tzinfo=timezone.utc),
+            "method": "GET",
+            "uri": "/",
+            "status_code": 200,
+            "size": 1,
+        }
+        return ApacheLog(**{**options, **kwargs})
+
+    def test_get_data_version(self):
+        data_version = self.dao.get_data_version()
+
+        self.dao.create_apache_logs(apache_logs=[self._create_log()])
+
+        self.assertNotEqual(self.dao.get_data_version(), data_version)
+
+    def test_get_data_version_nothing_inserted(self):
+        self.dao.create_apache_logs(apache_logs=[self._create_log(uri="/again")])
+        data_version = self.dao.get_data_version()
+
+        self.dao.create_apache_logs(apache_logs=[self._create_log(uri="/again")])
+        self.dao.create_apache_logs(apache_logs=[])
+
+        self.assertEqual(self.dao.get_data_version(), data_version)
+
+    def test_get_data_version_out_of_order_commit(self):
+        # A batch with lower ids committed after one with higher ids leaves the id range unchanged.
+        self.dao.create_apache_logs(apache_logs=[
+            self._create_log(uri="/first"),
+            self._create_log(uri="/late"),
+            self._create_log(uri="/last"),
+        ])
+        # The id of /late was taken by a batch that has not committed yet.
+        late_id = ApacheLogORM.objects.get(uri="/late").pk
+        ApacheLogORM.objects.filter(uri="/late").delete()
+        data_version = self.dao.get_data_version()
+
+        self.dao.create_apache_logs(apache_logs=[self._create_log(uri="/late")])
+        ApacheLogORM.objects.filter(uri="/late").update(id=late_id)
+
+        self.assertNotEqual(self.dao.get_data_version(), data_version)
+
+    def test_get_data_version_interior_delete(self):
+        # Retention deletes by date, an old-dated row can sit between newer ids.
+        self.dao.create_apache_logs(apache_logs=[
+            self._create_log(uri="/first", date=datetime(2021, 1, 2, tzinfo=timezone.utc)),
+            self._create_log(uri="/backfilled", date=datetime(2020, 1, 1, tzinfo=timezone.utc)),
+            self._create_log(uri="/last", date=datetime(2021, 1, 2, tzinfo=timezone.utc)),
+        ])
+        data_version = self.dao.get_data_version()
+
+        deleted = self.dao.delete_logs_before(date=datetime(2020, 6, 1, tzinfo=timezone.utc), batch_size=10)
+
+        self.assertEqual(deleted, 1)
+        self.assertNotEqual(self.dao.get_data_version(), data_version)
+
+    def test_iterate_logs(self):
+        rows = list(self.dao.iterate_logs(query="POST", chunk_size=1))
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][0], "127.0.0.1")
+        self.assertEqual(rows[0][2:], ("POST", "/index", 200, 202))
+
     def test_get_logs(self):
         entity_logs = [
             ApacheLog(
@@ -153,56 +362,231 @@ class ApacheLogsDAOTestCase(TransactionTestCase):
         self.assertEqual(logs[1], pagination)
 
 
+class TimeSeriesDAOTestCase(TransactionTestCase):
+    def setUp(self) -> None:
+        self.dao = ApacheLogsDAO()
+        self.dao.create_apache_logs(apache_logs=[
+            ApacheLog(
+                ip_address="127.0.0.1",
+                date=datetime(2021, 1, 1, 10, 1, 5, tzinfo=timezone.utc),
+                method="GET",
+                uri="/index",
+                status_code=200,
+                size=100,
+            ),
+            ApacheLog(
+                ip_address="127.0.0.1",
+                date=datetime(2021, 1, 1, 10, 1, 30, tzinfo=timezone.utc),
+                method="GET",
+                uri="/missing",
+                status_code=404,
+                size=10,
+            ),
+            ApacheLog(
+                ip_address="13.66.139.0",
+                date=datetime(2021, 1, 1, 11, 59, 0, tzinfo=timezone.utc),
+                method="POST",
+                uri="/index",
+                status_code=500,
+                size=1,
+            ),
+        ])
+
+    def test_create_apache_logs_rollups(self):
+        self.dao.create_apache_logs(apache_logs=[
+            ApacheLog(
+                ip_address="127.0.0.1",
+                date=datetime(2021, 1, 1, 10, 1, 5, tzinfo=timezone.utc),
+                method="GET",
+                uri="/index",
+                status_code=200,
+                size=100,
+            ),
+        ])
+
+        rollups = list(ApacheLogRollupORM.objects.order_by("minute", "status_code").values_list(
+            "minute", "method", "status_code", "count", "size",
+        ))
+
+        self.assertEqual(rollups, [
+            (datetime(2021, 1, 1, 10, 1, tzinfo=timezone.utc), "GET", 200, 1, 100),
+            (datetime(2021, 1, 1, 10, 1, tzinfo=timezone.utc), "GET", 404, 1, 10),
+            (datetime(2021, 1, 1, 11, 59, tzinfo=timezone.utc), "POST", 500, 1, 1),
+        ])
+
+    def test_get_time_buckets_without_query(self):
+        buckets = self.dao.get_time_buckets(interval="hour", date_from=None, date_to=None, query="")
+
+        self.assertEqual(buckets, [
+            TimeBucket(
+                start=datetime(2021, 1, 1, 10, tzinfo=timezone.utc),
+                count=2,
+                size=110,
+                client_error_rate=0.5,
+                server_error_rate=0.0,
+            ),
+            TimeBucket(
+                start=datetime(2021, 1, 1, 11, tzinfo=timezone.utc),
+                count=1,
+                size=1,
+                client_error_rate=0.0,
+                server_error_rate=1.0,
+            ),
+        ])
+
+    def test_get_time_buckets_with_query(self):
+        buckets = self.dao.get_time_buckets(interval="minute", date_from=None, date_to=None, query="missing")
+
+        self.assertEqual(buckets, [
+            TimeBucket(
+                start=datetime(2021, 1, 1, 10, 1, tzinfo=timezone.utc),
+                count=1,
+                size=10,
+                client_error_rate=1.0,
+                server_error_rate=0.0,
+            ),
+        ])
+
+    def test_get_time_buckets_with_range(self):
+        buckets = self.dao.get_time_buckets(
+            interval="day",
+            date_from=datetime(2021, 1, 1, 11, tzinfo=timezone.utc),
+            date_to=datetime(2021, 1, 2, tzinfo=timezone.utc),
+            query="",
+        )
+
+        self.assertEqual([bucket.count for bucket in buckets], [1])
+
+    def test_get_status_codes_count(self):
+        count_status_codes = self.dao.get_status_codes_count(date_from=None, date_to=None, query="")
+
+        self.assertEqual(count_status_codes, [
+            CountStatusCode(status_code=200, count=1),
+            CountStatusCode(status_code=404, count=1),
+            CountStatusCode(status_code=500, count=1),
+        ])
+
+    def test_get_status_codes_count_with_query(self):
+        count_status_codes = self.dao.get_status_codes_count(date_from=None, date_to=None, query="POST")
+
+        self.assertEqual(count_status_codes, [CountStatusCode(status_code=500, count=1)])
+
+
 class RequestDAOTestCase(TestCase):
     def setUp(self) -> None:
         self.dao = RequestDAO()
         self.url = "http://www.almhuette-raith.at/apache-log/access.log"
 
-    @mock.patch("apache_logs.daos.requests")
-    def test_check_partial_content_false(self, requests_mock):
+    @mock.patch("requests.head")
+    def test_check_partial_content_false(self, head_mock):
         headers_mock = mock.Mock()
         headers_mock.headers = {}
-        requests_mock.head.return_value = headers_mock
+        head_mock.return_value = headers_mock
         result = self.dao.check_partial_content(url=self.url)
 
         self.assertEqual(result, (False, 0))
 
-        requests_mock.head.assert_called_once_with(self.url)
+        head_mock.assert_called_once_with(self.url)
 
-    @mock.patch("apache_logs.daos.requests")
-    def test_check_partial_content_true(self, requests_mock):
+    @mock.patch("requests.head")
+    def test_check_partial_content_true(self, head_mock):
         headers_mock = mock.Mock()
         headers_mock.headers = {"Accept-Ranges": True, "Content-Length": 100}
-        requests_mock.head.return_value = headers_mock
+        head_mock.return_value = headers_mock
         result = self.dao.check_partial_content(url=self.url)
 
         self.assertEqual(result, (True, 100))
 
-        requests_mock.head.assert_called_once_with(self.url)
+        head_mock.assert_called_once_with(self.url)
 
-    @mock.patch("apache_logs.daos.requests")
-    def test_get_partial_rows(self, requests_mock):
+    @mock.patch("requests.get")
+    def test_get_partial_content(self, get_mock):
         from_bytes = 0
         to_bytes = 100
         result_mock = mock.Mock()
         result_mock.content = b"000\n000"
-        requests_mock.get.return_value = result_mock
-        result = self.dao.get_partial_rows(url=self.url, from_bytes=from_bytes, to_bytes=to_bytes)
+        get_mock.return_value = result_mock
+        result = self.dao.get_partial_content(url=self.url, from_bytes=from_bytes, to_bytes=to_bytes)
 
-        self.assertEqual(result, ["000", "000"])
+        self.assertEqual(result, b"000\n000")
 
-        requests_mock.get.assert_called_once_with(self.url, headers={"Range": f"bytes={from_bytes}-{to_bytes}"})
+        get_mock.assert_called_once_with(self.url, headers={"Range": f"bytes={from_bytes}-{to_bytes}"})
 
-    @mock.patch("apache_logs.daos.requests")
-    def test_get_full_rows(self, requests_mock):
+    @mock.patch("requests.get")
+    def test_get_full_content(self, get_mock):
         result_mock = mock.Mock()
         result_mock.content = b"000\n000"
-        requests_mock.get.return_value = result_mock
-        result = self.dao.get_full_rows(url=self.url)
+        get_mock.return_value = result_mock
+        result = self.dao.get_full_content(url=self.url)
+
+        self.assertEqual(result, b"000\n000")
+
+        get_mock.assert_called_once_with(self.url)
+
+    @mock.patch("requests.get")
+    def test_iter_full_content(self, get_mock):
+        result_mock = get_mock.return_value.__enter__.return_value
+        result_mock.iter_content.return_value = iter([b"000\n", b"000"])
+
+        result = list(self.dao.iter_full_content(url=self.url, chunk_size=4))
+
+        self.assertEqual(result, [b"000\n", b"000"])
+        get_mock.assert_called_once_with(self.url, stream=True)
+        result_mock.iter_content.assert_called_once_with(chunk_size=4)
+
 
-        self.assertEqual(result, ["000", "000"])
+class RequestDAOSessionTestCase(TestCase):
+    def test_get_partial_content_with_session(self):
+        session = mock.Mock()
+        session.get.return_value.content = b"000\n000"
+        dao = RequestDAO(session=session)
 
-        requests_mock.get.assert_called_once_with(self.url)
+        result = dao.get_partial_content(url="http://localhost/access.log", from_bytes=0, to_bytes=10)
+
+        self.assertEqual(result, b"000\n000")
+        session.get.assert_called_once_with("http://localhost/access.log", headers={"Range": "bytes=0-10"})
+
+
+class FileRequestDAOTestCase(TestCase):
+    def setUp(self) -> None:
+        file = tempfile.NamedTemporaryFile(delete=False)
+        file.write(b"first\nsecond\nthird")
+        file.close()
+        self.path = file.name
+        self.dao = FileRequestDAO()
+
+    def tearDown(self) -> None:
+        os.remove(self.path)
+
+    def test_check_partial_content(self):
+        self.assertEqual(self.dao.check_partial_content(url=self.path), (True, 18))
+
+    def test_get_partial_content(self):
+        result = self.dao.get_partial_content(url=f"file://{self.path}", from_bytes=3, to_bytes=8)
+
+        self.assertEqual(result, b"st\nsec")
+
+    def test_get_full_content(self):
+        self.assertEqual(self.dao.get_full_content(url=self.path), b"first\nsecond\nthird")
+
+    def test_iter_full_content(self):
+        result = list(self.dao.iter_full_content(url=self.path, chunk_size=8))
+
+        self.assertEqual(result, [b"first\nse", b"cond\nthi", b"rd"])
+
+
+class SourceRequestDAOTestCase(TestCase):
+    def test_dispatch(self):
+        http_dao = mock.Mock()
+        file_dao = mock.Mock()
+        dao = SourceRequestDAO(http_dao=http_dao, file_dao=file_dao)
+
+        dao.check_partial_content(url="https://url.com/access.log")
+        dao.get_full_content(url="/var/log/access.log")
+
+        http_dao.check_partial_content.assert_called_once_with(url="https://url.com/access.log")
+        file_dao.get_full_content.assert_called_once_with(url="/var/log/access.log")
+        file_dao.check_partial_content.assert_not_called()
 
 
 class ImportStatusDAOTestCase(TransactionTestCase):
@@ -248,6 +632,18 @@ class ImportStatusDAOTestCase(TransactionTestCase):
             percent=100,
             status=ImportStatusORM.STATUS_FINISH,
         ))
+        self.assertIsNotNone(finished_import_status_orm.finished_at)
+
+    def test_delete_finished_import_statuses_before(self):
+        now = datetime.now(timezone.utc)
+        ImportStatusORM.objects.create(status=ImportStatusORM.STATUS_FINISH, finished_at=now - timedelta(days=2))
+        ImportStatusORM.objects.create(status=ImportStatusORM.STATUS_FINISH, finished_at=now)
+        ImportStatusORM.objects.create(status=ImportStatusORM.STATUS_START)
+
+        deleted = self.dao.delete_finished_import_statuses_before(date=now - timedelta(days=1))
+
+        self.assertEqual(deleted, 1)
+        self.assertEqual(ImportStatusORM.objects.count(), 2)
 
     def test_get_import_statuses(self):
         import_status = ImportStatusORM()
@@ -260,3 +656,516 @@ class ImportStatusDAOTestCase(TransactionTestCase):
             percent=1,
             status=ImportStatusORM.STATUS_START,
         )])
+
+    def test_get_import_status(self):
+        import_status = ImportStatusORM.objects.create(percent=40)
+
+        self.assertEqual(self.dao.get_import_status(import_status_id=import_status.pk), ImportStatus(
+            pk=import_status.pk,
+            percent=40,
+            status=ImportStatusORM.STATUS_START,
+        ))
+
+    def test_fail_import_status(self):
+        import_status = ImportStatusORM.objects.create()
+
+        failed_import_status = self.dao.fail_import_status(import_status_id=import_status.pk)
+
+        self.assertEqual(failed_import_status.status, ImportStatusORM.STATUS_FAILED)
+        self.assertIsNotNone(ImportStatusORM.objects.get(pk=import_status.pk).finished_at)
+
+    def test_create_import_job(self):
+        import_job = self.dao.create_import_job(url="https://url.com/log", host="url.com", priority=3)
+
+        import_status = ImportStatusORM.objects.get(pk=import_job.pk)
+        self.assertEqual(import_job, ImportJob(
+            pk=import_status.pk,
+            url="https://url.com/log",
+            host="url.com",
+            priority=3,
+            sources=[],
+        ))
+        self.assertEqual(import_status.status, ImportStatusORM.STATUS_QUEUED)
+
+    def test_claim_import_jobs(self):
+        low = self.dao.create_import_job(url="https://first.com/low", host="first.com", priority=0)
+        high = self.dao.create_import_job(url="https://first.com/high", host="first.com", priority=5)
+        other_host = self.dao.create_import_job(url="https://second.com/log", host="second.com", priority=0)
+        third_host = self.dao.create_import_job(url="https://third.com/log", host="third.com", priority=0)
+
+        import_jobs = self.dao.claim_import_jobs(max_concurrent=2, max_concurrent_per_host=1)
+
+        self.assertEqual([import_job.pk for import_job in import_jobs], [high.pk, other_host.pk])
+        self.assertEqual(ImportStatusORM.objects.get(pk=high.pk).status, ImportStatusORM.STATUS_START)
+        self.assertIsNotNone(ImportStatusORM.objects.get(pk=high.pk).started_at)
+        self.assertEqual(ImportStatusORM.objects.get(pk=low.pk).status, ImportStatusORM.STATUS_QUEUED)
+
+        self.assertEqual(self.dao.claim_import_jobs(max_concurrent=2, max_concurrent_per_host=1), [])
+
+        self.dao.finish_import_status(import_status_id=high.pk)
+
+        import_jobs = self.dao.claim_import_jobs(max_concurrent=2, max_concurrent_per_host=1)
+
+        self.assertEqual([import_job.pk for import_job in import_jobs], [low.pk])
+        self.assertEqual(ImportStatusORM.objects.get(pk=third_host.pk).status, ImportStatusORM.STATUS_QUEUED)
+
+    def test_claim_import_jobs_ignores_legacy_running_imports(self):
+        ImportStatusORM.objects.create(status=ImportStatusORM.STATUS_START)
+        import_job = self.dao.create_import_job(url="https://url.com/log", host="url.com", priority=0)
+
+        import_jobs = self.dao.claim_import_jobs(max_concurrent=1, max_concurrent_per_host=1)
+
+        self.assertEqual(import_jobs, [import_job])
+
+    def test_count_import_statuses(self):
+        self.dao.create_import_job(url="https://url.com/log", host="url.com", priority=0)
+        self.dao.create_import_status()
+
+        self.assertEqual(self.dao.count_import_statuses(status=ImportStatusORM.STATUS_QUEUED), 1)
+        self.assertEqual(self.dao.count_import_statuses(status=ImportStatusORM.STATUS_START), 1)
+
+    def test_get_average_import_seconds(self):
+        now = datetime.now(tz=timezone.utc)
+        ImportStatusORM.objects.create(
+            status=ImportStatusORM.STATUS_FINISH,
+            started_at=now - timedelta(seconds=30),
+            finished_at=now,
+        )
+        ImportStatusORM.objects.create(
+            status=ImportStatusORM.STATUS_FINISH,
+            started_at=now - timedelta(seconds=90),
+            finished_at=now,
+        )
+        ImportStatusORM.objects.create(status=ImportStatusORM.STATUS_FINISH, finished_at=now)
+
+        self.assertEqual(self.dao.get_average_import_seconds(), 60.0)
+
+    def test_get_average_import_seconds_without_finished_imports(self):
+        self.assertIsNone(self.dao.get_average_import_seconds())
+
+    def _create_bulk_import(self):
+        return self.dao.create_bulk_import(parts=[
+            ImportPart(host="url.com", sources=[
+                ImportSource(url="https://url.com/a.log", from_bytes=0, to_bytes=99, size=100, accept_ranges=True),
+                ImportSource(url="https://url.com/b.log", from_bytes=0, to_bytes=99, size=100, accept_ranges=True),
+            ]),
+            ImportPart(host="", sources=[
+                ImportSource(url="/var/log/big.log", from_bytes=0, to_bytes=299, size=600, accept_ranges=True),
+            ]),
+            ImportPart(host="", sources=[
+                ImportSource(url="/var/log/big.log", from_bytes=300, to_bytes=599, size=600, accept_ranges=True),
+            ]),
+        ], priority=2)
+
+    def test_create_bulk_import(self):
+        import_status = self._create_bulk_import()
+
+        parent = ImportStatusORM.objects.get(pk=import_status.pk)
+        parts = list(parent.parts.order_by("pk"))
+        self.assertEqual(parent.size, 800)
+        self.assertEqual(parent.status, ImportStatusORM.STATUS_START)
+        self.assertEqual([part.size for part in parts], [200, 300, 300])
+        self.assertEqual({part.status for part in parts}, {ImportStatusORM.STATUS_QUEUED})
+        self.assertEqual(self.dao.get_import_statuses(), [import_status])
+        self.assertEqual(self.dao.get_import_job(import_status_id=parts[0].pk).sources[1], ImportSource(
+            url="https://url.com/b.log",
+            from_bytes=0,
+            to_bytes=99,
+            size=100,
+            accept_ranges=True,
+        ))
+
+    def test_create_bulk_import_started(self):
+        import_status = self.dao.create_bulk_import(parts=[
+            ImportPart(host="", sources=[
+                ImportSource(url="/var/log/big.log", from_bytes=0, to_bytes=299, size=600, accept_ranges=True),
+            ]),
+        ], priority=0, queued=False)
+
+        import_jobs = self.dao.get_import_parts(import_status_id=import_status.pk)
+        part = ImportStatusORM.objects.get(pk=import_jobs[0].pk)
+        self.assertEqual(len(import_jobs), 1)
+        self.assertEqual(part.status, ImportStatusORM.STATUS_START)
+        self.assertIsNotNone(part.started_at)
+        self.assertEqual(self.dao.claim_import_jobs(max_concurrent=2, max_concurrent_per_host=2), [])
+
+    def test_get_import_progress(self):
+        import_status = self._create_bulk_import()
+        import_jobs = self.dao.get_import_parts(import_status_id=import_status.pk)
+
+        self.dao.add_imported_size(import_status_id=import_jobs[1].pk, size=200)
+
+        self.assertEqual([import_job.pk for import_job in import_jobs], sorted(
+            ImportStatusORM.objects.filter(parent=import_status.pk).values_list("pk", flat=True)
+        ))
+        self.assertEqual(self.dao.get_import_progress(import_status_id=import_status.pk), ImportProgress(
+            status=ImportStatusORM.STATUS_START,
+            percent=25,
+            size=800,
+            imported_size=200,
+        ))
+
+    def test_claim_import_jobs_skips_bulk_import_parent(self):
+        import_status = self._create_bulk_import()
+
+        import_jobs = self.dao.claim_import_jobs(max_concurrent=2, max_concurrent_per_host=1)
+
+        self.assertEqual(len(import_jobs), 2)
+        self.assertEqual(self.dao.count_import_statuses(status=ImportStatusORM.STATUS_START), 2)
+        self.assertNotIn(import_status.pk, [import_job.pk for import_job in import_jobs])
+
+    def test_add_imported_size(self):
+        import_status = self._create_bulk_import()
+        part = ImportStatusORM.objects.filter(parent=import_status.pk).first()
+
+        self.dao.add_imported_size(import_status_id=part.pk, size=200)
+        self.dao.add_imported_size(import_status_id=part.pk, size=200)
+
+        parent = ImportStatusORM.objects.get(pk=import_status.pk)
+        self.assertEqual(parent.imported_size, 400)
+        self.assertEqual(parent.percent, 50)
+
+    def test_finish_import_part(self):
+        import_status = self._create_bulk_import()
+        parts = list(ImportStatusORM.objects.filter(parent=import_status.pk).order_by("pk"))
+        report = [ImportSourceReport(url="/var/log/big.log", size=300, seconds=1.5)]
+
+        for part in parts[:-1]:
+            self.dao.finish_import_part(import_status_id=part.pk, report=report)
+
+        self.assertEqual(self.dao.get_import_status(import_status_id=import_status.pk).status, "start")
+
+        self.dao.finish_import_part(import_status_id=parts[-1].pk, report=report)
+
+        parent = self.dao.get_import_status(import_status_id=import_status.pk)
+        self.assertEqual(parent.status, ImportStatusORM.STATUS_FINISH)
+        self.assertEqual(parent.percent, 100)
+        self.assertEqual(self.dao.get_import_part_reports(import_status_id=import_status.pk), report * 3)
+
+    def test_finish_import_part_failed(self):
+        import_status = self._create_bulk_import()
+        parts = list(ImportStatusORM.objects.filter(parent=import_status.pk))
+
+        self.dao.finish_import_part(import_status_id=parts[0].pk, report=[], failed=True)
+        for part in parts[1:]:
+            self.dao.finish_import_part(import_status_id=part.pk, report=[])
+
+        self.assertEqual(self.dao.get_import_status(import_status_id=import_status.pk).status, "failed")
+
+    def test_get_imported_sources(self):
+        finished_job = self.dao.create_import_job(url="https://url.com/single.log", host="url.com", priority=0)
+        self.dao.finish_import_status(import_status_id=finished_job.pk)
+        self.dao.create_import_job(url="https://url.com/queued.log", host="url.com", priority=0)
+        import_status = self._create_bulk_import()
+        parts = list(ImportStatusORM.objects.filter(parent=import_status.pk).order_by("pk"))
+        self.dao.finish_import_part(import_status_id=parts[0].pk, report=[])
+        self.dao.finish_import_part(import_status_id=parts[1].pk, report=[])
+
+        self.assertEqual(self.dao.get_imported_sources(), {
+            "https://url.com/single.log",
+            "https://url.com/a.log",
+            "https://url.com/b.log",
+        })
+
+        self.dao.finish_import_part(import_status_id=parts[2].pk, report=[])
+
+        self.assertIn("/var/log/big.log", self.dao.get_imported_sources())
+
+
+class ImportStatisticsDAOTestCase(TransactionTestCase):
+    def setUp(self) -> None:
+        self.logs_dao = ApacheLogsDAO()
+        self.dao = ImportStatusDAO()
+        self.apache_logs = [
+            ApacheLog(
+                ip_address=ip_address,
+                date=datetime(2020, 12, 19, 10, minute, tzinfo=timezone.utc),
+                method="GET",
+                uri="/",
+                status_code=status_code,
+                size=size,
+            ) for ip_address, minute, status_code, size in [
+                ("127.0.0.1", 0, 200, 100),
+                ("127.0.0.1", 1, 404, 10),
+                ("10.0.0.1", 2, 500, 5),
+                ("10.0.0.1", 3, 200, 100),
+                ("10.0.0.2", 4, 200, 100),
+            ]
+        ]
+
+    def test_create_apache_logs_with_import_status(self):
+        import_status = self.dao.create_import_status()
+
+        self.logs_dao.create_apache_logs(apache_logs=self.apache_logs[:2], import_status_id=import_status.pk)
+        self.logs_dao.create_apache_logs(apache_logs=self.apache_logs[2:])
+
+        self.assertEqual(ApacheLogORM.objects.filter(import_status=import_status.pk).count(), 2)
+        self.assertEqual(ApacheLogORM.objects.filter(import_status__isnull=True).count(), 3)
+
+    def test_get_import_statistics(self):
+        import_status = self.dao.create_import_status()
+        other_import_status = self.dao.create_import_status()
+        self.logs_dao.create_apache_logs(apache_logs=self.apache_logs[:4], import_status_id=import_status.pk)
+        # Lines already imported keep the import that inserted them first.
+        self.logs_dao.create_apache_logs(apache_logs=self.apache_logs[3:], import_status_id=other_import_status.pk)
+
+        statistics = self.logs_dao.get_import_statistics(import_status_id=import_status.pk, addresses_count=1)
+
+        self.assertEqual(statistics, ImportStatistics(
+            count=4,
+            unique_ip_count=2,
+            sum_sizes=215,
+            client_error_rate=0.25,
+            server_error_rate=0.25,
+            min_date=datetime(2020, 12, 19, 10, 0, tzinfo=timezone.utc),
+            max_date=datetime(2020, 12, 19, 10, 3, tzinfo=timezone.utc),
+            top_ip_addresses=[CountIPAddress(ip_address="10.0.0.1", count=2)],
+            status_codes_count=[
+                CountStatusCode(status_code=200, count=2),
+                CountStatusCode(status_code=404, count=1),
+                CountStatusCode(status_code=500, count=1),
+            ],
+        ))
+        self.assertEqual(self.logs_dao.get_import_statistics(import_status_id=other_import_status.pk).count, 1)
+
+    def test_get_import_statistics_skipped_count(self):
+        import_status = self.dao.create_import_status()
+        other_import_status = self.dao.create_import_status()
+        self.logs_dao.create_apache_logs(apache_logs=self.apache_logs[:4], import_status_id=import_status.pk)
+        self.logs_dao.create_apache_logs(apache_logs=self.apache_logs[3:], import_status_id=other_import_status.pk)
+        self.dao.save_lines_count(import_status_id=other_import_status.pk, lines_count=len(self.apache_logs[3:]))
+
+        statistics = self.logs_dao.get_import_statistics(import_status_id=other_import_status.pk)
+
+        # The line inserted by the first import was skipped by ON CONFLICT DO NOTHING.
+        self.assertEqual((statistics.count, statistics.skipped_count), (1, 1))
+
+    def test_get_import_statistics_without_logs(self):
+        import_status = self.dao.create_import_status()
+
+        statistics = self.logs_dao.get_import_statistics(import_status_id=import_status.pk)
+
+        self.assertEqual(statistics.count, 0)
+        self.assertEqual(statistics.sum_sizes, 0)
+        self.assertEqual(statistics.client_error_rate, 0.0)
+        self.assertIsNone(statistics.min_date)
+
+    def test_get_import_statistics_of_bulk_import(self):
+        parts = [ImportPart(host="", sources=[]) for _ in range(2)]
+        import_status = self.dao.create_bulk_import(parts=parts, priority=0)
+        parts = list(ImportStatusORM.objects.filter(parent=import_status.pk).order_by("pk"))
+        self.logs_dao.create_apache_logs(apache_logs=self.apache_logs[:2], import_status_id=parts[0].pk)
+        self.logs_dao.create_apache_logs(apache_logs=self.apache_logs[2:], import_status_id=parts[1].pk)
+
+        self.assertEqual(self.logs_dao.get_import_statistics(import_status_id=import_status.pk).count, 5)
+        self.assertEqual(self.logs_dao.get_import_statistics(import_status_id=parts[0].pk).count, 2)
+        self.assertEqual(self.dao.get_parent_import_status(import_status_id=parts[0].pk), import_status)
+        self.assertIsNone(self.dao.get_parent_import_status(import_status_id=import_status.pk))
+
+    def test_save_import_statistics(self):
+        import_status = self.dao.create_import_status()
+        self.logs_dao.create_apache_logs(apache_logs=self.apache_logs, import_status_id=import_status.pk)
+        statistics = self.logs_dao.get_import_statistics(import_status_id=import_status.pk)
+
+        self.assertIsNone(self.dao.get_import_statistics(import_status_id=import_status.pk))
+
+        self.dao.save_import_statistics(import_status_id=import_status.pk, statistics=statistics)
+
+        self.assertEqual(self.dao.get_import_statistics(import_status_id=import_status.pk), statistics)
+        self.assertIsNone(self.dao.get_import_statistics(import_status_id=import_status.pk + 100))
+
+
+class NetworkRollupsDAOTestCase(TransactionTestCase):
+    def setUp(self) -> None:
+        self.dao = ApacheLogsDAO()
+        self.dao.create_apache_logs(apache_logs=[
+            ApacheLog(
+                ip_address=ip_address,
+                date=datetime(2021, 1, day, 10, minute, tzinfo=timezone.utc),
+                method="GET",
+                uri="/",
+                status_code=200,
+                size=size,
+                country=country,
+                asn=asn,
+            ) for ip_address, day, minute, size, country, asn in [
+                ("5.9.1.1", 1, 0, 10, "DE", 24940),
+                ("5.9.1.2", 1, 1, 10, "DE", 24940),
+                ("5.9.2.1", 2, 0, 10, "DE", 24940),
+                ("1.0.0.1", 2, 1, 5, "US", 13335),
+                ("2a01:4f8:10a::1", 2, 2, 1, "DE", 24940),
+                ("10.0.0.1", 2, 3, 1, None, None),
+            ]
+        ])
+
+    def _get_network_groups(self, group_by: str, ipv4_prefix: int = 24, ipv6_prefix: int = 48, **kwargs):
+        options = {"subnet": None, "date_from": None, "date_to": None, **kwargs}
+        return self.dao.get_network_groups(
+            group_by=group_by, ipv4_prefix=ipv4_prefix, ipv6_prefix=ipv6_prefix, **options,
+        )
+
+    def test_create_apache_logs_network_rollups(self):
+        self.assertEqual(ApacheLogORM.objects.filter(country="DE", asn=24940).count(), 4)
+        self.assertEqual(ApacheLogNetworkRollupORM.objects.count(), 5)
+
+        # Rows already imported are not counted twice.
+        self.dao.create_apache_logs(apache_logs=[ApacheLog(
+            ip_address="5.9.1.1",
+            date=datetime(2021, 1, 1, 10, 0, tzinfo=timezone.utc),
+            method="GET",
+            uri="/",
+            status_code=200,
+            size=10,
+            country="DE",
+            asn=24940,
+        )])
+
+        self.assertEqual(self._get_network_groups("subnet")[0], CountNetwork(group="5.9.1.0/24", count=2, size=20))
+
+    def test_get_network_groups_by_subnet(self):
+        self.assertEqual(self._get_network_groups("subnet", ipv4_prefix=16, ipv6_prefix=32), [
+            CountNetwork(group="5.9.0.0/16", count=3, size=30),
+            CountNetwork(group="1.0.0.0/16", count=1, size=5),
+            CountNetwork(group="10.0.0.0/16", count=1, size=1),
+            CountNetwork(group="2a01:4f8::/32", count=1, size=1),
+        ])
+
+    def test_get_network_groups_within_subnet(self):
+        self.assertEqual(self._get_network_groups("subnet", subnet="5.9.0.0/16"), [
+            CountNetwork(group="5.9.1.0/24", count=2, size=20),
+            CountNetwork(group="5.9.2.0/24", count=1, size=10),
+        ])
+
+    def test_get_network_groups_by_country_and_asn(self):
+        self.assertEqual(self._get_network_groups("country"), [
+            CountNetwork(group="DE", count=4, size=31),
+            CountNetwork(group="US", count=1, size=5),
+            CountNetwork(group=None, count=1, size=1),
+        ])
+        self.assertEqual(self._get_network_groups("asn", groups_count=1), [
+            CountNetwork(group="24940", count=4, size=31),
+        ])
+
+    def test_get_network_groups_date_range(self):
+        groups = self._get_network_groups(
+            "country",
+            date_from=datetime(2021, 1, 2, 12, tzinfo=timezone.utc),
+            date_to=datetime(2021, 1, 3, tzinfo=timezone.utc),
+        )
+
+        self.assertEqual(groups[0], CountNetwork(group="DE", count=2, size=11))
+
+
+class AnomalyEventsDAOTestCase(TransactionTestCase):
+    def setUp(self) -> None:
+        self.dao = AnomalyEventsDAO()
+        self.window_start = datetime(2021, 1, 1, 10, tzinfo=timezone.utc)
+
+    def _get_anomaly_event(self, **kwargs) -> AnomalyEvent:
+        options = {
+            "kind": "ip",
+            "key": "10.0.0.1",
+            "reason": "rate",
+            "window_start": self.window_start,
+            "window_seconds": 60,
+            "count": 700,
+            "error_count": 10,
+            **kwargs,
+        }
+        return AnomalyEvent(**options)
+
+    def _get_anomaly_events(self, **kwargs):
+        options = {
+            "kind": None,
+            "reason": None,
+            "key": None,
+            "import_status_id": None,
+            "date_from": None,
+            "date_to": None,
+            **kwargs,
+        }
+        return self.dao.get_anomaly_events(**options)
+
+    def test_create_anomaly_events(self):
+        self.dao.create_anomaly_events(anomaly_events=[self._get_anomaly_event()], import_status_id=1)
+        # The same window flagged by another part of a bulk import.
+        self.dao.create_anomaly_events(anomaly_events=[self._get_anomaly_event(count=100)], import_status_id=2)
+
+        self.assertEqual(AnomalyEventORM.objects.count(), 1)
+        self.assertEqual(self._get_anomaly_events(), [
+            self._get_anomaly_event(count=800, error_count=20, import_status_id=1),
+        ])
+
+    def test_create_anomaly_events_long_key(self):
+        self.dao.create_anomaly_events(anomaly_events=[self._get_anomaly_event(kind="uri", key="/" * 600)])
+
+        self.assertEqual(len(AnomalyEventORM.objects.get().key), 512)
+
+    def test_get_anomaly_events(self):
+        self.dao.create_anomaly_events(anomaly_events=[
+            self._get_anomaly_event(),
+            self._get_anomaly_event(reason="error_ratio"),
+            self._get_anomaly_event(kind="uri", key="/", count=7000),
+            self._get_anomaly_event(window_start=self.window_start + timedelta(minutes=1)),
+        ], import_status_id=3)
+
+        self.assertEqual(len(self._get_anomaly_events()), 4)
+        self.assertEqual(len(self._get_anomaly_events(kind="ip", reason="rate")), 2)
+        self.assertEqual([event.key for event in self._get_anomaly_events(kind="uri")], ["/"])
+        self.assertEqual(len(self._get_anomaly_events(import_status_id=4)), 0)
+        self.assertEqual(
+            [event.window_start for event in self._get_anomaly_events(
+                date_from=self.window_start + timedelta(seconds=30),
+            )],
+            [self.window_start + timedelta(minutes=1)],
+        )
+        self.assertEqual(len(self._get_anomaly_events(date_to=self.window_start + timedelta(seconds=30))), 3)
+        self.assertEqual(len(self._get_anomaly_events(events_count=1)), 1)
+
+
+class SavedSearchesDAOTestCase(TransactionTestCase):
+    def setUp(self) -> None:
+        self.dao = SavedSearchesDAO()
+        self.statistics = LogStatistics(
+            unique_ip_count=2,
+            top_ip_addresses=[CountIPAddress("10.0.0.1", 3), CountIPAddress("10.0.0.2", 1)],
+            http_methods_count=[CountMethod("GET", 4)],
+            sum_sizes=400,
+        )
+
+    def test_create_saved_search(self):
+        self.dao.create_saved_search(query="/api/")
+        self.dao.create_saved_search(query="/api/")
+        self.dao.create_saved_search(query="POST")
+
+        self.assertEqual(self.dao.get_saved_searches(), [SavedSearch(query="/api/"), SavedSearch(query="POST")])
+
+    def test_delete_saved_search(self):
+        self.dao.create_saved_search(query="/api/")
+
+        self.assertTrue(self.dao.delete_saved_search(query="/api/"))
+        self.assertFalse(self.dao.delete_saved_search(query="/api/"))
+        self.assertEqual(self.dao.get_saved_searches(), [])
+
+    def test_saved_statistics(self):
+        self.dao.create_saved_search(query="/api/")
+        self.assertIsNone(self.dao.get_saved_statistics(query="/api/", data_version="1-10"))
+
+        self.dao.save_statistics(query="/api/", data_version="1-10", statistics=self.statistics)
+
+        self.assertEqual(self.dao.get_saved_statistics(query="/api/", data_version="1-10"), self.statistics)
+        self.assertIsNone(self.dao.get_saved_statistics(query="/api/", data_version="1-11"))
+        self.assertIsNone(self.dao.get_saved_statistics(query="POST", data_version="1-10"))
+        saved_search = self.dao.get_saved_searches()[0]
+        self.assertEqual(saved_search.data_version, "1-10")
+        self.assertIsNotNone(saved_search.refreshed_at)
+
+
+class HostRateLimitsDAOTestCase(TransactionTestCase):
+    def test_reserve_request(self):
+        dao = HostRateLimitsDAO()
+
+        self.assertEqual(dao.reserve_request(host="example.com", interval=10), 0)
+        self.assertAlmostEqual(dao.reserve_request(host="example.com", interval=10), 10, delta=1)
+        self.assertAlmostEqual(dao.reserve_request(host="example.com", interval=10), 20, delta=1)
+        self.assertEqual(dao.reserve_request(host="example.org", interval=10), 0)
@@ -0,0 +1,111 @@
+import dataclasses
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+from apache_logs.dedup import BloomFilter, OccurrenceCounter, get_log_hash
+from apache_logs.entities import ApacheLog
+
+
+class GetLogHashTestCase(TestCase):
+    def setUp(self) -> None:
+        self.apache_log = ApacheLog(
+            ip_address="127.0.0.1",
+            date=datetime.strptime("19/Dec/2020:13:57:26+0100", '%d/%b/%Y:%H:%M:%S%z'),
+            method="GET",
+            uri="/index",
+            status_code=200,
+            size=123,
+        )
+
+    def test_get_log_hash_is_stable(self):
+        self.assertEqual(get_log_hash(self.apache_log), get_log_hash(self.apache_log))
+
+    def test_get_log_hash_fits_bigint(self):
+        log_hash = get_log_hash(self.apache_log)
+
+        self.assertTrue(-2 ** 63 <= log_hash < 2 ** 63)
+
+    def test_get_log_hash_differs(self):
+        other_apache_log = ApacheLog(
+            ip_address="127.0.0.1",
+            date=self.apache_log.date,
+            method="GET",
+            uri="/index",
+            status_code=200,
+            size=124,
+        )
+
+        self.assertNotEqual(get_log_hash(self.apache_log), get_log_hash(other_apache_log))
+
+    def test_get_log_hash_user_agent(self):
+        other_apache_log = dataclasses.replace(self.apache_log, user_agent="curl/7.68.0")
+
+        self.assertNotEqual(get_log_hash(self.apache_log), get_log_hash(other_apache_log))
+
+    def test_get_log_hash_occurrence(self):
+        other_apache_log = dataclasses.replace(self.apache_log, occurrence=1)
+
+        # The first occurrence hashes like lines imported before occurrences were counted.
+        self.assertEqual(get_log_hash(dataclasses.replace(self.apache_log, occurrence=0)), -4445906787236320285)
+        self.assertNotEqual(get_log_hash(self.apache_log), get_log_hash(other_apache_log))
+
+
+class OccurrenceCounterTestCase(TestCase):
+    def setUp(self) -> None:
+        self.apache_log = ApacheLog(
+            ip_address="127.0.0.1",
+            date=datetime.strptime("19/Dec/2020:13:57:26+0100", '%d/%b/%Y:%H:%M:%S%z'),
+            method="GET",
+            uri="/index",
+            status_code=200,
+            size=123,
+        )
+
+    def test_count(self):
+        occurrence_counter = OccurrenceCounter()
+        apache_logs = [
+            dataclasses.replace(self.apache_log),
+            dataclasses.replace(self.apache_log, uri="/other"),
+            dataclasses.replace(self.apache_log),
+            dataclasses.replace(self.apache_log, date=self.apache_log.date + timedelta(seconds=1)),
+        ]
+
+        occurrence_counter.count(apache_logs[:2])
+        occurrence_counter.count(apache_logs[2:])
+
+        self.assertEqual([apache_log.occurrence for apache_log in apache_logs], [0, 0, 1, 0])
+
+    def test_count_forgets_old_seconds(self):
+        occurrence_counter = OccurrenceCounter(window_seconds=60)
+        apache_logs = [
+            dataclasses.replace(self.apache_log),
+            dataclasses.replace(self.apache_log, date=self.apache_log.date + timedelta(seconds=59)),
+            dataclasses.replace(self.apache_log),
+            dataclasses.replace(self.apache_log, date=self.apache_log.date + timedelta(seconds=60)),
+            dataclasses.replace(self.apache_log),
+        ]
+
+        for apache_log in apache_logs:
+            occurrence_counter.count([apache_log])
+
+        self.assertEqual([apache_log.occurrence for apache_log in apache_logs], [0, 0, 1, 0, 0])
+        self.assertEqual(len(occurrence_counter.seconds), 2)
+
+
+class BloomFilterTestCase(TestCase):
+    def test_add(self):
+        bloom_filter = BloomFilter(capacity=1000)
+
+        bloom_filter.add(-42)
+
+        self.assertIn(-42, bloom_filter)
+
+    def test_not_added(self):
+        bloom_filter = BloomFilter(capacity=1000, error_rate=0.0001)
+
+        for log_hash in range(1000):
+            bloom_filter.add(log_hash * 7919)
+
+        false_positives = len([log_hash for log_hash in range(10 ** 9, 10 ** 9 + 1000) if log_hash in bloom_filter])
+
+        self.assertLess(false_positives, 10)
@@ -0,0 +1,73 @@
+import gzip
+import importlib.util
+import io
+import json
+from datetime import datetime, timezone
+from unittest import TestCase, skipUnless
+
+from apache_logs.exporters import export_csv, export_jsonl, export_parquet, gzip_encode, zstd_encode
+
+
+class ExportersTestCase(TestCase):
+    def setUp(self) -> None:
+        self.rows = [
+            ("127.0.0.1", datetime(2021, 1, 1, tzinfo=timezone.utc), "GET", "/index,\"1\"", 200, 123),
+            ("13.66.139.0", datetime(2021, 1, 2, tzinfo=timezone.utc), "POST", "/index", 404, 0),
+            ("127.0.0.1", datetime(2021, 1, 3, tzinfo=timezone.utc), "GET", "/", 500, 1),
+        ]
+
+    def test_export_csv(self):
+        chunks = list(export_csv(iter(self.rows), batch_size=2))
+
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(b"".join(chunks).decode("utf-8").splitlines(), [
+            "ip_address,date,method,uri,status_code,size",
+            "127.0.0.1,2021-01-01T00:00:00+00:00,GET,\"/index,\"\"1\"\"\",200,123",
+            "13.66.139.0,2021-01-02T00:00:00+00:00,POST,/index,404,0",
+            "127.0.0.1,2021-01-03T00:00:00+00:00,GET,/,500,1",
+        ])
+
+    def test_export_csv_empty(self):
+        data = b"".join(export_csv(iter([]), batch_size=2))
+
+        self.assertEqual(data, b"ip_address,date,method,uri,status_code,size\r\n")
+
+    def test_export_jsonl(self):
+        lines = b"".join(export_jsonl(iter(self.rows), batch_size=2)).decode("utf-8").splitlines()
+
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[0]), {
+            "ip_address": "127.0.0.1",
+            "date": "2021-01-01T00:00:00+00:00",
+            "method": "GET",
+            "uri": "/index,\"1\"",
+            "status_code": 200,
+            "size": 123,
+        })
+
+    def test_gzip_encode(self):
+        data = b"".join(gzip_encode(export_jsonl(iter(self.rows), batch_size=2)))
+
+        self.assertEqual(gzip.decompress(data), b"".join(export_jsonl(iter(self.rows), batch_size=2)))
+
+    @skipUnless(importlib.util.find_spec("zstandard"), "zstandard is not installed")
+    def test_zstd_encode(self):
+        import zstandard
+
+        data = b"".join(zstd_encode(export_jsonl(iter(self.rows), batch_size=2)))
+
+        self.assertEqual(
+            zstandard.ZstdDecompressor().decompressobj().decompress(data),
+            b"".join(export_jsonl(iter(self.rows), batch_size=2)),
+        )
+
+    @skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_export_parquet(self):
+        import pyarrow.parquet
+
+        data = b"".join(export_parquet(iter(self.rows), batch_size=2))
+
+        parquet_file = pyarrow.parquet.ParquetFile(io.BytesIO(data))
+        self.assertEqual(parquet_file.metadata.num_rows, 3)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 2)
+        self.assertEqual(parquet_file.read().column("uri").to_pylist(), ["/index,\"1\"", "/index", "/"])
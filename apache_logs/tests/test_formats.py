@@ -0,0 +1,81 @@
+from unittest import TestCase
+
+from apache_logs.formats import LOG_PARSERS, SplitLogParser, RegexLogParser, LogFormatError, compile_log_format, \
+    detect_log_parser, get_log_parser
+
+COMMON_LINE = b'127.0.0.1 - frank [10/Oct/2000:13:55:36 -0700] "GET /apache_pb.gif HTTP/1.0" 200 2326'
+COMBINED_LINE = COMMON_LINE + b' "http://www.example.com/start.html" "Mozilla/4.08 [en] (Win98; I ;Nav)"'
+
+
+class CompileLogFormatTestCase(TestCase):
+    def test_common_is_split(self):
+        log_parser = LOG_PARSERS["common"]
+
+        self.assertIsInstance(log_parser, SplitLogParser)
+        self.assertEqual(log_parser.parse(COMBINED_LINE), (
+            b"127.0.0.1", b"10/Oct/2000:13:55:36", b"-0700", b"GET", b"/apache_pb.gif", b"200", b"2326",
+            None, None, None,
+        ))
+
+    def test_common_short_line(self):
+        self.assertIsNone(LOG_PARSERS["common"].parse(b'127.0.0.1 - - [10/Oct/2000:13:55:36 -0700]'))
+
+    def test_combined_is_regex(self):
+        log_parser = LOG_PARSERS["combined"]
+
+        self.assertIsInstance(log_parser, RegexLogParser)
+        self.assertEqual(log_parser.parse(COMBINED_LINE), (
+            b"127.0.0.1", b"10/Oct/2000:13:55:36", b"-0700", b"GET", b"/apache_pb.gif", b"200", b"2326",
+            b"http://www.example.com/start.html", b"Mozilla/4.08 [en] (Win98; I ;Nav)", None,
+        ))
+        self.assertIsNone(log_parser.parse(COMMON_LINE))
+
+    def test_escaped_quotes(self):
+        line = COMMON_LINE + b' "-" "say \\"hi\\""'
+
+        self.assertEqual(LOG_PARSERS["combined"].parse(line)[7:9], (b"-", b'say \\"hi\\"'))
+
+    def test_trailing_quoted_field_is_split(self):
+        log_parser = compile_log_format('%h %l %u %t "%r" %>s %b "%{User-agent}i"')
+
+        self.assertIsInstance(log_parser, SplitLogParser)
+        self.assertEqual(
+            log_parser.parse(COMMON_LINE + b' "Mozilla/5.0 (X11; Linux)" ')[8],
+            b"Mozilla/5.0 (X11; Linux)",
+        )
+
+    def test_response_time(self):
+        self.assertEqual(LOG_PARSERS["combined_time"].parse(COMBINED_LINE + b" 1500")[9], b"1500")
+        self.assertEqual(LOG_PARSERS["combined_time"].response_time_scale, 1)
+        self.assertEqual(LOG_PARSERS["nginx_time"].parse(COMBINED_LINE + b" 0.015")[9], b"0.015")
+        self.assertEqual(LOG_PARSERS["nginx_time"].response_time_scale, 1_000_000)
+
+    def test_unknown_directives(self):
+        log_parser = compile_log_format('%h %l %u %t "%r" %>s %b %{X-Request-Id}e "%{Host}i" %D')
+
+        self.assertEqual(
+            log_parser.parse(COMMON_LINE + b' abc "example.com" 12'),
+            LOG_PARSERS["common"].parse(COMMON_LINE)[:9] + (b"12",),
+        )
+
+    def test_missing_fields(self):
+        with self.assertRaises(LogFormatError):
+            compile_log_format("%h %t %b")
+
+    def test_get_log_parser(self):
+        self.assertIs(get_log_parser("combined"), LOG_PARSERS["combined"])
+        self.assertIsInstance(get_log_parser('%h %l %u %t "%r" %>s %b'), SplitLogParser)
+
+
+class DetectLogParserTestCase(TestCase):
+    def test_most_specific_format(self):
+        self.assertEqual(detect_log_parser([COMMON_LINE, b""]).name, "common")
+        self.assertEqual(detect_log_parser([COMBINED_LINE]).name, "combined")
+        self.assertEqual(detect_log_parser([COMBINED_LINE + b" 1500"]).name, "combined_time")
+        self.assertEqual(detect_log_parser([COMBINED_LINE + b" 0.015"]).name, "nginx_time")
+
+    def test_most_matches(self):
+        self.assertEqual(detect_log_parser([COMBINED_LINE, COMMON_LINE, COMMON_LINE]).name, "common")
+
+    def test_unknown_format(self):
+        self.assertIsNone(detect_log_parser([b"first", b"second"]))
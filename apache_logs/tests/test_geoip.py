@@ -0,0 +1,68 @@
+import gzip
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from apache_logs.daos import GeoIPDAO
+from apache_logs.geoip import IPRangeDatabase, GeoIPFormatError
+
+DATABASE = (
+    "1.0.0.0\t1.0.0.255\t13335\tUS\tCLOUDFLARENET\n"
+    "1.0.1.0\t1.0.3.255\t0\tNone\tNot routed\n"
+    "5.9.0.0\t5.9.255.255\t24940\tDE\tHETZNER-AS\n"
+    "2a01:4f8::\t2a01:4f8:ffff:ffff:ffff:ffff:ffff:ffff\t24940\tDE\tHETZNER-AS\n"
+)
+
+
+class IPRangeDatabaseTestCase(TestCase):
+    def setUp(self) -> None:
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.path)
+
+    def _write(self, name: str, content: str) -> str:
+        path = os.path.join(self.path, name)
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(path, "wt") as database_file:
+            database_file.write(content)
+        return path
+
+    def test_lookup(self):
+        database = IPRangeDatabase.load(self._write("ip2asn.tsv", DATABASE))
+
+        self.assertEqual(len(database), 4)
+        self.assertEqual(database.lookup("1.0.0.1"), ("US", 13335))
+        self.assertEqual(database.lookup("5.9.255.255"), ("DE", 24940))
+        self.assertEqual(database.lookup("2a01:4f8:10a::1"), ("DE", 24940))
+        self.assertEqual(database.lookup("::ffff:5.9.1.1"), ("DE", 24940))
+
+    def test_lookup_unknown(self):
+        database = IPRangeDatabase.load(self._write("ip2asn.tsv", DATABASE))
+
+        self.assertEqual(database.lookup("1.0.2.1"), (None, None))
+        self.assertEqual(database.lookup("0.0.0.1"), (None, None))
+        self.assertEqual(database.lookup("5.10.0.0"), (None, None))
+        self.assertEqual(database.lookup("2001:db8::1"), (None, None))
+        self.assertEqual(database.lookup("not an ip"), (None, None))
+
+    def test_load_gzip(self):
+        database = IPRangeDatabase.load(self._write("ip2asn.tsv.gz", DATABASE))
+
+        self.assertEqual(database.lookup("1.0.0.1"), ("US", 13335))
+
+    def test_load_invalid(self):
+        with self.assertRaises(GeoIPFormatError):
+            IPRangeDatabase.load(self._write("ip2asn.tsv", "1.0.0.0\t2a01:4f8::\t1\tUS\n"))
+
+        with self.assertRaises(GeoIPFormatError):
+            IPRangeDatabase.load(self._write("ip2asn.tsv", "1.0.0.0\t1.0.0.255\n"))
+
+    def test_geoip_dao_caches_lookups(self):
+        dao = GeoIPDAO(path=self._write("ip2asn.tsv", DATABASE), cache_size=10)
+
+        for _ in range(3):
+            self.assertEqual(dao.get_ip_location("5.9.1.1"), ("DE", 24940))
+
+        self.assertEqual(dao._lookup.cache_info().hits, 2)
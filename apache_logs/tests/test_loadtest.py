@@ -0,0 +1,105 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+
+from apache_logs.loadtest import LoadTest, Endpoint, HTTPConnection, get_percentile
+
+
+class DashboardHandler(BaseHTTPRequestHandler):
+    # Keeps connections open, except for /close; /error fails.
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        body = b"error" if self.path == "/error" else b"ok" * 1000
+
+        self.send_response(500 if self.path == "/error" else 200)
+        if self.path == "/chunked":
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.wfile.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(body), body))
+            return
+
+        self.send_header("Content-Length", str(len(body)))
+        if self.path == "/close":
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class LoadTestTestCase(TestCase):
+    def setUp(self) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), DashboardHandler)
+        self.server.daemon_threads = True
+        self.server.connections = set()
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _get(self, *paths):
+        async def get():
+            connection = HTTPConnection(host="127.0.0.1", port=self.port, timeout=5)
+            try:
+                return [await connection.get(path) for path in paths]
+            finally:
+                await connection.close()
+
+        return asyncio.run(get())
+
+    def test_get_percentile(self):
+        values = [float(value) for value in range(1, 101)]
+
+        self.assertEqual(get_percentile(values, 50), 50.0)
+        self.assertEqual(get_percentile(values, 99), 99.0)
+        self.assertEqual(get_percentile([0.5], 95), 0.5)
+        self.assertEqual(get_percentile([], 95), 0.0)
+
+    def test_connection_keep_alive(self):
+        responses = self._get("/", "/chunked", "/")
+
+        self.assertEqual(responses, [(200, b"ok" * 1000)] * 3)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_connection_close(self):
+        responses = self._get("/close", "/close")
+
+        self.assertEqual([status for status, _ in responses], [200, 200])
+        self.assertEqual(len(self.server.connections), 2)
+
+    def test_execute(self):
+        samples = iter([{"active": 2, "idle": 3}, {"active": 4}])
+        load_test = LoadTest(
+            host="127.0.0.1",
+            port=self.port,
+            users=5,
+            seconds=0.5,
+            endpoints=[
+                Endpoint(name="index", path="/", weight=0.7),
+                Endpoint(name="broken", path="/error", weight=0.3),
+            ],
+            think_seconds=0.01,
+            sample_connections=lambda: next(samples, {}),
+            sample_seconds=0.2,
+        )
+
+        report = load_test.execute()
+
+        total, index, broken = report.endpoints
+        self.assertEqual(report.users, 5)
+        self.assertEqual(total.name, "all")
+        self.assertGreater(index.requests_count, 0)
+        self.assertEqual(index.errors_count, 0)
+        self.assertEqual(broken.errors_count, broken.requests_count)
+        self.assertEqual(total.requests_count, index.requests_count + broken.requests_count)
+        self.assertLessEqual(total.p50_seconds, total.p99_seconds)
+        self.assertLessEqual(total.p99_seconds, total.max_seconds)
+        self.assertEqual(report.max_connections, 5)
+        self.assertEqual(report.max_connections_by_state, {"active": 4, "idle": 3})
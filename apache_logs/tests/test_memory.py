@@ -0,0 +1,291 @@
+import gc
+import os
+import threading
+import tracemalloc
+from datetime import datetime, timedelta
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, Optional
+from unittest import TestCase, mock
+
+import requests
+
+from apache_logs.chunking import KB, MB
+from apache_logs.daos import RequestDAO
+from apache_logs.entities import ImportStatus
+from apache_logs.usecases import ParseLogsUseCase, AsyncParseLogsUseCase
+
+# Size of the generated log, MEMORY_TEST_SIZE_MB=4096 runs the suite on 4 GB.
+SIZE_MB = int(os.environ.get("MEMORY_TEST_SIZE_MB", 16))
+# Slices of at most RANGE_SIZE are in memory at a time, SLICES_BUDGET_MB covers them and the interpreter noise.
+RANGE_SIZE = MB
+SLICES_BUDGET_MB = float(os.environ.get("MEMORY_TEST_SLICES_BUDGET_MB", 64))
+# Memory that may grow with the input (the Bloom filter of the deduplication), in MB per MB of input.
+BUDGET_PER_MB = float(os.environ.get("MEMORY_TEST_BUDGET_PER_MB", 0.1))
+# tracemalloc makes the import about ten times slower, so only the first TRACED_MB are traced.
+TRACED_MB = int(os.environ.get("MEMORY_TEST_TRACED_MB", 2))
+TOP_ALLOCATIONS = 10
+
+START = datetime(2021, 1, 1)
+BLOCK_SIZE = 256 * KB
+
+
+def get_log_line(index: int, date: str) -> bytes:
+    # Every line has the same length, so the line of any byte offset is known without generating the file.
+    return (
+        f"10.{100 + index // 100 % 100}.{100 + index % 100}.1 - - [{date} +0000] "
+        f"\"GET /page/{index:012d} HTTP/1.1\" {(200, 200, 200, 404, 500)[index % 5]} {1000 + index % 9000}\n"
+    ).encode()
+
+
+LINE_SIZE = len(get_log_line(0, START.strftime("%d/%b/%Y:%H:%M:%S")))
+
+
+def get_log_bytes(from_bytes: int, to_bytes: int) -> bytes:
+    first_line = from_bytes // LINE_SIZE
+    dates = {}
+    lines = []
+
+    for index in range(first_line, to_bytes // LINE_SIZE + 1):
+        second = index // 10
+        if second not in dates:
+            dates[second] = (START + timedelta(seconds=second)).strftime("%d/%b/%Y:%H:%M:%S")
+        lines.append(get_log_line(index, dates[second]))
+
+    offset = from_bytes - first_line * LINE_SIZE
+
+    return b"".join(lines)[offset:offset + to_bytes - from_bytes + 1]
+
+
+class SyntheticLogHandler(BaseHTTPRequestHandler):
+    # Serves `server.size` bytes of generated log lines, range requests only with `server.accept_ranges`.
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_headers(self, status: int, length: int, content_range: Optional[str] = None):
+        self.send_response(status)
+        if self.server.accept_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if content_range:
+            self.send_header("Content-Range", content_range)
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._send_headers(200, self.server.size)
+
+    def do_GET(self):
+        from_bytes, to_bytes = 0, self.server.size - 1
+        range_header = self.headers.get("Range")
+
+        if range_header and self.server.accept_ranges:
+            from_bytes, to_bytes = (int(value) for value in range_header[len("bytes="):].split("-"))
+            to_bytes = min(to_bytes, self.server.size - 1)
+            self._send_headers(206, to_bytes - from_bytes + 1, f"bytes {from_bytes}-{to_bytes}/{self.server.size}")
+        else:
+            self._send_headers(200, self.server.size)
+
+        for block_from in range(from_bytes, to_bytes + 1, BLOCK_SIZE):
+            self.wfile.write(get_log_bytes(block_from, min(block_from + BLOCK_SIZE - 1, to_bytes)))
+
+
+def _get_proc_status(field: str) -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * KB
+
+    return 0
+
+
+def _reset_peak_rss() -> Optional[int]:
+    # Linux only: writing 5 to clear_refs resets VmHWM, the peak RSS, to the current RSS.
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        return None
+
+    return _get_proc_status("VmRSS")
+
+
+class MemoryProfile:
+    # Peak RSS of the whole import. While the first `traced_size` bytes are fetched, also the most
+    # memory tracemalloc traced when a call of each stage returned, with a snapshot of the top
+    # allocations taken whenever that grew by a quarter.
+
+    def __init__(self, traced_size: int):
+        self.traced_size = traced_size
+        self.fetched_size = 0
+        self.rss_before: Optional[int] = None
+        self.rss_peak: Optional[int] = None
+        self.traced_peak: Optional[int] = None
+        self.stage_peaks: Dict[str, int] = {}
+        self.stage_snapshots: Dict[str, tracemalloc.Snapshot] = {}
+        self.snapshot_sizes: Dict[str, int] = {}
+
+    def start(self):
+        gc.collect()
+        if self.traced_size:
+            tracemalloc.start()
+        self.rss_before = _reset_peak_rss()
+
+    def _stop_tracing(self):
+        if tracemalloc.is_tracing():
+            self.traced_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def stop(self):
+        self._stop_tracing()
+        if self.rss_before is not None:
+            self.rss_peak = _get_proc_status("VmHWM")
+
+    def _record(self, stage: str, size: int = 0):
+        self.fetched_size += size
+        if not tracemalloc.is_tracing():
+            return
+        if self.fetched_size > self.traced_size:
+            self._stop_tracing()
+            return
+
+        traced = tracemalloc.get_traced_memory()[0]
+        if traced <= self.stage_peaks.get(stage, 0):
+            return
+
+        self.stage_peaks[stage] = traced
+        if traced > self.snapshot_sizes.get(stage, 0) * 1.25:
+            self.snapshot_sizes[stage] = traced
+            self.stage_snapshots[stage] = tracemalloc.take_snapshot()
+
+    def wrap(self, stage: str, func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            result = func(*args, **kwargs)
+            self._record(stage)
+            return result
+
+        return wrapper
+
+    def wrap_fetch(self, func: Callable[..., bytes]) -> Callable[..., bytes]:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            content = func(*args, **kwargs)
+            self._record("fetch", size=len(content))
+            return content
+
+        return wrapper
+
+    def wrap_fetch_iterator(self, func: Callable[..., Iterator[bytes]]) -> Callable[..., Iterator[bytes]]:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            for content in func(*args, **kwargs):
+                self._record("fetch", size=len(content))
+                yield content
+
+        return wrapper
+
+    @property
+    def rss_growth(self) -> Optional[int]:
+        return None if self.rss_peak is None else self.rss_peak - self.rss_before
+
+    def format(self) -> str:
+        lines = []
+        if self.traced_peak is not None:
+            lines.append(f"traced peak {self.traced_peak / MB:.1f} MB")
+        if self.rss_growth is not None:
+            lines.append(f"peak RSS {self.rss_peak / MB:.1f} MB, {self.rss_growth / MB:.1f} MB over the start")
+
+        for stage, peak in self.stage_peaks.items():
+            lines.append(f"{stage}: {peak / MB:.1f} MB traced")
+            statistics = self.stage_snapshots[stage].filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+            ]).statistics("lineno")
+            lines.extend(f"    {statistic}" for statistic in statistics[:TOP_ALLOCATIONS])
+
+        return "\n".join(lines)
+
+
+class ImportMemoryTestCase(TestCase):
+    # Imports SIZE_MB of generated logs from a local HTTP server through the real RequestDAO;
+    # the database is left out, inserted logs are only counted.
+
+    def setUp(self) -> None:
+        self.size = SIZE_MB * MB // LINE_SIZE * LINE_SIZE
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), SyntheticLogHandler)
+        self.server.size = self.size
+        self.server.accept_ranges = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/access.log"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.session = requests.Session()
+        self.logs_count = 0
+
+    def tearDown(self) -> None:
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _count_logs(self, apache_logs, import_status_id=None):
+        self.logs_count += len(apache_logs)
+
+    def _import(self, usecase_class, accept_ranges: bool) -> MemoryProfile:
+        self.server.accept_ranges = accept_ranges
+        logs_dao = mock.Mock()
+        logs_dao.create_apache_logs = self._count_logs
+        logs_dao.iterate_log_hashes.return_value = []
+        import_status_dao = mock.Mock()
+        import_status_dao.create_import_status.return_value = ImportStatus(pk=1, percent=0, status="start")
+        request_dao = RequestDAO(session=self.session)
+        usecase = usecase_class(
+            logs_dao,
+            request_dao,
+            import_status_dao,
+            max_range_size=RANGE_SIZE,
+            target_range_seconds=0.05,
+        )
+
+        profile = MemoryProfile(traced_size=TRACED_MB * MB)
+        request_dao.get_partial_content = profile.wrap_fetch(request_dao.get_partial_content)
+        request_dao.iter_full_content = profile.wrap_fetch_iterator(request_dao.iter_full_content)
+        usecase._parse_logs = profile.wrap("parse", usecase._parse_logs)
+        usecase._create_apache_logs = profile.wrap("write", usecase._create_apache_logs)
+
+        profile.start()
+        try:
+            usecase.execute(url=self.url)
+        finally:
+            profile.stop()
+
+        self.assertEqual(self.logs_count, self.size // LINE_SIZE)
+
+        return profile
+
+    def _assert_memory_budget(self, profile: MemoryProfile):
+        # Memory above the slices in flight, per MB of input; tracemalloc only saw the first TRACED_MB.
+        for name, growth, size_mb in (
+            ("traced", profile.traced_peak, min(TRACED_MB, SIZE_MB)),
+            ("RSS", profile.rss_growth, SIZE_MB),
+        ):
+            if growth is None:
+                continue
+
+            per_mb = max(growth / MB - SLICES_BUDGET_MB, 0) / size_mb
+            self.assertLessEqual(
+                per_mb,
+                BUDGET_PER_MB,
+                f"{name} memory {per_mb:.3f} MB per MB of input is over the budget of {BUDGET_PER_MB} MB "
+                f"(import of {SIZE_MB} MB)\n{profile.format()}",
+            )
+
+    def test_import_ranges(self):
+        self._assert_memory_budget(self._import(ParseLogsUseCase, accept_ranges=True))
+
+    def test_import_full(self):
+        self._assert_memory_budget(self._import(ParseLogsUseCase, accept_ranges=False))
+
+    def test_async_import_ranges(self):
+        self._assert_memory_budget(self._import(AsyncParseLogsUseCase, accept_ranges=True))
+
+    def test_async_import_full(self):
+        self._assert_memory_budget(self._import(AsyncParseLogsUseCase, accept_ranges=False))
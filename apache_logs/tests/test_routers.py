@@ -0,0 +1,49 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from apache_logs.models import ApacheLogORM, ImportStatusORM
+from apache_logs.routers import ReplicaRouter, get_read_database, read_from_replica
+
+
+class ReplicaRouterTestCase(TransactionTestCase):
+    def setUp(self) -> None:
+        self.router = ReplicaRouter()
+
+    def test_db_for_read_outside_view(self):
+        self.assertIsNone(self.router.db_for_read(ApacheLogORM))
+
+    @override_settings(DATABASE_REPLICAS=["replica_0"], DATABASE_PRIMARY_READS_AFTER_IMPORT_SECONDS=0)
+    def test_db_for_read_inside_view(self):
+        view = read_from_replica(lambda request: self.router.db_for_read(ApacheLogORM))
+
+        self.assertEqual(view(mock.Mock()), "replica_0")
+        self.assertIsNone(self.router.db_for_read(ApacheLogORM))
+
+    def test_db_for_write(self):
+        self.assertEqual(self.router.db_for_write(ApacheLogORM), "default")
+
+    def test_allow_migrate(self):
+        self.assertTrue(self.router.allow_migrate("default", "apache_logs"))
+        self.assertFalse(self.router.allow_migrate("replica_0", "apache_logs"))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_get_read_database_without_replicas(self):
+        self.assertEqual(get_read_database(), "default")
+
+    @override_settings(DATABASE_REPLICAS=["replica_0"], DATABASE_PRIMARY_READS_AFTER_IMPORT_SECONDS=60)
+    def test_get_read_database_after_import(self):
+        ImportStatusORM.objects.create(status=ImportStatusORM.STATUS_FINISH, finished_at=timezone.now())
+
+        self.assertEqual(get_read_database(), "default")
+
+    @override_settings(DATABASE_REPLICAS=["replica_0"], DATABASE_PRIMARY_READS_AFTER_IMPORT_SECONDS=60)
+    def test_get_read_database_long_after_import(self):
+        ImportStatusORM.objects.create(
+            status=ImportStatusORM.STATUS_FINISH,
+            finished_at=timezone.now() - timedelta(minutes=5),
+        )
+
+        self.assertEqual(get_read_database(), "replica_0")
@@ -0,0 +1,201 @@
+import os
+import shutil
+import tempfile
+from dataclasses import replace
+from datetime import datetime, timezone, timedelta
+from unittest import TestCase
+
+from django.test import TransactionTestCase
+
+from apache_logs.daos import LogSegmentsDAO, ApacheLogsDAO
+from apache_logs.entities import ApacheLog, CountIPAddress, CountMethod
+from apache_logs.models import ApacheLogORM
+from apache_logs.segments import write_segment, read_segment_header, LogSegmentReader, SegmentFormatError
+from apache_logs.usecases import RebuildFromSegmentsUseCase
+
+UTC_PLUS_ONE = timezone(timedelta(hours=1))
+
+APACHE_LOGS = [
+    ApacheLog(
+        ip_address="127.0.0.1",
+        date=datetime(2020, 12, 19, 13, 57, 26, tzinfo=UTC_PLUS_ONE),
+        method="GET",
+        uri="/index.html?q=ü",
+        status_code=200,
+        size=1024,
+    ),
+    ApacheLog(
+        ip_address="2001:db8::1",
+        date=datetime(2020, 12, 18, 10, 0, 0, tzinfo=timezone.utc),
+        method="POST",
+        uri="",
+        status_code=404,
+        size=0,
+        referrer="http://example.com/",
+        user_agent="",
+        response_time=1500,
+    ),
+    ApacheLog(
+        ip_address="::ffff:102:304",
+        date=datetime(2020, 12, 20, 0, 0, 0, tzinfo=timezone.utc),
+        method="DELETE",
+        uri="/api",
+        status_code=500,
+        size=99,
+        response_time=0,
+    ),
+]
+
+
+class SegmentFormatTestCase(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "segment")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+
+    def test_write_segment(self):
+        segment = write_segment(self.path, apache_logs=APACHE_LOGS, source="http://example.com/access.log")
+
+        self.assertEqual(segment.rows, 3)
+        self.assertEqual(segment.source, "http://example.com/access.log")
+        self.assertEqual(segment.min_date, datetime(2020, 12, 18, 10, tzinfo=timezone.utc))
+        self.assertEqual(segment.max_date, datetime(2020, 12, 20, tzinfo=timezone.utc))
+        self.assertEqual(read_segment_header(self.path), segment)
+        self.assertEqual(os.path.getsize(os.path.join(self.path, "date")), 3 * 8)
+        self.assertEqual(os.path.getsize(os.path.join(self.path, "ip_address")), 3 * 16)
+
+    def test_read_segment(self):
+        write_segment(self.path, apache_logs=APACHE_LOGS)
+
+        with LogSegmentReader(self.path) as reader:
+            self.assertEqual(len(reader), 3)
+            self.assertEqual(list(reader.columns["size"]), [1024, 0, 99])
+            chunks = list(reader.iterate_logs(chunk_size=2))
+
+        self.assertEqual(chunks, [APACHE_LOGS[:2], APACHE_LOGS[2:]])
+        # The logged UTC offset is kept, so log hashes stay the same.
+        self.assertEqual(chunks[0][0].date.isoformat(), "2020-12-19T13:57:26+01:00")
+
+    def test_read_segment_occurrences(self):
+        apache_logs = [APACHE_LOGS[0], replace(APACHE_LOGS[0], occurrence=1)]
+        write_segment(self.path, apache_logs=apache_logs)
+
+        with LogSegmentReader(self.path) as reader:
+            self.assertEqual(list(reader.iterate_logs(chunk_size=10)), [apache_logs])
+
+    def test_read_segment_without_occurrences(self):
+        # Written before occurrences were stored.
+        write_segment(self.path, apache_logs=APACHE_LOGS)
+        os.remove(os.path.join(self.path, "occurrence"))
+
+        with LogSegmentReader(self.path) as reader:
+            self.assertEqual(list(reader.iterate_logs(chunk_size=10)), [APACHE_LOGS])
+
+    def test_write_empty_segment(self):
+        with self.assertRaises(SegmentFormatError):
+            write_segment(self.path, apache_logs=[])
+
+    def test_read_invalid_segment(self):
+        write_segment(self.path, apache_logs=APACHE_LOGS)
+        with open(os.path.join(self.path, "header"), "r+b") as header_file:
+            header_file.write(b"NOTSEG01")
+
+        with self.assertRaises(SegmentFormatError):
+            LogSegmentReader(self.path)
+
+    def test_read_truncated_column(self):
+        write_segment(self.path, apache_logs=APACHE_LOGS)
+        with open(os.path.join(self.path, "size"), "r+b") as column_file:
+            column_file.truncate(8)
+
+        with self.assertRaises(SegmentFormatError):
+            LogSegmentReader(self.path)
+
+
+class LogSegmentsDAOTestCase(TestCase):
+    def setUp(self) -> None:
+        self.path = tempfile.mkdtemp()
+        self.dao = LogSegmentsDAO(path=self.path)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.path)
+
+    def test_create_segment(self):
+        self.assertIsNone(self.dao.create_segment(apache_logs=[], source="a"))
+        first_segment = self.dao.create_segment(apache_logs=APACHE_LOGS[:1], source="a")
+        second_segment = self.dao.create_segment(apache_logs=APACHE_LOGS[1:], source="b")
+
+        self.assertEqual(self.dao.get_segments(), [second_segment, first_segment])
+        self.assertEqual(self.dao.get_segments(source="a"), [first_segment])
+        self.assertEqual(
+            [apache_logs for apache_logs in self.dao.iterate_segment_logs(second_segment, chunk_size=10)],
+            [APACHE_LOGS[1:]],
+        )
+
+    def test_get_segments_skips_unfinished(self):
+        self.dao.create_segment(apache_logs=APACHE_LOGS, source="a")
+        os.makedirs(os.path.join(self.path, ".unfinished.tmp"))
+
+        self.assertEqual(len(self.dao.get_segments()), 1)
+
+    def test_iterate_logs(self):
+        self.dao.create_segment(apache_logs=APACHE_LOGS, source="a")
+
+        rows = list(self.dao.iterate_logs(query="", chunk_size=2))
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1], ("2001:db8::1", APACHE_LOGS[1].date, "POST", "", 404, 0))
+        self.assertEqual(rows[0][1].utcoffset(), timedelta(0))
+        self.assertEqual([row[3] for row in self.dao.iterate_logs(query="INDEX", chunk_size=2)], ["/index.html?q=ü"])
+        self.assertEqual([row[2] for row in self.dao.iterate_logs(query="12-19 12:57", chunk_size=2)], ["GET"])
+
+    def test_get_statistics(self):
+        self.dao.create_segment(apache_logs=APACHE_LOGS, source="a")
+        self.dao.create_segment(apache_logs=APACHE_LOGS[:1], source="b")
+
+        statistics = self.dao.get_statistics(source=None, addresses_count=1)
+
+        self.assertEqual(statistics.unique_ip_count, 3)
+        self.assertEqual(statistics.top_ip_addresses, [CountIPAddress(ip_address="127.0.0.1", count=2)])
+        self.assertEqual(statistics.http_methods_count, [
+            CountMethod(method="GET", count=2),
+            CountMethod(method="POST", count=1),
+            CountMethod(method="DELETE", count=1),
+        ])
+        self.assertEqual(statistics.sum_sizes, 2147)
+        self.assertEqual(self.dao.get_statistics(source="b").sum_sizes, 1024)
+
+    def test_delete_segments_before(self):
+        self.dao.create_segment(apache_logs=APACHE_LOGS[:2], source="a")
+        self.dao.create_segment(apache_logs=APACHE_LOGS[2:], source="b")
+
+        deleted = self.dao.delete_segments_before(date=datetime(2020, 12, 19, 13, tzinfo=timezone.utc))
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual([segment.source for segment in self.dao.get_segments()], ["b"])
+
+
+class RebuildFromSegmentsTestCase(TransactionTestCase):
+    def setUp(self) -> None:
+        self.path = tempfile.mkdtemp()
+        self.segments_dao = LogSegmentsDAO(path=self.path)
+        self.logs_dao = ApacheLogsDAO()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.path)
+
+    def test_execute(self):
+        self.segments_dao.create_segment(apache_logs=APACHE_LOGS, source="a")
+        self.logs_dao.create_apache_logs(apache_logs=APACHE_LOGS[:1])
+        usecase = RebuildFromSegmentsUseCase(logs_dao=self.logs_dao, segments_dao=self.segments_dao, chunk_size=2)
+
+        logs_count = usecase.execute()
+
+        # The row imported before has the same hash and is not inserted twice.
+        self.assertEqual(logs_count, 3)
+        self.assertEqual(ApacheLogORM.objects.count(), 3)
+        self.assertEqual(ApacheLogORM.objects.get(method="POST").referrer, "http://example.com/")
+        # Stays an IPv6 address, Postgres prints IPv4-mapped addresses dotted.
+        self.assertEqual(ApacheLogORM.objects.get(method="DELETE").ip_address, "::ffff:1.2.3.4")
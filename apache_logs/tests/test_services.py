@@ -1,24 +1,64 @@
+import os
 from unittest import TestCase, mock
 
-from apache_logs.services import ParseLogsCeleryService
+from apache_logs.services import ParseLogsCeleryService, BulkImportCeleryService, ParseLogsLocalService
 
 
 class ServicesTestCase(TestCase):
-    @mock.patch("apache_logs.services.parse_logs_task")
-    def test_parse_logs_celery_service__valid_url(self, parse_logs_task_mock: mock.Mock):
+    @mock.patch("apache_logs.services._schedule_imports")
+    @mock.patch("apache_logs.services.ImportStatusDAO")
+    def test_parse_logs_celery_service__valid_url(self, dao_mock: mock.Mock, schedule_imports_mock: mock.Mock):
         parse_logs_celery_service = ParseLogsCeleryService()
-        url = "https://url.com"
+        url = "https://url.com:8080/access.log"
 
-        parse_logs_celery_service.execute(url=url)
+        import_job = parse_logs_celery_service.execute(url=url, priority=5)
 
-        parse_logs_task_mock.delay.assert_called_once_with(url)
+        dao_mock.return_value.create_import_job.assert_called_once_with(url=url, host="url.com", priority=5)
+        self.assertEqual(import_job, dao_mock.return_value.create_import_job.return_value)
+        schedule_imports_mock.assert_called_once_with()
 
-    @mock.patch("apache_logs.services.parse_logs_task")
-    def test_parse_logs_celery_service__invalid_url(self, parse_logs_task_mock: mock.Mock):
+    @mock.patch("apache_logs.services._schedule_imports")
+    @mock.patch("apache_logs.services.ImportStatusDAO")
+    def test_parse_logs_celery_service__invalid_url(self, dao_mock: mock.Mock, schedule_imports_mock: mock.Mock):
         parse_logs_celery_service = ParseLogsCeleryService()
         url = "invalid_url"
 
         with self.assertRaises(ParseLogsCeleryService.ParseLogsCeleryValidationError):
             parse_logs_celery_service.execute(url=url)
 
-            parse_logs_task_mock.delay.assert_not_called()
+        dao_mock.return_value.create_import_job.assert_not_called()
+        schedule_imports_mock.assert_not_called()
+
+
+class BulkImportCeleryServiceTestCase(TestCase):
+    @mock.patch("apache_logs.services._schedule_imports")
+    @mock.patch("apache_logs.services.BulkImportUseCase")
+    def test_execute(self, usecase_mock: mock.Mock, schedule_imports_mock: mock.Mock):
+        usecase_mock.return_value.execute.return_value.import_status_id = 10
+
+        BulkImportCeleryService().execute(sources=["https://url.com/a.log", "logs/b.log\n", "# comment"], priority=1)
+
+        sources = usecase_mock.return_value.execute.call_args.kwargs["sources"]
+        self.assertEqual(list(sources), ["https://url.com/a.log", os.path.abspath("logs/b.log"), "# comment"])
+        schedule_imports_mock.assert_called_once_with()
+
+    @mock.patch("apache_logs.services._schedule_imports")
+    @mock.patch("apache_logs.services.BulkImportUseCase")
+    def test_execute_nothing_to_import(self, usecase_mock: mock.Mock, schedule_imports_mock: mock.Mock):
+        usecase_mock.return_value.execute.return_value.import_status_id = None
+
+        BulkImportCeleryService().execute(sources=[])
+
+        schedule_imports_mock.assert_not_called()
+
+
+class ParseLogsLocalServiceTestCase(TestCase):
+    @mock.patch("apache_logs.services.LocalImportUseCase")
+    def test_execute_invalid_source(self, usecase_mock: mock.Mock):
+        service = ParseLogsLocalService()
+
+        for url in ("https://", "/no/such/access.log", "file:///no/such/access.log"):
+            with self.assertRaises(service.ParseLogsLocalValidationError):
+                service.execute(url=url, processes=2)
+
+        usecase_mock.assert_not_called()
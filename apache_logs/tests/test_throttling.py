@@ -0,0 +1,60 @@
+from unittest import TestCase, mock
+
+from apache_logs.throttling import RateLimiter, HostRateLimiter
+
+
+class RateLimiterTestCase(TestCase):
+    def setUp(self) -> None:
+        self.now = 100.0
+        self.sleep = mock.Mock(side_effect=self._advance)
+
+    def _advance(self, seconds: float):
+        self.now += seconds
+
+    def test_first_call_does_not_wait(self):
+        rate_limiter = RateLimiter(rate=2, clock=lambda: self.now, sleep_func=self.sleep)
+
+        rate_limiter.wait()
+
+        self.sleep.assert_not_called()
+
+    def test_calls_are_spaced(self):
+        rate_limiter = RateLimiter(rate=4, clock=lambda: self.now, sleep_func=self.sleep)
+
+        rate_limiter.wait()
+        rate_limiter.wait()
+        self._advance(0.125)
+        rate_limiter.wait()
+
+        self.assertEqual(self.sleep.call_args_list, [mock.call(0.25), mock.call(0.125)])
+        self.assertEqual(self.now, 100.5)
+
+    def test_slow_calls_do_not_wait(self):
+        rate_limiter = RateLimiter(rate=2, clock=lambda: self.now, sleep_func=self.sleep)
+
+        rate_limiter.wait()
+        self._advance(1)
+        rate_limiter.wait()
+
+        self.sleep.assert_not_called()
+
+    def test_reserve(self):
+        rate_limiter = RateLimiter(rate=4, clock=lambda: self.now, sleep_func=self.sleep)
+
+        self.assertEqual(rate_limiter.reserve(), 0)
+        self.assertEqual(rate_limiter.reserve(), 0.25)
+        self.assertEqual(rate_limiter.reserve(), 0.5)
+        self.sleep.assert_not_called()
+
+
+class HostRateLimiterTestCase(TestCase):
+    def test_wait(self):
+        reserve_request = mock.Mock(side_effect=[0.0, 0.5])
+        sleep = mock.Mock()
+        rate_limiter = HostRateLimiter(rate=2, host="example.com", reserve_request=reserve_request, sleep_func=sleep)
+
+        rate_limiter.wait()
+        rate_limiter.wait()
+
+        self.assertEqual(reserve_request.call_args_list, [mock.call(host="example.com", interval=0.5)] * 2)
+        sleep.assert_called_once_with(0.5)
@@ -1,14 +1,26 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 from datetime import datetime
+from typing import List, Dict
 from unittest import TestCase, mock
 
+from apache_logs.dedup import get_log_hash
 from apache_logs.entities import ApacheLog, CountIPAddress, CountMethod, Pagination, PaginatedLogWithStatistics, \
-    LogStatistics
-from apache_logs.usecases import ParseLogsUseCase, GetLogsUseCase, ImportStatusUseCase
+    LogStatistics, TimeBucket, CountStatusCode, LogTimeSeries, LogRows, ImportJob, ImportQueue, ImportSource, \
+    ImportSourceReport, ImportPart, BulkImportPlan, BulkImportSummary, SourceThroughput, ImportStatistics, \
+    ImportComparison, ImportStatus, AnomalyThresholds, ImportProgress, SavedSearch
+from apache_logs.usecases import ParseLogsUseCase, GetLogsUseCase, ImportStatusUseCase, AsyncParseLogsUseCase, \
+    GetTimeSeriesUseCase, ExportLogsUseCase, GetStatisticsUseCase, GetLogRowsUseCase, RetentionUseCase, \
+    ScheduleImportsUseCase, ImportQueueUseCase, BulkImportUseCase, BulkImportSummaryUseCase, \
+    GetImportStatisticsUseCase, CompareImportsUseCase, GetNetworkStatisticsUseCase, GetAnomalyEventsUseCase, \
+    LocalImportUseCase, RefreshSavedSearchesUseCase
 
 
 class ParseLogsUseCaseTestCase(TestCase):
     def setUp(self) -> None:
         self.logs_dao = mock.Mock()
+        self.logs_dao.iterate_log_hashes.return_value = []
         self.request_dao = mock.Mock()
         self.import_status_dao = mock.Mock()
 
@@ -17,7 +29,7 @@ class ParseLogsUseCaseTestCase(TestCase):
         usecase._import_logs = mock.Mock()
         url = mock.Mock()
         self.request_dao.check_partial_content.return_value = (False, 0)
-        self.request_dao.get_full_rows.return_value = []
+        self.request_dao.iter_full_content.return_value = [b"first\nsec", b"ond\nthird"]
         import_status_mock = mock.Mock()
         self.import_status_dao.create_import_status.return_value = import_status_mock
 
@@ -25,69 +37,155 @@ class ParseLogsUseCaseTestCase(TestCase):
 
         self.request_dao.check_partial_content.assert_called_once_with(url=url)
         self.import_status_dao.create_import_status.assert_called_once_with()
-        self.request_dao.get_full_rows.assert_called_once_with(url=url)
-        self.request_dao.get_partial_rows.assert_not_called()
+        self.request_dao.iter_full_content.assert_called_once_with(url=url, chunk_size=16 * 1024 * 1024)
+        self.request_dao.get_partial_content.assert_not_called()
         self.import_status_dao.finish_import_status.assert_called_once_with(import_status_id=import_status_mock.pk)
         self.import_status_dao.update_import_status.assert_not_called()
-        usecase._import_logs.assert_called_once_with(rows=[])
+        self.assertEqual(usecase._import_logs.call_args_list, [
+            mock.call(buffers=[b"first"]),
+            mock.call(buffers=[b"second"]),
+            mock.call(buffers=[b"third"]),
+        ])
+
+    def test_execute_failed_writes_segment(self):
+        segments_dao = mock.Mock()
+        usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao, segments_dao=segments_dao)
+
+        def iter_full_content(url, chunk_size):
+            yield b"127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /index - 200 123\n"
+            raise ConnectionError
+
+        self.request_dao.check_partial_content.return_value = (False, 0)
+        self.request_dao.iter_full_content.side_effect = iter_full_content
+        self.logs_dao.create_apache_logs.side_effect = lambda apache_logs, import_status_id: {
+            get_log_hash(apache_log) for apache_log in apache_logs
+        }
+
+        with self.assertRaises(ConnectionError):
+            usecase.execute("https://url.com/access.log")
+
+        # The committed row is in a segment, an import again would skip it as already imported.
+        self.assertEqual(
+            [call.kwargs["source"] for call in segments_dao.create_segment.call_args_list],
+            ["https://url.com/access.log"],
+        )
+        self.import_status_dao.fail_import_status.assert_called_once()
 
     def test_execute_accept_ranges(self):
-        usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao)
+        usecase = ParseLogsUseCase(
+            self.logs_dao,
+            self.request_dao,
+            self.import_status_dao,
+            min_range_size=10,
+            max_range_size=10,
+        )
         usecase._import_logs = mock.Mock()
         url = mock.Mock()
         self.request_dao.check_partial_content.return_value = (True, 100)
         import_status_mock = mock.Mock()
         self.import_status_dao.create_import_status.return_value = import_status_mock
-        self.request_dao.get_partial_rows.return_value = ["first", "second"]
+        self.request_dao.get_partial_content.side_effect = lambda **kwargs: b"first\nsecond"
         usecase.execute(url)
 
         self.request_dao.check_partial_content.assert_called_once_with(url=url)
         self.import_status_dao.create_import_status.assert_called_once_with()
-        self.request_dao.get_full_rows.assert_not_called()
-        self.assertEqual(self.request_dao.get_partial_rows.call_count, 100)
+        self.request_dao.iter_full_content.assert_not_called()
+        self.assertEqual(self.request_dao.get_partial_content.call_count, 10)
+        self.request_dao.get_partial_content.assert_any_call(url=url, from_bytes=0, to_bytes=9)
+        self.request_dao.get_partial_content.assert_called_with(url=url, from_bytes=90, to_bytes=99)
         self.import_status_dao.finish_import_status.assert_called_once_with(import_status_id=import_status_mock.pk)
-        self.assertEqual(self.import_status_dao.update_import_status.call_count, 99)
-        self.assertEqual(usecase._import_logs.call_count, 100)
+        self.assertEqual(self.import_status_dao.update_import_status.call_count, 9)
+        self.import_status_dao.update_import_status.assert_called_with(
+            import_status_id=import_status_mock.pk,
+            percent=90,
+        )
+        self.assertEqual(usecase._import_logs.call_count, 11)
+        usecase._import_logs.assert_called_with(buffers=[b"second"])
+
+    def test_execute_accept_ranges_small_file(self):
+        usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao)
+        usecase._import_logs = mock.Mock()
+        url = mock.Mock()
+        self.request_dao.check_partial_content.return_value = (True, 64 * 1024)
+        self.request_dao.get_partial_content.return_value = b"first\n"
+
+        usecase.execute(url)
+
+        self.request_dao.get_partial_content.assert_called_once_with(url=url, from_bytes=0, to_bytes=64 * 1024 - 1)
+        self.import_status_dao.update_import_status.assert_not_called()
+
+    def test_execute_rebuild_indexes(self):
+        usecase = ParseLogsUseCase(
+            self.logs_dao,
+            self.request_dao,
+            self.import_status_dao,
+            rebuild_indexes_from_size=100,
+        )
+        usecase._import_logs = mock.Mock(side_effect=ValueError)
+        self.request_dao.check_partial_content.return_value = (True, 100)
+        self.request_dao.get_partial_content.return_value = b"first\nsecond"
+
+        with self.assertRaises(ValueError):
+            usecase.execute(mock.Mock())
+
+        self.logs_dao.drop_secondary_indexes.assert_called_once_with()
+        self.logs_dao.create_secondary_indexes.assert_called_once_with()
+
+    def test_execute_small_file_keeps_indexes(self):
+        usecase = ParseLogsUseCase(
+            self.logs_dao,
+            self.request_dao,
+            self.import_status_dao,
+            rebuild_indexes_from_size=101,
+        )
+        usecase._import_logs = mock.Mock()
+        self.request_dao.check_partial_content.return_value = (True, 100)
+        self.request_dao.get_partial_content.return_value = b"first\nsecond"
+
+        usecase.execute(mock.Mock())
+
+        self.logs_dao.drop_secondary_indexes.assert_not_called()
+        self.logs_dao.create_secondary_indexes.assert_not_called()
 
     def test_import_logs_empty_rows(self):
         usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao)
 
-        usecase._import_logs(rows=[])
+        usecase._import_logs(buffers=[])
 
-        self.logs_dao.create_apache_logs.assert_called_once_with(apache_logs=[])
+        self.logs_dao.create_apache_logs.assert_called_once_with(apache_logs=[], import_status_id=None)
 
     def test_import_logs_invalid_ip_address(self):
         usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao)
 
-        usecase._import_logs(rows=["ip - - [12/Jan/2020:12:12:12 +0100] \"GET /index - 200 123"])
+        usecase._import_logs(buffers=[b"ip - - [12/Jan/2020:12:12:12 +0100] \"GET /index - 200 123"])
 
-        self.logs_dao.create_apache_logs.assert_called_once_with(apache_logs=[])
+        self.logs_dao.create_apache_logs.assert_called_once_with(apache_logs=[], import_status_id=None)
 
     def test_import_logs_invalid_date(self):
         usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao)
 
-        usecase._import_logs(rows=["127.0.0.1 - - [12/JJan/2020:12:12:12 +0100] \"GET /index - 200 123"])
+        usecase._import_logs(buffers=[b"127.0.0.1 - - [12/JJan/2020:12:12:12 +0100] \"GET /index - 200 123"])
 
-        self.logs_dao.create_apache_logs.assert_called_once_with(apache_logs=[])
+        self.logs_dao.create_apache_logs.assert_called_once_with(apache_logs=[], import_status_id=None)
 
     def test_import_logs_invalid_method(self):
         usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao)
 
-        usecase._import_logs(rows=["127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"METHOD /index - 200 123"])
+        usecase._import_logs(buffers=[b"127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"METHOD /index - 200 123"])
 
-        self.logs_dao.create_apache_logs.assert_called_once_with(apache_logs=[])
+        self.logs_dao.create_apache_logs.assert_called_once_with(apache_logs=[], import_status_id=None)
 
     def test_import_logs_invalid_status_code(self):
         usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao)
 
-        usecase._import_logs(rows=["127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /index - status 123"])
+        usecase._import_logs(buffers=[b"127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /index - status 123"])
 
-        self.logs_dao.create_apache_logs.assert_called_once_with(apache_logs=[])
+        self.logs_dao.create_apache_logs.assert_called_once_with(apache_logs=[], import_status_id=None)
 
     def test_import_logs(self):
         usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao)
 
-        usecase._import_logs(rows=["127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /index - 200 123"])
+        usecase._import_logs(buffers=[b"127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /index - 200 123"])
 
         self.logs_dao.create_apache_logs.assert_called_once_with(apache_logs=[ApacheLog(
             ip_address="127.0.0.1",
@@ -96,12 +194,77 @@ class ParseLogsUseCaseTestCase(TestCase):
             uri="/index",
             status_code=200,
             size=123,
-        )])
+        )], import_status_id=None)
+
+    def test_import_logs_geoip(self):
+        geoip_dao = mock.Mock()
+        geoip_dao.get_ip_location.return_value = ("DE", 24940)
+        usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao, geoip_dao=geoip_dao)
+
+        usecase._import_logs(buffers=[b"5.9.1.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /index - 200 123"])
+
+        geoip_dao.get_ip_location.assert_called_once_with("5.9.1.1")
+        apache_logs = self.logs_dao.create_apache_logs.call_args.kwargs["apache_logs"]
+        self.assertEqual([(log.country, log.asn) for log in apache_logs], [("DE", 24940)])
+
+    def test_import_logs_anomalies(self):
+        anomaly_events_dao = mock.Mock()
+        usecase = ParseLogsUseCase(
+            self.logs_dao,
+            self.request_dao,
+            self.import_status_dao,
+            anomaly_events_dao=anomaly_events_dao,
+            anomaly_thresholds=AnomalyThresholds(max_ip_requests=2),
+        )
+        self.request_dao.check_partial_content.return_value = (False, 0)
+        self.request_dao.iter_full_content.return_value = [
+            b"10.0.0.1 - - [19/Dec/2020:13:57:%02d +0100] \"GET /index - 200 123\n" % second for second in range(3)
+        ]
+        self.import_status_dao.create_import_status.return_value = ImportStatus(pk=7, status="start", percent=1)
+
+        usecase.execute(url="http://localhost/access.log")
+
+        anomaly_events_dao.create_anomaly_events.assert_called_once()
+        self.assertEqual(anomaly_events_dao.create_anomaly_events.call_args.kwargs["import_status_id"], 7)
+        self.assertEqual([
+            (event.kind, event.key, event.reason, event.count)
+            for event in anomaly_events_dao.create_anomaly_events.call_args.kwargs["anomaly_events"]
+        ], [("ip", "10.0.0.1", "rate", 3)])
+        self.assertIsNone(usecase.burst_detector)
+
+    def test_import_logs_anomalies_skip_duplicates(self):
+        anomaly_events_dao = mock.Mock()
+        usecase = ParseLogsUseCase(
+            self.logs_dao,
+            self.request_dao,
+            self.import_status_dao,
+            anomaly_events_dao=anomaly_events_dao,
+            anomaly_thresholds=AnomalyThresholds(max_ip_requests=1),
+        )
+        self.logs_dao.get_existing_log_hashes.side_effect = lambda log_hashes: set(log_hashes)
+        self.logs_dao.iterate_log_hashes.return_value = [
+            get_log_hash(ApacheLog(
+                ip_address="10.0.0.1",
+                date=datetime.strptime("19/Dec/2020:13:57:26+0100", '%d/%b/%Y:%H:%M:%S%z'),
+                method="GET",
+                uri="/index",
+                status_code=200,
+                size=123,
+                occurrence=occurrence,
+            )) for occurrence in range(3)
+        ]
+        usecase._start_deduplication(source="", max_length=0)
+        usecase._start_anomaly_detection()
+
+        usecase._import_logs(buffers=[b"10.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /index - 200 123\n" * 3])
+        usecase._finish_anomaly_detection()
+
+        anomaly_events_dao.create_anomaly_events.assert_not_called()
 
     def test_import_logs_invalid_size(self):
         usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao)
 
-        usecase._import_logs(rows=["127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /index - 200 qwe"])
+        usecase._import_logs(buffers=[b"127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /index - 200 qwe"])
 
         self.logs_dao.create_apache_logs.assert_called_once_with(apache_logs=[ApacheLog(
             ip_address="127.0.0.1",
@@ -110,7 +273,376 @@ class ParseLogsUseCaseTestCase(TestCase):
             uri="/index",
             status_code=200,
             size=0,
-        )])
+        )], import_status_id=None)
+
+    def test_import_logs_invalid_utf_8(self):
+        usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao)
+
+        usecase._import_logs(buffers=[
+            b"127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /\xff - 200 123\n"
+            b"127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /\xc3\xbc - 200 123"
+        ])
+
+        self.logs_dao.create_apache_logs.assert_called_once_with(apache_logs=[ApacheLog(
+            ip_address="127.0.0.1",
+            date=datetime.strptime("19/Dec/2020:13:57:26+0100", '%d/%b/%Y:%H:%M:%S%z'),
+            method="GET",
+            uri="/\u00fc",
+            status_code=200,
+            size=123,
+        )], import_status_id=None)
+
+    def test_import_logs_combined_format(self):
+        usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao, log_format="nginx_time")
+
+        usecase._import_logs(buffers=[
+            b"127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /index HTTP/1.1\" 200 123 \"-\" \"curl/7.68.0\" 0.015\n"
+            b"127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /index HTTP/1.1\" 200 123"
+        ])
+
+        self.logs_dao.create_apache_logs.assert_called_once_with(apache_logs=[ApacheLog(
+            ip_address="127.0.0.1",
+            date=datetime.strptime("19/Dec/2020:13:57:26+0100", '%d/%b/%Y:%H:%M:%S%z'),
+            method="GET",
+            uri="/index",
+            status_code=200,
+            size=123,
+            referrer=None,
+            user_agent="curl/7.68.0",
+            response_time=15000,
+        )], import_status_id=None)
+
+    def test_execute_detects_log_format(self):
+        usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao, log_format="auto")
+        self.request_dao.check_partial_content.return_value = (False, 0)
+        self.request_dao.iter_full_content.return_value = [
+            b"127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET / HTTP/1.1\" 200 1 \"https://a.com/\" \"curl\"\n",
+        ]
+        self.logs_dao.get_existing_log_hashes.return_value = set()
+
+        usecase.execute("https://url.com")
+
+        self.assertEqual(usecase.log_parser.name, "combined")
+        apache_logs = self.logs_dao.create_apache_logs.call_args.kwargs["apache_logs"]
+        self.assertEqual([(log.referrer, log.user_agent) for log in apache_logs], [("https://a.com/", "curl")])
+
+    def test_execute_queued_import_status(self):
+        usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao)
+        usecase._import_logs = mock.Mock()
+        self.request_dao.check_partial_content.return_value = (False, 0)
+        self.request_dao.iter_full_content.return_value = []
+        import_status_mock = mock.Mock()
+        self.import_status_dao.get_import_status.return_value = import_status_mock
+
+        usecase.execute("https://url.com", import_status_id=7)
+
+        self.import_status_dao.get_import_status.assert_called_once_with(import_status_id=7)
+        self.import_status_dao.create_import_status.assert_not_called()
+        self.import_status_dao.finish_import_status.assert_called_once_with(import_status_id=import_status_mock.pk)
+
+    def test_execute_failed(self):
+        usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao)
+        self.request_dao.check_partial_content.side_effect = ConnectionError
+        import_status_mock = mock.Mock()
+        self.import_status_dao.create_import_status.return_value = import_status_mock
+
+        with self.assertRaises(ConnectionError):
+            usecase.execute("https://url.com")
+
+        self.import_status_dao.fail_import_status.assert_called_once_with(import_status_id=import_status_mock.pk)
+        self.import_status_dao.finish_import_status.assert_not_called()
+
+    def test_execute_rate_limited_ranges(self):
+        usecase = ParseLogsUseCase(
+            self.logs_dao,
+            self.request_dao,
+            self.import_status_dao,
+            min_range_size=10,
+            max_range_size=10,
+            requests_per_second=5,
+        )
+        usecase._import_logs = mock.Mock()
+        usecase._get_rate_limiter = mock.Mock()
+        self.request_dao.check_partial_content.return_value = (True, 30)
+        self.request_dao.get_partial_content.side_effect = lambda **kwargs: b"first\nsecond"
+
+        usecase.execute("https://url.com")
+
+        usecase._get_rate_limiter.assert_called_with(url="https://url.com")
+        self.assertEqual(usecase._get_rate_limiter.return_value.wait.call_count, 3)
+
+    def test_get_rate_limiter(self):
+        host_rate_limits_dao = mock.Mock()
+        usecase = ParseLogsUseCase(
+            self.logs_dao,
+            self.request_dao,
+            self.import_status_dao,
+            requests_per_second=5,
+            host_rate_limits_dao=host_rate_limits_dao,
+        )
+
+        rate_limiter = usecase._get_rate_limiter(url="https://url.com/access.log")
+
+        self.assertIs(usecase._get_rate_limiter(url="https://url.com/other.log"), rate_limiter)
+        self.assertIsNot(usecase._get_rate_limiter(url="https://other.com/access.log"), rate_limiter)
+        self.assertEqual(rate_limiter.host, "url.com")
+        self.assertEqual(rate_limiter.interval, 0.2)
+        self.assertIs(rate_limiter.reserve_request, host_rate_limits_dao.reserve_request)
+
+    def test_get_rate_limiter_unlimited(self):
+        usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao)
+
+        self.assertIsNone(usecase._get_rate_limiter(url="https://url.com"))
+
+
+class DeduplicateLogsUseCaseTestCase(TestCase):
+    def setUp(self) -> None:
+        self.logs_dao = mock.Mock()
+        self.logs_dao.iterate_log_hashes.return_value = []
+        self.request_dao = mock.Mock()
+        self.import_status_dao = mock.Mock()
+        self.usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao)
+        self.usecase._start_deduplication(source="http://example.com/access.log", max_length=0)
+        self.row = b"127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /index - 200 123"
+        self.apache_log = ApacheLog(
+            ip_address="127.0.0.1",
+            date=datetime.strptime("19/Dec/2020:13:57:26+0100", '%d/%b/%Y:%H:%M:%S%z'),
+            method="GET",
+            uri="/index",
+            status_code=200,
+            size=123,
+        )
+        self.next_apache_log = replace(self.apache_log, occurrence=1)
+
+    def test_import_logs_identical_lines_in_one_slice(self):
+        # Requests logged twice in the same second are numbered, both are kept.
+        self.usecase._import_logs(buffers=[self.row + b"\n" + self.row])
+
+        self.logs_dao.create_apache_logs.assert_called_once_with(
+            apache_logs=[self.apache_log, self.next_apache_log],
+            import_status_id=None,
+        )
+        self.logs_dao.iterate_log_hashes.assert_called_once_with(
+            source="http://example.com/access.log",
+            chunk_size=10_000,
+        )
+        self.logs_dao.get_existing_log_hashes.assert_not_called()
+
+    def test_import_logs_identical_lines_in_slices(self):
+        self.usecase._import_logs(buffers=[self.row])
+        self.usecase._import_logs(buffers=[self.row])
+
+        self.logs_dao.create_apache_logs.assert_called_with(apache_logs=[self.next_apache_log], import_status_id=None)
+
+    def test_import_logs_already_imported(self):
+        # Imported before with a single occurrence of the line.
+        self.logs_dao.iterate_log_hashes.return_value = [get_log_hash(self.apache_log)]
+        self.logs_dao.get_existing_log_hashes.return_value = {get_log_hash(self.apache_log)}
+        self.usecase._start_deduplication(source="http://example.com/access.log", max_length=0)
+
+        self.usecase._import_logs(buffers=[self.row + b"\n" + self.row])
+
+        self.logs_dao.get_existing_log_hashes.assert_called_once_with(log_hashes=[get_log_hash(self.apache_log)])
+        self.logs_dao.create_apache_logs.assert_called_once_with(
+            apache_logs=[self.next_apache_log],
+            import_status_id=None,
+        )
+
+    def test_import_logs_bloom_filter_false_positive(self):
+        self.logs_dao.iterate_log_hashes.return_value = [get_log_hash(self.apache_log)]
+        self.logs_dao.get_existing_log_hashes.return_value = set()
+        self.usecase._start_deduplication(source="http://example.com/access.log", max_length=0)
+
+        self.usecase._import_logs(buffers=[self.row])
+
+        self.logs_dao.create_apache_logs.assert_called_once_with(apache_logs=[self.apache_log], import_status_id=None)
+
+    def test_import_logs_without_deduplication(self):
+        self.logs_dao.reset_mock()
+        usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao, deduplicate=False)
+        usecase._start_deduplication(source="http://example.com/access.log", max_length=0)
+
+        usecase._import_logs(buffers=[self.row + b"\n" + self.row])
+
+        self.logs_dao.iterate_log_hashes.assert_not_called()
+        self.logs_dao.create_apache_logs.assert_called_once_with(
+            apache_logs=[self.apache_log, self.next_apache_log],
+            import_status_id=None,
+        )
+
+    def test_import_logs_segments(self):
+        segments_dao = mock.Mock()
+        usecase = ParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao, segments_dao=segments_dao)
+        usecase._start_deduplication(source="http://example.com/access.log", max_length=0)
+        usecase.source = "http://example.com/access.log"
+        # The second line was inserted by an import of another source.
+        self.logs_dao.create_apache_logs.return_value = {get_log_hash(self.apache_log)}
+
+        usecase._import_logs(buffers=[self.row + b"\n" + self.row])
+        usecase._import_logs(buffers=[self.row])
+        segments_dao.create_segment.assert_not_called()
+        usecase._finish_segment()
+
+        # Only inserted rows, buffered into one segment with their occurrences, a rebuild hashes them the same.
+        segments_dao.create_segment.assert_called_once_with(
+            apache_logs=[self.apache_log],
+            source="http://example.com/access.log",
+        )
+
+    def test_import_logs_segment_rows(self):
+        segments_dao = mock.Mock()
+        usecase = ParseLogsUseCase(
+            self.logs_dao,
+            self.request_dao,
+            self.import_status_dao,
+            segments_dao=segments_dao,
+            segment_rows=2,
+        )
+        usecase._start_deduplication(source="http://example.com/access.log", max_length=0)
+        self.logs_dao.create_apache_logs.side_effect = lambda apache_logs, import_status_id: {
+            get_log_hash(apache_log) for apache_log in apache_logs
+        }
+
+        for _ in range(3):
+            usecase._import_logs(buffers=[self.row])
+
+        segments_dao.create_segment.assert_called_once_with(
+            apache_logs=[self.apache_log, self.next_apache_log],
+            source="",
+        )
+
+
+class AsyncParseLogsUseCaseTestCase(TestCase):
+    def setUp(self) -> None:
+        self.logs_dao = mock.Mock()
+        self.logs_dao.iterate_log_hashes.return_value = []
+        self.request_dao = mock.Mock()
+        self.import_status_dao = mock.Mock()
+
+    def test_execute_no_accept_ranges(self):
+        usecase = AsyncParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao)
+        url = mock.Mock()
+        self.request_dao.check_partial_content.return_value = (False, 0)
+        self.request_dao.iter_full_content.return_value = [
+            b"127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /a - 200 123\n",
+            b"127.0.0.1 - - [19/Dec/2020:13:57:27 +0100] \"GET /b - 200 123\n",
+        ]
+        import_status_mock = mock.Mock()
+        self.import_status_dao.create_import_status.return_value = import_status_mock
+        self.logs_dao.get_existing_log_hashes.return_value = set()
+
+        usecase.execute(url)
+
+        self.request_dao.check_partial_content.assert_called_once_with(url=url)
+        self.request_dao.iter_full_content.assert_called_once_with(url=url, chunk_size=16 * 1024 * 1024)
+        self.request_dao.get_partial_content.assert_not_called()
+        self.assertEqual([
+            [apache_log.uri for apache_log in call.kwargs["apache_logs"]]
+            for call in self.logs_dao.create_apache_logs.call_args_list
+        ], [["/a"], ["/b"]])
+        self.import_status_dao.finish_import_status.assert_called_once_with(import_status_id=import_status_mock.pk)
+        self.import_status_dao.update_import_status.assert_not_called()
+
+    def test_execute_accept_ranges(self):
+        usecase = AsyncParseLogsUseCase(
+            self.logs_dao,
+            self.request_dao,
+            self.import_status_dao,
+            min_range_size=1,
+            max_range_size=1,
+        )
+        url = mock.Mock()
+        self.request_dao.check_partial_content.return_value = (True, 100)
+        import_status_mock = mock.Mock()
+        self.import_status_dao.create_import_status.return_value = import_status_mock
+        self.request_dao.get_partial_content.side_effect = lambda **kwargs: (
+            b"127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /index - 200 123\n"
+        )
+        self.logs_dao.get_existing_log_hashes.return_value = set()
+
+        usecase.execute(url)
+
+        self.assertEqual(self.request_dao.get_partial_content.call_count, 100)
+        self.assertEqual(self.logs_dao.create_apache_logs.call_count, 100)
+        self.assertEqual(self.import_status_dao.update_import_status.call_count, 99)
+        self.import_status_dao.finish_import_status.assert_called_once_with(import_status_id=import_status_mock.pk)
+        self.logs_dao.create_apache_logs.assert_called_with(apache_logs=[ApacheLog(
+            ip_address="127.0.0.1",
+            date=datetime.strptime("19/Dec/2020:13:57:26+0100", '%d/%b/%Y:%H:%M:%S%z'),
+            method="GET",
+            uri="/index",
+            status_code=200,
+            size=123,
+            # The same line in all 100 ranges.
+            occurrence=99,
+        )], import_status_id=import_status_mock.pk)
+
+    def test_execute_rate_limited_ranges(self):
+        host_rate_limits_dao = mock.Mock()
+        host_rate_limits_dao.reserve_request.return_value = 0.0
+        usecase = AsyncParseLogsUseCase(
+            self.logs_dao,
+            self.request_dao,
+            self.import_status_dao,
+            min_range_size=10,
+            max_range_size=10,
+            requests_per_second=4,
+            host_rate_limits_dao=host_rate_limits_dao,
+        )
+        self.request_dao.check_partial_content.return_value = (True, 30)
+        self.request_dao.get_partial_content.side_effect = lambda **kwargs: b"\n"
+
+        usecase.execute("https://url.com/access.log")
+
+        self.assertEqual(
+            host_rate_limits_dao.reserve_request.call_args_list,
+            [mock.call(host="url.com", interval=0.25)] * 3,
+        )
+
+    def test_execute_accept_ranges_write_error(self):
+        usecase = AsyncParseLogsUseCase(self.logs_dao, self.request_dao, self.import_status_dao)
+        self.request_dao.check_partial_content.return_value = (True, 100)
+        self.request_dao.get_partial_content.side_effect = lambda **kwargs: b"\n"
+        self.logs_dao.create_apache_logs.side_effect = ValueError
+
+        with self.assertRaises(ValueError):
+            usecase.execute(mock.Mock())
+
+        self.import_status_dao.finish_import_status.assert_not_called()
+
+    def test_execute_no_accept_ranges_write_error(self):
+        threads = {}
+        closed = threading.Event()
+
+        def iter_full_content(url, chunk_size):
+            try:
+                while True:
+                    yield b"127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /a - 200 123\n"
+            finally:
+                closed.set()
+
+        def create_apache_logs(**kwargs):
+            threads["write"] = threading.current_thread()
+            raise ValueError
+
+        usecase = AsyncParseLogsUseCase(
+            self.logs_dao,
+            self.request_dao,
+            self.import_status_dao,
+            close_connection=lambda: threads.setdefault("close_connection", threading.current_thread()),
+        )
+        self.request_dao.check_partial_content.return_value = (False, 0)
+        self.request_dao.iter_full_content.side_effect = iter_full_content
+        self.logs_dao.get_existing_log_hashes.return_value = set()
+        self.logs_dao.create_apache_logs.side_effect = create_apache_logs
+
+        with self.assertRaises(ValueError):
+            usecase.execute(mock.Mock())
+
+        # The endless response is closed when the writer fails, and the connection on the writer thread.
+        self.assertTrue(closed.is_set())
+        self.assertIs(threads["close_connection"], threads["write"])
+        self.import_status_dao.fail_import_status.assert_called_once()
 
 
 class GetLogsUseCaseTestCase(TestCase):
@@ -171,6 +703,827 @@ class GetLogsUseCaseTestCase(TestCase):
         self.dao.get_sum_sizes.assert_called_once_with(query=query)
 
 
+class GetStatisticsUseCaseTestCase(TestCase):
+    def setUp(self) -> None:
+        self.dao = mock.Mock()
+
+    def test_execute(self):
+        usecase = GetStatisticsUseCase(self.dao)
+        query = mock.Mock()
+        self.dao.get_count_unique_ip_addresses.return_value = 1
+        self.dao.get_top_ip_addresses.return_value = [CountIPAddress("ip", 1)]
+        self.dao.get_http_methods_count.return_value = [CountMethod("GET", 1)]
+        self.dao.get_sum_sizes.return_value = 10
+
+        result = usecase.execute(query=query)
+
+        self.assertEqual(result, LogStatistics(
+            unique_ip_count=1,
+            top_ip_addresses=[CountIPAddress("ip", 1)],
+            http_methods_count=[CountMethod("GET", 1)],
+            sum_sizes=10,
+        ))
+        self.dao.get_logs.assert_not_called()
+
+
+class SavedSearchesUseCaseTestCase(TestCase):
+    def setUp(self) -> None:
+        self.dao = mock.Mock()
+        self.dao.get_data_version.return_value = "1-100"
+        self.dao.get_count_unique_ip_addresses.return_value = 1
+        self.dao.get_top_ip_addresses.return_value = [CountIPAddress("ip", 1)]
+        self.dao.get_http_methods_count.return_value = [CountMethod("GET", 1)]
+        self.dao.get_sum_sizes.return_value = 10
+        self.saved_searches_dao = mock.Mock()
+        self.saved_statistics = LogStatistics(
+            unique_ip_count=2,
+            top_ip_addresses=[CountIPAddress("ip", 2)],
+            http_methods_count=[CountMethod("POST", 2)],
+            sum_sizes=20,
+        )
+
+    def test_get_statistics_saved_search(self):
+        self.saved_searches_dao.get_saved_statistics.return_value = self.saved_statistics
+        usecase = GetStatisticsUseCase(self.dao, saved_searches_dao=self.saved_searches_dao)
+
+        result = usecase.execute(query="/api/")
+
+        self.assertEqual(result, self.saved_statistics)
+        self.saved_searches_dao.get_saved_statistics.assert_called_once_with(query="/api/", data_version="1-100")
+        self.dao.get_count_unique_ip_addresses.assert_not_called()
+
+    def test_get_statistics_stale_or_unknown_search(self):
+        self.saved_searches_dao.get_saved_statistics.return_value = None
+        usecase = GetStatisticsUseCase(self.dao, saved_searches_dao=self.saved_searches_dao)
+
+        result = usecase.execute(query="/api/")
+
+        self.assertEqual(result.unique_ip_count, 1)
+        self.dao.get_count_unique_ip_addresses.assert_called_once_with(query="/api/")
+
+    def test_get_statistics_without_query(self):
+        usecase = GetStatisticsUseCase(self.dao, saved_searches_dao=self.saved_searches_dao)
+
+        usecase.execute(query="")
+
+        self.saved_searches_dao.get_saved_statistics.assert_not_called()
+        self.dao.get_data_version.assert_not_called()
+
+    def test_get_logs_saved_search(self):
+        self.saved_searches_dao.get_saved_statistics.return_value = self.saved_statistics
+        self.dao.get_logs.return_value = ([], mock.Mock())
+        usecase = GetLogsUseCase(self.dao, saved_searches_dao=self.saved_searches_dao)
+
+        result = usecase.execute(query="/api/", page=1)
+
+        self.assertEqual(result.statistics, self.saved_statistics)
+        self.dao.get_logs.assert_called_once_with(page=1, query="/api/", per_page=25)
+        self.dao.get_sum_sizes.assert_not_called()
+
+    def test_refresh_saved_searches(self):
+        self.saved_searches_dao.get_saved_searches.return_value = [
+            SavedSearch(query="/api/", data_version="1-50"),
+            SavedSearch(query="POST", data_version="1-100"),
+            SavedSearch(query="404"),
+        ]
+
+        refreshed_count = RefreshSavedSearchesUseCase(self.dao, self.saved_searches_dao).execute()
+
+        self.assertEqual(refreshed_count, 2)
+        statistics = LogStatistics(
+            unique_ip_count=1,
+            top_ip_addresses=[CountIPAddress("ip", 1)],
+            http_methods_count=[CountMethod("GET", 1)],
+            sum_sizes=10,
+        )
+        self.assertEqual(self.saved_searches_dao.save_statistics.call_args_list, [
+            mock.call(query="/api/", data_version="1-100", statistics=statistics),
+            mock.call(query="404", data_version="1-100", statistics=statistics),
+        ])
+
+
+class GetLogRowsUseCaseTestCase(TestCase):
+    def setUp(self) -> None:
+        self.dao = mock.Mock()
+
+    def test_execute(self):
+        usecase = GetLogRowsUseCase(self.dao)
+        query = mock.Mock()
+        self.dao.get_log_rows.return_value = ([("127.0.0.1", 200)], True)
+
+        result = usecase.execute(query=query, page=2, per_page=1, fields=["ip_address", "status_code"])
+
+        self.assertEqual(result, LogRows(
+            fields=["ip_address", "status_code"],
+            rows=[("127.0.0.1", 200)],
+            page=2,
+            has_next=True,
+        ))
+        self.dao.get_log_rows.assert_called_once_with(
+            page=2,
+            per_page=1,
+            query=query,
+            fields=["ip_address", "status_code"],
+        )
+
+    def test_execute_all_fields(self):
+        usecase = GetLogRowsUseCase(self.dao)
+        self.dao.get_log_rows.return_value = ([], False)
+
+        result = usecase.execute(query="")
+
+        self.assertEqual(result.fields, ["ip_address", "date", "method", "uri", "status_code", "size"])
+
+    def test_execute_invalid_fields(self):
+        usecase = GetLogRowsUseCase(self.dao)
+
+        with self.assertRaises(GetLogRowsUseCase.GetLogRowsValidationError):
+            usecase.execute(query="", fields=["id", "ip_address"])
+
+        self.dao.get_log_rows.assert_not_called()
+
+    def test_execute_invalid_per_page(self):
+        usecase = GetLogRowsUseCase(self.dao, max_per_page=10)
+
+        with self.assertRaises(GetLogRowsUseCase.GetLogRowsValidationError):
+            usecase.execute(query="", per_page=11)
+
+    def test_execute_invalid_page(self):
+        usecase = GetLogRowsUseCase(self.dao)
+
+        with self.assertRaises(GetLogRowsUseCase.GetLogRowsValidationError):
+            usecase.execute(query="", page=0)
+
+
+class GetTimeSeriesUseCaseTestCase(TestCase):
+    def setUp(self) -> None:
+        self.dao = mock.Mock()
+
+    def test_execute(self):
+        usecase = GetTimeSeriesUseCase(self.dao)
+        query = mock.Mock()
+        date_from = datetime(2021, 1, 1)
+        date_to = datetime(2021, 1, 2)
+        buckets = [TimeBucket(start=date_from, count=2, size=10, client_error_rate=0.5, server_error_rate=0.0)]
+        status_codes_count = [CountStatusCode(status_code=200, count=1), CountStatusCode(status_code=404, count=1)]
+        self.dao.get_time_buckets.return_value = buckets
+        self.dao.get_status_codes_count.return_value = status_codes_count
+
+        result = usecase.execute(query=query, interval="minute", date_from=date_from, date_to=date_to)
+
+        self.assertEqual(result, LogTimeSeries(
+            interval="minute",
+            buckets=buckets,
+            status_codes_count=status_codes_count,
+        ))
+        self.dao.get_time_buckets.assert_called_once_with(
+            interval="minute",
+            date_from=date_from,
+            date_to=date_to,
+            query=query,
+        )
+        self.dao.get_status_codes_count.assert_called_once_with(date_from=date_from, date_to=date_to, query=query)
+
+    def test_execute_invalid_interval(self):
+        usecase = GetTimeSeriesUseCase(self.dao)
+
+        with self.assertRaises(GetTimeSeriesUseCase.GetTimeSeriesValidationError):
+            usecase.execute(query="", interval="week")
+
+        self.dao.get_time_buckets.assert_not_called()
+
+    def test_execute_invalid_range(self):
+        usecase = GetTimeSeriesUseCase(self.dao)
+
+        with self.assertRaises(GetTimeSeriesUseCase.GetTimeSeriesValidationError):
+            usecase.execute(query="", date_from=datetime(2021, 1, 2), date_to=datetime(2021, 1, 1))
+
+
+class GetNetworkStatisticsUseCaseTestCase(TestCase):
+    def setUp(self) -> None:
+        self.dao = mock.Mock()
+        self.usecase = GetNetworkStatisticsUseCase(logs_dao=self.dao)
+
+    def test_execute(self):
+        result = self.usecase.execute(group_by="subnet", ipv4_prefix=16, subnet="10.1.2.3/8")
+
+        self.assertEqual(result, self.dao.get_network_groups.return_value)
+        self.dao.get_network_groups.assert_called_once_with(
+            group_by="subnet",
+            ipv4_prefix=16,
+            ipv6_prefix=48,
+            subnet="10.0.0.0/8",
+            date_from=None,
+            date_to=None,
+            groups_count=20,
+        )
+
+    def test_execute_invalid(self):
+        for kwargs in (
+            {"group_by": "city"},
+            {"ipv4_prefix": 32},
+            {"ipv6_prefix": 64},
+            {"subnet": "10.0.0.0/33"},
+            {"date_from": datetime(2021, 1, 2), "date_to": datetime(2021, 1, 1)},
+        ):
+            with self.assertRaises(self.usecase.GetNetworkStatisticsValidationError):
+                self.usecase.execute(**kwargs)
+
+        self.dao.get_network_groups.assert_not_called()
+
+
+class GetAnomalyEventsUseCaseTestCase(TestCase):
+    def setUp(self) -> None:
+        self.dao = mock.Mock()
+        self.usecase = GetAnomalyEventsUseCase(anomaly_events_dao=self.dao)
+
+    def test_execute(self):
+        result = self.usecase.execute(kind="ip", reason="", import_status_id=3)
+
+        self.assertEqual(result, self.dao.get_anomaly_events.return_value)
+        self.dao.get_anomaly_events.assert_called_once_with(
+            kind="ip",
+            reason=None,
+            key=None,
+            import_status_id=3,
+            date_from=None,
+            date_to=None,
+            events_count=100,
+        )
+
+    def test_execute_invalid(self):
+        for kwargs in (
+            {"kind": "host"},
+            {"reason": "size"},
+            {"date_from": datetime(2021, 1, 2), "date_to": datetime(2021, 1, 1)},
+        ):
+            with self.assertRaises(self.usecase.GetAnomalyEventsValidationError):
+                self.usecase.execute(**kwargs)
+
+        self.dao.get_anomaly_events.assert_not_called()
+
+
+class ExportLogsUseCaseTestCase(TestCase):
+    def setUp(self) -> None:
+        self.dao = mock.Mock()
+        self.dao.iterate_logs.return_value = iter([
+            ("127.0.0.1", datetime(2021, 1, 1), "GET", "/index", 200, 123),
+        ])
+
+    def test_execute(self):
+        usecase = ExportLogsUseCase(self.dao, chunk_size=10)
+        query = mock.Mock()
+
+        result = usecase.execute(query=query, export_format="jsonl")
+
+        self.assertEqual(result.filename, "logs.jsonl")
+        self.assertEqual(result.content_type, "application/x-ndjson")
+        self.assertEqual(len(b"".join(result.chunks).splitlines()), 1)
+        self.dao.iterate_logs.assert_called_once_with(query=query, chunk_size=10)
+
+    def test_execute_gzip(self):
+        usecase = ExportLogsUseCase(self.dao)
+
+        result = usecase.execute(query="", export_format="csv", compression="gzip")
+
+        self.assertEqual(result.filename, "logs.csv.gz")
+        self.assertTrue(b"".join(result.chunks).startswith(b"\x1f\x8b"))
+
+    def test_execute_from_segments(self):
+        segments_dao = mock.Mock()
+        segments_dao.iterate_logs.return_value = iter([])
+        usecase = ExportLogsUseCase(self.dao, chunk_size=10, segments_dao=segments_dao)
+
+        usecase.execute(query="", export_format="csv", from_segments=True)
+
+        segments_dao.iterate_logs.assert_called_once_with(query="", chunk_size=10)
+        self.dao.iterate_logs.assert_not_called()
+
+    def test_execute_from_segments_disabled(self):
+        usecase = ExportLogsUseCase(self.dao)
+
+        with self.assertRaises(ExportLogsUseCase.ExportLogsValidationError):
+            usecase.execute(query="", from_segments=True)
+
+    def test_execute_invalid_format(self):
+        usecase = ExportLogsUseCase(self.dao)
+
+        with self.assertRaises(ExportLogsUseCase.ExportLogsValidationError):
+            usecase.execute(query="", export_format="xml")
+
+        self.dao.iterate_logs.assert_not_called()
+
+    def test_execute_invalid_compression(self):
+        usecase = ExportLogsUseCase(self.dao)
+
+        with self.assertRaises(ExportLogsUseCase.ExportLogsValidationError):
+            usecase.execute(query="", compression="rar")
+
+    @mock.patch("apache_logs.usecases.importlib.util.find_spec")
+    def test_execute_missing_requirement(self, find_spec_mock: mock.Mock):
+        usecase = ExportLogsUseCase(self.dao)
+        find_spec_mock.return_value = None
+
+        with self.assertRaises(ExportLogsUseCase.ExportLogsValidationError):
+            usecase.execute(query="", export_format="parquet")
+
+        find_spec_mock.assert_called_once_with("pyarrow")
+
+
+class RetentionUseCaseTestCase(TestCase):
+    def setUp(self) -> None:
+        self.logs_dao = mock.Mock()
+        self.import_status_dao = mock.Mock()
+        self.now = datetime(2021, 2, 1)
+
+    def test_execute(self):
+        usecase = RetentionUseCase(
+            self.logs_dao,
+            self.import_status_dao,
+            log_days=10,
+            import_status_days=20,
+            batch_size=2,
+        )
+        self.logs_dao.delete_logs_before.side_effect = [2, 2, 1]
+        self.import_status_dao.delete_finished_import_statuses_before.return_value = 3
+
+        result = usecase.execute(now=self.now)
+
+        self.assertEqual(result.logs_deleted, 5)
+        self.assertEqual(result.import_statuses_deleted, 3)
+        self.assertEqual(self.logs_dao.delete_logs_before.call_count, 3)
+        self.logs_dao.delete_logs_before.assert_called_with(date=datetime(2021, 1, 22), batch_size=2)
+        self.logs_dao.delete_analytics_logs_before.assert_called_once_with(date=datetime(2021, 1, 22))
+        self.import_status_dao.delete_finished_import_statuses_before.assert_called_once_with(
+            date=datetime(2021, 1, 12),
+        )
+
+    def test_execute_segments(self):
+        segments_dao = mock.Mock()
+        segments_dao.delete_segments_before.return_value = 7
+        self.logs_dao.delete_logs_before.return_value = 0
+        usecase = RetentionUseCase(
+            self.logs_dao,
+            self.import_status_dao,
+            log_days=10,
+            import_status_days=0,
+            segments_dao=segments_dao,
+        )
+
+        result = usecase.execute(now=self.now)
+
+        self.assertEqual(result.segment_logs_deleted, 7)
+        segments_dao.delete_segments_before.assert_called_once_with(date=datetime(2021, 1, 22))
+
+    def test_execute_disabled(self):
+        usecase = RetentionUseCase(self.logs_dao, self.import_status_dao, log_days=0, import_status_days=0)
+
+        result = usecase.execute(now=self.now)
+
+        self.assertEqual((result.logs_deleted, result.import_statuses_deleted), (0, 0))
+        self.logs_dao.delete_logs_before.assert_not_called()
+        self.logs_dao.delete_analytics_logs_before.assert_not_called()
+        self.import_status_dao.delete_finished_import_statuses_before.assert_not_called()
+
+
+class ImportPartUseCaseTestCase(TestCase):
+    def setUp(self) -> None:
+        self.logs_dao = mock.Mock()
+        self.logs_dao.iterate_log_hashes.return_value = []
+        self.request_dao = mock.Mock()
+        self.import_status_dao = mock.Mock()
+        self.content = b"".join(b"line %d\n" % i for i in range(30)) + b"last line"
+        self.request_dao.get_partial_content.side_effect = lambda url, from_bytes, to_bytes: (
+            self.content[from_bytes:to_bytes + 1]
+        )
+
+    def _get_usecase(self) -> ParseLogsUseCase:
+        usecase = ParseLogsUseCase(
+            self.logs_dao,
+            self.request_dao,
+            self.import_status_dao,
+            min_range_size=5,
+            max_range_size=7,
+            deduplicate=False,
+        )
+        usecase._import_logs = mock.Mock()
+
+        return usecase
+
+    def test_import_source_windows(self):
+        size = len(self.content)
+
+        for window_size in (1, 3, 8, 13, 50, size):
+            usecase = self._get_usecase()
+
+            for from_bytes in range(0, size, window_size):
+                usecase._import_source(
+                    source=ImportSource(
+                        url="/var/log/access.log",
+                        from_bytes=from_bytes,
+                        to_bytes=min(from_bytes + window_size, size) - 1,
+                        size=size,
+                        accept_ranges=True,
+                    ),
+                    on_progress=mock.Mock(),
+                )
+
+            rows = [
+                row
+                for call in usecase._import_logs.call_args_list
+                for buffer in call.kwargs["buffers"]
+                for row in bytes(buffer).split(b"\n")
+            ]
+            self.assertEqual(rows, self.content.split(b"\n"), window_size)
+
+    def test_execute_part(self):
+        usecase = self._get_usecase()
+        sources = [
+            ImportSource(url="/var/log/a.log", from_bytes=0, to_bytes=9, size=10, accept_ranges=True),
+            ImportSource(url="https://url.com/b.log", from_bytes=0, to_bytes=-1, size=0, accept_ranges=False),
+        ]
+        self.import_status_dao.get_import_job.return_value = ImportJob(
+            pk=5,
+            url="",
+            host="",
+            priority=0,
+            sources=sources,
+        )
+        self.request_dao.iter_full_content.return_value = [b"line"]
+        usecase._import_logs.side_effect = lambda buffers: usecase._create_apache_logs(apache_logs=[
+            ApacheLog(ip_address="127.0.0.1", date=datetime.now(), method="GET", uri="/", status_code=200, size=0)
+            for _ in buffers
+        ])
+
+        usecase.execute_part(import_status_id=5)
+
+        # Saved before the part finishes, so the last part to finish counts the lines of every part.
+        self.assertLess(
+            self.import_status_dao.mock_calls.index(mock.call.save_lines_count(import_status_id=5, lines_count=3)),
+            self.import_status_dao.mock_calls.index(mock.call.finish_import_part(
+                import_status_id=5,
+                report=self.import_status_dao.finish_import_part.call_args.kwargs["report"],
+            )),
+        )
+
+        self.import_status_dao.add_imported_size.assert_has_calls([mock.call(5, 5), mock.call(5, 5), mock.call(5, 0)])
+        self.request_dao.iter_full_content.assert_called_once_with(url="https://url.com/b.log", chunk_size=7)
+        finish_kwargs = self.import_status_dao.finish_import_part.call_args.kwargs
+        self.assertEqual(finish_kwargs["import_status_id"], 5)
+        self.assertEqual([(report.url, report.size) for report in finish_kwargs["report"]], [
+            ("/var/log/a.log", 10),
+            ("https://url.com/b.log", 0),
+        ])
+
+    def test_execute_part_failed(self):
+        usecase = self._get_usecase()
+        self.import_status_dao.get_import_job.return_value = ImportJob(pk=5, url="", host="", priority=0, sources=[
+            ImportSource(url="/var/log/a.log", from_bytes=0, to_bytes=9, size=10, accept_ranges=True),
+        ])
+        self.request_dao.get_partial_content.side_effect = OSError
+
+        with self.assertRaises(OSError):
+            usecase.execute_part(import_status_id=5)
+
+        self.import_status_dao.finish_import_part.assert_called_once_with(import_status_id=5, report=[], failed=True)
+
+
+class BulkImportUseCaseTestCase(TestCase):
+    def setUp(self) -> None:
+        self.import_status_dao = mock.Mock()
+        self.request_dao = mock.Mock()
+        self.import_status_dao.get_imported_sources.return_value = {"https://url.com/old.log"}
+        self.import_status_dao.create_bulk_import.return_value.pk = 10
+        self.sizes = {
+            "https://url.com/small_1.log": (True, 30),
+            "https://url.com/small_2.log": (True, 40),
+            "https://other.com/small.log": (True, 10),
+            "/var/log/big.log": (True, 250),
+            "https://url.com/medium.log": (True, 80),
+            "https://url.com/no_ranges.log": (False, 0),
+        }
+
+        def check_partial_content(url):
+            if url == "https://url.com/down.log":
+                raise ConnectionError("refused")
+            return self.sizes[url]
+
+        self.request_dao.check_partial_content.side_effect = check_partial_content
+
+    def test_execute(self):
+        usecase = BulkImportUseCase(self.import_status_dao, self.request_dao, pack_size=50, split_size=100)
+
+        result = usecase.execute(sources=[
+            "# rotated logs",
+            "https://url.com/small_1.log\n",
+            "https://url.com/small_2.log",
+            "https://url.com/old.log",
+            "",
+            "https://other.com/small.log",
+            "/var/log/big.log",
+            "https://url.com/small_1.log",
+            "https://url.com/medium.log",
+            "https://url.com/no_ranges.log",
+            "https://url.com/down.log",
+        ], priority=3)
+
+        self.assertEqual(result, BulkImportPlan(
+            import_status_id=10,
+            parts_count=7,
+            sources=list(self.sizes),
+            skipped=["https://url.com/old.log"],
+            unavailable=["https://url.com/down.log"],
+        ))
+        parts = self.import_status_dao.create_bulk_import.call_args.kwargs["parts"]
+        self.assertEqual(
+            [
+                (part.host, [(source.url, source.from_bytes, source.to_bytes) for source in part.sources])
+                for part in parts
+            ],
+            [
+                ("url.com", [("https://url.com/small_1.log", 0, 29), ("https://url.com/small_2.log", 0, 39)]),
+                ("", [("/var/log/big.log", 0, 99)]),
+                ("", [("/var/log/big.log", 100, 199)]),
+                ("", [("/var/log/big.log", 200, 249)]),
+                ("url.com", [("https://url.com/medium.log", 0, 79)]),
+                ("url.com", [("https://url.com/no_ranges.log", 0, -1)]),
+                ("other.com", [("https://other.com/small.log", 0, 9)]),
+            ],
+        )
+        self.assertEqual(self.import_status_dao.create_bulk_import.call_args.kwargs["priority"], 3)
+
+    def test_execute_nothing_to_import(self):
+        usecase = BulkImportUseCase(self.import_status_dao, self.request_dao)
+
+        result = usecase.execute(sources=["https://url.com/old.log"])
+
+        self.assertIsNone(result.import_status_id)
+        self.import_status_dao.create_bulk_import.assert_not_called()
+
+
+class LocalImportUseCaseTestCase(TestCase):
+    def setUp(self) -> None:
+        self.import_status_dao = mock.Mock()
+        self.import_status_dao.create_bulk_import.return_value.pk = 10
+        self.import_status_dao.get_import_parts.side_effect = lambda import_status_id: [
+            ImportJob(pk=11 + index, url="", host="", priority=0, sources=part.sources)
+            for index, part in enumerate(self.import_status_dao.create_bulk_import.call_args.kwargs["parts"])
+        ]
+        self.import_status_dao.get_import_progress.return_value = ImportProgress(
+            status="finish",
+            percent=100,
+            size=250,
+            imported_size=250,
+        )
+        self.request_dao = mock.Mock()
+        self.request_dao.check_partial_content.return_value = (True, 250)
+        self.import_part = mock.Mock()
+        self.executor = ThreadPoolExecutor(max_workers=2)
+
+    def tearDown(self) -> None:
+        self.executor.shutdown()
+
+    def _get_usecase(self, **kwargs) -> LocalImportUseCase:
+        return LocalImportUseCase(
+            import_status_dao=self.import_status_dao,
+            request_dao=self.request_dao,
+            executor=self.executor,
+            import_part=self.import_part,
+            **kwargs,
+        )
+
+    def _get_windows(self):
+        parts = self.import_status_dao.create_bulk_import.call_args.kwargs["parts"]
+
+        return [(source.from_bytes, source.to_bytes) for part in parts for source in part.sources]
+
+    def test_execute(self):
+        on_progress = mock.Mock()
+
+        result = self._get_usecase(parts_count=3, min_part_size=50, on_progress=on_progress).execute(
+            url="/var/log/big.log",
+        )
+
+        self.assertEqual(self._get_windows(), [(0, 83), (84, 167), (168, 249)])
+        self.assertFalse(self.import_status_dao.create_bulk_import.call_args.kwargs["queued"])
+        self.assertEqual(sorted(call.args for call in self.import_part.call_args_list), [(11,), (12,), (13,)])
+        self.assertEqual(result.import_status_id, 10)
+        self.assertEqual(result.imported_size, 250)
+        self.assertGreater(result.bytes_per_second, 0)
+        on_progress.assert_called_with(result)
+
+    def test_execute_small_file(self):
+        self._get_usecase(parts_count=8, min_part_size=100).execute(url="/var/log/big.log")
+
+        self.assertEqual(self._get_windows(), [(0, 124), (125, 249)])
+
+    def test_execute_without_ranges(self):
+        self.request_dao.check_partial_content.return_value = (False, 0)
+
+        self._get_usecase(parts_count=8).execute(url="https://url.com/a.log")
+
+        parts = self.import_status_dao.create_bulk_import.call_args.kwargs["parts"]
+        self.assertEqual(parts, [ImportPart(host="url.com", sources=[
+            ImportSource(url="https://url.com/a.log", from_bytes=0, to_bytes=-1, size=0, accept_ranges=False),
+        ])])
+
+    def test_execute_failed_part(self):
+        self.import_part.side_effect = lambda import_status_id: 1 / (import_status_id - 11)
+        self.import_status_dao.get_import_status.side_effect = lambda import_status_id: mock.Mock(
+            status="start" if import_status_id == 11 else "finish"
+        )
+
+        with self.assertRaises(ZeroDivisionError):
+            self._get_usecase(parts_count=2, min_part_size=50).execute(url="/var/log/big.log")
+
+        self.import_status_dao.finish_import_part.assert_called_once_with(import_status_id=11, report=[], failed=True)
+
+    def test_execute_interrupted(self):
+        release = threading.Event()
+        self.import_part.side_effect = lambda import_status_id: release.wait(5)
+        self.import_status_dao.get_import_status.return_value.status = "start"
+        on_progress = mock.Mock(side_effect=KeyboardInterrupt)
+
+        try:
+            with self.assertRaises(KeyboardInterrupt):
+                self._get_usecase(parts_count=3, min_part_size=50, on_progress=on_progress, progress_seconds=0.01) \
+                    .execute(url="/var/log/big.log")
+        finally:
+            release.set()
+
+        # Two parts were running on the two threads, the third one was cancelled before it started.
+        self.assertEqual(self.import_part.call_count, 2)
+        self.import_status_dao.finish_import_part.assert_has_calls([
+            mock.call(import_status_id=11, report=[], failed=True),
+            mock.call(import_status_id=12, report=[], failed=True),
+            mock.call(import_status_id=13, report=[], failed=True),
+        ])
+
+
+class BulkImportSummaryUseCaseTestCase(TestCase):
+    def test_execute(self):
+        dao = mock.Mock()
+        dao.get_import_status.return_value.status = "finish"
+        dao.get_import_status.return_value.percent = 100
+        dao.get_import_part_reports.return_value = [
+            ImportSourceReport(url="/var/log/big.log", size=100, seconds=1.0),
+            ImportSourceReport(url="https://url.com/a.log", size=50, seconds=0.0),
+            ImportSourceReport(url="/var/log/big.log", size=300, seconds=3.0),
+        ]
+
+        result = BulkImportSummaryUseCase(dao).execute(import_status_id=10)
+
+        self.assertEqual(result, BulkImportSummary(status="finish", percent=100, sources=[
+            SourceThroughput(url="/var/log/big.log", size=400, seconds=4.0, bytes_per_second=100.0),
+            SourceThroughput(url="https://url.com/a.log", size=50, seconds=0.0, bytes_per_second=0.0),
+        ]))
+        dao.get_import_part_reports.assert_called_once_with(import_status_id=10)
+
+
+def _get_import_statistics(count: int, ip_addresses: List[str], status_codes: Dict[int, int]) -> ImportStatistics:
+    return ImportStatistics(
+        count=count,
+        unique_ip_count=len(ip_addresses),
+        sum_sizes=count * 10,
+        client_error_rate=status_codes.get(404, 0) / count,
+        server_error_rate=status_codes.get(500, 0) / count,
+        min_date=None,
+        max_date=None,
+        top_ip_addresses=[CountIPAddress(ip_address=ip_address, count=1) for ip_address in ip_addresses],
+        status_codes_count=[CountStatusCode(status_code=code, count=count) for code, count in status_codes.items()],
+    )
+
+
+class ImportStatisticsUseCaseTestCase(TestCase):
+    def setUp(self) -> None:
+        self.dao = mock.Mock()
+        self.base = _get_import_statistics(count=4, ip_addresses=["10.0.0.1", "10.0.0.2"], status_codes={200: 4})
+        self.other = _get_import_statistics(
+            count=8,
+            ip_addresses=["10.0.0.2", "10.0.0.3"],
+            status_codes={200: 4, 404: 2, 500: 2},
+        )
+
+    def test_get_import_statistics_missing(self):
+        self.dao.get_import_statistics.return_value = None
+        usecase = GetImportStatisticsUseCase(import_status_dao=self.dao)
+
+        with self.assertRaises(usecase.GetImportStatisticsValidationError):
+            usecase.execute(import_status_id=1)
+
+    def test_compare_imports(self):
+        self.dao.get_import_statistics.side_effect = lambda import_status_id: {1: self.base, 2: self.other}[
+            import_status_id
+        ]
+
+        result = CompareImportsUseCase(import_status_dao=self.dao).execute(
+            base_import_status_id=1,
+            other_import_status_id=2,
+        )
+
+        self.assertEqual(result, ImportComparison(
+            base=self.base,
+            other=self.other,
+            count_change=4,
+            unique_ip_count_change=0,
+            sum_sizes_change=40,
+            client_error_rate_change=0.25,
+            server_error_rate_change=0.25,
+            status_codes_change=[CountStatusCode(status_code=404, count=2), CountStatusCode(status_code=500, count=2)],
+            new_top_ip_addresses=[CountIPAddress(ip_address="10.0.0.3", count=1)],
+            dropped_top_ip_addresses=[CountIPAddress(ip_address="10.0.0.1", count=1)],
+        ))
+
+    def test_execute_saves_import_statistics(self):
+        logs_dao = mock.Mock()
+        logs_dao.iterate_log_hashes.return_value = []
+        request_dao = mock.Mock()
+        request_dao.check_partial_content.return_value = (False, 0)
+        request_dao.iter_full_content.return_value = []
+        self.dao.create_import_status.return_value = ImportStatus(pk=3, percent=1, status="start")
+
+        ParseLogsUseCase(logs_dao, request_dao, self.dao).execute("https://url.com")
+
+        logs_dao.create_apache_logs.assert_not_called()
+        logs_dao.get_import_statistics.assert_called_once_with(import_status_id=3)
+        self.dao.save_import_statistics.assert_called_once_with(
+            import_status_id=3,
+            statistics=logs_dao.get_import_statistics.return_value,
+        )
+
+    def test_execute_part_saves_bulk_import_statistics(self):
+        logs_dao = mock.Mock()
+        self.dao.get_import_job.return_value = ImportJob(pk=5, url="", host="", priority=0, sources=[])
+        self.dao.get_parent_import_status.return_value = ImportStatus(pk=4, percent=100, status="finish")
+
+        ParseLogsUseCase(logs_dao, mock.Mock(), self.dao).execute_part(import_status_id=5)
+
+        self.assertEqual(
+            [call.kwargs["import_status_id"] for call in self.dao.save_import_statistics.call_args_list],
+            [5, 4],
+        )
+
+        self.dao.save_import_statistics.reset_mock()
+        self.dao.get_parent_import_status.return_value = ImportStatus(pk=4, percent=50, status="start")
+
+        ParseLogsUseCase(logs_dao, mock.Mock(), self.dao).execute_part(import_status_id=5)
+
+        self.dao.save_import_statistics.assert_called_once_with(
+            import_status_id=5,
+            statistics=logs_dao.get_import_statistics.return_value,
+        )
+
+
+class ScheduleImportsUseCaseTestCase(TestCase):
+    def test_execute(self):
+        dao = mock.Mock()
+        start_import = mock.Mock()
+        import_jobs = [
+            ImportJob(pk=1, url="https://first.com/log", host="first.com", priority=1, sources=[]),
+            ImportJob(pk=2, url="https://second.com/log", host="second.com", priority=0, sources=[]),
+        ]
+        dao.claim_import_jobs.return_value = import_jobs
+        usecase = ScheduleImportsUseCase(dao, start_import=start_import, max_concurrent=4, max_concurrent_per_host=1)
+
+        result = usecase.execute()
+
+        self.assertEqual(result, import_jobs)
+        dao.claim_import_jobs.assert_called_once_with(max_concurrent=4, max_concurrent_per_host=1)
+        start_import.assert_has_calls([mock.call(import_jobs[0]), mock.call(import_jobs[1])])
+
+
+class ImportQueueUseCaseTestCase(TestCase):
+    def setUp(self) -> None:
+        self.dao = mock.Mock()
+
+    def test_execute(self):
+        self.dao.count_import_statuses.side_effect = lambda status: {"queued": 3, "start": 2}[status]
+        self.dao.get_average_import_seconds.return_value = 60.0
+        usecase = ImportQueueUseCase(self.dao, max_concurrent=2)
+
+        result = usecase.execute()
+
+        self.assertEqual(result, ImportQueue(depth=3, running=2, expected_wait_seconds=120.0))
+
+    def test_execute_free_slot(self):
+        self.dao.count_import_statuses.side_effect = lambda status: {"queued": 0, "start": 1}[status]
+        self.dao.get_average_import_seconds.return_value = None
+        usecase = ImportQueueUseCase(self.dao, max_concurrent=2)
+
+        result = usecase.execute()
+
+        self.assertEqual(result, ImportQueue(depth=0, running=1, expected_wait_seconds=0.0))
+
+    def test_execute_no_finished_imports(self):
+        self.dao.count_import_statuses.side_effect = lambda status: {"queued": 1, "start": 2}[status]
+        self.dao.get_average_import_seconds.return_value = None
+        usecase = ImportQueueUseCase(self.dao, max_concurrent=2)
+
+        result = usecase.execute()
+
+        self.assertEqual(result, ImportQueue(depth=1, running=2, expected_wait_seconds=None))
+
+
 class ImportStatusUseCaseTestCase(TestCase):
     def setUp(self) -> None:
         self.dao = mock.Mock()
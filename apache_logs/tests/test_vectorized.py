@@ -0,0 +1,84 @@
+import importlib.util
+import io
+from contextlib import redirect_stdout
+from unittest import TestCase, mock, skipUnless
+
+from apache_logs.usecases import ParseLogsUseCase
+
+ROWS = [
+    "83.149.9.216 - - [17/May/2015:10:05:03 +0000] \"GET /presentations/index.html HTTP/1.1\" 200 203023 \"-\" \"ua\"",
+    "127.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"POST /index.php?a=1 HTTP/1.0\" 404 - \"-\" \"ua\"",
+    "::1 - - [29/Feb/2020:23:59:59 -0530] \"OPTIONS * HTTP/1.1\" 200 0",
+    "2001:db8:0:0::1 - - [01/Jan/2021:00:00:00 +0000] \"HEAD / HTTP/1.1\" 301 007",
+    "",
+    "10.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /ü HTTP/1.1\" 200 12",
+    "10.0.0.1  -  - [19/Dec/2020:13:57:26 +0100] \"GET /spaces HTTP/1.1\" 200 12",
+    "10.0.0.1\t- - [19/Dec/2020:13:57:26 +0100] \"GET /tab HTTP/1.1\" 200 12",
+    "10.0.0.1 - - [19/dec/2020:13:57:26 +0100] \"GET /lowercase-month HTTP/1.1\" 200 +5",
+    "10.0.0.256 - - [19/Dec/2020:13:57:26 +0100] \"GET /invalid-ip HTTP/1.1\" 200 12",
+    "192.168.001.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /leading-zero HTTP/1.1\" 200 12",
+    "10.0.0.1 - - [29/Feb/2019:13:57:26 +0100] \"GET /invalid-day HTTP/1.1\" 200 12",
+    "10.0.0.1 - - [19/Dec/2020:24:00:00 +0100] \"GET /invalid-hour HTTP/1.1\" 200 12",
+    "10.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"FOO /invalid-method HTTP/1.1\" 200 12",
+    "10.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /invalid-status HTTP/1.1\" 600 12",
+    "10.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /status-sign HTTP/1.1\" +200 12",
+    "10.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /size-underscore HTTP/1.1\" 200 1_000",
+    "10.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /huge-size HTTP/1.1\" 200 99999999999999999999",
+    "10.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /carriage-return HTTP/1.1\" 200 12\r",
+    "10.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /invalid-utf-8-\udcff HTTP/1.1\" 200 12",
+    "10.0.0.1 - - [19/Dec/2020:13:57:26 +0100] \"GET /unit-separator\x1fx HTTP/1.1\" 200 12",
+    "10.0.0.1 - - [19/Dec/2020:13:57:26 +0100]",
+]
+
+
+@skipUnless(importlib.util.find_spec("numpy"), "numpy is not installed")
+class VectorizedParserTestCase(TestCase):
+    def setUp(self) -> None:
+        self.scalar_usecase = ParseLogsUseCase(mock.Mock(), mock.Mock(), mock.Mock())
+        self.vectorized_usecase = ParseLogsUseCase(mock.Mock(), mock.Mock(), mock.Mock(), vectorized=True)
+
+    def _parse(self, usecase: ParseLogsUseCase, rows):
+        data = "\n".join(rows).encode("utf-8", "surrogateescape")
+        output = io.StringIO()
+        with redirect_stdout(output):
+            apache_logs = usecase._parse_logs(buffers=[memoryview(data)])
+
+        return apache_logs, output.getvalue()
+
+    def test_identical_to_scalar_parser(self):
+        scalar_logs, scalar_output = self._parse(self.scalar_usecase, ROWS)
+        vectorized_logs, vectorized_output = self._parse(self.vectorized_usecase, ROWS)
+
+        self.assertEqual(vectorized_logs, scalar_logs)
+        self.assertEqual([log.date.tzinfo for log in vectorized_logs], [log.date.tzinfo for log in scalar_logs])
+        self.assertEqual(vectorized_output, scalar_output)
+        self.assertEqual(len(vectorized_logs), 13)
+        self.assertIn("/invalid-utf-8-\\xff uri is not valid utf-8.", vectorized_output)
+        self.assertIn("does not match the common log format.", vectorized_output)
+
+    def test_columns(self):
+        from apache_logs.vectorized import parse_log_buffer
+
+        parse_rows = mock.Mock(side_effect=self.scalar_usecase._parse_rows)
+
+        log_batch = parse_log_buffer(memoryview("\n".join(ROWS[:3]).encode()), parse_rows=parse_rows)
+
+        self.assertEqual(len(log_batch), 3)
+        self.assertEqual(log_batch.ip_addresses, ["83.149.9.216", "127.0.0.1", "::1"])
+        self.assertEqual(log_batch.timestamps.tolist(), [1431857103, 1608382646, 1583040599])
+        self.assertEqual(log_batch.utc_offsets.tolist(), [0, 60, -330])
+        self.assertEqual(log_batch.status_codes.tolist(), [200, 404, 200])
+        self.assertEqual(log_batch.sizes.tolist(), [203023, 0, 0])
+        parse_rows.assert_not_called()
+
+    def test_empty(self):
+        self.assertEqual(self._parse(self.vectorized_usecase, ["", ""]), ([], ""))
+
+    @mock.patch("apache_logs.usecases.importlib.util.find_spec")
+    def test_numpy_missing(self, find_spec_mock: mock.Mock):
+        find_spec_mock.return_value = None
+
+        with redirect_stdout(io.StringIO()):
+            usecase = ParseLogsUseCase(mock.Mock(), mock.Mock(), mock.Mock(), vectorized=True)
+
+        self.assertFalse(usecase.vectorized)
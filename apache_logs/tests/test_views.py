@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+
+from django.test import TransactionTestCase
+
+from apache_logs.daos import ApacheLogsDAO
+from apache_logs.entities import ApacheLog
+
+
+class DataETagTestCase(TransactionTestCase):
+    def setUp(self) -> None:
+        self.dao = ApacheLogsDAO()
+        self.dao.create_apache_logs(apache_logs=[
+            ApacheLog(
+                ip_address="10.0.0.1",
+                date=datetime(2021 - index % 2, 1, 1, tzinfo=timezone.utc),
+                method="GET",
+                uri=f"/page/{index}",
+                status_code=200,
+                size=1,
+            ) for index in range(3)
+        ])
+
+    def _get_statistics(self, etag: str = None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get("/api/statistics", **headers)
+
+    def test_not_modified(self):
+        etag = self._get_statistics()["ETag"]
+
+        self.assertEqual(self._get_statistics(etag=etag).status_code, 304)
+
+    def test_modified_by_interior_delete(self):
+        # The row with the middle id is the only old one, the id range stays the same.
+        etag = self._get_statistics()["ETag"]
+
+        self.dao.delete_logs_before(date=datetime(2020, 6, 1, tzinfo=timezone.utc), batch_size=10)
+
+        response = self._get_statistics(etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
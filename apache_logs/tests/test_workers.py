@@ -0,0 +1,68 @@
+import subprocess
+import sys
+from unittest import TestCase, mock
+
+from django.conf import settings
+from django.test import override_settings
+
+from apache_logs.workers import get_apache_logs_dao, get_request_dao, get_http_session, reset_worker_state, \
+    check_connections, get_parse_logs_options, get_host_rate_limits_dao
+
+
+class WorkersTestCase(TestCase):
+    def tearDown(self) -> None:
+        reset_worker_state()
+
+    def test_singletons(self):
+        self.assertIs(get_apache_logs_dao(), get_apache_logs_dao())
+        self.assertIs(get_request_dao(), get_request_dao())
+        self.assertIs(get_request_dao().session, get_http_session())
+
+    def test_reset_worker_state(self):
+        request_dao = get_request_dao()
+
+        reset_worker_state()
+
+        self.assertIsNot(get_request_dao(), request_dao)
+
+    @mock.patch("apache_logs.workers.close_old_connections")
+    @mock.patch("apache_logs.workers.connections")
+    def test_check_connections(self, connections_mock: mock.Mock, close_old_connections_mock: mock.Mock):
+        broken_connection = mock.Mock()
+        broken_connection.is_usable.return_value = False
+        healthy_connection = mock.Mock()
+        healthy_connection.is_usable.return_value = True
+        connections_mock.all.return_value = [broken_connection, healthy_connection]
+
+        check_connections()
+
+        broken_connection.close.assert_called_once_with()
+        healthy_connection.close.assert_not_called()
+        close_old_connections_mock.assert_called_once_with()
+
+    @override_settings(IMPORT_HOST_REQUESTS_PER_SECOND=12, IMPORT_MAX_CONCURRENT_PER_HOST=2)
+    def test_get_parse_logs_options_requests_per_second(self):
+        # The rate of the host is shared through the database, not split between the imports.
+        options = get_parse_logs_options()
+
+        self.assertEqual(options["requests_per_second"], 12)
+        self.assertIs(options["host_rate_limits_dao"], get_host_rate_limits_dao())
+
+
+class LazyImportsTestCase(TestCase):
+    def test_dashboard_does_not_import_requests_or_celery(self):
+        # A fresh interpreter, the test runner itself has imported both already.
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, django; django.setup(); import parsing_logs.urls, apache_logs.workers; "
+                "print(sorted({'requests', 'celery'} & set(sys.modules)))",
+            ],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        self.assertEqual(result.stdout.strip(), "[]")
@@ -0,0 +1,57 @@
+from time import monotonic, sleep
+from typing import Callable
+
+
+class RateLimiter:
+    # Spaces calls at least 1 / `rate` seconds apart. The first call never waits.
+
+    def __init__(
+        self,
+        rate: float,
+        clock: Callable[[], float] = monotonic,
+        sleep_func: Callable[[float], None] = sleep,
+    ):
+        self.interval = 1 / rate
+        self.clock = clock
+        self.sleep_func = sleep_func
+        self.next_call_at = None
+
+    def reserve(self) -> float:
+        # Books the next call and returns the seconds until it.
+        now = self.clock()
+        call_at = now if self.next_call_at is None else max(now, self.next_call_at)
+        self.next_call_at = call_at + self.interval
+
+        return call_at - now
+
+    def wait(self):
+        seconds = self.reserve()
+
+        if seconds > 0:
+            self.sleep_func(seconds)
+
+
+class HostRateLimiter:
+    # Spaces the calls to `host` of every process at least 1 / `rate` seconds apart. `reserve_request`
+    # books the next free slot of the host and returns the seconds until it.
+
+    def __init__(
+        self,
+        rate: float,
+        host: str,
+        reserve_request: Callable[..., float],
+        sleep_func: Callable[[float], None] = sleep,
+    ):
+        self.interval = 1 / rate
+        self.host = host
+        self.reserve_request = reserve_request
+        self.sleep_func = sleep_func
+
+    def reserve(self) -> float:
+        return self.reserve_request(host=self.host, interval=self.interval)
+
+    def wait(self):
+        seconds = self.reserve()
+
+        if seconds > 0:
+            self.sleep_func(seconds)
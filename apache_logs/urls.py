@@ -1,8 +1,17 @@
 from django.urls import path
 
-from apache_logs.views import index, import_status
+from apache_logs.views import index, import_status, time_series, export, api_logs, api_statistics, \
+    api_import_statistics, api_compare_imports, api_networks, api_anomalies
 
 urlpatterns = [
     path("import_status", import_status, name="import_status"),
+    path("statistics/time_series", time_series, name="time_series"),
+    path("export", export, name="export"),
+    path("api/logs", api_logs, name="api_logs"),
+    path("api/statistics", api_statistics, name="api_statistics"),
+    path("api/imports/<int:import_status_id>/statistics", api_import_statistics, name="api_import_statistics"),
+    path("api/networks", api_networks, name="api_networks"),
+    path("api/anomalies", api_anomalies, name="api_anomalies"),
+    path("api/imports/compare", api_compare_imports, name="api_compare_imports"),
     path("", index, name="index"),
 ]
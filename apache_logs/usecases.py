@@ -1,53 +1,201 @@
+import asyncio
+import importlib.util
 import ipaddress
-from datetime import datetime
+from concurrent.futures import Executor, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from collections import defaultdict
+from dataclasses import replace
+from functools import partial
 from math import ceil
-from typing import List
+from time import monotonic, sleep
+from typing import List, Optional, Callable, Any, Iterable, Dict, Iterator, Union, TYPE_CHECKING
+from urllib.parse import urlparse
 
-from apache_logs.constants import HTTP_METHODS
-from apache_logs.entities import ApacheLog, LogStatistics, PaginatedLogWithStatistics, ImportStatus
-from apache_logs.interfaces import IApacheLogsDAO, IRequestDAO, IImportStatusDAO
+from apache_logs.anomalies import BurstDetector
+from apache_logs.chunking import AdaptiveRangeSizer, KB, MB, Buffer, LineSplitter
+from apache_logs.constants import HTTP_METHODS_BY_NAME, AVERAGE_LINE_SIZE, DEFAULT_BLOOM_CAPACITY, \
+    LOG_HASHES_CHUNK_SIZE, TIME_SERIES_INTERVALS, LOG_FIELDS, OPTIONAL_LOG_FIELDS, DETECT_FORMAT_LINES, \
+    NETWORK_GROUPS, ROLLUP_IPV4_PREFIX, ROLLUP_IPV6_PREFIX, ANOMALY_KINDS, ANOMALY_REASONS
+from apache_logs.dedup import BloomFilter, OccurrenceCounter, get_log_hash
+from apache_logs.entities import ApacheLog, LogStatistics, PaginatedLogWithStatistics, ImportStatus, LogTimeSeries, \
+    LogsExport, LogRows, RetentionReport, ImportJob, ImportQueue, ImportSource, ImportSourceReport, ImportPart, \
+    BulkImportPlan, BulkImportSummary, SourceThroughput, ImportStatistics, ImportComparison, CountStatusCode, \
+    CountNetwork, AnomalyEvent, AnomalyThresholds, LocalImportProgress
+from apache_logs.exporters import EXPORT_FORMATS, EXPORT_COMPRESSIONS
+from apache_logs.interfaces import IApacheLogsDAO, IRequestDAO, IImportStatusDAO, ILogSegmentsDAO, IGeoIPDAO, \
+    IAnomalyEventsDAO, ISavedSearchesDAO, IHostRateLimitsDAO
+from apache_logs.throttling import RateLimiter, HostRateLimiter
+
+if TYPE_CHECKING:
+    from apache_logs.formats import LogParser
+
+
+def _decode(value: bytes) -> str:
+    return value.decode("utf-8", "backslashreplace")
+
+
+def _decode_header(value: bytes) -> Optional[str]:
+    # "-" is how the log formats write a missing header.
+    if value == b"-":
+        return None
+
+    return value.decode("utf-8", "backslashreplace")
+
+
+def _locate_logs(geoip_dao: IGeoIPDAO, apache_logs: List[ApacheLog]):
+    for apache_log in apache_logs:
+        apache_log.country, apache_log.asn = geoip_dao.get_ip_location(apache_log.ip_address)
 
 
 class ParseLogsUseCase:
 
-    def __init__(self, logs_dao: IApacheLogsDAO, request_dao: IRequestDAO, import_status_dao: IImportStatusDAO):
+    def __init__(
+        self,
+        logs_dao: IApacheLogsDAO,
+        request_dao: IRequestDAO,
+        import_status_dao: IImportStatusDAO,
+        min_range_size: int = 64 * KB,
+        max_range_size: int = 16 * MB,
+        target_range_seconds: float = 1.0,
+        deduplicate: bool = True,
+        rebuild_indexes_from_size: Optional[int] = None,
+        requests_per_second: Optional[float] = None,
+        host_rate_limits_dao: Optional[IHostRateLimitsDAO] = None,
+        vectorized: bool = False,
+        log_format: str = "common",
+        segments_dao: Optional[ILogSegmentsDAO] = None,
+        segment_rows: int = 100_000,
+        geoip_dao: Optional[IGeoIPDAO] = None,
+        anomaly_events_dao: Optional[IAnomalyEventsDAO] = None,
+        anomaly_thresholds: Optional[AnomalyThresholds] = None,
+    ):
         self.logs_dao = logs_dao
         self.request_dao = request_dao
         self.import_status_dao = import_status_dao
+        self.min_range_size = min_range_size
+        self.max_range_size = max_range_size
+        self.target_range_seconds = target_range_seconds
+        self.deduplicate = deduplicate
+        self.rebuild_indexes_from_size = rebuild_indexes_from_size
+        # Range requests per second to a source host, shared with the other processes through
+        # `host_rate_limits_dao` when it is set.
+        self.requests_per_second = requests_per_second
+        self.host_rate_limits_dao = host_rate_limits_dao
+        self.rate_limiters = {}
+        self.vectorized = vectorized and self._is_numpy_installed()
+        self.log_format = log_format
+        # Resolved with the first slice: compiling the formats is left to the processes that parse.
+        self.log_parser = None
+        self.bloom_filter = None
+        self.occurrence_counter = OccurrenceCounter()
+        self.segments_dao = segments_dao
+        self.segment_rows = segment_rows
+        # Inserted rows not written to a segment yet.
+        self.segment_logs = []
+        self.geoip_dao = geoip_dao
+        self.anomaly_events_dao = anomaly_events_dao
+        self.anomaly_thresholds = anomaly_thresholds or AnomalyThresholds()
+        self.burst_detector = None
+        # URL of the file being imported, recorded in its segments.
+        self.source = ""
+        # Import the inserted rows are tagged with.
+        self.import_status_id = None
+        # Lines parsed by the import, also the ones skipped as already imported.
+        self.lines_count = 0
+
+    def _is_numpy_installed(self) -> bool:
+        if importlib.util.find_spec("numpy") is None:
+            print("numpy is not installed, falling back to the scalar parser")
+            return False
+
+        return True
+
+    def _start_format_detection(self):
+        if self.log_format == "auto":
+            self.log_parser = None
+
+    def _get_log_parser(self, buffers: List[Buffer]) -> Optional["LogParser"]:
+        from apache_logs.formats import LOG_PARSERS, get_log_parser, detect_log_parser
+
+        if self.log_format != "auto":
+            return get_log_parser(self.log_format)
+
+        lines = [line for buffer in buffers for line in bytes(buffer[:64 * KB]).split(b"\n") if line.strip()]
+        if not lines:
+            return None
+
+        log_parser = detect_log_parser(lines[:DETECT_FORMAT_LINES])
+        if log_parser is None:
+            print("Log format was not detected, falling back to the common log format")
+            return LOG_PARSERS["common"]
+
+        return log_parser
+
+    def _parse_logs(self, buffers: List[Buffer]) -> List[ApacheLog]:
+        if self.log_parser is None:
+            self.log_parser = self._get_log_parser(buffers=buffers)
+            if self.log_parser is None:
+                return []
+
+        apache_logs = []
+
+        for buffer in buffers:
+            # The vectorized parser only knows the Common Log Format.
+            if self.vectorized and self.log_parser.name == "common":
+                from apache_logs.vectorized import parse_log_buffer
 
-    def _import_logs(self, rows: List[str]):
+                apache_logs.extend(parse_log_buffer(buffer, parse_rows=self._parse_rows).to_apache_logs())
+            else:
+                apache_logs.extend(self._parse_rows(rows=bytes(buffer).split(b"\n")))
+
+        return apache_logs
+
+    def _parse_rows(self, rows: List[bytes]) -> List[ApacheLog]:
+        # Fields stay bytes until they are stored; ip addresses and dates repeat a lot,
+        # so each distinct value is decoded and validated once per call.
         apache_logs = []
+        ip_addresses = {}
+        dates = {}
+        log_parser = self.log_parser
 
         for line in rows:
             if not line:
                 continue
-            ip_address, _, _, date, gmt, method, uri, _, status_code, size, *options = line.split()
 
-            try:
-                ip_address = str(ipaddress.ip_address(ip_address))
-            except ValueError:
-                print(f"{ip_address} is not a valid ip address")
+            fields = log_parser.parse(line)
+            if fields is None:
+                print(f"{_decode(line)} does not match the {log_parser.name} log format.")
                 continue
+            ip_address, date, gmt, method, uri, status_code, size, referrer, user_agent, response_time = fields
 
-            date = date[1:]
-            gmt = gmt[:-1]
+            if ip_address not in ip_addresses:
+                try:
+                    ip_addresses[ip_address] = str(ipaddress.ip_address(ip_address.decode("ascii")))
+                except ValueError:
+                    ip_addresses[ip_address] = None
 
-            try:
-                date = datetime.strptime(date + gmt, '%d/%b/%Y:%H:%M:%S%z')
-            except ValueError:
-                print(f"{date} date is not a valid date.")
+            if ip_addresses[ip_address] is None:
+                print(f"{_decode(ip_address)} is not a valid ip address")
                 continue
 
-            method = method[1:]
+            if (date, gmt) not in dates:
+                try:
+                    dates[date, gmt] = datetime.strptime((date + gmt).decode("ascii"), '%d/%b/%Y:%H:%M:%S%z')
+                except ValueError:
+                    dates[date, gmt] = None
+
+            if dates[date, gmt] is None:
+                print(f"{_decode(date)} date is not a valid date.")
+                continue
 
-            if method not in HTTP_METHODS:
-                print(f"{method} method is not valid.")
+            if method not in HTTP_METHODS_BY_NAME:
+                print(f"{_decode(method)} method is not valid.")
                 continue
 
             try:
                 status_code = int(status_code)
             except ValueError:
-                print(f"{status_code} should be valid integer")
+                print(f"{_decode(status_code)} should be valid integer")
                 continue
 
             if not 100 <= status_code <= 599:
@@ -56,81 +204,904 @@ class ParseLogsUseCase:
 
             try:
                 size = int(size)
-            except ValueError:
+            except (TypeError, ValueError):
                 size = 0
 
+            if referrer is not None:
+                referrer = _decode_header(referrer)
+
+            if user_agent is not None:
+                user_agent = _decode_header(user_agent)
+
+            if response_time is not None:
+                try:
+                    response_time = round(float(response_time) * log_parser.response_time_scale)
+                except ValueError:
+                    response_time = None
+
+            try:
+                uri = uri.decode("utf-8")
+            except UnicodeDecodeError:
+                print(f"{_decode(uri)} uri is not valid utf-8.")
+                continue
+
             apache_log = ApacheLog(
-                ip_address=ip_address,
-                date=date,
-                method=method,
+                ip_address=ip_addresses[ip_address],
+                date=dates[date, gmt],
+                method=HTTP_METHODS_BY_NAME[method],
                 uri=uri,
                 status_code=status_code,
                 size=size,
+                referrer=referrer,
+                user_agent=user_agent,
+                response_time=response_time,
             )
 
             apache_logs.append(apache_log)
 
-        self.logs_dao.create_apache_logs(apache_logs=apache_logs)
+        return apache_logs
+
+    def _deduplicate_logs(self, apache_logs: List[ApacheLog]) -> List[ApacheLog]:
+        # The Bloom filter holds the lines of earlier imports of the source. Lines it has never
+        # seen go straight to the insert, the unique line_hash index still guards them against
+        # rows imported from other sources. Lines it may have seen are checked against the
+        # database, so false positives are never lost.
+        new_logs = []
+        suspect_logs = {}
+
+        for apache_log in apache_logs:
+            log_hash = get_log_hash(apache_log)
+
+            if log_hash in self.bloom_filter:
+                suspect_logs[log_hash] = apache_log
+            else:
+                new_logs.append(apache_log)
+
+        if suspect_logs:
+            existing_log_hashes = self.logs_dao.get_existing_log_hashes(log_hashes=list(suspect_logs))
+            new_logs.extend(
+                apache_log for log_hash, apache_log in suspect_logs.items() if log_hash not in existing_log_hashes
+            )
+
+        return new_logs
+
+    def _create_apache_logs(self, apache_logs: List[ApacheLog]):
+        self.lines_count += len(apache_logs)
+        self.occurrence_counter.count(apache_logs)
+
+        if self.bloom_filter is not None:
+            apache_logs = self._deduplicate_logs(apache_logs=apache_logs)
+
+        if self.geoip_dao is not None:
+            _locate_logs(geoip_dao=self.geoip_dao, apache_logs=apache_logs)
+
+        inserted_log_hashes = self.logs_dao.create_apache_logs(
+            apache_logs=apache_logs,
+            import_status_id=self.import_status_id,
+        )
+
+        # Segments keep the inserted rows only, a file imported again adds nothing to them.
+        if self.segments_dao is not None:
+            self.segment_logs.extend(log for log in apache_logs if get_log_hash(log) in inserted_log_hashes)
+            if len(self.segment_logs) >= self.segment_rows:
+                self._finish_segment()
+
+        # Only new lines are counted, a file imported again flags nothing twice.
+        if self.burst_detector is not None:
+            self._create_anomaly_events(anomaly_events=self.burst_detector.observe(apache_logs))
+
+    def _finish_segment(self):
+        # Rows are buffered up to `segment_rows`, so an import writes a few large segments instead of one per slice.
+        if self.segment_logs:
+            self.segments_dao.create_segment(apache_logs=self.segment_logs, source=self.source)
+            self.segment_logs = []
+
+    def _create_anomaly_events(self, anomaly_events: List[AnomalyEvent]):
+        if anomaly_events:
+            self.anomaly_events_dao.create_anomaly_events(
+                anomaly_events=anomaly_events,
+                import_status_id=self.import_status_id,
+            )
+
+    def _import_logs(self, buffers: List[Buffer]):
+        apache_logs = self._parse_logs(buffers=buffers)
+
+        self._create_apache_logs(apache_logs=apache_logs)
+
+    def _start_deduplication(self, source: str, max_length: int):
+        self.occurrence_counter = OccurrenceCounter()
+        self.bloom_filter = None
+        if not self.deduplicate:
+            return
+
+        # Only a source imported before can have known lines, the first import skips the filter.
+        bloom_filter = BloomFilter(capacity=max_length // AVERAGE_LINE_SIZE or DEFAULT_BLOOM_CAPACITY)
+        known_lines_count = 0
+        for log_hash in self.logs_dao.iterate_log_hashes(source=source, chunk_size=LOG_HASHES_CHUNK_SIZE):
+            bloom_filter.add(log_hash)
+            known_lines_count += 1
+
+        if known_lines_count:
+            self.bloom_filter = bloom_filter
+
+    def _start_anomaly_detection(self):
+        if self.anomaly_events_dao is not None and self.anomaly_thresholds.window_seconds > 0:
+            self.burst_detector = BurstDetector(thresholds=self.anomaly_thresholds)
+
+    def _finish_anomaly_detection(self):
+        # The last window of the file ends with it.
+        if self.burst_detector is not None:
+            self._create_anomaly_events(anomaly_events=self.burst_detector.flush())
+            self.burst_detector = None
+
+    def _get_range_sizer(self, max_length: int) -> AdaptiveRangeSizer:
+        return AdaptiveRangeSizer(
+            min_size=self.min_range_size,
+            max_size=self.max_range_size,
+            target_seconds=self.target_range_seconds,
+            initial_size=ceil(max_length / 100),
+        )
+
+    def _get_rate_limiter(self, url: str) -> Optional[Union[RateLimiter, HostRateLimiter]]:
+        if not self.requests_per_second:
+            return None
+
+        host = urlparse(url).hostname or ""
+        if host not in self.rate_limiters:
+            if self.host_rate_limits_dao is None:
+                self.rate_limiters[host] = RateLimiter(rate=self.requests_per_second)
+            else:
+                self.rate_limiters[host] = HostRateLimiter(
+                    rate=self.requests_per_second,
+                    host=host,
+                    reserve_request=self.host_rate_limits_dao.reserve_request,
+                )
+
+        return self.rate_limiters[host]
+
+    def _get_partial_content(self, range_sizer: AdaptiveRangeSizer, url: str, from_bytes: int, to_bytes: int) -> bytes:
+        rate_limiter = self._get_rate_limiter(url=url)
+        if rate_limiter is not None:
+            rate_limiter.wait()
+
+        return self._fetch_partial_content(range_sizer, url=url, from_bytes=from_bytes, to_bytes=to_bytes)
+
+    def _fetch_partial_content(
+        self,
+        range_sizer: AdaptiveRangeSizer,
+        url: str,
+        from_bytes: int,
+        to_bytes: int,
+    ) -> bytes:
+        started_at = monotonic()
+        content = self.request_dao.get_partial_content(url=url, from_bytes=from_bytes, to_bytes=to_bytes)
+        range_sizer.record(size=to_bytes - from_bytes + 1, seconds=monotonic() - started_at)
+
+        return content
+
+    def _iter_full_buffers(self, url: str) -> Iterator[List[Buffer]]:
+        # A server without range support is read as a stream of `max_range_size` chunks,
+        # so only one chunk and its logs are in memory at a time, like with ranges.
+        line_splitter = LineSplitter()
+
+        for content in self.request_dao.iter_full_content(url=url, chunk_size=self.max_range_size):
+            buffers = line_splitter.split(content)
+            if buffers:
+                yield buffers
+
+        last_line = line_splitter.flush()
+        if last_line:
+            yield last_line
+
+    def _import_full(self, url: str):
+        for buffers in self._iter_full_buffers(url=url):
+            self._import_logs(buffers=buffers)
+
+    def _get_percent(self, to_bytes: int, max_length: int) -> int:
+        return (to_bytes + 1) * 100 // max_length
+
+    def _should_rebuild_indexes(self, max_length: int) -> bool:
+        return self.rebuild_indexes_from_size is not None and max_length >= self.rebuild_indexes_from_size
+
+    def _import_ranges(self, url: str, max_length: int, import_status: ImportStatus):
+        range_sizer = self._get_range_sizer(max_length=max_length)
+        line_splitter = LineSplitter()
+        percent = 0
+
+        for from_bytes, to_bytes in range_sizer.get_ranges(max_length=max_length):
+            content = self._get_partial_content(range_sizer, url=url, from_bytes=from_bytes, to_bytes=to_bytes)
+            self._import_logs(buffers=line_splitter.split(content))
+
+            new_percent = self._get_percent(to_bytes=to_bytes, max_length=max_length)
+            if percent < new_percent < 100:
+                percent = new_percent
+                self.import_status_dao.update_import_status(import_status_id=import_status.pk, percent=percent)
+
+        last_line = line_splitter.flush()
+        if last_line:
+            self._import_logs(buffers=last_line)
+
+    def _get_import_status(self, import_status_id: Optional[int]) -> ImportStatus:
+        if import_status_id is None:
+            return self.import_status_dao.create_import_status()
 
-    def execute(self, url: str) -> None:
+        return self.import_status_dao.get_import_status(import_status_id=import_status_id)
+
+    def _import(self, url: str, import_status: ImportStatus):
         is_accept_ranges, max_length = self.request_dao.check_partial_content(url=url)
 
-        import_status = self.import_status_dao.create_import_status()
+        self._start_deduplication(source=url, max_length=max_length)
+        self._start_anomaly_detection()
+        self._start_format_detection()
+        self.source = url
+        self.import_status_id = import_status.pk
+
+        rebuild_indexes = self._should_rebuild_indexes(max_length=max_length)
+        if rebuild_indexes:
+            self.logs_dao.drop_secondary_indexes()
+
+        try:
+            if is_accept_ranges:
+                self._import_ranges(url=url, max_length=max_length, import_status=import_status)
+            else:
+                self._import_full(url=url)
+            self._finish_anomaly_detection()
+        finally:
+            # The inserted rows are committed, they are written to a segment also when the import fails.
+            self._finish_segment()
+            if rebuild_indexes:
+                self.logs_dao.create_secondary_indexes()
+
+    def execute(self, url: str, import_status_id: Optional[int] = None) -> None:
+        import_status = self._get_import_status(import_status_id=import_status_id)
+        self.lines_count = 0
+
+        try:
+            self._import(url=url, import_status=import_status)
+        except Exception:
+            self.import_status_dao.fail_import_status(import_status_id=import_status.pk)
+            raise
+
+        self.import_status_dao.save_lines_count(import_status_id=import_status.pk, lines_count=self.lines_count)
+        self.import_status_dao.finish_import_status(import_status_id=import_status.pk)
+        self._save_import_statistics(import_status_id=import_status.pk)
+
+    def _save_import_statistics(self, import_status_id: int):
+        # Computed once from the rows of the finished import, reading them is cheap right after they were written.
+        statistics = self.logs_dao.get_import_statistics(import_status_id=import_status_id)
+        self.import_status_dao.save_import_statistics(import_status_id=import_status_id, statistics=statistics)
+
+    def _import_source(self, source: ImportSource, on_progress: Callable[[int], Any]):
+        if not source.accept_ranges:
+            self._import_full(url=source.url)
+            on_progress(source.to_bytes - source.from_bytes + 1)
+            return
+
+        # A window imports the lines starting inside it. Fetching starts one byte early, so the
+        # first line is the tail of a line owned by the previous window (empty if that byte is "\n").
+        line_splitter = LineSplitter(skip_first_line=source.from_bytes > 0)
+        range_sizer = self._get_range_sizer(max_length=source.to_bytes - source.from_bytes + 1)
+
+        for from_bytes, to_bytes in range_sizer.get_ranges(
+            max_length=source.to_bytes + 1,
+            from_bytes=source.from_bytes - 1 if line_splitter.skip_first_line else 0,
+        ):
+            content = self._get_partial_content(range_sizer, url=source.url, from_bytes=from_bytes, to_bytes=to_bytes)
+            self._import_logs(buffers=line_splitter.split(content))
+            on_progress(to_bytes - from_bytes + 1)
+
+        if line_splitter.skip_first_line:
+            # The whole window is inside a single line.
+            return
+
+        # The last line may continue after the window, it is read up to its newline.
+        from_bytes = source.to_bytes + 1
+        while line_splitter.tail and from_bytes < source.size:
+            to_bytes = min(from_bytes + self.min_range_size, source.size) - 1
+            content = self._get_partial_content(range_sizer, url=source.url, from_bytes=from_bytes, to_bytes=to_bytes)
+            newline = content.find(b"\n")
+            self._import_logs(buffers=line_splitter.split(content[:newline + 1] if newline >= 0 else content))
+            from_bytes = to_bytes + 1
+
+        last_line = line_splitter.flush()
+        if last_line:
+            self._import_logs(buffers=last_line)
+
+    def execute_part(self, import_status_id: int) -> None:
+        import_job = self.import_status_dao.get_import_job(import_status_id=import_status_id)
+        on_progress = partial(self.import_status_dao.add_imported_size, import_status_id)
+        report = []
+        self.lines_count = 0
+
+        try:
+            for source in import_job.sources:
+                started_at = monotonic()
+                self._start_deduplication(source=source.url, max_length=source.to_bytes - source.from_bytes + 1)
+                self._start_anomaly_detection()
+                self._start_format_detection()
+                self.source = source.url
+                self.import_status_id = import_status_id
+                self._import_source(source=source, on_progress=on_progress)
+                self._finish_anomaly_detection()
+                self._finish_segment()
+                report.append(ImportSourceReport(
+                    url=source.url,
+                    size=source.to_bytes - source.from_bytes + 1,
+                    seconds=monotonic() - started_at,
+                ))
+        except Exception:
+            # The inserted rows of the failed source are committed, they are written to a segment too.
+            self._finish_segment()
+            self.import_status_dao.finish_import_part(import_status_id=import_status_id, report=report, failed=True)
+            raise
+
+        # Before the part finishes, the last part to finish counts the lines of all of them.
+        self.import_status_dao.save_lines_count(import_status_id=import_status_id, lines_count=self.lines_count)
+        self.import_status_dao.finish_import_part(import_status_id=import_status_id, report=report)
+        self._save_import_statistics(import_status_id=import_status_id)
+
+        # The last part to finish also finishes the bulk import.
+        parent = self.import_status_dao.get_parent_import_status(import_status_id=import_status_id)
+        if parent is not None and parent.status == "finish":
+            self._save_import_statistics(import_status_id=parent.pk)
+
+
+class AsyncParseLogsUseCase(ParseLogsUseCase):
+    # Three-stage pipeline: fetch -> parse -> write, connected by bounded queues,
+    # so fetching slice N+1, parsing slice N and inserting slice N-1 overlap.
+    # DAOs are blocking, so every stage hands them to an executor; the writer
+    # uses a single dedicated thread so all DB work shares one connection,
+    # `close_connection` is called on that thread before it exits.
+
+    def __init__(
+        self,
+        logs_dao: IApacheLogsDAO,
+        request_dao: IRequestDAO,
+        import_status_dao: IImportStatusDAO,
+        queue_size: int = 2,
+        executor: Optional[Executor] = None,
+        close_connection: Optional[Callable[[], Any]] = None,
+        **kwargs,
+    ):
+        super().__init__(logs_dao=logs_dao, request_dao=request_dao, import_status_dao=import_status_dao, **kwargs)
+        self.queue_size = queue_size
+        self.executor = executor
+        self.close_connection = close_connection
+        self.db_executor = None
 
-        if is_accept_ranges:
-            step = ceil(max_length / 100)
-            percent = 0
-            from_bytes = 0
-            to_bytes = step
-            last_row = ""
+    async def _run_in_executor(self, executor: Optional[Executor], func: Callable, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(executor, partial(func, **kwargs))
 
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # A call cannot be interrupted, a cancelled stage stops only once it has returned.
+            await asyncio.wait([future])
+            raise
+
+    async def _write(self, func: Callable, **kwargs) -> Any:
+        return await self._run_in_executor(self.db_executor, func, **kwargs)
+
+    async def _fetch_stage(self, url: str, max_length: int, buffers_queue: asyncio.Queue):
+        range_sizer = self._get_range_sizer(max_length=max_length)
+        line_splitter = LineSplitter()
+        rate_limiter = self._get_rate_limiter(url=url)
+
+        for from_bytes, to_bytes in range_sizer.get_ranges(max_length=max_length):
+            if rate_limiter is not None:
+                # Booked on the database thread, the wait itself holds no thread.
+                await asyncio.sleep(await self._write(rate_limiter.reserve))
+
+            content = await self._run_in_executor(
+                self.executor,
+                self._fetch_partial_content,
+                range_sizer=range_sizer,
+                url=url,
+                from_bytes=from_bytes,
+                to_bytes=to_bytes,
+            )
+
+            await buffers_queue.put((
+                line_splitter.split(content),
+                self._get_percent(to_bytes=to_bytes, max_length=max_length),
+            ))
+
+        last_line = line_splitter.flush()
+        if last_line:
+            await buffers_queue.put((last_line, 100))
+
+        await buffers_queue.put(None)
+
+    async def _fetch_full_stage(self, url: str, buffers_queue: asyncio.Queue):
+        # The size is unknown, progress stays at 0 until the import finishes.
+        full_buffers = self._iter_full_buffers(url=url)
+
+        try:
             while True:
-                rows = self.request_dao.get_partial_rows(url=url, from_bytes=from_bytes, to_bytes=to_bytes)
-                if last_row:
-                    rows[0] = f"{last_row}{rows[0]}"
-                last_row = rows[-1]
-                self._import_logs(rows=rows[:-1])
+                buffers = await self._run_in_executor(self.executor, partial(next, full_buffers, None))
+                if buffers is None:
+                    break
 
-                if to_bytes == max_length:
-                    self.import_status_dao.finish_import_status(import_status_id=import_status.pk)
-                    return
+                await buffers_queue.put((buffers, 0))
+        finally:
+            # Closes the streamed response, also when another stage failed.
+            await self._run_in_executor(self.executor, full_buffers.close)
 
-                percent += 1
+        await buffers_queue.put(None)
 
-                self.import_status_dao.update_import_status(import_status_id=import_status.pk, percent=percent)
+    async def _parse_stage(self, buffers_queue: asyncio.Queue, logs_queue: asyncio.Queue):
+        while True:
+            item = await buffers_queue.get()
+            if item is None:
+                await logs_queue.put(None)
+                return
 
-                from_bytes += step
-                to_bytes += step
+            buffers, percent = item
+            apache_logs = await self._run_in_executor(self.executor, self._parse_logs, buffers=buffers)
 
-                if to_bytes > max_length:
-                    to_bytes = max_length
-        else:
-            rows = self.request_dao.get_full_rows(url=url)
-            self._import_logs(rows=rows)
-            self.import_status_dao.finish_import_status(import_status_id=import_status.pk)
+            await logs_queue.put((apache_logs, percent))
+
+    async def _write_stage(self, import_status: ImportStatus, logs_queue: asyncio.Queue):
+        percent = 0
+
+        while True:
+            item = await logs_queue.get()
+            if item is None:
+                return
+
+            apache_logs, new_percent = item
+            await self._write(self._create_apache_logs, apache_logs=apache_logs)
+
+            if percent < new_percent < 100:
+                percent = new_percent
+                await self._write(
+                    self.import_status_dao.update_import_status,
+                    import_status_id=import_status.pk,
+                    percent=percent,
+                )
+
+    async def _run_stages(self, *stages):
+        tasks = [asyncio.ensure_future(stage) for stage in stages]
+
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            # The failure is raised only after the other stages and their calls have stopped.
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _import_async(self, url: str, import_status: ImportStatus):
+        is_accept_ranges, max_length = await self._run_in_executor(
+            self.executor,
+            self.request_dao.check_partial_content,
+            url=url,
+        )
+
+        await self._write(self._start_deduplication, source=url, max_length=max_length)
+        self._start_anomaly_detection()
+        self._start_format_detection()
+        self.source = url
+        self.import_status_id = import_status.pk
+
+        rebuild_indexes = self._should_rebuild_indexes(max_length=max_length)
+        if rebuild_indexes:
+            await self._write(self.logs_dao.drop_secondary_indexes)
+
+        try:
+            buffers_queue = asyncio.Queue(maxsize=self.queue_size)
+            logs_queue = asyncio.Queue(maxsize=self.queue_size)
+
+            if is_accept_ranges:
+                fetch_stage = self._fetch_stage(url=url, max_length=max_length, buffers_queue=buffers_queue)
+            else:
+                fetch_stage = self._fetch_full_stage(url=url, buffers_queue=buffers_queue)
+
+            await self._run_stages(
+                fetch_stage,
+                self._parse_stage(buffers_queue=buffers_queue, logs_queue=logs_queue),
+                self._write_stage(import_status=import_status, logs_queue=logs_queue),
+            )
+            await self._write(self._finish_anomaly_detection)
+        finally:
+            await self._write(self._finish_segment)
+            if rebuild_indexes:
+                await self._write(self.logs_dao.create_secondary_indexes)
+
+    async def execute_async(self, url: str, import_status_id: Optional[int] = None) -> None:
+        import_status = await self._write(self._get_import_status, import_status_id=import_status_id)
+        self.lines_count = 0
+
+        try:
+            await self._import_async(url=url, import_status=import_status)
+        except Exception:
+            await self._write(self.import_status_dao.fail_import_status, import_status_id=import_status.pk)
+            raise
+
+        await self._write(
+            self.import_status_dao.save_lines_count,
+            import_status_id=import_status.pk,
+            lines_count=self.lines_count,
+        )
+        await self._write(self.import_status_dao.finish_import_status, import_status_id=import_status.pk)
+        await self._write(self._save_import_statistics, import_status_id=import_status.pk)
+
+    def execute(self, url: str, import_status_id: Optional[int] = None) -> None:
+        self.db_executor = ThreadPoolExecutor(max_workers=1)
+
+        try:
+            asyncio.run(self.execute_async(url=url, import_status_id=import_status_id))
+        finally:
+            try:
+                # Connections belong to the thread that opened them.
+                if self.close_connection is not None:
+                    self.db_executor.submit(self.close_connection).result()
+            finally:
+                self.db_executor.shutdown()
+                self.db_executor = None
 
 
 class GetLogsUseCase:
 
-    def __init__(self, logs_dao: IApacheLogsDAO):
+    def __init__(self, logs_dao: IApacheLogsDAO, saved_searches_dao: Optional[ISavedSearchesDAO] = None):
         self.dao = logs_dao
+        self.statistics_usecase = GetStatisticsUseCase(logs_dao=logs_dao, saved_searches_dao=saved_searches_dao)
 
     def execute(self, query: str, page: int, per_page: int = 25) -> PaginatedLogWithStatistics:
         logs, pagination = self.dao.get_logs(page=page, query=query, per_page=per_page)
+        statistics = self.statistics_usecase.execute(query=query)
 
-        unique_ip_count = self.dao.get_count_unique_ip_addresses(query=query)
-        top_ip_addresses = self.dao.get_top_ip_addresses(query=query)
-        http_methods_count = self.dao.get_http_methods_count(query=query)
-        sum_sizes = self.dao.get_sum_sizes(query=query)
+        return PaginatedLogWithStatistics(logs=logs, statistics=statistics, pagination=pagination)
+
+
+class GetStatisticsUseCase:
+    # Statistics of a saved search are read from its summary row while the data has not changed since
+    # its last refresh, any other search string is aggregated over the logs.
+
+    def __init__(self, logs_dao: IApacheLogsDAO, saved_searches_dao: Optional[ISavedSearchesDAO] = None):
+        self.dao = logs_dao
+        self.saved_searches_dao = saved_searches_dao
 
-        statistics = LogStatistics(
-            unique_ip_count=unique_ip_count,
-            top_ip_addresses=top_ip_addresses,
-            http_methods_count=http_methods_count,
-            sum_sizes=sum_sizes,
+    def _get_saved_statistics(self, query: str) -> Optional[LogStatistics]:
+        if self.saved_searches_dao is None or not query:
+            return None
+
+        return self.saved_searches_dao.get_saved_statistics(query=query, data_version=self.dao.get_data_version())
+
+    def execute(self, query: str) -> LogStatistics:
+        saved_statistics = self._get_saved_statistics(query=query)
+        if saved_statistics is not None:
+            return saved_statistics
+
+        return LogStatistics(
+            unique_ip_count=self.dao.get_count_unique_ip_addresses(query=query),
+            top_ip_addresses=self.dao.get_top_ip_addresses(query=query),
+            http_methods_count=self.dao.get_http_methods_count(query=query),
+            sum_sizes=self.dao.get_sum_sizes(query=query),
         )
 
-        return PaginatedLogWithStatistics(logs=logs, statistics=statistics, pagination=pagination)
+
+class RefreshSavedSearchesUseCase:
+    # Recomputes the statistics of the saved searches that are behind the current data version.
+    # The version is read first, so rows inserted meanwhile leave a search behind, never ahead.
+
+    def __init__(self, logs_dao: IApacheLogsDAO, saved_searches_dao: ISavedSearchesDAO):
+        self.statistics_usecase = GetStatisticsUseCase(logs_dao=logs_dao)
+        self.logs_dao = logs_dao
+        self.saved_searches_dao = saved_searches_dao
+
+    def execute(self) -> int:
+        data_version = self.logs_dao.get_data_version()
+        refreshed_count = 0
+
+        for saved_search in self.saved_searches_dao.get_saved_searches():
+            if saved_search.data_version == data_version:
+                continue
+
+            self.saved_searches_dao.save_statistics(
+                query=saved_search.query,
+                data_version=data_version,
+                statistics=self.statistics_usecase.execute(query=saved_search.query),
+            )
+            refreshed_count += 1
+
+        return refreshed_count
+
+
+class GetLogRowsUseCase:
+    class GetLogRowsValidationError(Exception):
+        pass
+
+    def __init__(self, logs_dao: IApacheLogsDAO, max_per_page: int = 1000):
+        self.dao = logs_dao
+        self.max_per_page = max_per_page
+
+    def execute(self, query: str, page: int = 1, per_page: int = 100, fields: Optional[List[str]] = None) -> LogRows:
+        fields = fields or LOG_FIELDS
+
+        invalid_fields = [field for field in fields if field not in LOG_FIELDS + OPTIONAL_LOG_FIELDS]
+        if invalid_fields:
+            raise self.GetLogRowsValidationError(f"{', '.join(invalid_fields)} fields are not valid.")
+
+        if page < 1:
+            raise self.GetLogRowsValidationError(f"{page} page should be positive.")
+
+        if not 1 <= per_page <= self.max_per_page:
+            raise self.GetLogRowsValidationError(f"{per_page} per_page should be between 1 and {self.max_per_page}.")
+
+        rows, has_next = self.dao.get_log_rows(page=page, per_page=per_page, query=query, fields=fields)
+
+        return LogRows(fields=fields, rows=rows, page=page, has_next=has_next)
+
+
+class DataVersionUseCase:
+
+    def __init__(self, logs_dao: IApacheLogsDAO):
+        self.dao = logs_dao
+
+    def execute(self) -> str:
+        return self.dao.get_data_version()
+
+
+class GetTimeSeriesUseCase:
+    class GetTimeSeriesValidationError(Exception):
+        pass
+
+    def __init__(self, logs_dao: IApacheLogsDAO):
+        self.dao = logs_dao
+
+    def execute(
+        self,
+        query: str,
+        interval: str = "hour",
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+    ) -> LogTimeSeries:
+        if interval not in TIME_SERIES_INTERVALS:
+            raise self.GetTimeSeriesValidationError(f"{interval} interval is not valid.")
+
+        if date_from and date_to and date_from >= date_to:
+            raise self.GetTimeSeriesValidationError("date_from should be before date_to.")
+
+        buckets = self.dao.get_time_buckets(interval=interval, date_from=date_from, date_to=date_to, query=query)
+        status_codes_count = self.dao.get_status_codes_count(date_from=date_from, date_to=date_to, query=query)
+
+        return LogTimeSeries(interval=interval, buckets=buckets, status_codes_count=status_codes_count)
+
+
+class GetNetworkStatisticsUseCase:
+    class GetNetworkStatisticsValidationError(Exception):
+        pass
+
+    def __init__(self, logs_dao: IApacheLogsDAO):
+        self.dao = logs_dao
+
+    def execute(
+        self,
+        group_by: str = "subnet",
+        ipv4_prefix: int = ROLLUP_IPV4_PREFIX,
+        ipv6_prefix: int = ROLLUP_IPV6_PREFIX,
+        subnet: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        groups_count: int = 20,
+    ) -> List[CountNetwork]:
+        if group_by not in NETWORK_GROUPS:
+            raise self.GetNetworkStatisticsValidationError(f"{group_by} group is not valid.")
+
+        # Rollups keep subnets of these prefixes, shorter ones are aggregated from them.
+        if not 0 <= ipv4_prefix <= ROLLUP_IPV4_PREFIX:
+            raise self.GetNetworkStatisticsValidationError(f"IPv4 prefix should be from 0 to {ROLLUP_IPV4_PREFIX}.")
+        if not 0 <= ipv6_prefix <= ROLLUP_IPV6_PREFIX:
+            raise self.GetNetworkStatisticsValidationError(f"IPv6 prefix should be from 0 to {ROLLUP_IPV6_PREFIX}.")
+
+        if subnet:
+            try:
+                subnet = str(ipaddress.ip_network(subnet, strict=False))
+            except ValueError:
+                raise self.GetNetworkStatisticsValidationError(f"{subnet} subnet is not valid.")
+
+        if date_from and date_to and date_from >= date_to:
+            raise self.GetNetworkStatisticsValidationError("date_from should be before date_to.")
+
+        return self.dao.get_network_groups(
+            group_by=group_by,
+            ipv4_prefix=ipv4_prefix,
+            ipv6_prefix=ipv6_prefix,
+            subnet=subnet or None,
+            date_from=date_from,
+            date_to=date_to,
+            groups_count=groups_count,
+        )
+
+
+class GetAnomalyEventsUseCase:
+    class GetAnomalyEventsValidationError(Exception):
+        pass
+
+    def __init__(self, anomaly_events_dao: IAnomalyEventsDAO):
+        self.dao = anomaly_events_dao
+
+    def execute(
+        self,
+        kind: Optional[str] = None,
+        reason: Optional[str] = None,
+        key: Optional[str] = None,
+        import_status_id: Optional[int] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        events_count: int = 100,
+    ) -> List[AnomalyEvent]:
+        if kind and kind not in ANOMALY_KINDS:
+            raise self.GetAnomalyEventsValidationError(f"{kind} kind is not valid.")
+        if reason and reason not in ANOMALY_REASONS:
+            raise self.GetAnomalyEventsValidationError(f"{reason} reason is not valid.")
+        if date_from and date_to and date_from >= date_to:
+            raise self.GetAnomalyEventsValidationError("date_from should be before date_to.")
+
+        return self.dao.get_anomaly_events(
+            kind=kind or None,
+            reason=reason or None,
+            key=key or None,
+            import_status_id=import_status_id,
+            date_from=date_from,
+            date_to=date_to,
+            events_count=events_count,
+        )
+
+
+class ExportLogsUseCase:
+    class ExportLogsValidationError(Exception):
+        pass
+
+    def __init__(
+        self,
+        logs_dao: IApacheLogsDAO,
+        chunk_size: int = 2000,
+        segments_dao: Optional[ILogSegmentsDAO] = None,
+    ):
+        self.dao = logs_dao
+        self.chunk_size = chunk_size
+        self.segments_dao = segments_dao
+
+    def _check_requirement(self, module_name: Optional[str]):
+        if module_name and importlib.util.find_spec(module_name) is None:
+            raise self.ExportLogsValidationError(f"{module_name} should be installed.")
+
+    def execute(
+        self,
+        query: str,
+        export_format: str = "csv",
+        compression: Optional[str] = None,
+        from_segments: bool = False,
+    ) -> LogsExport:
+        if export_format not in EXPORT_FORMATS:
+            raise self.ExportLogsValidationError(f"{export_format} format is not valid.")
+
+        if compression and compression not in EXPORT_COMPRESSIONS:
+            raise self.ExportLogsValidationError(f"{compression} compression is not valid.")
+
+        export, content_type, extension, requirement = EXPORT_FORMATS[export_format]
+        self._check_requirement(requirement)
+
+        if from_segments and self.segments_dao is None:
+            raise self.ExportLogsValidationError("Segments are not enabled.")
+
+        # Segments are read without touching the database.
+        rows_dao = self.segments_dao if from_segments else self.dao
+        rows = rows_dao.iterate_logs(query=query, chunk_size=self.chunk_size)
+        chunks = export(rows, batch_size=self.chunk_size)
+        filename = f"logs.{extension}"
+
+        if compression:
+            encode, compression_extension, requirement = EXPORT_COMPRESSIONS[compression]
+            self._check_requirement(requirement)
+
+            chunks = encode(chunks)
+            filename = f"{filename}.{compression_extension}"
+
+        return LogsExport(filename=filename, content_type=content_type, chunks=chunks)
+
+
+class RetentionUseCase:
+
+    def __init__(
+        self,
+        logs_dao: IApacheLogsDAO,
+        import_status_dao: IImportStatusDAO,
+        log_days: int,
+        import_status_days: int,
+        batch_size: int = 10000,
+        pause_seconds: float = 0,
+        segments_dao: Optional[ILogSegmentsDAO] = None,
+    ):
+        self.logs_dao = logs_dao
+        self.import_status_dao = import_status_dao
+        self.segments_dao = segments_dao
+        self.log_days = log_days
+        self.import_status_days = import_status_days
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+
+    def _delete_logs(self, now: datetime) -> int:
+        date = now - timedelta(days=self.log_days)
+        logs_deleted = 0
+
+        while True:
+            deleted = self.logs_dao.delete_logs_before(date=date, batch_size=self.batch_size)
+            logs_deleted += deleted
+
+            if deleted < self.batch_size:
+                return logs_deleted
+
+            if self.pause_seconds:
+                sleep(self.pause_seconds)
+
+    def execute(self, now: datetime) -> RetentionReport:
+        started_at = monotonic()
+        logs_deleted = 0
+        segment_logs_deleted = 0
+        import_statuses_deleted = 0
+
+        if self.log_days:
+            logs_deleted = self._delete_logs(now=now)
+            # The analytics copy is rewritten once for the whole run, not once per batch.
+            self.logs_dao.delete_analytics_logs_before(date=now - timedelta(days=self.log_days))
+            if self.segments_dao is not None:
+                segment_logs_deleted = self.segments_dao.delete_segments_before(
+                    date=now - timedelta(days=self.log_days),
+                )
+
+        if self.import_status_days:
+            import_statuses_deleted = self.import_status_dao.delete_finished_import_statuses_before(
+                date=now - timedelta(days=self.import_status_days),
+            )
+
+        return RetentionReport(
+            logs_deleted=logs_deleted,
+            import_statuses_deleted=import_statuses_deleted,
+            seconds=monotonic() - started_at,
+            segment_logs_deleted=segment_logs_deleted,
+        )
+
+
+class RebuildFromSegmentsUseCase:
+    # Imports parsed segments again, without fetching or parsing the files. Rows that are
+    # still stored are skipped by the line_hash index.
+
+    def __init__(
+        self,
+        logs_dao: IApacheLogsDAO,
+        segments_dao: ILogSegmentsDAO,
+        chunk_size: int = 10000,
+        geoip_dao: Optional[IGeoIPDAO] = None,
+    ):
+        self.logs_dao = logs_dao
+        self.segments_dao = segments_dao
+        self.chunk_size = chunk_size
+        self.geoip_dao = geoip_dao
+
+    def execute(self, source: Optional[str] = None) -> int:
+        logs_count = 0
+
+        for segment in self.segments_dao.get_segments(source=source):
+            for apache_logs in self.segments_dao.iterate_segment_logs(segment, chunk_size=self.chunk_size):
+                if self.geoip_dao is not None:
+                    _locate_logs(geoip_dao=self.geoip_dao, apache_logs=apache_logs)
+                self.logs_dao.create_apache_logs(apache_logs=apache_logs)
+                logs_count += len(apache_logs)
+
+        return logs_count
+
+
+class GetSegmentStatisticsUseCase:
+
+    def __init__(self, segments_dao: ILogSegmentsDAO):
+        self.dao = segments_dao
+
+    def execute(self, source: Optional[str] = None) -> LogStatistics:
+        return self.dao.get_statistics(source=source)
 
 
 class ImportStatusUseCase:
@@ -141,3 +1112,348 @@ class ImportStatusUseCase:
         import_statuses = self.dao.get_import_statuses()
 
         return import_statuses
+
+
+class ScheduleImportsUseCase:
+    def __init__(
+        self,
+        import_status_dao: IImportStatusDAO,
+        start_import: Callable[[ImportJob], Any],
+        max_concurrent: int,
+        max_concurrent_per_host: int,
+    ):
+        self.dao = import_status_dao
+        self.start_import = start_import
+        self.max_concurrent = max_concurrent
+        self.max_concurrent_per_host = max_concurrent_per_host
+
+    def execute(self) -> List[ImportJob]:
+        import_jobs = self.dao.claim_import_jobs(
+            max_concurrent=self.max_concurrent,
+            max_concurrent_per_host=self.max_concurrent_per_host,
+        )
+
+        for import_job in import_jobs:
+            self.start_import(import_job)
+
+        return import_jobs
+
+
+class BulkImportUseCase:
+    # Plans a bulk import: sources smaller than `pack_size` are packed into shared parts
+    # (per host, so the per-host limits still hold), sources bigger than `split_size`
+    # are split into byte windows imported in parallel.
+
+    def __init__(
+        self,
+        import_status_dao: IImportStatusDAO,
+        request_dao: IRequestDAO,
+        pack_size: int = 8 * MB,
+        split_size: int = 256 * MB,
+    ):
+        self.import_status_dao = import_status_dao
+        self.request_dao = request_dao
+        self.pack_size = pack_size
+        self.split_size = split_size
+
+    def _read_sources(self, sources: Iterable[str]) -> List[str]:
+        unique_sources = {}
+
+        for source in sources:
+            source = source.strip()
+            if source and not source.startswith("#"):
+                unique_sources.setdefault(source, None)
+
+        return list(unique_sources)
+
+    def _get_import_source(self, url: str) -> ImportSource:
+        is_accept_ranges, max_length = self.request_dao.check_partial_content(url=url)
+
+        return ImportSource(
+            url=url,
+            from_bytes=0,
+            to_bytes=max_length - 1,
+            size=max_length,
+            accept_ranges=is_accept_ranges,
+        )
+
+    def _plan_parts(self, import_sources: List[ImportSource]) -> List[ImportPart]:
+        parts = []
+        packs: Dict[str, ImportPart] = {}
+
+        for import_source in import_sources:
+            host = urlparse(import_source.url).hostname or ""
+
+            if import_source.accept_ranges and import_source.size > self.split_size:
+                for from_bytes in range(0, import_source.size, self.split_size):
+                    to_bytes = min(from_bytes + self.split_size, import_source.size) - 1
+                    parts.append(ImportPart(
+                        host=host,
+                        sources=[replace(import_source, from_bytes=from_bytes, to_bytes=to_bytes)],
+                    ))
+            elif import_source.accept_ranges and import_source.size < self.pack_size:
+                pack = packs.setdefault(host, ImportPart(host=host, sources=[]))
+                pack.sources.append(import_source)
+                if sum(source.size for source in pack.sources) >= self.pack_size:
+                    parts.append(packs.pop(host))
+            else:
+                parts.append(ImportPart(host=host, sources=[import_source]))
+
+        parts.extend(packs.values())
+
+        return parts
+
+    def execute(self, sources: Iterable[str], priority: int = 0) -> BulkImportPlan:
+        sources = self._read_sources(sources=sources)
+        imported_sources = self.import_status_dao.get_imported_sources()
+
+        skipped = [source for source in sources if source in imported_sources]
+        import_sources = []
+        unavailable = []
+
+        for source in sources:
+            if source in imported_sources:
+                continue
+
+            try:
+                import_sources.append(self._get_import_source(url=source))
+            except Exception as e:
+                print(f"{source} is not available: {e}")
+                unavailable.append(source)
+
+        parts = self._plan_parts(import_sources=import_sources)
+        import_status_id = None
+        if parts:
+            import_status_id = self.import_status_dao.create_bulk_import(parts=parts, priority=priority).pk
+
+        return BulkImportPlan(
+            import_status_id=import_status_id,
+            parts_count=len(parts),
+            sources=[import_source.url for import_source in import_sources],
+            skipped=skipped,
+            unavailable=unavailable,
+        )
+
+
+class LocalImportUseCase:
+    # Imports one source without the queue: its byte windows become the parts of a bulk import
+    # that is started at once, and `import_part` runs them in parallel on `executor`, e.g. one
+    # process per core, each fetching, parsing and inserting its window on its own connection.
+    # Progress is read back from the bulk import row every `progress_seconds`.
+
+    def __init__(
+        self,
+        import_status_dao: IImportStatusDAO,
+        request_dao: IRequestDAO,
+        executor: Executor,
+        import_part: Callable[[int], Any],
+        parts_count: int,
+        min_part_size: int = 8 * MB,
+        progress_seconds: float = 1.0,
+        on_progress: Optional[Callable[[LocalImportProgress], Any]] = None,
+    ):
+        self.import_status_dao = import_status_dao
+        self.request_dao = request_dao
+        self.executor = executor
+        self.import_part = import_part
+        self.parts_count = parts_count
+        self.min_part_size = min_part_size
+        self.progress_seconds = progress_seconds
+        self.on_progress = on_progress
+
+    def _plan_parts(self, url: str) -> List[ImportPart]:
+        is_accept_ranges, max_length = self.request_dao.check_partial_content(url=url)
+        import_source = ImportSource(
+            url=url,
+            from_bytes=0,
+            to_bytes=max_length - 1,
+            size=max_length,
+            accept_ranges=is_accept_ranges,
+        )
+        host = urlparse(url).hostname or ""
+
+        if not is_accept_ranges:
+            return [ImportPart(host=host, sources=[import_source])]
+
+        parts_count = max(min(self.parts_count, max_length // self.min_part_size), 1)
+        part_size = ceil(max_length / parts_count)
+
+        return [
+            ImportPart(host=host, sources=[replace(
+                import_source,
+                from_bytes=from_bytes,
+                to_bytes=min(from_bytes + part_size, max_length) - 1,
+            )]) for from_bytes in range(0, max_length, part_size)
+        ]
+
+    def _report_progress(self, import_status_id: int, started_at: float, last: Optional[LocalImportProgress]):
+        import_progress = self.import_status_dao.get_import_progress(import_status_id=import_status_id)
+        seconds = monotonic() - started_at
+        last_seconds, last_imported_size = (last.seconds, last.imported_size) if last else (0.0, 0)
+
+        local_import_progress = LocalImportProgress(
+            import_status_id=import_status_id,
+            status=import_progress.status,
+            percent=import_progress.percent,
+            size=import_progress.size,
+            imported_size=import_progress.imported_size,
+            seconds=seconds,
+            bytes_per_second=import_progress.imported_size / seconds if seconds else 0.0,
+            current_bytes_per_second=(
+                (import_progress.imported_size - last_imported_size) / (seconds - last_seconds)
+                if seconds > last_seconds else 0.0
+            ),
+        )
+        if self.on_progress is not None:
+            self.on_progress(local_import_progress)
+
+        return local_import_progress
+
+    def _fail_unfinished_parts(self, import_jobs: List[ImportJob]):
+        # Parts count against the import limits while they are started, a part whose process died or
+        # that was never run after an interruption would hold its slot forever.
+        for import_job in import_jobs:
+            if self.import_status_dao.get_import_status(import_status_id=import_job.pk).status == "start":
+                self.import_status_dao.finish_import_part(import_status_id=import_job.pk, report=[], failed=True)
+
+    def execute(self, url: str) -> LocalImportProgress:
+        parts = self._plan_parts(url=url)
+        import_status = self.import_status_dao.create_bulk_import(parts=parts, priority=0, queued=False)
+        import_jobs = self.import_status_dao.get_import_parts(import_status_id=import_status.pk)
+
+        started_at = monotonic()
+        futures = {}
+        pending = set()
+        local_import_progress = None
+
+        try:
+            futures = {self.executor.submit(self.import_part, import_job.pk): import_job for import_job in import_jobs}
+            pending = set(futures)
+
+            while pending:
+                _, pending = wait(pending, timeout=self.progress_seconds)
+                local_import_progress = self._report_progress(
+                    import_status_id=import_status.pk,
+                    started_at=started_at,
+                    last=local_import_progress,
+                )
+        finally:
+            # Also on Ctrl-C or SIGTERM while waiting.
+            for future in pending:
+                future.cancel()
+            self._fail_unfinished_parts(import_jobs=import_jobs)
+
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        if errors:
+            raise errors[0]
+
+        # Reported after every part had finished, so it holds the final status.
+        return local_import_progress
+
+
+class BulkImportSummaryUseCase:
+    def __init__(self, import_status_dao: IImportStatusDAO):
+        self.dao = import_status_dao
+
+    def execute(self, import_status_id: int) -> BulkImportSummary:
+        import_status = self.dao.get_import_status(import_status_id=import_status_id)
+        sizes = defaultdict(int)
+        seconds = defaultdict(float)
+
+        # Windows of a split source are imported in parallel, their times are summed up.
+        for source_report in self.dao.get_import_part_reports(import_status_id=import_status_id):
+            sizes[source_report.url] += source_report.size
+            seconds[source_report.url] += source_report.seconds
+
+        return BulkImportSummary(
+            status=import_status.status,
+            percent=import_status.percent,
+            sources=[
+                SourceThroughput(
+                    url=url,
+                    size=size,
+                    seconds=seconds[url],
+                    bytes_per_second=size / seconds[url] if seconds[url] else 0.0,
+                ) for url, size in sizes.items()
+            ],
+        )
+
+
+class GetImportStatisticsUseCase:
+    class GetImportStatisticsValidationError(Exception):
+        pass
+
+    def __init__(self, import_status_dao: IImportStatusDAO):
+        self.dao = import_status_dao
+
+    def execute(self, import_status_id: int) -> ImportStatistics:
+        statistics = self.dao.get_import_statistics(import_status_id=import_status_id)
+        if statistics is None:
+            raise self.GetImportStatisticsValidationError(f"Import {import_status_id} has no statistics.")
+
+        return statistics
+
+
+class CompareImportsUseCase:
+    # Compares the statistics stored when the imports finished, no log rows are read.
+
+    def __init__(self, import_status_dao: IImportStatusDAO):
+        self.statistics_usecase = GetImportStatisticsUseCase(import_status_dao=import_status_dao)
+
+    def execute(self, base_import_status_id: int, other_import_status_id: int) -> ImportComparison:
+        base = self.statistics_usecase.execute(import_status_id=base_import_status_id)
+        other = self.statistics_usecase.execute(import_status_id=other_import_status_id)
+
+        status_codes_change = defaultdict(int)
+        for count_status_code in other.status_codes_count:
+            status_codes_change[count_status_code.status_code] += count_status_code.count
+        for count_status_code in base.status_codes_count:
+            status_codes_change[count_status_code.status_code] -= count_status_code.count
+
+        base_ip_addresses = {count_ip_address.ip_address for count_ip_address in base.top_ip_addresses}
+        other_ip_addresses = {count_ip_address.ip_address for count_ip_address in other.top_ip_addresses}
+
+        return ImportComparison(
+            base=base,
+            other=other,
+            count_change=other.count - base.count,
+            unique_ip_count_change=other.unique_ip_count - base.unique_ip_count,
+            sum_sizes_change=other.sum_sizes - base.sum_sizes,
+            client_error_rate_change=other.client_error_rate - base.client_error_rate,
+            server_error_rate_change=other.server_error_rate - base.server_error_rate,
+            status_codes_change=[
+                CountStatusCode(status_code=status_code, count=count)
+                for status_code, count in sorted(status_codes_change.items()) if count
+            ],
+            new_top_ip_addresses=[
+                count_ip_address for count_ip_address in other.top_ip_addresses
+                if count_ip_address.ip_address not in base_ip_addresses
+            ],
+            dropped_top_ip_addresses=[
+                count_ip_address for count_ip_address in base.top_ip_addresses
+                if count_ip_address.ip_address not in other_ip_addresses
+            ],
+        )
+
+
+class ImportQueueUseCase:
+    def __init__(self, import_status_dao: IImportStatusDAO, max_concurrent: int):
+        self.dao = import_status_dao
+        self.max_concurrent = max_concurrent
+
+    def execute(self) -> ImportQueue:
+        depth = self.dao.count_import_statuses(status="queued")
+        running = self.dao.count_import_statuses(status="start")
+        average_import_seconds = self.dao.get_average_import_seconds()
+
+        # A new job starts after every job ahead of it has got a slot, i.e. after
+        # this many "waves" of imports, each taking about the average import time.
+        waves = (depth + running) // self.max_concurrent
+        if not waves:
+            expected_wait_seconds = 0.0
+        elif average_import_seconds is not None:
+            expected_wait_seconds = waves * average_import_seconds
+        else:
+            expected_wait_seconds = None
+
+        return ImportQueue(depth=depth, running=running, expected_wait_seconds=expected_wait_seconds)
@@ -0,0 +1,379 @@
+import ipaddress
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List
+
+import numpy
+
+from apache_logs.chunking import Buffer
+from apache_logs.constants import HTTP_METHODS
+from apache_logs.entities import ApacheLog
+
+MONTHS = [b"Jan", b"Feb", b"Mar", b"Apr", b"May", b"Jun", b"Jul", b"Aug", b"Sep", b"Oct", b"Nov", b"Dec"]
+DAYS_IN_MONTH = numpy.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+FIELDS_COUNT = 10
+DATE_LENGTH = len("[19/Dec/2020:13:57:26")
+GMT_LENGTH = len("+0100]")
+METHOD_WIDTH = 8
+MAX_SIZE_DIGITS = 18
+
+# Bytes bytes.split() treats as whitespace besides the space itself; lines containing them,
+# or any non-ASCII byte, take the scalar path.
+OTHER_WHITESPACE = [9, 11, 12, 13]
+
+
+@dataclass
+class LogBatch:
+    # Parsed lines as columns, in buffer order. Timestamps are UTC seconds since the epoch,
+    # offsets are the minutes of the original time zone, methods index HTTP_METHODS.
+    ip_addresses: List[str]
+    timestamps: numpy.ndarray
+    utc_offsets: numpy.ndarray
+    methods: numpy.ndarray
+    uris: List[str]
+    status_codes: numpy.ndarray
+    sizes: numpy.ndarray
+
+    def __len__(self) -> int:
+        return len(self.uris)
+
+    def to_apache_logs(self) -> List[ApacheLog]:
+        timezones = {}
+        apache_logs = []
+
+        for ip_address, timestamp, utc_offset, method, uri, status_code, size in zip(
+            self.ip_addresses,
+            self.timestamps.tolist(),
+            self.utc_offsets.tolist(),
+            self.methods.tolist(),
+            self.uris,
+            self.status_codes.tolist(),
+            self.sizes.tolist(),
+        ):
+            tz = timezones.get(utc_offset)
+            if tz is None:
+                tz = timezones[utc_offset] = timezone(timedelta(minutes=utc_offset))
+
+            apache_logs.append(ApacheLog(
+                ip_address=ip_address,
+                date=datetime.fromtimestamp(timestamp, tz),
+                method=HTTP_METHODS[method],
+                uri=uri,
+                status_code=status_code,
+                size=size,
+            ))
+
+        return apache_logs
+
+
+def _pack(values: numpy.ndarray, width: int) -> numpy.ndarray:
+    # Rows of up to 8 bytes as one uint64 each, so they compare against a lookup table at once.
+    packed = numpy.zeros(len(values), dtype=numpy.uint64)
+    for i in range(width):
+        packed |= values[:, i].astype(numpy.uint64) << numpy.uint64(8 * i)
+
+    return packed
+
+
+def _gather(buffer: numpy.ndarray, starts: numpy.ndarray, width: int) -> numpy.ndarray:
+    index = starts[:, None] + numpy.arange(width)
+    values = buffer[numpy.minimum(index, len(buffer) - 1)].astype(numpy.int64)
+
+    return numpy.where(index < len(buffer), values, 0)
+
+
+def _gather_field(buffer: numpy.ndarray, starts: numpy.ndarray, lengths: numpy.ndarray, width: int) -> numpy.ndarray:
+    # Bytes past the end of the field are zeroed.
+    values = _gather(buffer, starts, width)
+
+    return numpy.where(numpy.arange(width) < lengths[:, None], values, 0)
+
+
+def _digits(values: numpy.ndarray) -> numpy.ndarray:
+    return values - ord("0")
+
+
+def _is_digits(values: numpy.ndarray) -> numpy.ndarray:
+    return ((values >= ord("0")) & (values <= ord("9"))).all(axis=1)
+
+
+def _to_number(values: numpy.ndarray) -> numpy.ndarray:
+    number = numpy.zeros(len(values), dtype=numpy.int64)
+    for i in range(values.shape[1]):
+        number = number * 10 + _digits(values[:, i])
+
+    return number
+
+
+def _parse_variable_number(
+    buffer: numpy.ndarray,
+    starts: numpy.ndarray,
+    lengths: numpy.ndarray,
+    width: int,
+):
+    # Right-aligns every field, so shorter numbers are padded with leading zeros.
+    index = starts[:, None] + lengths[:, None] - width + numpy.arange(width)
+    in_field = index >= starts[:, None]
+    values = buffer[numpy.clip(index, 0, len(buffer) - 1)].astype(numpy.int64)
+    values = numpy.where(in_field, values, ord("0"))
+    is_digit = (values >= ord("0")) & (values <= ord("9"))
+
+    all_digits = is_digit.all(axis=1) & (lengths <= width)
+    no_digits = ~(is_digit & in_field).any(axis=1)
+
+    return _to_number(numpy.where(is_digit, values, ord("0"))), all_digits, no_digits
+
+
+def _get_days_from_civil(years: numpy.ndarray, months: numpy.ndarray, days: numpy.ndarray) -> numpy.ndarray:
+    years = years - (months <= 2)
+    eras = years // 400
+    year_of_era = years - eras * 400
+    day_of_year = (153 * (months + numpy.where(months > 2, -3, 9)) + 2) // 5 + days - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+
+    return eras * 146097 + day_of_era - 719468
+
+
+def _parse_dates(buffer: numpy.ndarray, date_starts: numpy.ndarray, gmt_starts: numpy.ndarray):
+    date = _gather(buffer, date_starts, DATE_LENGTH)
+    gmt = _gather(buffer, gmt_starts, GMT_LENGTH)
+
+    number_columns = [1, 2, 8, 9, 10, 11, 13, 14, 16, 17, 19, 20]
+    valid = _is_digits(date[:, number_columns]) & _is_digits(gmt[:, 1:5])
+    for position, separator in ((3, "/"), (7, "/"), (12, ":"), (15, ":"), (18, ":")):
+        valid &= date[:, position] == ord(separator)
+    valid &= (gmt[:, 0] == ord("+")) | (gmt[:, 0] == ord("-"))
+
+    months = numpy.full(len(date), -1)
+    month_names = _pack(date[:, 4:7], 3)
+    for i, month_name in enumerate(MONTHS):
+        months[month_names == int.from_bytes(month_name, "little")] = i + 1
+    valid &= months > 0
+    months = numpy.maximum(months, 1)
+
+    days = _to_number(date[:, 1:3])
+    years = _to_number(date[:, 8:12])
+    hours = _to_number(date[:, 13:15])
+    minutes = _to_number(date[:, 16:18])
+    seconds = _to_number(date[:, 19:21])
+    offset_hours = _to_number(gmt[:, 1:3])
+    offset_minutes = _to_number(gmt[:, 3:5])
+
+    is_leap = (years % 4 == 0) & ((years % 100 != 0) | (years % 400 == 0))
+    days_in_month = DAYS_IN_MONTH[months - 1] + ((months == 2) & is_leap)
+    # Years 1 and 9999 may leave the datetime range once converted to UTC.
+    valid &= (years > 1) & (years < 9999) & (days >= 1) & (days <= days_in_month)
+    valid &= (hours <= 23) & (minutes <= 59) & (seconds <= 59)
+    valid &= (offset_hours <= 23) & (offset_minutes <= 59)
+
+    utc_offsets = (offset_hours * 60 + offset_minutes) * numpy.where(gmt[:, 0] == ord("-"), -1, 1)
+    timestamps = (
+        _get_days_from_civil(years, months, days) * 86400 + hours * 3600 + minutes * 60 + seconds - utc_offsets * 60
+    )
+
+    return timestamps, utc_offsets, valid
+
+
+def _split_fields(buffer: numpy.ndarray, line_starts: numpy.ndarray, line_ends: numpy.ndarray):
+    spaces = numpy.flatnonzero(buffer == ord(" "))
+    first_spaces = numpy.searchsorted(spaces, line_starts)
+    spaces_count = numpy.searchsorted(spaces, line_ends) - first_spaces
+
+    if len(spaces):
+        space_index = numpy.minimum(first_spaces[:, None] + numpy.arange(FIELDS_COUNT), len(spaces) - 1)
+        field_ends = spaces[space_index]
+    else:
+        field_ends = numpy.zeros((len(line_starts), FIELDS_COUNT), dtype=numpy.int64)
+    field_ends[:, FIELDS_COUNT - 1] = numpy.where(
+        spaces_count >= FIELDS_COUNT,
+        field_ends[:, FIELDS_COUNT - 1],
+        line_ends,
+    )
+    field_starts = numpy.column_stack([line_starts, field_ends[:, :-1] + 1])
+
+    # str.split() collapses repeated spaces, those lines are left to the scalar parser.
+    valid = (spaces_count >= FIELDS_COUNT - 1) & (field_ends > field_starts).all(axis=1)
+
+    return field_starts, field_ends, valid
+
+
+def _is_canonical_ipv4(buffer: numpy.ndarray, starts: numpy.ndarray, lengths: numpy.ndarray) -> numpy.ndarray:
+    # Four dot-separated decimal octets up to 255 without leading zeros, like "10.0.0.1".
+    width = len("255.255.255.255")
+    values = _gather_field(buffer, starts, lengths, width)
+    in_field = numpy.arange(width) < lengths[:, None]
+    is_dot = values == ord(".")
+    is_digit = (values >= ord("0")) & (values <= ord("9"))
+
+    valid = (lengths <= width) & (is_dot.sum(axis=1) == 3) & ((is_dot | is_digit) == in_field).all(axis=1)
+    candidates = numpy.flatnonzero(valid)
+    values = values[candidates]
+
+    dots = numpy.nonzero(is_dot[candidates])[1].reshape(-1, 3)
+    octet_starts = numpy.column_stack([numpy.zeros(len(dots), dtype=numpy.int64), dots + 1])
+    octet_ends = numpy.column_stack([dots, lengths[candidates]])
+    octet_lengths = octet_ends - octet_starts
+
+    octets = numpy.zeros(octet_starts.shape, dtype=numpy.int64)
+    for i in range(3):
+        # i-th digit from the right of every octet, octets shorter than that get 0.
+        index = octet_ends - 1 - i
+        digits = _digits(numpy.take_along_axis(values, numpy.maximum(index, 0), axis=1))
+        octets += numpy.where(index >= octet_starts, digits, 0) * 10 ** i
+
+    first_digits = numpy.take_along_axis(values, numpy.minimum(octet_starts, width - 1), axis=1)
+    valid[candidates] = (
+        (octet_lengths >= 1) & (octet_lengths <= 3) & (octets <= 255)
+        & ((octet_lengths == 1) | (first_digits != ord("0")))
+    ).all(axis=1)
+
+    return valid
+
+
+def _get_plain_lines(buffer: numpy.ndarray, line_starts: numpy.ndarray) -> numpy.ndarray:
+    special = numpy.flatnonzero((buffer >= 128) | numpy.isin(buffer, OTHER_WHITESPACE))
+    plain = numpy.ones(len(line_starts), dtype=bool)
+    plain[numpy.searchsorted(line_starts, special, side="right") - 1] = False
+
+    return plain
+
+
+def _get_empty_batch() -> LogBatch:
+    return LogBatch(
+        ip_addresses=[],
+        timestamps=numpy.empty(0, dtype=numpy.int64),
+        utc_offsets=numpy.empty(0, dtype=numpy.int64),
+        methods=numpy.empty(0, dtype=numpy.int64),
+        uris=[],
+        status_codes=numpy.empty(0, dtype=numpy.int64),
+        sizes=numpy.empty(0, dtype=numpy.int64),
+    )
+
+
+def parse_log_buffer(data: Buffer, parse_rows: Callable[[List[bytes]], List[ApacheLog]]) -> LogBatch:
+    # Lines in the fixed Common Log Format are parsed as whole columns; every other line is
+    # handed to `parse_rows` (the scalar parser), so the result is identical to it.
+    # `data` is read in place, only ip addresses and uris of the parsed lines are decoded.
+    buffer = numpy.frombuffer(data, dtype=numpy.uint8)
+    if not (buffer != ord("\n")).any():
+        return _get_empty_batch()
+
+    newlines = numpy.flatnonzero(buffer == ord("\n"))
+    line_starts = numpy.concatenate([[0], newlines + 1]).astype(numpy.int64)
+    line_ends = numpy.concatenate([newlines, [len(buffer)]]).astype(numpy.int64)
+    not_empty = line_ends > line_starts
+
+    field_starts, field_ends, fast = _split_fields(buffer, line_starts, line_ends)
+    field_lengths = field_ends - field_starts
+    fast &= not_empty & _get_plain_lines(buffer, line_starts)
+    fast &= (field_lengths[:, 3] == DATE_LENGTH) & (field_lengths[:, 4] == GMT_LENGTH)
+
+    # The first byte of the method field is the opening quote, dropped like in the scalar parser.
+    method_lengths = field_lengths[:, 5] - 1
+    method_keys = _pack(_gather_field(buffer, field_starts[:, 5] + 1, method_lengths, METHOD_WIDTH), METHOD_WIDTH)
+    method_table = numpy.array([int.from_bytes(method.encode(), "little") for method in HTTP_METHODS], numpy.uint64)
+    methods = numpy.argmax(method_keys[:, None] == method_table, axis=1)
+    fast &= (method_lengths <= METHOD_WIDTH) & numpy.isin(method_keys, method_table)
+
+    timestamps, utc_offsets, valid_dates = _parse_dates(buffer, field_starts[:, 3], field_starts[:, 4])
+    fast &= valid_dates
+
+    status_codes, status_digits, _ = _parse_variable_number(buffer, field_starts[:, 8], field_lengths[:, 8], 3)
+    fast &= status_digits & (field_lengths[:, 8] == 3) & (status_codes >= 100) & (status_codes <= 599)
+
+    # int() fails on a size without digits, the scalar parser stores 0 then.
+    sizes, size_digits, size_no_digits = _parse_variable_number(
+        buffer, field_starts[:, 9], field_lengths[:, 9], MAX_SIZE_DIGITS,
+    )
+    sizes = numpy.where(size_digits, sizes, 0)
+    fast &= size_digits | size_no_digits
+
+    fast_lines = numpy.flatnonzero(fast)
+    fast_ip_addresses = [
+        str(data[start:end], "ascii")
+        for start, end in zip(line_starts[fast_lines].tolist(), field_ends[fast_lines, 0].tolist())
+    ]
+
+    # Canonical IPv4 addresses are their own normalized form, the rest goes through ipaddress.
+    valid_ip_addresses = numpy.ones(len(fast_lines), dtype=bool)
+    ip_addresses = {}
+    is_ipv4 = _is_canonical_ipv4(buffer, line_starts[fast_lines], field_lengths[fast_lines, 0])
+    for i in numpy.flatnonzero(~is_ipv4).tolist():
+        raw_ip_address = fast_ip_addresses[i]
+        if raw_ip_address not in ip_addresses:
+            try:
+                ip_addresses[raw_ip_address] = str(ipaddress.ip_address(raw_ip_address))
+            except ValueError:
+                ip_addresses[raw_ip_address] = None
+
+        fast_ip_addresses[i] = ip_addresses[raw_ip_address]
+        valid_ip_addresses[i] = fast_ip_addresses[i] is not None
+
+    if not valid_ip_addresses.all():
+        fast[fast_lines[~valid_ip_addresses]] = False
+        fast_ip_addresses = [ip for ip, valid in zip(fast_ip_addresses, valid_ip_addresses.tolist()) if valid]
+        fast_lines = fast_lines[valid_ip_addresses]
+
+    uri_bounds = zip(field_starts[fast_lines, 6].tolist(), field_ends[fast_lines, 6].tolist())
+    uris = [str(data[start:end], "ascii") for start, end in uri_bounds]
+
+    slow_lines = []
+    slow_logs = []
+    for line in numpy.flatnonzero(~fast & not_empty).tolist():
+        for apache_log in parse_rows([bytes(data[line_starts[line]:line_ends[line]])]):
+            slow_lines.append(line)
+            slow_logs.append(apache_log)
+
+    return _merge(
+        LogBatch(
+            ip_addresses=fast_ip_addresses,
+            timestamps=timestamps[fast_lines],
+            utc_offsets=utc_offsets[fast_lines],
+            methods=methods[fast_lines],
+            uris=uris,
+            status_codes=status_codes[fast_lines],
+            sizes=sizes[fast_lines],
+        ),
+        fast_lines,
+        slow_logs,
+        numpy.array(slow_lines, dtype=numpy.int64),
+    )
+
+
+def _merge(
+    batch: LogBatch,
+    lines: numpy.ndarray,
+    apache_logs: List[ApacheLog],
+    apache_log_lines: numpy.ndarray,
+) -> LogBatch:
+    if not apache_logs:
+        return batch
+
+    order = numpy.argsort(numpy.concatenate([lines, apache_log_lines]), kind="stable")
+
+    def merge_column(column: numpy.ndarray, values: List) -> numpy.ndarray:
+        try:
+            values = numpy.array(values, dtype=column.dtype)
+        except OverflowError:
+            # int() in the scalar parser has no upper bound.
+            column, values = column.astype(object), numpy.array(values, dtype=object)
+
+        return numpy.concatenate([column, values])[order]
+
+    def merge_list(column: List, values: List) -> List:
+        merged = column + values
+        return [merged[i] for i in order.tolist()]
+
+    return LogBatch(
+        ip_addresses=merge_list(batch.ip_addresses, [apache_log.ip_address for apache_log in apache_logs]),
+        timestamps=merge_column(batch.timestamps, [int(apache_log.date.timestamp()) for apache_log in apache_logs]),
+        utc_offsets=merge_column(
+            batch.utc_offsets,
+            [apache_log.date.utcoffset() // timedelta(minutes=1) for apache_log in apache_logs],
+        ),
+        methods=merge_column(batch.methods, [HTTP_METHODS.index(apache_log.method) for apache_log in apache_logs]),
+        uris=merge_list(batch.uris, [apache_log.uri for apache_log in apache_logs]),
+        status_codes=merge_column(batch.status_codes, [apache_log.status_code for apache_log in apache_logs]),
+        sizes=merge_column(batch.sizes, [apache_log.size for apache_log in apache_logs]),
+    )
@@ -1,15 +1,43 @@
 import dataclasses
+import hashlib
+import json
 
-from django.http import JsonResponse
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse, HttpResponse
 from django.shortcuts import render
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import etag
 
-from apache_logs.daos import ApacheLogsDAO, ImportStatusDAO
-from apache_logs.usecases import GetLogsUseCase, ImportStatusUseCase
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
+from apache_logs.analytics import ColumnarLogStore
+from apache_logs.constants import ROLLUP_IPV4_PREFIX, ROLLUP_IPV6_PREFIX
+from apache_logs.daos import ApacheLogsDAO, ImportStatusDAO, AnalyticsApacheLogsDAO, AnomalyEventsDAO, SavedSearchesDAO
+from apache_logs.routers import read_from_replica
+from apache_logs.usecases import GetLogsUseCase, ImportStatusUseCase, GetTimeSeriesUseCase, ExportLogsUseCase, \
+    GetStatisticsUseCase, GetLogRowsUseCase, DataVersionUseCase, ImportQueueUseCase, GetImportStatisticsUseCase, \
+    CompareImportsUseCase, GetNetworkStatisticsUseCase, GetAnomalyEventsUseCase
 
+
+def _get_statistics_dao():
+    # Statistics are scanned from the columnar copy when it is enabled.
+    if not settings.ANALYTICS_PATH:
+        return ApacheLogsDAO()
+
+    return AnalyticsApacheLogsDAO(
+        logs_dao=ApacheLogsDAO(),
+        store=ColumnarLogStore(path=settings.ANALYTICS_PATH, threads=settings.ANALYTICS_THREADS),
+    )
+
+
+@read_from_replica
 def index(request):
-    dao = ApacheLogsDAO()
-    usecase = GetLogsUseCase(logs_dao=dao)
+    dao = _get_statistics_dao()
+    usecase = GetLogsUseCase(logs_dao=dao, saved_searches_dao=SavedSearchesDAO())
 
     query = request.GET.get("q", "")
     page = request.GET.get("page", 1)
@@ -22,13 +50,253 @@ def index(request):
     return render(request, 'apache_logs/index.html', context)
 
 
+@read_from_replica
 def import_status(request):
     dao = ImportStatusDAO()
     usecase = ImportStatusUseCase(dao=dao)
 
     import_statuses = usecase.execute()
 
-    count_not_finished_import_statuses = len([status for status in import_statuses if status.status == "start"])
+    import_queue = ImportQueueUseCase(import_status_dao=dao, max_concurrent=settings.IMPORT_MAX_CONCURRENT).execute()
+
+    count_not_finished_import_statuses = len([
+        status for status in import_statuses if status.status in ("queued", "start")
+    ])
+
+    percents = [
+        {"id": import_status.pk, "percent": import_status.percent}
+        for import_status in import_statuses if import_status.status != "failed"
+    ]
+    return JsonResponse({
+        "percents": percents,
+        "logs_import": bool(count_not_finished_import_statuses),
+        "queue": dataclasses.asdict(import_queue),
+    })
+
+
+@read_from_replica
+def time_series(request):
+    dao = _get_statistics_dao()
+    usecase = GetTimeSeriesUseCase(logs_dao=dao)
+
+    query = request.GET.get("q", "")
+    interval = request.GET.get("interval", "hour")
+    date_from = request.GET.get("from", "")
+    date_to = request.GET.get("to", "")
+
+    try:
+        parsed_date_from = parse_datetime(date_from) if date_from else None
+        parsed_date_to = parse_datetime(date_to) if date_to else None
+    except ValueError:
+        parsed_date_from = parsed_date_to = None
+
+    if (date_from and not parsed_date_from) or (date_to and not parsed_date_to):
+        return JsonResponse({"error": "from and to should be valid ISO 8601 dates"}, status=400)
+
+    try:
+        log_time_series = usecase.execute(
+            query=query,
+            interval=interval,
+            date_from=parsed_date_from,
+            date_to=parsed_date_to,
+        )
+    except usecase.GetTimeSeriesValidationError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse(dataclasses.asdict(log_time_series))
+
+
+@read_from_replica
+def export(request):
+    dao = ApacheLogsDAO()
+    usecase = ExportLogsUseCase(logs_dao=dao)
+
+    query = request.GET.get("q", "")
+    export_format = request.GET.get("format", "csv")
+    compression = request.GET.get("compression") or None
+
+    try:
+        logs_export = usecase.execute(query=query, export_format=export_format, compression=compression)
+    except usecase.ExportLogsValidationError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    response = StreamingHttpResponse(logs_export.chunks, content_type=logs_export.content_type)
+    response["Content-Disposition"] = f'attachment; filename="{logs_export.filename}"'
+    return response
+
+
+class _APIJSONEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        if dataclasses.is_dataclass(o):
+            return dataclasses.asdict(o)
+        return super().default(o)
+
+
+def _json_response(data, status: int = 200) -> HttpResponse:
+    # orjson serialises dataclasses, datetimes and tuples natively and is much faster, but stays optional.
+    if orjson:
+        content = orjson.dumps(data)
+    else:
+        content = json.dumps(data, cls=_APIJSONEncoder, separators=(",", ":"))
+
+    return HttpResponse(content, content_type="application/json", status=status)
+
+
+def _get_data_etag(request) -> str:
+    # Changes with the stored rows and the query string, so unchanged data is answered with
+    # 304 Not Modified before any statistics are computed. The data version is bumped in the
+    # transaction of every inserted or deleted batch, whatever the ids of its rows.
+    data_version = DataVersionUseCase(logs_dao=ApacheLogsDAO()).execute()
+
+    return hashlib.md5(f"{data_version}:{request.GET.urlencode()}".encode("utf-8")).hexdigest()
+
+
+@read_from_replica
+@etag(_get_data_etag)
+def api_logs(request):
+    dao = ApacheLogsDAO()
+    usecase = GetLogRowsUseCase(logs_dao=dao)
+
+    query = request.GET.get("q", "")
+    fields = [field for field in request.GET.get("fields", "").split(",") if field]
+
+    try:
+        page = int(request.GET.get("page", 1))
+        per_page = int(request.GET.get("per_page", 100))
+    except ValueError:
+        return _json_response({"error": "page and per_page should be integers"}, status=400)
+
+    try:
+        log_rows = usecase.execute(query=query, page=page, per_page=per_page, fields=fields)
+    except usecase.GetLogRowsValidationError as e:
+        return _json_response({"error": str(e)}, status=400)
+
+    return _json_response({
+        "fields": log_rows.fields,
+        "rows": log_rows.rows,
+        "page": log_rows.page,
+        "has_next": log_rows.has_next,
+    })
+
+
+@read_from_replica
+@etag(_get_data_etag)
+def api_statistics(request):
+    dao = _get_statistics_dao()
+    usecase = GetStatisticsUseCase(logs_dao=dao, saved_searches_dao=SavedSearchesDAO())
+
+    query = request.GET.get("q", "")
+
+    return _json_response(usecase.execute(query=query))
+
+
+@read_from_replica
+def api_import_statistics(request, import_status_id: int):
+    usecase = GetImportStatisticsUseCase(import_status_dao=ImportStatusDAO())
+
+    try:
+        import_statistics = usecase.execute(import_status_id=import_status_id)
+    except usecase.GetImportStatisticsValidationError as e:
+        return _json_response({"error": str(e)}, status=404)
+
+    return _json_response(import_statistics)
+
+
+@read_from_replica
+def api_compare_imports(request):
+    usecase = CompareImportsUseCase(import_status_dao=ImportStatusDAO())
+
+    try:
+        base_import_status_id = int(request.GET.get("base", ""))
+        other_import_status_id = int(request.GET.get("other", ""))
+    except ValueError:
+        return _json_response({"error": "base and other should be import ids"}, status=400)
+
+    try:
+        import_comparison = usecase.execute(
+            base_import_status_id=base_import_status_id,
+            other_import_status_id=other_import_status_id,
+        )
+    except GetImportStatisticsUseCase.GetImportStatisticsValidationError as e:
+        return _json_response({"error": str(e)}, status=404)
+
+    return _json_response(import_comparison)
+
+
+@read_from_replica
+@etag(_get_data_etag)
+def api_networks(request):
+    dao = _get_statistics_dao()
+    usecase = GetNetworkStatisticsUseCase(logs_dao=dao)
+
+    date_from = request.GET.get("from", "")
+    date_to = request.GET.get("to", "")
+
+    try:
+        ipv4_prefix = int(request.GET.get("prefix", ROLLUP_IPV4_PREFIX))
+        ipv6_prefix = int(request.GET.get("ipv6_prefix", ROLLUP_IPV6_PREFIX))
+        groups_count = int(request.GET.get("count", 20))
+    except ValueError:
+        return _json_response({"error": "prefix, ipv6_prefix and count should be integers"}, status=400)
+
+    try:
+        parsed_date_from = parse_datetime(date_from) if date_from else None
+        parsed_date_to = parse_datetime(date_to) if date_to else None
+    except ValueError:
+        parsed_date_from = parsed_date_to = None
+
+    if (date_from and not parsed_date_from) or (date_to and not parsed_date_to):
+        return _json_response({"error": "from and to should be valid ISO 8601 dates"}, status=400)
+
+    try:
+        count_networks = usecase.execute(
+            group_by=request.GET.get("by", "subnet"),
+            ipv4_prefix=ipv4_prefix,
+            ipv6_prefix=ipv6_prefix,
+            subnet=request.GET.get("subnet") or None,
+            date_from=parsed_date_from,
+            date_to=parsed_date_to,
+            groups_count=groups_count,
+        )
+    except usecase.GetNetworkStatisticsValidationError as e:
+        return _json_response({"error": str(e)}, status=400)
+
+    return _json_response(count_networks)
+
+
+@read_from_replica
+def api_anomalies(request):
+    usecase = GetAnomalyEventsUseCase(anomaly_events_dao=AnomalyEventsDAO())
+
+    date_from = request.GET.get("from", "")
+    date_to = request.GET.get("to", "")
+
+    try:
+        import_status_id = int(request.GET["import"]) if request.GET.get("import") else None
+        events_count = int(request.GET.get("count", 100))
+    except ValueError:
+        return _json_response({"error": "import and count should be integers"}, status=400)
+
+    try:
+        parsed_date_from = parse_datetime(date_from) if date_from else None
+        parsed_date_to = parse_datetime(date_to) if date_to else None
+    except ValueError:
+        parsed_date_from = parsed_date_to = None
+
+    if (date_from and not parsed_date_from) or (date_to and not parsed_date_to):
+        return _json_response({"error": "from and to should be valid ISO 8601 dates"}, status=400)
+
+    try:
+        anomaly_events = usecase.execute(
+            kind=request.GET.get("kind") or None,
+            reason=request.GET.get("reason") or None,
+            key=request.GET.get("key") or None,
+            import_status_id=import_status_id,
+            date_from=parsed_date_from,
+            date_to=parsed_date_to,
+            events_count=events_count,
+        )
+    except usecase.GetAnomalyEventsValidationError as e:
+        return _json_response({"error": str(e)}, status=400)
 
-    percents = [{"id": import_status.pk, "percent": import_status.percent} for import_status in import_statuses]
-    return JsonResponse({"percents": percents, "logs_import": bool(count_not_finished_import_statuses)})
+    return _json_response(anomaly_events)
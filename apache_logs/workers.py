@@ -0,0 +1,193 @@
+from functools import lru_cache
+from typing import Optional, TYPE_CHECKING
+
+from django.conf import settings
+from django.db import connections, close_old_connections
+
+from apache_logs.analytics import ColumnarLogStore
+from apache_logs.daos import ApacheLogsDAO, RequestDAO, ImportStatusDAO, SourceRequestDAO, FileRequestDAO, \
+    AnalyticsApacheLogsDAO, LogSegmentsDAO, GeoIPDAO, AnomalyEventsDAO, SavedSearchesDAO, HostRateLimitsDAO
+from apache_logs.entities import AnomalyThresholds
+from apache_logs.interfaces import IApacheLogsDAO
+from apache_logs.usecases import ParseLogsUseCase, RefreshSavedSearchesUseCase
+
+if TYPE_CHECKING:
+    import requests
+
+
+# Process-level singletons, built lazily in every worker process after the fork. Celery is not
+# imported here, so the local import entry point uses them too; tasks.py connects the signals.
+
+@lru_cache(maxsize=None)
+def get_http_session() -> "requests.Session":
+    # Imported on first use, imports of local files never need requests.
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=settings.HTTP_POOL_SIZE,
+        pool_maxsize=settings.HTTP_POOL_SIZE,
+        max_retries=Retry(total=settings.HTTP_RETRIES, backoff_factor=0.5, status_forcelist=[502, 503, 504]),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+
+@lru_cache(maxsize=None)
+def get_apache_logs_dao() -> IApacheLogsDAO:
+    apache_logs_dao = ApacheLogsDAO(batch_size=settings.PARSE_LOGS_DB_BATCH_SIZE)
+    if not settings.ANALYTICS_PATH:
+        return apache_logs_dao
+
+    # Imported rows are appended to the columnar analytics copy as well.
+    return AnalyticsApacheLogsDAO(
+        logs_dao=apache_logs_dao,
+        store=ColumnarLogStore(
+            path=settings.ANALYTICS_PATH,
+            threads=settings.ANALYTICS_THREADS,
+            compact_segments=settings.ANALYTICS_COMPACT_SEGMENTS,
+            segment_rows=settings.ANALYTICS_SEGMENT_ROWS,
+        ),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_request_dao() -> RequestDAO:
+    return RequestDAO(session=get_http_session())
+
+
+@lru_cache(maxsize=None)
+def get_source_request_dao() -> SourceRequestDAO:
+    return SourceRequestDAO(http_dao=get_request_dao(), file_dao=FileRequestDAO())
+
+
+@lru_cache(maxsize=None)
+def get_import_status_dao() -> ImportStatusDAO:
+    return ImportStatusDAO()
+
+
+@lru_cache(maxsize=None)
+def get_segments_dao() -> Optional[LogSegmentsDAO]:
+    if not settings.SEGMENTS_PATH:
+        return None
+
+    return LogSegmentsDAO(path=settings.SEGMENTS_PATH)
+
+
+@lru_cache(maxsize=None)
+def get_geoip_dao() -> Optional[GeoIPDAO]:
+    # The database is loaded once per process.
+    if not settings.GEOIP_PATH:
+        return None
+
+    return GeoIPDAO(path=settings.GEOIP_PATH, cache_size=settings.GEOIP_CACHE_SIZE)
+
+
+@lru_cache(maxsize=None)
+def get_anomaly_events_dao() -> AnomalyEventsDAO:
+    return AnomalyEventsDAO()
+
+
+@lru_cache(maxsize=None)
+def get_saved_searches_dao() -> SavedSearchesDAO:
+    return SavedSearchesDAO()
+
+
+@lru_cache(maxsize=None)
+def get_host_rate_limits_dao() -> HostRateLimitsDAO:
+    return HostRateLimitsDAO()
+
+
+def get_anomaly_thresholds() -> AnomalyThresholds:
+    return AnomalyThresholds(
+        window_seconds=settings.ANOMALY_WINDOW_SECONDS,
+        max_ip_requests=settings.ANOMALY_MAX_IP_REQUESTS,
+        max_uri_requests=settings.ANOMALY_MAX_URI_REQUESTS,
+        max_error_ratio=settings.ANOMALY_MAX_ERROR_RATIO,
+        min_requests=settings.ANOMALY_MIN_REQUESTS,
+        max_keys=settings.ANOMALY_MAX_KEYS,
+    )
+
+
+def get_parse_logs_options() -> dict:
+    return {
+        "min_range_size": settings.PARSE_LOGS_MIN_RANGE_SIZE,
+        "max_range_size": settings.PARSE_LOGS_MAX_RANGE_SIZE,
+        "target_range_seconds": settings.PARSE_LOGS_TARGET_RANGE_SECONDS,
+        "deduplicate": settings.PARSE_LOGS_DEDUPLICATE,
+        "rebuild_indexes_from_size": settings.PARSE_LOGS_REBUILD_INDEXES_FROM_SIZE,
+        # The request slots of a host are booked in the database, so the rate holds across all
+        # running imports of the host and the processes of a local import.
+        "requests_per_second": settings.IMPORT_HOST_REQUESTS_PER_SECOND,
+        "host_rate_limits_dao": get_host_rate_limits_dao(),
+        "vectorized": settings.PARSE_LOGS_VECTORIZED,
+        "log_format": settings.PARSE_LOGS_FORMAT,
+        "segments_dao": get_segments_dao(),
+        "segment_rows": settings.SEGMENT_ROWS,
+        "geoip_dao": get_geoip_dao(),
+        "anomaly_events_dao": get_anomaly_events_dao(),
+        "anomaly_thresholds": get_anomaly_thresholds(),
+    }
+
+
+def import_part(import_status_id: int):
+    # One part of a bulk import, run by import_part_task and by the processes of a local import.
+    parse_logs_usecase = ParseLogsUseCase(
+        logs_dao=get_apache_logs_dao(),
+        request_dao=get_source_request_dao(),
+        import_status_dao=get_import_status_dao(),
+        **get_parse_logs_options(),
+    )
+
+    parse_logs_usecase.execute_part(import_status_id=import_status_id)
+
+
+def refresh_saved_searches() -> int:
+    refresh_saved_searches_usecase = RefreshSavedSearchesUseCase(
+        logs_dao=get_apache_logs_dao(),
+        saved_searches_dao=get_saved_searches_dao(),
+    )
+
+    return refresh_saved_searches_usecase.execute()
+
+
+def reset_worker_state(**kwargs):
+    # Sockets inherited from the parent process must not be shared with it.
+    for get_singleton in (
+        get_http_session,
+        get_apache_logs_dao,
+        get_request_dao,
+        get_source_request_dao,
+        get_import_status_dao,
+        get_segments_dao,
+        get_geoip_dao,
+        get_anomaly_events_dao,
+        get_saved_searches_dao,
+    ):
+        get_singleton.cache_clear()
+
+    close_connections()
+
+
+def close_connections():
+    # Connections are per thread, this closes the ones of the calling thread.
+    for connection in connections.all():
+        connection.close()
+
+
+def check_connections(**kwargs):
+    # Persistent connections (CONN_MAX_AGE) can be dropped by the server or a pooler
+    # while the worker is idle, a broken one is closed and reopened on first use.
+    for connection in connections.all():
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
+
+    close_old_connections()
+
+
+def release_connections(**kwargs):
+    close_old_connections()
@@ -1,6 +1,7 @@
 import os
 
 from celery import Celery
+from celery.schedules import crontab
 from django.conf import settings
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "parsing_logs.settings")
@@ -10,4 +11,33 @@ celery_app = Celery(
     broker=settings.CELERY_BROKER_URL,
 )
 
+celery_app.conf.update(
+    # One long import at a time per process, a prefetched import would wait behind it.
+    worker_prefetch_multiplier=1,
+    # Imports are idempotent, so an import interrupted by a worker crash is simply re-delivered.
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    # Redis re-delivers unacknowledged tasks after the visibility timeout, also while they still run,
+    # so it must outlast the longest import or the import would run twice, past the concurrency caps.
+    broker_transport_options={"visibility_timeout": settings.CELERY_VISIBILITY_TIMEOUT},
+    worker_concurrency=settings.CELERY_WORKER_CONCURRENCY,
+    worker_max_tasks_per_child=settings.CELERY_WORKER_MAX_TASKS_PER_CHILD,
+    task_routes={
+        "apache_logs.tasks.parse_logs_task": {"queue": settings.CELERY_IMPORTS_QUEUE},
+        "apache_logs.tasks.import_part_task": {"queue": settings.CELERY_IMPORTS_QUEUE},
+    },
+)
+
 celery_app.autodiscover_tasks()
+
+celery_app.conf.beat_schedule = {
+    "retention": {
+        "task": "apache_logs.tasks.retention_task",
+        "schedule": crontab(hour=settings.RETENTION_HOUR, minute=0),
+    },
+    # Picks up queued imports whose scheduling message was lost, e.g. after a worker crash.
+    "schedule_imports": {
+        "task": "apache_logs.tasks.schedule_imports_task",
+        "schedule": settings.IMPORT_SCHEDULE_SECONDS,
+    },
+}
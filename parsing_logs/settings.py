@@ -67,15 +67,29 @@ WSGI_APPLICATION = 'parsing_logs.wsgi.application'
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
 
+# Seconds a connection is kept open between requests and Celery tasks, 0 closes it every time.
+DATABASE_CONN_MAX_AGE = int(os.environ.get("DATABASE_CONN_MAX_AGE", 60))
+
 if 'test' in sys.argv:
     DATABASES = {
         'default': dj_database_url.parse(os.environ.get("TEST_DATABASE_URL")),
     }
 else:
     DATABASES = {
-        'default': dj_database_url.parse(os.environ.get("DATABASE_URL")),
+        'default': dj_database_url.parse(os.environ.get("DATABASE_URL"), conn_max_age=DATABASE_CONN_MAX_AGE),
     }
 
+DATABASE_REPLICAS = []
+for replica_number, replica_url in enumerate(os.environ.get("DATABASE_REPLICA_URLS", "").split()):
+    replica_alias = f"replica_{replica_number}"
+    DATABASES[replica_alias] = dj_database_url.parse(replica_url, conn_max_age=DATABASE_CONN_MAX_AGE)
+    DATABASES[replica_alias]["TEST"] = {"MIRROR": "default"}
+    DATABASE_REPLICAS.append(replica_alias)
+
+DATABASE_ROUTERS = ["apache_logs.routers.ReplicaRouter"]
+
+DATABASE_PRIMARY_READS_AFTER_IMPORT_SECONDS = int(os.environ.get("DATABASE_PRIMARY_READS_AFTER_IMPORT_SECONDS", 0))
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.1/topics/i18n/
 
@@ -96,3 +110,75 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL")
+# Imports are long and I/O bound, they get their own queue so short tasks never wait behind them.
+CELERY_IMPORTS_QUEUE = os.environ.get("CELERY_IMPORTS_QUEUE", "imports")
+CELERY_WORKER_CONCURRENCY = int(os.environ.get("CELERY_WORKER_CONCURRENCY", 4))
+CELERY_WORKER_MAX_TASKS_PER_CHILD = int(os.environ.get("CELERY_WORKER_MAX_TASKS_PER_CHILD", 100))
+# Seconds a started task stays unacknowledged before Redis delivers it again, longer than the longest import.
+CELERY_VISIBILITY_TIMEOUT = int(os.environ.get("CELERY_VISIBILITY_TIMEOUT", 24 * 60 * 60))
+
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 4))
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", 3))
+
+# Imports are queued and started by schedule_imports_task within these limits.
+IMPORT_MAX_CONCURRENT = int(os.environ.get("IMPORT_MAX_CONCURRENT", 2))
+IMPORT_MAX_CONCURRENT_PER_HOST = max(int(os.environ.get("IMPORT_MAX_CONCURRENT_PER_HOST", 1)), 1)
+# Range requests per second to a single source host, shared by its running imports. 0 means unlimited.
+IMPORT_HOST_REQUESTS_PER_SECOND = float(os.environ.get("IMPORT_HOST_REQUESTS_PER_SECOND", 0))
+IMPORT_SCHEDULE_SECONDS = int(os.environ.get("IMPORT_SCHEDULE_SECONDS", 30))
+# Bulk imports pack sources smaller than IMPORT_PACK_SIZE into one job and split bigger than IMPORT_SPLIT_SIZE.
+IMPORT_PACK_SIZE = int(os.environ.get("IMPORT_PACK_SIZE", 8 * 1024 * 1024))
+IMPORT_SPLIT_SIZE = int(os.environ.get("IMPORT_SPLIT_SIZE", 256 * 1024 * 1024))
+
+PARSE_LOGS_ASYNC = int(os.environ.get("PARSE_LOGS_ASYNC", 0))
+# How often `parse_logs --local` prints the throughput.
+PARSE_LOGS_LOCAL_PROGRESS_SECONDS = float(os.environ.get("PARSE_LOGS_LOCAL_PROGRESS_SECONDS", 1.0))
+# Parses fixed-format lines as NumPy columns, needs numpy installed.
+PARSE_LOGS_VECTORIZED = int(os.environ.get("PARSE_LOGS_VECTORIZED", 0))
+# A name from apache_logs.formats.LOG_FORMATS, an Apache LogFormat string or "auto" to detect it per file.
+PARSE_LOGS_FORMAT = os.environ.get("PARSE_LOGS_FORMAT", "auto")
+PARSE_LOGS_QUEUE_SIZE = int(os.environ.get("PARSE_LOGS_QUEUE_SIZE", 2))
+PARSE_LOGS_MIN_RANGE_SIZE = int(os.environ.get("PARSE_LOGS_MIN_RANGE_SIZE", 64 * 1024))
+PARSE_LOGS_MAX_RANGE_SIZE = int(os.environ.get("PARSE_LOGS_MAX_RANGE_SIZE", 16 * 1024 * 1024))
+PARSE_LOGS_TARGET_RANGE_SECONDS = float(os.environ.get("PARSE_LOGS_TARGET_RANGE_SECONDS", 1.0))
+PARSE_LOGS_DB_BATCH_SIZE = int(os.environ.get("PARSE_LOGS_DB_BATCH_SIZE", 1000))
+PARSE_LOGS_DEDUPLICATE = int(os.environ.get("PARSE_LOGS_DEDUPLICATE", 1))
+# Drop ApacheLogORM secondary indexes during imports of at least this many bytes and rebuild them afterwards.
+PARSE_LOGS_REBUILD_INDEXES_FROM_SIZE = (
+    int(os.environ["PARSE_LOGS_REBUILD_INDEXES_FROM_SIZE"]) if os.environ.get("PARSE_LOGS_REBUILD_INDEXES_FROM_SIZE")
+    else None
+)
+
+# Directory of the columnar analytics copy of the logs, needs duckdb and pyarrow installed. Empty disables it.
+ANALYTICS_PATH = os.environ.get("ANALYTICS_PATH", "")
+# DuckDB scan threads, 0 uses all cores.
+ANALYTICS_THREADS = int(os.environ.get("ANALYTICS_THREADS", 0))
+ANALYTICS_COMPACT_SEGMENTS = int(os.environ.get("ANALYTICS_COMPACT_SEGMENTS", 16))
+ANALYTICS_SEGMENT_ROWS = int(os.environ.get("ANALYTICS_SEGMENT_ROWS", 1_000_000))
+
+# Directory of the parsed segments written during imports, see apache_logs/segments.py. Empty disables them.
+SEGMENTS_PATH = os.environ.get("SEGMENTS_PATH", "")
+# Inserted rows buffered per segment, an import writes one segment per this many rows.
+SEGMENT_ROWS = int(os.environ.get("SEGMENT_ROWS", 100_000))
+
+# Offline ip range database with autonomous systems and countries (iptoasn.com ip2asn-combined.tsv, may be
+# gzipped), addresses are looked up during imports. Empty disables it.
+GEOIP_PATH = os.environ.get("GEOIP_PATH", "")
+GEOIP_CACHE_SIZE = int(os.environ.get("GEOIP_CACHE_SIZE", 65536))
+
+# Bursts per ip address and uri flagged while logs are imported, see apache_logs/anomalies.py. 0 seconds disables it.
+ANOMALY_WINDOW_SECONDS = int(os.environ.get("ANOMALY_WINDOW_SECONDS", 60))
+# Requests per window, 0 turns the check off.
+ANOMALY_MAX_IP_REQUESTS = int(os.environ.get("ANOMALY_MAX_IP_REQUESTS", 600))
+ANOMALY_MAX_URI_REQUESTS = int(os.environ.get("ANOMALY_MAX_URI_REQUESTS", 6000))
+# Share of responses with status >= 400 of keys with at least ANOMALY_MIN_REQUESTS requests in a window.
+ANOMALY_MAX_ERROR_RATIO = float(os.environ.get("ANOMALY_MAX_ERROR_RATIO", 0.5))
+ANOMALY_MIN_REQUESTS = int(os.environ.get("ANOMALY_MIN_REQUESTS", 50))
+ANOMALY_MAX_KEYS = int(os.environ.get("ANOMALY_MAX_KEYS", 100000))
+
+# Raw log rows older than RETENTION_LOG_DAYS are deleted, per-minute rollups are kept. 0 keeps everything.
+RETENTION_LOG_DAYS = int(os.environ.get("RETENTION_LOG_DAYS", 0))
+RETENTION_IMPORT_STATUS_DAYS = int(os.environ.get("RETENTION_IMPORT_STATUS_DAYS", 30))
+RETENTION_BATCH_SIZE = int(os.environ.get("RETENTION_BATCH_SIZE", 10000))
+RETENTION_PAUSE_SECONDS = float(os.environ.get("RETENTION_PAUSE_SECONDS", 0.1))
+RETENTION_HOUR = int(os.environ.get("RETENTION_HOUR", 3))